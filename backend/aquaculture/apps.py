@@ -6,4 +6,11 @@ class AquacultureConfig(AppConfig):
     name = 'aquaculture'
 
     def ready(self):
+        from django.conf import settings
+
         from . import signals  # noqa: F401
+
+        if getattr(settings, 'CONSULTAS_LENTAS_MS', 0) > 0:
+            from db import lentas
+
+            lentas.instalar(settings.CONSULTAS_LENTAS_MS, settings.CONSULTAS_LENTAS_MAXIMO)
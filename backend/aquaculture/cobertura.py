@@ -32,14 +32,25 @@ cobertura que sobrevive e a derivada daqui.
 **Uma consulta so, e nao uma por dataset.** O agrupamento
 `(fonte, variavel, local)` tem 24 linhas no total; nove agregacoes separadas
 custariam nove idas ao banco para responder o que uma responde.
+
+**E essa consulta le um resumo, e nao a tabela de medicoes.** O `GROUP BY`
+sobre `MedicaoAmbiental` inteira rodava a cada visita ao catalogo, e crescia
+com a serie. `CoberturaResumo` guarda o resultado por grupo, e `acumular`
+o mantem dentro da transacao do `persistencia.gravar`. Sim, e uma copia - a
+regra acima diz que copia envelhece. O que a torna aceitavel e nao depender
+de ninguem lembrar: a mesma transacao que grava a medicao grava o resumo,
+`reconstruir` a refaz do zero, e `divergencias` (no `conferir_persistencia`)
+reprova o deploy se ela se afastar do banco.
 """
 
+from django.db import transaction
 from django.db.models import Count, Max, Min
+from django.utils import timezone
 
-from .models import MedicaoAmbiental
+from .models import CoberturaResumo, MedicaoAmbiental
 
-# Chave do agrupamento que a consulta unica devolve.
-CAMPOS_GRUPO = ('fonte', 'variavel', 'local_recife__slug')
+# Chave de um grupo no resumo gravado: (recife, fonte, variavel).
+CAMPOS_GRUPO = ('local_recife_id', 'fonte', 'variavel')
 
 MOTIVO_EXTERNO = (
     'Referencia externa: o dataset existe no provedor e este projeto nao o '
@@ -59,11 +70,13 @@ def resumo():
     mapa ja montado, o que obrigava a view a avaliar o queryset uma segunda vez
     so para monta-lo — tres consultas onde bastavam duas. Um teste de contagem
     pegou.
+
+    Le de `CoberturaResumo`: poucas dezenas de linhas, qualquer que seja o
+    tamanho da serie.
     """
-    agrupado = (
-        MedicaoAmbiental.objects
-        .values(*CAMPOS_GRUPO)
-        .annotate(n=Count('id'), inicio=Min('data'), fim=Max('data'))
+    linhas = (
+        CoberturaResumo.objects.filter(n__gt=0)
+        .values('fonte', 'variavel', 'local_recife__slug', 'n', 'inicio', 'fim')
     )
 
     return {
@@ -72,10 +85,138 @@ def resumo():
             'inicio': linha['inicio'],
             'fim': linha['fim'],
         }
+        for linha in linhas
+    }
+
+
+def agregar(locais=None):
+    """`{(recife_id, fonte, variavel): (n, inicio, fim)}` contado nas medicoes.
+
+    ⚠️ E a consulta cara, a que o resumo existe para evitar: `GROUP BY` sobre
+    a tabela inteira (ou sobre os recifes de `locais`). So para `reconstruir`
+    e `divergencias`, nunca no caminho de uma requisicao.
+    """
+    medicoes = MedicaoAmbiental.objects.order_by()
+    if locais is not None:
+        medicoes = medicoes.filter(local_recife__in=locais)
+    agrupado = (
+        medicoes.values(*CAMPOS_GRUPO)
+        .annotate(n=Count('id'), inicio=Min('data'), fim=Max('data'))
+    )
+    return {
+        tuple(linha[campo] for campo in CAMPOS_GRUPO): (linha['n'], linha['inicio'], linha['fim'])
         for linha in agrupado
     }
 
 
+def _guardado(locais=None):
+    linhas = CoberturaResumo.objects.filter(n__gt=0)
+    if locais is not None:
+        linhas = linhas.filter(local_recife__in=locais)
+    return {
+        tuple(linha[:3]): tuple(linha[3:])
+        for linha in linhas.values_list(*CAMPOS_GRUPO, 'n', 'inicio', 'fim')
+    }
+
+
+def divergencias(locais=None):
+    """Os grupos em que o resumo gravado nao bate com as medicoes.
+
+    Vazio e o esperado. Qualquer grupo aqui e medicao gravada ou apagada por
+    fora do `gravar` - e `reconstruir` resolve.
+    """
+    real, guardado = agregar(locais), _guardado(locais)
+    return sorted(
+        chave for chave in real.keys() | guardado.keys()
+        if real.get(chave) != guardado.get(chave)
+    )
+
+
+def reconstruir(locais=None):
+    """Refaz o resumo a partir das medicoes. Devolve quantos grupos mudaram.
+
+    Uma transacao: quem le o catalogo durante a reconstrucao ve o resumo
+    antigo inteiro, e nunca um pela metade.
+    """
+    with transaction.atomic():
+        mudaram = len(divergencias(locais))
+        antigos = CoberturaResumo.objects.all()
+        if locais is not None:
+            antigos = antigos.filter(local_recife__in=locais)
+        antigos.delete()
+        CoberturaResumo.objects.bulk_create([
+            CoberturaResumo(
+                local_recife_id=local, fonte=fonte, variavel=variavel,
+                n=n, inicio=inicio, fim=fim,
+            )
+            for (local, fonte, variavel), (n, inicio, fim) in agregar(locais).items()
+        ], batch_size=1000)
+    return mudaram
+
+
+def acumular(medicoes):
+    """Soma ao resumo as medicoes novas do lote. Chamada por `gravar`.
+
+    Precisa rodar na transacao do `gravar`, antes do upsert: so o que ainda
+    nao existe conta. O upsert regrava a medicao que ja esta no banco, e
+    conta-la de novo inflaria `n` a cada reingestao da janela diaria. As datas
+    do lote sao conferidas contra a unicidade numa consulta so.
+
+    ⚠️ As linhas do resumo sao travadas (`select_for_update`) **antes** dessa
+    conferencia. Duas ingestoes do mesmo grupo esperam uma pela outra, e a
+    segunda ve o que a primeira gravou; sem a trava, as duas contariam a mesma
+    medicao como nova. O grupo que ainda nao existe nasce zerado primeiro, para
+    que tambem haja linha a travar.
+    """
+    if not medicoes:
+        return
+
+    grupos = {(m.local_recife_id, m.fonte, m.variavel) for m in medicoes}
+    locais = {local for local, _, _ in grupos}
+    fontes = {fonte for _, fonte, _ in grupos}
+    variaveis = {variavel for _, _, variavel in grupos}
+
+    CoberturaResumo.objects.bulk_create(
+        [CoberturaResumo(local_recife_id=local, fonte=fonte, variavel=variavel)
+         for local, fonte, variavel in grupos],
+        ignore_conflicts=True,
+    )
+    travadas = {
+        (r.local_recife_id, r.fonte, r.variavel): r
+        for r in CoberturaResumo.objects.select_for_update().filter(
+            local_recife_id__in=locais, fonte__in=fontes, variavel__in=variaveis,
+        )
+    }
+
+    datas = [m.data for m in medicoes]
+    existentes = set(
+        MedicaoAmbiental.objects.filter(
+            local_recife_id__in=locais, fonte__in=fontes, variavel__in=variaveis,
+            data__range=(min(datas), max(datas)),
+        ).values_list(*CAMPOS_GRUPO, 'data')
+    )
+
+    alteradas = {}
+    for medicao in medicoes:
+        grupo = (medicao.local_recife_id, medicao.fonte, medicao.variavel)
+        chave = (*grupo, medicao.data)
+        if chave in existentes:
+            continue
+        existentes.add(chave)
+        resumo_do_grupo = alteradas[grupo] = travadas[grupo]
+        resumo_do_grupo.n += 1
+        resumo_do_grupo.inicio = min(resumo_do_grupo.inicio or medicao.data, medicao.data)
+        resumo_do_grupo.fim = max(resumo_do_grupo.fim or medicao.data, medicao.data)
+
+    if alteradas:
+        agora = timezone.now()
+        for resumo_do_grupo in alteradas.values():
+            resumo_do_grupo.atualizado_em = agora
+        CoberturaResumo.objects.bulk_update(
+            list(alteradas.values()), ['n', 'inicio', 'fim', 'atualizado_em'],
+        )
+
+
 def _consulta_de_medicoes(dataset, variaveis):
     """A URL que devolve exatamente estas medicoes.
 
@@ -0,0 +1,185 @@
+"""Mede os caminhos quentes sobre dados sinteticos e compara com uma rodada anterior.
+
+    python backend/manage.py benchmark
+    python backend/manage.py benchmark --recifes 30 --anos 10 --repeticoes 3
+    python backend/manage.py benchmark --casos api predicao.calcular
+    python backend/manage.py benchmark --comparar dados/benchmarks/base.json
+
+O resultado vai para `dados/benchmarks/<data>-<commit>.json`. Com
+`--comparar`, sai com codigo 1 se algum caso regrediu alem de `--tolerancia`
+- e o que deixa o benchmark servir de portao em CI.
+
+Como medir uma otimizacao: rode no commit de antes com `--saida base.json`,
+aplique a troca e rode de novo com `--comparar base.json`, na mesma escala.
+
+🚨 Os dados vao para um banco de teste criado so para a rodada e destruido no
+fim, como o do `manage.py test`. Gravar recifes sinteticos no banco de
+verdade os faria aparecer no site e no treino.
+"""
+
+import logging
+import sys
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import casos, execucao, sintetico
+from ml.persistencia import RAIZ
+
+PASTA_PADRAO = RAIZ / 'dados' / 'benchmarks'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark dos caminhos quentes sobre dados sinteticos, num banco descartavel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recifes', type=int, default=3)
+        parser.add_argument('--anos', type=int, default=6)
+        parser.add_argument(
+            '--variaveis', default=','.join(sintetico.VARIAVEIS_PADRAO),
+            help=f'Separadas por virgula. Disponiveis: {", ".join(sintetico.ORIGENS)}',
+        )
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument(
+            '--casos', nargs='*', default=(),
+            help='Prefixos dos casos a rodar (ex.: api predicao.calcular). Padrao: todos.',
+        )
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument('--saida', help=f'JSON da rodada. Padrao: {PASTA_PADRAO}/')
+        parser.add_argument('--comparar', help='JSON de uma rodada anterior.')
+        parser.add_argument(
+            '--tolerancia', type=float, default=execucao.TOLERANCIA_PADRAO,
+            help='Piora relativa aceita antes de acusar regressao. Padrao: 0.20',
+        )
+        parser.add_argument(
+            '--piso-ms', type=float, default=execucao.PISO_MS_PADRAO,
+            help='Diferenca absoluta abaixo da qual nada e regressao. Padrao: 1 ms',
+        )
+        parser.add_argument('--listar', action='store_true', help='Lista os casos e sai.')
+
+    def handle(self, *args, **opcoes):
+        if opcoes['listar']:
+            for caso in casos.CASOS.values():
+                exige = f'  (exige {", ".join(caso.exige)})' if caso.exige else ''
+                self.stdout.write(f'  {caso.grupo:10s} {caso.nome}{exige}')
+            return
+
+        try:
+            escala = sintetico.Escala(
+                recifes=opcoes['recifes'], anos=opcoes['anos'],
+                variaveis=tuple(v.strip() for v in opcoes['variaveis'].split(',') if v.strip()),
+                semente=opcoes['semente'],
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro)) from erro
+
+        selecionados = casos.selecionar(opcoes['casos'])
+        if not selecionados:
+            raise CommandError(
+                f'Nenhum caso comeca por {opcoes["casos"]}. Veja --listar.'
+            )
+
+        base = None
+        if opcoes['comparar']:
+            from django.db import connection
+
+            # Conferida antes de medir: descobrir a escala errada depois de
+            # dez minutos de benchmark seria jogar a rodada fora.
+            try:
+                base = execucao.ler(opcoes['comparar'])
+                execucao.exigir_comparavel(base, escala.como_dict(), connection.vendor)
+            except (OSError, execucao.RodadasIncomparaveis) as erro:
+                raise CommandError(str(erro)) from erro
+
+        self.stdout.write(self.style.MIGRATE_HEADING('=== ESCALA ==='))
+        self.stdout.write(
+            f'  {escala.recifes} recifes x {escala.anos} anos x '
+            f'{len(escala.variaveis)} variaveis = ~{escala.medicoes:,} medicoes'
+        )
+
+        rodada = self._medir(selecionados, escala, opcoes['repeticoes'])
+        execucao.identificar(rodada)
+
+        saida = Path(opcoes['saida'] or PASTA_PADRAO / (
+            f'{date.today().isoformat()}-{rodada.commit or "sem-git"}.json'
+        ))
+        rodada.salvar(saida)
+        self.stdout.write(f'\n  gravado em {saida}')
+        if rodada.alterado:
+            self.stdout.write(self.style.WARNING(
+                '  (!) arvore com alteracoes nao commitadas: a medida nao e do '
+                f'commit {rodada.commit}.'
+            ))
+
+        if base is not None:
+            self._comparar(base, rodada, opcoes, [c.nome for c in selecionados])
+
+    def _medir(self, selecionados, escala, repeticoes):
+        from django.conf import settings
+        from django.db import connection
+        from django.test.utils import setup_test_environment, teardown_test_environment
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== CASOS (mediana) ==='))
+
+        def mostrar(medida):
+            self.stdout.write(
+                f'  {medida.nome:30s} {medida.mediana_ms:10.1f} ms  '
+                f'[{medida.minimo_ms:.1f} - {medida.maximo_ms:.1f}]  '
+                f'{medida.por_item_us:10.1f} us/item ({medida.itens:,})'
+            )
+
+        original = settings.DATABASES['default']['NAME']
+        # Uma linha de log por requisicao no console mediria o terminal, nao a
+        # view. Avisos continuam passando.
+        logging.disable(logging.INFO)
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        cenario = casos.Cenario(escala)
+        try:
+            rodada = execucao.executar(selecionados, cenario, repeticoes, mostrar)
+        finally:
+            cenario.fechar()
+            connection.creation.destroy_test_db(original, verbosity=0)
+            teardown_test_environment()
+            logging.disable(logging.NOTSET)
+
+        for nome, motivo in rodada.pulados.items():
+            self.stdout.write(f'  {nome:30s} pulado: {motivo}')
+        return rodada
+
+    def _comparar(self, base, rodada, opcoes, nomes):
+        try:
+            diferencas = execucao.comparar(
+                base, rodada, opcoes['tolerancia'], opcoes['piso_ms'], nomes
+            )
+        except execucao.RodadasIncomparaveis as erro:
+            raise CommandError(str(erro)) from erro
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\n=== CONTRA {base.commit or opcoes["comparar"]} '
+            f'(tolerancia {opcoes["tolerancia"]:.0%}) ==='
+        ))
+        estilos = {
+            'regrediu': self.style.ERROR,
+            'melhorou': self.style.SUCCESS,
+        }
+        for diferenca in diferencas:
+            if diferenca.razao is None:
+                linha = f'  {diferenca.nome:30s} {diferenca.situacao}'
+            else:
+                linha = (
+                    f'  {diferenca.nome:30s} {diferenca.base_ms:10.1f} -> '
+                    f'{diferenca.atual_ms:10.1f} ms  x{diferenca.razao:.2f}  '
+                    f'{diferenca.situacao}'
+                )
+            self.stdout.write(estilos.get(diferenca.situacao, str)(linha))
+
+        regressoes = [d for d in diferencas if d.situacao == 'regrediu']
+        if regressoes:
+            self.stderr.write(self.style.ERROR(
+                f'\n{len(regressoes)} caso(s) regrediram: '
+                f'{", ".join(d.nome for d in regressoes)}.'
+            ))
+            sys.exit(1)
+        self.stdout.write(self.style.SUCCESS('\nNenhuma regressao.'))
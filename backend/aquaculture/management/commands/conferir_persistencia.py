@@ -2,6 +2,10 @@
 
 Sai com codigo 1 quando alguma conferencia falha, para poder virar portao de
 deploy em vez de relatorio que ninguem le.
+
+No fim, o tamanho das tabelas de medicao e as consultas lentas capturadas em
+uso real (`db/lentas.py`). Essas partes sao so relatorio: uma consulta lenta
+de ontem nao reprova o deploy de hoje.
 """
 
 import sys
@@ -10,24 +14,42 @@ from django.core.management.base import BaseCommand
 
 
 class Command(BaseCommand):
-    help = 'Confere indices, constraints e o tempo das consultas quentes.'
+    help = 'Confere indices, constraints, o plano das consultas quentes e o resumo de cobertura.'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--sem-neo4j', action='store_true',
             help='Pula a conferencia do grafo (util quando ele nao subiu).',
         )
+        parser.add_argument(
+            '--aceitar-planos', action='store_true',
+            help='Grava os planos medidos como nova linha de base, mesmo os que '
+                 'regrediram (a mudanca era esperada).',
+        )
+        parser.add_argument(
+            '--lentas', type=int, default=10, metavar='N',
+            help='Quantas consultas lentas capturadas listar (0 nao lista).',
+        )
+        parser.add_argument(
+            '--lentas-dias', type=int, default=7, metavar='DIAS',
+            help='Periodo das consultas lentas listadas (padrao: 7 dias).',
+        )
 
     def handle(self, *args, **opcoes):
         from db import conferencia
 
         achados = conferencia.conferir_tudo(
-            incluir_neo4j=not opcoes['sem_neo4j']
+            incluir_neo4j=not opcoes['sem_neo4j'],
+            aceitar_planos=opcoes['aceitar_planos'],
         )
 
         titulos = {
-            'indices': 'Indices e constraints (PostgreSQL)',
-            'consultas': f'Consultas quentes (limite {conferencia.LIMITE_MS:.0f} ms)',
+            'indices': 'Indices e constraints',
+            'consultas': (
+                f'Consultas quentes (limite {conferencia.LIMITE_MS:.0f} ms, '
+                f'plano contra a linha de base)'
+            ),
+            'cobertura': 'Resumo de cobertura do catalogo',
             'neo4j': 'Constraints de unicidade (Neo4j)',
         }
 
@@ -44,6 +66,10 @@ class Command(BaseCommand):
                 linha if achado.ok else self.style.ERROR(linha)
             )
 
+        self._tamanhos(conferencia)
+        if opcoes['lentas'] > 0:
+            self._consultas_lentas(opcoes['lentas'], opcoes['lentas_dias'])
+
         falhas = [a for a in achados if not a.ok]
         self.stdout.write('')
 
@@ -58,10 +84,53 @@ class Command(BaseCommand):
                 '  Indice ausente costuma ser migracao nao aplicada: '
                 'rode "manage.py migrate".\n'
                 '  Constraint do Neo4j ausente: rode "manage.py neo4j_projetar", '
-                'que as cria de forma idempotente.'
+                'que as cria de forma idempotente.\n'
+                '  Plano que regrediu sem indice ausente: confira a migracao e o '
+                'ANALYZE; se a mudanca era esperada, "--aceitar-planos".\n'
+                '  Resumo de cobertura divergente: rode '
+                '"manage.py reconstruir_cobertura".'
             )
             sys.exit(1)
 
         self.stdout.write(self.style.SUCCESS(
             f'{len(achados)} conferencias, todas ok.'
         ))
+
+    def _tamanhos(self, conferencia):
+        medidas = conferencia.tamanhos()
+        if not medidas:
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING('Tamanho das tabelas de medicao'))
+        for medida in medidas:
+            self.stdout.write(
+                f'  {medida.tabela:<32} {medida.linhas:>12,} linhas  '
+                f'tabela {medida.tabela_bytes / 1024:>10,.0f} KB  '
+                f'indices {medida.indices_bytes / 1024:>10,.0f} KB'
+            )
+
+    def _consultas_lentas(self, limite, dias):
+        from django.conf import settings
+
+        from db import lentas
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Consultas lentas capturadas (ultimos {dias} dias)'
+        ))
+        limite_ms = getattr(settings, 'CONSULTAS_LENTAS_MS', 0)
+        ofensoras = lentas.piores(limite, dias=dias)
+        if not ofensoras:
+            self.stdout.write(
+                '  nenhuma' + (f' acima de {limite_ms} ms' if limite_ms
+                               else ' (captura desligada: CONSULTAS_LENTAS_MS=0)')
+            )
+            return
+        for ofensora in ofensoras:
+            self.stdout.write(
+                f'  {ofensora.impressao}  {ofensora.vezes}x  '
+                f'{ofensora.total_ms:,.0f} ms no total, max {ofensora.max_ms:,.0f} ms'
+            )
+            self.stdout.write(f'    {ofensora.sql[:160]}')
+            if ofensora.origem:
+                self.stdout.write(f'    em {ofensora.origem}')
+            if ofensora.plano:
+                self.stdout.write(f'    plano: {ofensora.plano}')
@@ -0,0 +1,138 @@
+"""Enche o banco com recifes sinteticos, para teste de carga.
+
+    python backend/manage.py gerar_sintetico --recifes 500 --anos 20
+    python backend/manage.py gerar_sintetico --recifes 50 --variaveis sst,dhw,baa
+    python backend/manage.py gerar_sintetico --limpar --recifes 0
+    python backend/manage.py gerar_sintetico --recifes 0 --gcbd dados/gcbd_sintetico.csv
+
+Grava `LocalRecife`, `MedicaoAmbiental` e `ExecucaoIngestao` pelo caminho em
+massa (`COPY` no PostgreSQL) - 500 recifes x 20 anos sao ~22 milhoes de
+medicoes. Com `--gcbd`, escreve tambem um CSV no formato do GCBD; aponte
+`GCBD_CSV` para ele para exercitar a entrega 2 na mesma escala.
+
+🚨 **Escreve no banco configurado**, ao contrario do `benchmark`, que usa um
+banco descartavel. E o que se quer para testar API, projecao e treino com
+volume - e e o que faria os recifes sinteticos aparecerem no site. Por isso
+recusa rodar com `DEBUG=False` sem `--fora-do-debug`, e todos os recifes levam
+o `--prefixo` no slug para que `--limpar` os encontre.
+"""
+
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import sintetico
+
+
+class Command(BaseCommand):
+    help = 'Grava recifes, medicoes e execucoes sinteticos no banco, para teste de carga.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recifes', type=int, default=500)
+        parser.add_argument('--anos', type=int, default=20)
+        parser.add_argument(
+            '--variaveis', default=','.join(sintetico.VARIAVEIS_PADRAO),
+            help=f'Separadas por virgula. Disponiveis: {", ".join(sintetico.ORIGENS)}',
+        )
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument(
+            '--prefixo', default='sintetico',
+            help='Prefixo do slug dos recifes. Padrao: sintetico',
+        )
+        parser.add_argument('--lote', type=int, default=5000)
+        parser.add_argument(
+            '--sem-execucoes', action='store_true',
+            help='Nao grava as ExecucaoIngestao que teriam produzido as medicoes.',
+        )
+        parser.add_argument(
+            '--limpar', action='store_true',
+            help='Apaga antes os recifes do prefixo, com medicoes e execucoes.',
+        )
+        parser.add_argument('--gcbd', help='Escreve tambem um CSV no formato do GCBD aqui.')
+        parser.add_argument('--gcbd-visitas', type=int, default=20000)
+        parser.add_argument(
+            '--fora-do-debug', action='store_true',
+            help='Permite rodar com DEBUG=False. So num banco de homologacao.',
+        )
+
+    def handle(self, *args, **opcoes):
+        from django.conf import settings
+
+        from aquaculture.models import LocalRecife
+
+        if not settings.DEBUG and not opcoes['fora_do_debug']:
+            raise CommandError(
+                'DEBUG=False: este parece o banco de producao. Recifes sinteticos '
+                'apareceriam no site. Use --fora-do-debug se for homologacao.'
+            )
+
+        prefixo = opcoes['prefixo']
+        if opcoes['limpar']:
+            inicio = time.perf_counter()
+            apagadas = sintetico.apagar(prefixo)
+            self.stdout.write(
+                f'  {apagadas:,} medicoes de "{prefixo}-*" apagadas '
+                f'em {time.perf_counter() - inicio:.1f} s'
+            )
+        elif opcoes['recifes'] and LocalRecife.objects.filter(
+            slug__startswith=f'{prefixo}-'
+        ).exists():
+            raise CommandError(
+                f'Ja ha recifes "{prefixo}-*" no banco. Use --limpar para '
+                'substitui-los ou outro --prefixo para somar.'
+            )
+
+        if opcoes['recifes']:
+            self._popular(opcoes)
+        if opcoes['gcbd']:
+            self._gcbd(Path(opcoes['gcbd']), opcoes['gcbd_visitas'], opcoes['semente'])
+
+    def _popular(self, opcoes):
+        try:
+            escala = sintetico.Escala(
+                recifes=opcoes['recifes'], anos=opcoes['anos'],
+                variaveis=tuple(v.strip() for v in opcoes['variaveis'].split(',') if v.strip()),
+                semente=opcoes['semente'],
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro)) from erro
+
+        self.stdout.write(self.style.MIGRATE_HEADING('=== GERANDO ==='))
+        self.stdout.write(
+            f'  {escala.recifes} recifes x {escala.anos} anos x '
+            f'{len(escala.variaveis)} variaveis = ~{escala.medicoes:,} medicoes'
+        )
+
+        inicio = time.perf_counter()
+        total = 0
+        # ~20 linhas de progresso, qualquer que seja a escala.
+        passo = max(escala.recifes // 20, 1)
+
+        def progresso(feitos, medicoes):
+            nonlocal total
+            total += medicoes
+            if feitos % passo == 0 or feitos == escala.recifes:
+                decorrido = time.perf_counter() - inicio
+                self.stdout.write(
+                    f'    {feitos:,}/{escala.recifes:,} recifes  {total:,} medicoes  '
+                    f'{total / decorrido:,.0f} linhas/s'
+                )
+
+        sintetico.popular(
+            escala, prefixo=opcoes['prefixo'], lote=opcoes['lote'],
+            com_execucoes=not opcoes['sem_execucoes'], ao_progredir=progresso,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{escala.recifes:,} recifes e {total:,} medicoes em '
+            f'{time.perf_counter() - inicio:.1f} s.'
+        ))
+
+    def _gcbd(self, caminho, visitas, semente):
+        inicio = time.perf_counter()
+        linhas = sintetico.gcbd_csv(caminho, visitas=visitas, semente=semente)
+        self.stdout.write(self.style.SUCCESS(
+            f'GCBD sintetico: {linhas:,} linhas ({visitas:,} visitas) em {caminho} '
+            f'em {time.perf_counter() - inicio:.1f} s. '
+            f'Aponte GCBD_CSV={caminho} para usa-lo.'
+        ))
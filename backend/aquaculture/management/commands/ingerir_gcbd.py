@@ -2,9 +2,12 @@
 
 Usa a rede e exige credencial do Copernicus (a mesma de `ingerir`, guardada em
 `~/.copernicusmarine`). Nao escreve no banco: o resultado vai para um cache em
-`dados/`, com proveniencia por valor. O porque esta em `ml/gcbd_ambiental.py`.
+`dados/` (um SQLite proprio, fora do banco do Django), com proveniencia por
+valor. O porque esta em `ml/gcbd_ambiental.py`.
 
-Grava a cada visita concluida, entao pode ser interrompido e retomado.
+Le cada lote de visitas de uma vez so e grava a cada lote concluido, entao
+pode ser interrompido e retomado. Com `--todos-os-paises` extrai o GCBD
+inteiro, nao so o recorte de `gcbd.PAIS_PADRAO`.
 """
 
 from django.core.management.base import BaseCommand
@@ -19,6 +22,20 @@ class Command(BaseCommand):
         parser.add_argument('--csv', help='Caminho do CSV do GCBD.')
         parser.add_argument('--cache', help='Onde gravar as janelas.')
         parser.add_argument('--pais', default=gcbd.PAIS_PADRAO)
+        parser.add_argument(
+            '--todos-os-paises', action='store_true',
+            help='Ignora --pais e extrai as visitas de todos os paises.',
+        )
+        parser.add_argument(
+            '--lote', type=int, default=gcbd_ambiental.TAMANHO_DO_LOTE,
+            help='Visitas por leitura (e por gravacao no cache). '
+                 f'Padrao: {gcbd_ambiental.TAMANHO_DO_LOTE}',
+        )
+        parser.add_argument(
+            '--trabalhadores', type=int,
+            help='Threads para baixar os blocos de cada leitura. '
+                 'Padrao: o do dask.',
+        )
         parser.add_argument(
             '--dias', type=int, default=gcbd_ambiental.DIAS_DA_JANELA,
             help=f'Tamanho da janela. Padrao: {gcbd_ambiental.DIAS_DA_JANELA}',
@@ -41,7 +58,10 @@ class Command(BaseCommand):
 
     def handle(self, *args, **opcoes):
         try:
-            conjunto = gcbd.montar(caminho=opcoes['csv'], pais=opcoes['pais'])
+            conjunto = gcbd.montar(
+                caminho=opcoes['csv'],
+                pais=None if opcoes['todos_os_paises'] else opcoes['pais'],
+            )
         except gcbd.ArquivoAusente as erro:
             self.stderr.write(self.style.ERROR(str(erro)))
             return
@@ -60,6 +80,13 @@ class Command(BaseCommand):
         self.stdout.write(f'  {len(visitas)} visitas, {visitas["Site_ID"].nunique()} sitios')
         self.stdout.write(f'  janela de {opcoes["dias"]} dias antes de cada uma')
         self.stdout.write(f'  variaveis: {", ".join(variaveis)}')
+        for variavel in variaveis:
+            faltando = gcbd_ambiental.visitas_faltando(
+                visitas, variavel, opcoes['cache']
+            )
+            self.stdout.write(
+                f'    {variavel:11s} {len(faltando)} de {len(visitas)} ainda por extrair'
+            )
         self.stdout.write(
             f'  ate {len(visitas) * len(variaveis) * (opcoes["dias"] + 1):,} '
             f'valores diarios'
@@ -83,6 +110,8 @@ class Command(BaseCommand):
             dias=opcoes['dias'],
             limite=opcoes['limite'],
             ao_progredir=progresso,
+            tamanho_lote=opcoes['lote'],
+            trabalhadores=opcoes['trabalhadores'],
         )
 
         self.stdout.write(self.style.MIGRATE_HEADING('\n=== RESULTADO ==='))
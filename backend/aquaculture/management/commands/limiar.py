@@ -40,6 +40,11 @@ class Command(BaseCommand):
         self._contexto(varredura, opcoes)
         self._tabela(varredura)
         self._teto(varredura)
+        self._deteccao = dict(zip(
+            (p.limiar for p in varredura.pontos),
+            varredura.intervalos_de_deteccao(semente=opcoes['semente']),
+            strict=False,
+        ))
         self._candidatos(varredura)
         self._ressalva()
 
@@ -157,6 +162,13 @@ class Command(BaseCommand):
             f'{ano["dias_de_alarme_falso"]:.1f} dias de alarme falso por ano '
             f'e por recife)'
         )
+        deteccao = self._deteccao.get(ponto.limiar)
+        if deteccao and deteccao.reamostras:
+            self.stdout.write(
+                f'      deteccao {deteccao.estimativa:.0%}, IC 95% '
+                f'{deteccao.baixo:.0%} a {deteccao.alto:.0%} '
+                f'(bootstrap sobre os episodios)'
+            )
         for e in ponto.perdidos:
             self.stdout.write(
                 f'      perde: {e["local"]} {e["inicio"]} '
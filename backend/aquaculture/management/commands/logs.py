@@ -0,0 +1,176 @@
+"""Consulta os logs JSONL por um indice SQLite, sem varrer os arquivos.
+
+    python backend/manage.py logs                                  # so atualiza o indice
+    python backend/manage.py logs --correlacao a3f9c1d2e4b5        # o fluxo inteiro
+    python backend/manage.py logs --texto "falhou AND 503" --desde 2d
+    python backend/manage.py logs --nivel WARNING --campo fonte=noaa_crw
+    python backend/manage.py logs --agregar duracao_ms --por padrao --funcao p95 --desde 7d
+    python backend/manage.py logs --agregar rejeitadas --por fonte
+    python backend/manage.py logs --sql "SELECT nivel, count(*) FROM linhas GROUP BY nivel"
+
+Toda chamada primeiro atualiza o indice (`logs/indice.sqlite3`) com o que foi
+escrito desde a anterior - so os bytes novos de cada arquivo. Ver
+`observabilidade/indice.py` para como a rotacao e reconhecida.
+
+`--por padrao` agrupa pelo padrao da rota (`api/locais/<slug:slug>/`); `--por
+rota` seria um grupo por caminho, um por slug.
+
+`--desde` e `--ate` aceitam `7d`, `12h`, `30m` (atras de agora) ou data ISO.
+"""
+
+import json
+import re
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from observabilidade import indice
+
+_INTERVALO = re.compile(r'^(\d+)([dhm])$')
+_UNIDADES = {'d': 'days', 'h': 'hours', 'm': 'minutes'}
+
+
+def instante(texto):
+    """`7d`/`12h`/`30m` atras de agora, ou uma data/hora ISO."""
+    intervalo = _INTERVALO.match(texto)
+    if intervalo:
+        quantidade, unidade = intervalo.groups()
+        return datetime.now().astimezone() - timedelta(**{_UNIDADES[unidade]: int(quantidade)})
+    try:
+        quando = datetime.fromisoformat(texto)
+    except ValueError:
+        raise CommandError(f'"{texto}" nao e intervalo (7d, 12h, 30m) nem data ISO.') from None
+    return quando if quando.tzinfo else quando.astimezone()
+
+
+def _campo(texto):
+    chave, igual, valor = texto.partition('=')
+    if not igual or not chave:
+        raise CommandError(f'--campo espera chave=valor, veio "{texto}".')
+    return chave, valor
+
+
+class Command(BaseCommand):
+    help = 'Consulta os logs JSONL (correlacao, texto, campos, agregados) por um indice SQLite.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pasta', help='Pasta dos logs. Padrao: LOG_PASTA')
+        parser.add_argument('--correlacao', help='Todas as linhas de um fluxo.')
+        parser.add_argument('--texto', help='Busca de texto na mensagem e no erro (sintaxe FTS5).')
+        parser.add_argument(
+            '--nivel', type=str.upper, choices=indice.NIVEIS,
+            help='Este nivel e acima (WARNING pega ERROR tambem).',
+        )
+        parser.add_argument('--logger', help='Logger, com os filhos (ingestao pega ingestao.registro).')
+        parser.add_argument('--desde', type=instante, help='7d, 12h, 30m ou data ISO.')
+        parser.add_argument('--ate', type=instante, help='7d, 12h, 30m ou data ISO.')
+        parser.add_argument(
+            '--campo', action='append', default=[], metavar='CHAVE=VALOR',
+            help='Filtra por campo do contexto ou texto curto dos dados (fonte=noaa_crw). '
+                 'Repetivel.',
+        )
+        parser.add_argument(
+            '--limite', type=int, default=200,
+            help='Quantas linhas mostrar, as mais recentes. 0 mostra todas. Padrao: 200',
+        )
+        parser.add_argument('--json', action='store_true', help='Linhas em JSON, como no arquivo.')
+        parser.add_argument('--agregar', metavar='CAMPO', help='Campo numerico a agregar.')
+        parser.add_argument('--por', metavar='CAMPO', help='Campo que forma os grupos.')
+        parser.add_argument(
+            '--funcao', choices=indice.FUNCOES, default='soma',
+            help='Padrao: soma',
+        )
+        parser.add_argument('--sql', help='SQL livre sobre as tabelas linhas, campos e busca.')
+        parser.add_argument(
+            '--sem-atualizar', action='store_true',
+            help='Consulta o indice como esta, sem ler os arquivos.',
+        )
+        parser.add_argument(
+            '--reconstruir', action='store_true',
+            help='Apaga o indice e le tudo de novo.',
+        )
+
+    def handle(self, *args, **opcoes):
+        pasta = Path(opcoes['pasta'] or settings.LOG_PASTA)
+        caminho = pasta / indice.NOME_INDICE
+        if opcoes['reconstruir']:
+            for sufixo in ('', '-wal', '-shm'):
+                Path(f'{caminho}{sufixo}').unlink(missing_ok=True)
+
+        with indice.Indice(caminho) as aberto:
+            if not opcoes['sem_atualizar']:
+                feito = aberto.atualizar(pasta)
+                self.stderr.write(
+                    f'Indice: {feito.linhas:,} linhas novas de {feito.arquivos} arquivo(s) '
+                    f'em {feito.segundos * 1000:,.0f} ms'
+                    + (f', {feito.ignoradas} ignoradas' if feito.ignoradas else '')
+                    + (f', {feito.removidos} arquivo(s) rotacionado(s) fora' if feito.removidos else '')
+                )
+
+            filtros = {
+                'correlacao': opcoes['correlacao'],
+                'texto': opcoes['texto'],
+                'nivel': opcoes['nivel'],
+                'logger': opcoes['logger'],
+                'desde': opcoes['desde'],
+                'ate': opcoes['ate'],
+                'campos': dict(_campo(c) for c in opcoes['campo']),
+            }
+            if opcoes['sql']:
+                self._sql(aberto, opcoes['sql'])
+            elif opcoes['agregar']:
+                self._agregar(aberto, opcoes, filtros)
+            elif any(filtros.values()):
+                self._linhas(aberto, opcoes, filtros)
+
+    def _linhas(self, aberto, opcoes, filtros):
+        # `linhas` e um gerador: a expressao FTS5 invalida so estoura aqui.
+        try:
+            registros = list(aberto.linhas(limite=opcoes['limite'] or None, **filtros))
+        except sqlite3.Error as erro:
+            raise CommandError(f'Consulta recusada: {erro}') from None
+        for registro in registros:
+            if opcoes['json']:
+                self.stdout.write(json.dumps(registro, ensure_ascii=False))
+                continue
+            linha = (
+                f'{registro["quando"][:19].replace("T", " ")} {registro["nivel"]:7s} '
+                f'[{registro["correlacao"]}] {registro["logger"]}: {registro["mensagem"]}'
+            )
+            campos = {**registro.get('contexto', {}), **registro.get('dados', {})}
+            if campos:
+                linha += ' | ' + ' '.join(f'{c}={v}' for c, v in sorted(campos.items()))
+            estilo = self.style.ERROR if registro['nivel'] in ('ERROR', 'CRITICAL') else (
+                self.style.WARNING if registro['nivel'] == 'WARNING' else str
+            )
+            self.stdout.write(estilo(linha))
+            if registro.get('erro'):
+                self.stdout.write(registro['erro'])
+
+    def _agregar(self, aberto, opcoes, filtros):
+        try:
+            grupos = aberto.agregar(
+                opcoes['agregar'], por=opcoes['por'], funcao=opcoes['funcao'], **filtros
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro)) from None
+        except sqlite3.Error as erro:
+            raise CommandError(f'Consulta recusada: {erro}') from None
+        titulo = f'{opcoes["funcao"]}({opcoes["agregar"]})'
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{opcoes["por"] or "":40s} {titulo:>16s} {"linhas":>8s}'
+        ))
+        for grupo, valor, quantas in grupos:
+            self.stdout.write(f'{grupo or "-":40s} {valor:16,.1f} {quantas:8d}')
+
+    def _sql(self, aberto, sql):
+        try:
+            colunas, linhas = aberto.consultar(sql)
+        except sqlite3.Error as erro:
+            raise CommandError(f'SQL recusado: {erro}') from None
+        self.stdout.write(self.style.MIGRATE_HEADING('\t'.join(colunas)))
+        for linha in linhas:
+            self.stdout.write('\t'.join('' if v is None else str(v) for v in linha))
@@ -0,0 +1,97 @@
+"""Particiona `MedicaoAmbiental` por ano (PostgreSQL), e mantem as particoes.
+
+    python backend/manage.py particionar_medicoes                # so mostra
+    python backend/manage.py particionar_medicoes --converter    # uma vez
+    python backend/manage.py particionar_medicoes --ate-ano 2027 # cria os anos
+    python backend/manage.py particionar_medicoes --desanexar 2019
+
+(!) `--converter` reescreve a tabela inteira sob trava exclusiva: a ingestao e
+a API esperam ate o fim. Numa janela, e com backup. Ver `db/particoes.py`.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from db import particoes
+
+
+class Command(BaseCommand):
+    help = 'Particiona MedicaoAmbiental por ano no PostgreSQL e cria os anos que faltam.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--converter', action='store_true',
+            help='Troca a tabela comum pela particionada (uma vez, em janela).',
+        )
+        parser.add_argument(
+            '--ate-ano', type=int, metavar='ANO',
+            help='Cria as particoes que faltam ate ANO, tirando as linhas delas '
+                 'da particao padrao.',
+        )
+        parser.add_argument(
+            '--desanexar', type=int, metavar='ANO',
+            help='Desanexa o ano, que vira tabela solta para arquivar. O site '
+                 'deixa de ver essas medicoes.',
+        )
+
+    def handle(self, *args, **opcoes):
+        try:
+            if opcoes['converter']:
+                self._converter()
+            if opcoes['ate_ano']:
+                self._garantir(opcoes['ate_ano'])
+            if opcoes['desanexar']:
+                nome = particoes.desanexar(connection, opcoes['desanexar'])
+                self.stdout.write(self.style.WARNING(
+                    f'  {nome} desanexada: copie (pg_dump -t {nome}) antes de apagar.'
+                ))
+            self._mostrar()
+        except particoes.ParticionamentoIndisponivel as erro:
+            raise CommandError(str(erro)) from erro
+
+    def _converter(self):
+        self.stdout.write(self.style.MIGRATE_HEADING('=== CONVERTENDO ==='))
+        conversao = particoes.converter(connection)
+        self.stdout.write(self.style.SUCCESS(
+            f'  {conversao.linhas:,} medicoes em {len(conversao.anos)} particoes anuais '
+            f'({conversao.anos[0]}-{conversao.anos[-1]}) e a padrao.'
+        ))
+
+    def _garantir(self, ate_ano):
+        criadas = particoes.garantir_anos(connection, ate_ano)
+        if not criadas:
+            self.stdout.write(f'  Todos os anos ate {ate_ano} ja tem particao.')
+        for ano, movidas in criadas.items():
+            self.stdout.write(self.style.SUCCESS(
+                f'  {particoes.nome_da_particao(ano)} criada'
+                + (f', {movidas:,} linhas trazidas da padrao' if movidas else '')
+            ))
+
+    def _mostrar(self):
+        if connection.vendor != 'postgresql':
+            raise CommandError(f'particionamento so no PostgreSQL (este banco e {connection.vendor})')
+
+        with connection.cursor() as cursor:
+            if not particoes.particionada(cursor):
+                self.stdout.write(
+                    f'{particoes.TABELA}: tabela comum, sem particoes. '
+                    f'"--converter" particiona por ano.'
+                )
+                return
+            lista = particoes.particoes(cursor)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'=== {particoes.TABELA} ==='))
+        for particao in lista:
+            faixa = particao.ano if particao.ano is not None else 'padrao'
+            self.stdout.write(
+                f'  {faixa!s:>6}  ~{particao.linhas:>10,} linhas  '
+                f'{particao.bytes / 1024 / 1024:8.1f} MB  {particao.nome}'
+            )
+        padrao = next((p for p in lista if p.ano is None), None)
+        if padrao and padrao.linhas:
+            self.stdout.write(self.style.WARNING(
+                f'  (!) {padrao.linhas:,} linhas na padrao: rode '
+                f'"--ate-ano {date.today().year + 1}" para dar ano a elas.'
+            ))
@@ -0,0 +1,87 @@
+"""Mede quanto um comando gasta so importando codigo, e quem puxou o que.
+
+    python backend/manage.py perfil_importacao                 # mede o `check`
+    python backend/manage.py perfil_importacao -- migrate --plan
+    python backend/manage.py perfil_importacao --limite-ms 800 # falha se passar
+
+O `--` separa as opcoes deste comando das do comando medido.
+
+O comando medido roda num processo novo, com `python -X importtime`. Ver
+`observabilidade/importacao.py` para como a saida e lida.
+
+⚠️ `--limite-ms` existe para CI e cron: sai com codigo 1 quando a partida passa
+do orcamento. Sem isso, uma regressao de import so aparece quando alguem
+estranha que o `check` ficou lento - ou nunca.
+"""
+
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from observabilidade import importacao
+
+
+class Command(BaseCommand):
+    help = 'Perfil de importacao de um comando do manage.py (python -X importtime).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'comando', nargs='*', default=['check'],
+            help='O comando a medir, com os argumentos dele. Padrao: check',
+        )
+        parser.add_argument(
+            '--pacotes', type=int, default=12,
+            help='Quantos pacotes listar, do mais caro. Padrao: 12',
+        )
+        parser.add_argument(
+            '--limite-ms', type=float,
+            help='Orcamento da partida. Acima dele, sai com codigo 1.',
+        )
+
+    def handle(self, *args, **opcoes):
+        comando = opcoes['comando']
+        manage = Path(settings.BASE_DIR) / 'manage.py'
+        perfil, codigo = importacao.medir(manage, comando)
+
+        if not perfil.importacoes:
+            self.stderr.write(self.style.ERROR(
+                f'"{" ".join(comando)}" nao produziu saida de -X importtime '
+                f'(codigo {codigo}).'
+            ))
+            sys.exit(1)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'=== manage.py {" ".join(comando)} ==='
+        ))
+        self.stdout.write(
+            f'  {perfil.total_ms:,.0f} ms importando '
+            f'{len(perfil.importacoes)} modulos'
+        )
+        if codigo:
+            self.stdout.write(self.style.WARNING(
+                f'  (!) o comando saiu com codigo {codigo}; o perfil vale ate ali'
+            ))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== POR PACOTE (tempo proprio) ==='))
+        for pacote, ms in perfil.por_pacote()[:opcoes['pacotes']]:
+            # A raiz (quem no projeto disparou) e o importador direto bastam
+            # para saber onde mexer; o meio da cadeia e ruido.
+            cadeia = perfil.quem_trouxe(pacote)[:-1]
+            if len(cadeia) > 2:
+                cadeia = [cadeia[0], '...', cadeia[-1]]
+            origem = ' > '.join(cadeia) or '(direto)'
+            self.stdout.write(f'  {ms:8.1f} ms  {pacote:24s} via {origem}')
+
+        limite = opcoes['limite_ms']
+        if limite is not None:
+            if perfil.total_ms > limite:
+                self.stderr.write(self.style.ERROR(
+                    f'\nPartida de {perfil.total_ms:,.0f} ms passa do limite '
+                    f'de {limite:,.0f} ms.'
+                ))
+                sys.exit(1)
+            self.stdout.write(self.style.SUCCESS(
+                f'\nDentro do limite de {limite:,.0f} ms.'
+            ))
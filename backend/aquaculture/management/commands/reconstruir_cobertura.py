@@ -0,0 +1,44 @@
+"""Refaz o resumo de cobertura do catalogo a partir das medicoes.
+
+    python backend/manage.py reconstruir_cobertura              # refaz
+    python backend/manage.py reconstruir_cobertura --conferir   # so compara
+
+O resumo e mantido pelo `persistencia.gravar`. Este comando e para quando algo
+gravou ou apagou medicao por fora dele - o `conferir_persistencia` aponta. Ver
+`aquaculture/cobertura.py`.
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Refaz CoberturaResumo a partir de MedicaoAmbiental (ou so compara).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--conferir', action='store_true',
+            help='So lista os grupos divergentes; sai com codigo 1 se houver.',
+        )
+
+    def handle(self, *args, **opcoes):
+        from aquaculture import cobertura
+
+        if opcoes['conferir']:
+            divergentes = cobertura.divergencias()
+            for local, fonte, variavel in divergentes:
+                self.stdout.write(f'  recife {local}  {fonte}/{variavel}')
+            if divergentes:
+                self.stdout.write(self.style.ERROR(
+                    f'{len(divergentes)} grupo(s) divergem das medicoes. '
+                    f'Rode sem "--conferir" para refazer.'
+                ))
+                sys.exit(1)
+            self.stdout.write(self.style.SUCCESS('Resumo de cobertura confere com as medicoes.'))
+            return
+
+        mudaram = cobertura.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'Resumo de cobertura refeito; {mudaram} grupo(s) estavam divergentes.'
+        ))
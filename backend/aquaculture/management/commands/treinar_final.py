@@ -103,6 +103,7 @@ class Command(BaseCommand):
 
         caminho_modelo, caminho_json = persistencia.salvar(
             ajuste, opcoes['nome'], pasta=opcoes['pasta'],
+            amostra=conjunto.quadro,
             extras={
                 'semente': opcoes['semente'],
                 'locais': sorted(l.slug for l in locais),
@@ -128,11 +129,29 @@ class Command(BaseCommand):
             f'  releitura : {"OK" if iguais else "DIVERGIU"} '
             f'({len(recarregado.colunas)} colunas)'
         )
+        self._pontuador(opcoes)
 
         self.stdout.write(self.style.SUCCESS(
             '\nArtefato derivado: nao versionado, regeravel com este comando.'
         ))
 
+    def _pontuador(self, opcoes):
+        """O que o painel vai carregar: o pontuador conferido, ou o pipeline."""
+        gravado = persistencia.ler_metadados(
+            opcoes['nome'], pasta=opcoes['pasta']
+        ).get('pontuador') or {}
+        if gravado.get('arquivo'):
+            self.stdout.write(
+                f'  pontuador : {gravado["arquivo"]} (igual ao pipeline ate '
+                f'{gravado["diferenca_maxima"]:.1e} em '
+                f'{gravado["linhas_conferidas"]} linhas)'
+            )
+            return
+        self.stdout.write(self.style.WARNING(
+            f'  pontuador : nao gerado - {gravado.get("motivo", "?")}. '
+            f'O painel carrega o pipeline.'
+        ))
+
     def _listar(self, pasta):
         modelos = persistencia.listar(pasta)
         if not modelos:
@@ -59,6 +59,15 @@ class Command(BaseCommand):
                  'ambientais. Implica --ambiental.',
         )
         parser.add_argument('--cache', help='Caminho do cache ambiental.')
+        parser.add_argument(
+            '--repeticoes-cv', type=int, default=0,
+            help='Repete a validacao sobre N sorteios de dobras e mostra a '
+                 f'faixa da PR-AUC. Sugerido: {gcbd.REPETICOES_CV_PADRAO}.',
+        )
+        parser.add_argument(
+            '--trabalhadores', type=int, default=1,
+            help='Processos para ajustar as dobras. -1 usa todos os nucleos.',
+        )
 
     def handle(self, *args, **opcoes):
         if opcoes['interpretavel']:
@@ -142,12 +151,22 @@ class Command(BaseCommand):
                 resultado = gcbd.validar(
                     conjunto, nome=opcoes['modelo'],
                     agrupar_por=agrupamento, n_dobras=opcoes['dobras'],
+                    trabalhadores=opcoes['trabalhadores'],
                 )
             except ValueError as erro:
                 self.stderr.write(f'  {erro}')
                 continue
             self.stdout.write(resultado.resumo())
 
+            if opcoes['repeticoes_cv']:
+                repetida = gcbd.validar_repetido(
+                    conjunto, nome=opcoes['modelo'],
+                    agrupar_por=agrupamento, n_dobras=opcoes['dobras'],
+                    repeticoes=opcoes['repeticoes_cv'],
+                    trabalhadores=opcoes['trabalhadores'],
+                )
+                self.stdout.write('\n' + repetida.resumo())
+
         if opcoes['importancia']:
             for agrupamento in ('sitio', 'ano'):
                 self.stdout.write(self.style.MIGRATE_HEADING(
@@ -157,6 +176,7 @@ class Command(BaseCommand):
                     gcbd.medir_importancia(
                         conjunto, nome=opcoes['modelo'],
                         agrupar_por=agrupamento, n_dobras=opcoes['dobras'],
+                        trabalhadores=opcoes['trabalhadores'],
                     ).resumo()
                 )
 
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aquaculture', '0027_correlacao_na_execucao_ingestao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaLenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('impressao', models.CharField(max_length=16)),
+                ('sql', models.TextField()),
+                ('duracao_ms', models.FloatField()),
+                ('origem', models.CharField(blank=True, max_length=300)),
+                ('correlacao', models.CharField(blank=True, max_length=32)),
+                ('rota', models.CharField(blank=True, max_length=300)),
+                ('capturada_em', models.DateTimeField(auto_now_add=True)),
+                ('plano', models.JSONField(blank=True, null=True)),
+                ('plano_erro', models.CharField(blank=True, max_length=300)),
+            ],
+            options={
+                'verbose_name': 'Consulta lenta',
+                'verbose_name_plural': 'Consultas lentas',
+                'ordering': ['-capturada_em'],
+                'indexes': [models.Index(fields=['impressao', '-capturada_em'], name='aquaculture_impress_54abd4_idx'), models.Index(fields=['capturada_em'], name='aquaculture_captura_435eba_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aquaculture', '0028_consultas_lentas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanoConsultaQuente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consulta', models.CharField(max_length=120)),
+                ('banco', models.CharField(max_length=20)),
+                ('versao', models.CharField(blank=True, max_length=40)),
+                ('medido_em', models.DateTimeField(auto_now_add=True)),
+                ('tempo_ms', models.FloatField()),
+                ('forma', models.JSONField(default=list)),
+                ('regrediu', models.BooleanField(default=False)),
+                ('detalhe', models.CharField(blank=True, max_length=300)),
+            ],
+            options={
+                'verbose_name': 'Plano de consulta quente',
+                'verbose_name_plural': 'Planos de consultas quentes',
+                'ordering': ['-medido_em'],
+                'indexes': [models.Index(fields=['consulta', 'banco', '-medido_em'], name='aquaculture_consult_3a4a37_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+"""BRIN sobre `MedicaoAmbiental.data`, so no PostgreSQL.
+
+A tabela e escrita em ordem de tempo (a ingestao so acrescenta o delta), e e
+o caso de manual do BRIN: um resumo de minimo e maximo por faixa de paginas,
+com uma fracao do tamanho de um B-tree, para as leituras por periodo. Vale com
+ou sem o particionamento de `db/particoes.py`, que o recria na conversao.
+
+Fora do estado do Django, de proposito: `BrinIndex` no `Meta` quebraria o
+`migrate` no SQLite da suite, que nao conhece `USING brin`.
+"""
+
+from django.db import migrations
+
+# Copiados, e nao importados de `db/particoes.py`: migracao nao pode mudar
+# quando o modulo muda.
+TABELA = 'aquaculture_medicaoambiental'
+BRIN = 'aquaculture_medicao_data_brin'
+
+
+def criar_brin(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS "{BRIN}" ON "{TABELA}" USING brin (data)'
+    )
+
+
+def remover_brin(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{BRIN}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aquaculture', '0029_planos_consultas_quentes'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_brin, remover_brin),
+    ]
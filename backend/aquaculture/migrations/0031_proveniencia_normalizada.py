@@ -0,0 +1,146 @@
+"""Tira de `MedicaoAmbiental` os textos de proveniencia que se repetem.
+
+`unidade`, `dataset_id` e `observacao` eram texto em toda linha, e sao poucas
+combinacoes: uma unidade e um dataset por variavel e produto, e meia duzia de
+frases de flag. Passam a morar em `OrigemMedicao` e `ObservacaoMedicao`, e a
+medicao guarda so as chaves. A API, o CSV e o grafo continuam lendo os mesmos
+textos, por `com_proveniencia()`.
+
+Na ordem de sempre: criar as tabelas e as chaves anulaveis, mover o dado, so
+entao exigir a origem e apagar as colunas.
+
+⚠️ No PostgreSQL o `DROP COLUMN` so esconde a coluna: o espaco volta no
+proximo `VACUUM FULL`, ou na conversao de `particionar_medicoes`, que copia a
+tabela.
+"""
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalizar(apps, schema_editor):
+    from django.db.models import OuterRef, Subquery
+
+    MedicaoAmbiental = apps.get_model('aquaculture', 'MedicaoAmbiental')
+    OrigemMedicao = apps.get_model('aquaculture', 'OrigemMedicao')
+    ObservacaoMedicao = apps.get_model('aquaculture', 'ObservacaoMedicao')
+
+    pares = set(
+        MedicaoAmbiental.objects.order_by().values_list('unidade', 'dataset_id').distinct()
+    )
+    OrigemMedicao.objects.bulk_create(
+        [OrigemMedicao(unidade=unidade, dataset_id=dataset_id) for unidade, dataset_id in pares]
+    )
+    # Poucos pares: um UPDATE por par, cada um pelo indice da unicidade.
+    for origem in OrigemMedicao.objects.all():
+        MedicaoAmbiental.objects.filter(
+            unidade=origem.unidade, dataset_id=origem.dataset_id,
+        ).update(origem=origem.pk)
+
+    textos = set(
+        MedicaoAmbiental.objects.exclude(observacao='').order_by()
+        .values_list('observacao', flat=True).distinct()
+    )
+    ObservacaoMedicao.objects.bulk_create([ObservacaoMedicao(texto=texto) for texto in textos])
+    MedicaoAmbiental.objects.exclude(observacao='').update(nota=Subquery(
+        ObservacaoMedicao.objects.filter(texto=OuterRef('observacao')).values('pk')[:1]
+    ))
+
+
+def desnormalizar(apps, schema_editor):
+    from django.db.models import OuterRef, Subquery
+
+    MedicaoAmbiental = apps.get_model('aquaculture', 'MedicaoAmbiental')
+    OrigemMedicao = apps.get_model('aquaculture', 'OrigemMedicao')
+    ObservacaoMedicao = apps.get_model('aquaculture', 'ObservacaoMedicao')
+
+    for origem in OrigemMedicao.objects.all():
+        MedicaoAmbiental.objects.filter(origem=origem.pk).update(
+            unidade=origem.unidade, dataset_id=origem.dataset_id,
+        )
+    MedicaoAmbiental.objects.filter(nota__isnull=False).update(observacao=Subquery(
+        ObservacaoMedicao.objects.filter(pk=OuterRef('nota')).values('texto')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aquaculture', '0030_brin_data_medicoes'),
+    ]
+
+    operations = [
+        # --- 1. as tabelas pequenas e as chaves, ainda anulaveis -----------
+        migrations.CreateModel(
+            name='OrigemMedicao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unidade', models.CharField(max_length=40)),
+                ('dataset_id', models.CharField(blank=True, max_length=160)),
+            ],
+            options={
+                'verbose_name': 'Origem de medicao',
+                'verbose_name_plural': 'Origens de medicao',
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('unidade', 'dataset_id'),
+                        name='aquaculture_unique_origem_unidade_dataset',
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ObservacaoMedicao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('texto', models.TextField(unique=True)),
+            ],
+            options={
+                'verbose_name': 'Observacao de medicao',
+                'verbose_name_plural': 'Observacoes de medicao',
+            },
+        ),
+        migrations.AddField(
+            model_name='medicaoambiental',
+            name='origem',
+            field=models.ForeignKey(
+                db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT,
+                related_name='+', to='aquaculture.origemmedicao',
+            ),
+        ),
+        migrations.AddField(
+            model_name='medicaoambiental',
+            name='nota',
+            field=models.ForeignKey(
+                blank=True, db_index=False, help_text='Motivo do flag quando nao for "ok"',
+                null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+',
+                to='aquaculture.observacaomedicao',
+            ),
+        ),
+
+        # --- 2. mover o dado ------------------------------------------------
+        migrations.RunPython(normalizar, desnormalizar),
+
+        # --- 3. so entao exigir a origem e apagar as colunas ---------------
+        migrations.AlterField(
+            model_name='medicaoambiental',
+            name='origem',
+            field=models.ForeignKey(
+                db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                related_name='+', to='aquaculture.origemmedicao',
+            ),
+        ),
+        # So no estado: com `default`, o caminho de volta consegue recriar a
+        # coluna NOT NULL numa tabela com linhas, antes de `desnormalizar`
+        # preenche-la.
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='medicaoambiental',
+                name='unidade',
+                field=models.CharField(default='', max_length=40),
+            ),
+        ]),
+        migrations.RemoveField(model_name='medicaoambiental', name='unidade'),
+        migrations.RemoveField(model_name='medicaoambiental', name='dataset_id'),
+        migrations.RemoveField(model_name='medicaoambiental', name='observacao'),
+    ]
@@ -0,0 +1,55 @@
+"""`CoberturaResumo`: a agregacao do catalogo, guardada e mantida pelo `gravar`.
+
+Nasce preenchida pela mesma agregacao que `/api/datasets/` fazia a cada
+requisicao - e a ultima vez que ela roda sobre a tabela inteira fora do
+`reconstruir_cobertura`.
+"""
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher(apps, schema_editor):
+    from django.db.models import Count, Max, Min
+
+    MedicaoAmbiental = apps.get_model('aquaculture', 'MedicaoAmbiental')
+    CoberturaResumo = apps.get_model('aquaculture', 'CoberturaResumo')
+
+    agrupado = (
+        MedicaoAmbiental.objects.order_by()
+        .values('local_recife_id', 'fonte', 'variavel')
+        .annotate(n=Count('id'), inicio=Min('data'), fim=Max('data'))
+    )
+    CoberturaResumo.objects.bulk_create(
+        [CoberturaResumo(**linha) for linha in agrupado], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aquaculture', '0031_proveniencia_normalizada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoberturaResumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fonte', models.CharField(max_length=60)),
+                ('variavel', models.CharField(max_length=20)),
+                ('n', models.PositiveIntegerField(default=0)),
+                ('inicio', models.DateField(null=True)),
+                ('fim', models.DateField(null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('local_recife', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='aquaculture.localrecife')),
+            ],
+            options={
+                'verbose_name': 'Resumo de cobertura',
+                'verbose_name_plural': 'Resumos de cobertura',
+                'constraints': [models.UniqueConstraint(fields=('local_recife', 'fonte', 'variavel'), name='aquaculture_unique_cobertura_local_fonte_variavel')],
+            },
+        ),
+        # Sem volta: a tabela inteira sai no `DeleteModel` do reverso.
+        migrations.RunPython(preencher, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aquaculture', '0032_cobertura_resumo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecucaoProjecao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iniciada_em', models.DateTimeField(auto_now_add=True)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+                ('nos', models.PositiveIntegerField(default=0)),
+                ('relacoes', models.PositiveIntegerField(default=0)),
+                ('erro', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Execucao de projecao',
+                'verbose_name_plural': 'Execucoes de projecao',
+                'ordering': ['-iniciada_em'],
+            },
+        ),
+    ]
@@ -98,6 +98,90 @@ class LocalRecife(models.Model):
         return f'{self.nome} ({self.estado})'
 
 
+class OrigemMedicao(models.Model):
+    """Unidade e dataset de uma medicao, guardados uma vez e nao em cada linha.
+
+    Sao poucas combinacoes (uma por variavel e produto) repetidas em centenas
+    de milhares de medicoes. Na linha fica so a chave; o texto volta na leitura
+    por `MedicaoAmbiental.objects.com_proveniencia()`.
+    """
+
+    unidade = models.CharField(max_length=40)
+    dataset_id = models.CharField(max_length=160, blank=True)
+
+    class Meta:
+        verbose_name = 'Origem de medicao'
+        verbose_name_plural = 'Origens de medicao'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unidade', 'dataset_id'],
+                name='aquaculture_unique_origem_unidade_dataset',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.dataset_id or "-"} ({self.unidade})'
+
+
+class ObservacaoMedicao(models.Model):
+    """O texto do flag de qualidade, guardado uma vez por texto distinto.
+
+    A frase do `COLUNAS_DEGRADADAS` se repete em toda medicao de PAR de
+    fallback; a de `qualidade.validar` leva o valor e se repete menos. As duas
+    sao gravadas como estao - o texto lido e o mesmo que foi escrito.
+    """
+
+    texto = models.TextField(unique=True)
+
+    class Meta:
+        verbose_name = 'Observacao de medicao'
+        verbose_name_plural = 'Observacoes de medicao'
+
+    def __str__(self):
+        return self.texto[:80]
+
+
+class MedicaoAmbientalQuerySet(models.QuerySet):
+    def com_proveniencia(self):
+        """Devolve `unidade`, `dataset_id` e `observacao` como texto, por JOIN.
+
+        Obrigatorio em quem le essas tres em lote (API, CSV, projecao): sem a
+        anotacao, cada medicao busca a origem e a observacao uma a uma.
+        """
+        from django.db.models import F, TextField, Value
+        from django.db.models.functions import Coalesce
+
+        return self.annotate(
+            unidade=F('origem__unidade'),
+            dataset_id=F('origem__dataset_id'),
+            observacao=Coalesce('nota__texto', Value(''), output_field=TextField()),
+        )
+
+
+def _texto_da_proveniencia(nome, relacao, campo):
+    """`unidade`, `dataset_id` e `observacao` como atributos da medicao.
+
+    Uma `property` (e nao um descritor proprio) porque o `Model.__init__` so
+    aceita como argumento o que for `property`: `MedicaoAmbiental(unidade='°C')`
+    continua valendo, como antes da normalizacao, e `resolver_proveniencia`
+    troca o texto pelas chaves antes de gravar. Na leitura, o texto vem da
+    anotacao de `com_proveniencia` ou, sem ela, da tabela pequena.
+    """
+    pendente = f'_{nome}_pendente'
+
+    def ler(medicao):
+        if pendente in medicao.__dict__:
+            return medicao.__dict__[pendente]
+        if getattr(medicao, f'{relacao}_id') is None:
+            return ''
+        return getattr(getattr(medicao, relacao), campo)
+
+    def escrever(medicao, valor):
+        medicao.__dict__[pendente] = valor if valor is not None else ''
+
+    return property(ler, escrever)
+
+
 class MedicaoAmbiental(models.Model):
     """Uma medicao de uma variavel canonica, num local, numa data, de uma fonte.
 
@@ -147,22 +231,37 @@ class MedicaoAmbiental(models.Model):
         blank=True,
         help_text='Nulo quando reprovado na validacao - jamais preencher com 0',
     )
-    unidade = models.CharField(max_length=40)
 
     # Proveniencia - exigida pelo contrato canonico.
     fonte = models.CharField(max_length=60, help_text='Slug do conector. Ex: noaa_crw')
-    dataset_id = models.CharField(max_length=160, blank=True)
     quality_flag = models.CharField(
         max_length=12,
         choices=QUALIDADE_CHOICES,
         default='ok',
     )
-    observacao = models.TextField(
-        blank=True,
-        help_text='Motivo do flag quando nao for "ok"',
+    # ⚠️ Unidade, dataset e o motivo do flag moram em tabelas pequenas: eram
+    # os textos repetidos em toda linha, e a linha mais estreita e o que cabe
+    # mais por pagina nas leituras em massa (exportacao, `carregar_largo`,
+    # projecao). `fonte` e `quality_flag` ficam: a primeira e parte da chave
+    # do upsert, a segunda e curta e filtrada em toda leitura.
+    #
+    # Sem indice nas duas chaves: ninguem procura medicao pela origem, e cada
+    # indice seria mais um do tamanho da tabela.
+    origem = models.ForeignKey(
+        OrigemMedicao, on_delete=models.PROTECT, related_name='+', db_index=False,
+    )
+    nota = models.ForeignKey(
+        ObservacaoMedicao, on_delete=models.PROTECT, related_name='+', db_index=False,
+        null=True, blank=True, help_text='Motivo do flag quando nao for "ok"',
     )
     data_coleta = models.DateTimeField(auto_now=True)
 
+    unidade = _texto_da_proveniencia('unidade', 'origem', 'unidade')
+    dataset_id = _texto_da_proveniencia('dataset_id', 'origem', 'dataset_id')
+    observacao = _texto_da_proveniencia('observacao', 'nota', 'texto')
+
+    objects = MedicaoAmbientalQuerySet.as_manager()
+
     class Meta:
         ordering = ['-data', 'variavel']
         verbose_name = 'Medicao ambiental'
@@ -183,6 +282,123 @@ class MedicaoAmbiental(models.Model):
     def __str__(self):
         return f'{self.local_recife.slug} {self.data} {self.variavel}={self.valor}'
 
+    def save(self, *args, **kwargs):
+        self.resolver_proveniencia([self])
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def resolver_proveniencia(cls, medicoes):
+        """Troca o texto de origem e observacao pelas chaves, criando o que faltar.
+
+        Uma consulta por tabela para o lote inteiro, e um `INSERT` so do que
+        e novo. Quem grava em massa sem `save` (o `bulk_create` do upsert)
+        chama antes.
+        """
+        def origem_pendente(medicao):
+            return medicao.origem_id is None or not medicao.__dict__.keys().isdisjoint(
+                {'_unidade_pendente', '_dataset_id_pendente'}
+            )
+
+        def nota_pendente(medicao):
+            return '_observacao_pendente' in medicao.__dict__
+
+        origens, notas = cls.chaves_de_proveniencia(
+            {(m.unidade, m.dataset_id) for m in medicoes if origem_pendente(m)},
+            {m.observacao for m in medicoes if nota_pendente(m) and m.observacao},
+        )
+        for medicao in medicoes:
+            if origem_pendente(medicao):
+                medicao.origem_id = origens[(medicao.unidade, medicao.dataset_id)]
+            if nota_pendente(medicao):
+                medicao.nota_id = notas.get(medicao.observacao)
+
+    @staticmethod
+    def chaves_de_proveniencia(pares=(), textos=()):
+        """`({(unidade, dataset_id): id}, {texto: id})`, criando o que faltar.
+
+        Para quem grava por fora do ORM (a carga sintetica) e precisa das
+        chaves antes de montar as linhas.
+        """
+        pares, textos = set(pares), set(textos)
+        origens = _chaves(
+            OrigemMedicao, pares,
+            models.Q(
+                unidade__in={unidade for unidade, _ in pares},
+                dataset_id__in={dataset_id for _, dataset_id in pares},
+            ),
+            lambda par: OrigemMedicao(unidade=par[0], dataset_id=par[1]),
+            lambda origem: (origem.unidade, origem.dataset_id),
+        )
+        notas = _chaves(
+            ObservacaoMedicao, textos, models.Q(texto__in=textos),
+            lambda texto: ObservacaoMedicao(texto=texto),
+            lambda nota: nota.texto,
+        )
+        return origens, notas
+
+
+def _chaves(modelo, chaves, filtro, novo, chave_de):
+    """`{chave: id}` de uma tabela de textos, criando as chaves que faltam.
+
+    `filtro` pode trazer linhas a mais (o produto das unidades pelos datasets,
+    na origem); so as chaves pedidas voltam.
+    """
+    if not chaves:
+        return {}
+
+    def ler():
+        linhas = modelo.objects.filter(filtro)
+        return {
+            chave: linha.pk for linha in linhas if (chave := chave_de(linha)) in chaves
+        }
+
+    encontradas = ler()
+    faltantes = chaves - encontradas.keys()
+    if faltantes:
+        # `ignore_conflicts`: outra ingestao pode ter criado a mesma no meio.
+        modelo.objects.bulk_create([novo(chave) for chave in faltantes], ignore_conflicts=True)
+        encontradas = ler()
+    return encontradas
+
+
+class CoberturaResumo(models.Model):
+    """Quantas medicoes, e de quando a quando, por (fonte, variavel, recife).
+
+    E a agregacao que `/api/datasets/` fazia a cada requisicao sobre a tabela
+    inteira, guardada. O catalogo le poucas dezenas de linhas daqui, e o custo
+    nao cresce com a serie.
+
+    🚨 **E copia, e copia envelhece** - o defeito que `cobertura.py` conta.
+    Por isso so `persistencia.gravar` a mantem, na mesma transacao das
+    medicoes, e `reconstruir_cobertura` a refaz do zero. Quem grava medicao por
+    outro caminho reconstroi no fim (a carga sintetica faz isso);
+    `conferir_persistencia` reprova quando ela diverge do banco.
+    """
+
+    fonte = models.CharField(max_length=60)
+    variavel = models.CharField(max_length=20)
+    # Sem indice proprio: a unicidade abaixo comeca pelo recife.
+    local_recife = models.ForeignKey(
+        LocalRecife, on_delete=models.CASCADE, related_name='+', db_index=False,
+    )
+    n = models.PositiveIntegerField(default=0)
+    inicio = models.DateField(null=True)
+    fim = models.DateField(null=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Resumo de cobertura'
+        verbose_name_plural = 'Resumos de cobertura'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['local_recife', 'fonte', 'variavel'],
+                name='aquaculture_unique_cobertura_local_fonte_variavel',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.fonte}/{self.variavel} em {self.local_recife_id}: {self.n}'
+
 
 class ExecucaoIngestao(models.Model):
     """Registro de cada execucao de ingestao - o "com logs e tratamento de
@@ -249,6 +465,117 @@ class ExecucaoIngestao(models.Model):
         return f'{self.fonte}/{local} {self.iniciado_em:%Y-%m-%d %H:%M} -> {self.status}'
 
 
+class ExecucaoProjecao(models.Model):
+    """Uma reconstrucao do grafo por `db/projecao.projetar`.
+
+    O id da ultima concluida e a versao do grafo: o cache das paginas do grafo
+    (`neo4j_service`) leva esse id na chave, e reprojetar invalida tudo sem
+    precisar saber o que mudou. Fica no PostgreSQL, e nao no cache, porque quem
+    projeta e um `manage.py` - outro processo, que nao alcanca o cache em
+    memoria dos workers.
+
+    ⚠️ Uma projecao que falha no meio tambem e concluida, com `erro`: o grafo
+    ja foi apagado e em parte reescrito, e o que estava no cache nao e mais o
+    que o grafo tem.
+    """
+
+    iniciada_em = models.DateTimeField(auto_now_add=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+    nos = models.PositiveIntegerField(default=0)
+    relacoes = models.PositiveIntegerField(default=0)
+    erro = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-iniciada_em']
+        verbose_name = 'Execucao de projecao'
+        verbose_name_plural = 'Execucoes de projecao'
+
+    def __str__(self):
+        situacao = 'falha' if self.erro else 'ok'
+        if self.concluida_em is None:
+            situacao = 'em andamento'
+        return f'projecao {self.pk} {self.iniciada_em:%Y-%m-%d %H:%M} -> {situacao}'
+
+    @classmethod
+    def versao_do_grafo(cls):
+        """Id da ultima projecao concluida, ou `None` se nunca houve uma."""
+        return (
+            cls.objects.filter(concluida_em__isnull=False)
+            .order_by('-concluida_em', '-pk').values_list('pk', flat=True).first()
+        )
+
+
+class ConsultaLenta(models.Model):
+    """Uma consulta do ORM que passou de `CONSULTAS_LENTAS_MS` em uso real.
+
+    Gravada por `db/lentas.py`, com o plano tirado depois, fora da requisicao.
+    A tabela tem teto (`CONSULTAS_LENTAS_MAXIMO`): e amostra recente, nao
+    historico - as mais antigas saem quando entram novas.
+
+    🚨 Os parametros nunca sao gravados: `sql` tem os `%s` no lugar dos
+    valores, como no log. O plano e tirado com eles e descartado em seguida.
+    """
+
+    # Hash do SQL normalizado: a mesma consulta com outros valores, ou com
+    # outro numero de itens no `IN (...)`, tem a mesma impressao.
+    impressao = models.CharField(max_length=16)
+    sql = models.TextField()
+    duracao_ms = models.FloatField()
+    # `arquivo:linha funcao` do primeiro quadro do projeto que disparou.
+    origem = models.CharField(max_length=300, blank=True)
+    correlacao = models.CharField(max_length=32, blank=True)
+    rota = models.CharField(max_length=300, blank=True)
+    capturada_em = models.DateTimeField(auto_now_add=True)
+    plano = models.JSONField(null=True, blank=True)
+    plano_erro = models.CharField(max_length=300, blank=True)
+
+    class Meta:
+        ordering = ['-capturada_em']
+        verbose_name = 'Consulta lenta'
+        verbose_name_plural = 'Consultas lentas'
+        indexes = [
+            models.Index(fields=['impressao', '-capturada_em']),
+            models.Index(fields=['capturada_em']),
+        ]
+
+    def __str__(self):
+        return f'{self.impressao} {self.duracao_ms:.0f} ms em {self.origem or "?"}'
+
+
+class PlanoConsultaQuente(models.Model):
+    """O plano e o tempo de uma das `CONSULTAS_QUENTES` numa conferencia.
+
+    Gravado por `db/conferencia.medir_consultas` a cada `conferir_persistencia`
+    (e portanto a cada `preparar_deploy`). A linha de base de uma consulta e a
+    ultima medida sem regressao no mesmo banco: uma regressao continua
+    reprovando ate ser corrigida ou aceita com `--aceitar-planos`.
+    """
+
+    consulta = models.CharField(max_length=120)
+    # `postgresql` ou `sqlite`: plano de um banco nao e base para o outro.
+    banco = models.CharField(max_length=20)
+    # Commit curto do codigo medido; vazio fora de um clone do git.
+    versao = models.CharField(max_length=40, blank=True)
+    medido_em = models.DateTimeField(auto_now_add=True)
+    tempo_ms = models.FloatField()
+    # Os nos do plano em pre-ordem: tipo, relacao, indice, linhas estimadas e
+    # reais (as reais so no PostgreSQL, que roda com ANALYZE).
+    forma = models.JSONField(default=list)
+    regrediu = models.BooleanField(default=False)
+    detalhe = models.CharField(max_length=300, blank=True)
+
+    class Meta:
+        ordering = ['-medido_em']
+        verbose_name = 'Plano de consulta quente'
+        verbose_name_plural = 'Planos de consultas quentes'
+        indexes = [
+            models.Index(fields=['consulta', 'banco', '-medido_em']),
+        ]
+
+    def __str__(self):
+        return f'{self.consulta} [{self.banco}] {self.tempo_ms:.1f} ms'
+
+
 class Especie(models.Model):
     """Uma especie do acervo, com a proveniencia que o lado ambiental ja tinha.
 
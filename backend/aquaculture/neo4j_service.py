@@ -2,6 +2,7 @@ from typing import Any, Iterable
 
 from django.conf import settings
 
+from .models import ExecucaoProjecao
 from .neo4j_schema import (
     ESPECIE_LABEL,
     LOCALIZACAO_LABEL,
@@ -13,23 +14,20 @@ from .neo4j_schema import (
     build_localizacao_id,
 )
 
-try:
-    from neo4j import GraphDatabase
-    from neo4j.exceptions import AuthError, ConfigurationError, Neo4jError, ServiceUnavailable
-except ImportError:  # pragma: no cover - depende do ambiente local
-    GraphDatabase = None
+# ⚠️ O pacote `neo4j` e importado so quando alguem fala com o banco, e nao ao
+# carregar este modulo. As views importam daqui, o `manage.py check` importa as
+# views para conferir as URLs - e o driver, que puxa o pandas junto, custava
+# ~0,6 s de cada `check`, `migrate` e `atualizar` (medido com
+# `manage.py perfil_importacao`). Ver `_neo4j`.
 
-    class Neo4jError(Exception):
-        pass
 
-    class AuthError(Neo4jError):
-        pass
-
-    class ConfigurationError(Neo4jError):
-        pass
-
-    class ServiceUnavailable(Neo4jError):
-        pass
+def _neo4j():
+    """`(GraphDatabase, exceptions)` do pacote, ou `None` se nao instalado."""
+    try:
+        from neo4j import GraphDatabase, exceptions
+    except ImportError:  # pragma: no cover - depende do ambiente local
+        return None
+    return GraphDatabase, exceptions
 
 
 class Neo4jServiceError(Exception):
@@ -68,8 +66,15 @@ ORDER BY nome, slug
     rel_tem_predicao=REL_TEM_PREDICAO,
 )
 
-OBTER_LOCALIZACAO_GRAFO_QUERY = """
+# 🚨 **Uma ida ao banco para o detalhe inteiro.** Ate 19/10/2026 eram tres
+# leituras em sequencia - o local, as especies, as predicoes -, cada uma com a
+# sua sessao e a sua transacao: tres voltas ao servidor para uma pagina. Os
+# subqueries `COLLECT` (Neo4j 5.6+) montam as duas listas no mesmo plano, com a
+# mesma ordem e as mesmas chaves que as tres consultas devolviam: o JSON da API
+# nao mudou.
+OBTER_DETALHE_LOCALIZACAO_GRAFO_QUERY = """
 MATCH (l:{localizacao_label} {{id: $localizacao_id}})
+WITH l LIMIT 1
 RETURN
     l.slug AS slug,
     l.nome AS nome,
@@ -77,58 +82,57 @@ RETURN
     l.cidade AS cidade,
     l.descricao AS descricao,
     l.ultima_atualizacao AS ultima_atualizacao,
-    l.ativo AS ativo
-LIMIT 1
-""".format(localizacao_label=LOCALIZACAO_LABEL)
-
-LISTAR_ESPECIES_LOCALIZACAO_GRAFO_QUERY = """
-MATCH (:{localizacao_label} {{id: $localizacao_id}})-[:{rel_abriga_especie}]->(e:{especie_label})
-RETURN
-    e.nome_cientifico AS nome_cientifico,
-    e.nome_comum AS nome_comum,
-    e.tipo AS tipo,
-    e.descricao AS descricao,
-    e.iucn_categoria AS iucn_categoria,
-    e.iucn_categoria_rotulo AS iucn_categoria_rotulo,
-    e.iucn_avaliado_em AS iucn_avaliado_em,
-    e.iucn_versao AS iucn_versao,
-    e.fonte_iucn_url AS fonte_iucn_url,
-    e.iucn_tem_procedencia AS iucn_tem_procedencia,
-    e.credito_imagem AS credito_imagem,
-    e.fonte_imagem_url AS fonte_imagem_url,
-    e.local_captura_foto AS local_captura_foto,
-    e.fonte_url AS fonte_url
-ORDER BY coalesce(e.nome_comum, ''), e.nome_cientifico
+    l.ativo AS ativo,
+    COLLECT {{
+        MATCH (l)-[:{rel_abriga_especie}]->(e:{especie_label})
+        WITH e
+        ORDER BY coalesce(e.nome_comum, ''), e.nome_cientifico
+        RETURN e {{
+            .nome_cientifico,
+            .nome_comum,
+            .tipo,
+            .descricao,
+            .iucn_categoria,
+            .iucn_categoria_rotulo,
+            .iucn_avaliado_em,
+            .iucn_versao,
+            .fonte_iucn_url,
+            .iucn_tem_procedencia,
+            .credito_imagem,
+            .fonte_imagem_url,
+            .local_captura_foto,
+            .fonte_url
+        }}
+    }} AS especies,
+    COLLECT {{
+        MATCH (l)-[:{rel_tem_predicao}]->(p:{predicao_label})
+        OPTIONAL MATCH (p)-[:{rel_derivada_de}]->(m:{medicao_ambiental_label})
+        WITH p, m
+        ORDER BY p.data DESC
+        RETURN {{
+            local_slug: p.local_slug,
+            data: p.data,
+            sst_atual: m.sst,
+            limite_termico: m.limite_termico,
+            anomalia: m.anomalia_termica,
+            dhw_calculado: m.dhw,
+            irradiancia: m.par,
+            turbidez: m.kd490,
+            salinidade: m.salinidade,
+            ph: m.ph,
+            oxigenio: m.oxigenio,
+            nitrato: m.nitrato,
+            clorofila: m.clorofila,
+            risco_integrado: p.risco_integrado,
+            nivel_alerta: p.nivel_alerta
+        }}
+    }} AS predicoes
 """.format(
     localizacao_label=LOCALIZACAO_LABEL,
     especie_label=ESPECIE_LABEL,
-    rel_abriga_especie=REL_ABRIGA_ESPECIE,
-)
-
-LISTAR_PREDICOES_LOCALIZACAO_GRAFO_QUERY = """
-MATCH (:{localizacao_label} {{id: $localizacao_id}})-[:{rel_tem_predicao}]->(p:{predicao_label})
-OPTIONAL MATCH (p)-[:{rel_derivada_de}]->(m:{medicao_ambiental_label})
-RETURN
-    p.local_slug AS local_slug,
-    p.data AS data,
-    m.sst AS sst_atual,
-    m.limite_termico AS limite_termico,
-    m.anomalia_termica AS anomalia,
-    m.dhw AS dhw_calculado,
-    m.par AS irradiancia,
-    m.kd490 AS turbidez,
-    m.salinidade AS salinidade,
-    m.ph AS ph,
-    m.oxigenio AS oxigenio,
-    m.nitrato AS nitrato,
-    m.clorofila AS clorofila,
-    p.risco_integrado AS risco_integrado,
-    p.nivel_alerta AS nivel_alerta
-ORDER BY p.data DESC
-""".format(
-    localizacao_label=LOCALIZACAO_LABEL,
     predicao_label=PREDICAO_LABEL,
     medicao_ambiental_label=MEDICAO_AMBIENTAL_LABEL,
+    rel_abriga_especie=REL_ABRIGA_ESPECIE,
     rel_tem_predicao=REL_TEM_PREDICAO,
     rel_derivada_de=REL_DERIVADA_DE,
 )
@@ -151,19 +155,40 @@ def _get_neo4j_settings() -> tuple[str, str, str]:
     return uri, user, password
 
 
+def _configuracao_do_pool() -> dict[str, Any]:
+    """O pool do driver, de `settings.NEO4J_*` - ver la o porque de cada valor.
+
+    ⚠️ O driver e o pool sao do processo. Criado na primeira leitura, e nao na
+    importacao: com `gunicorn --preload` um driver aberto no mestre seria
+    herdado pelos workers com os mesmos sockets.
+    """
+    espera = settings.NEO4J_POOL_ESPERA_SEGUNDOS
+    return {
+        'max_connection_pool_size': settings.NEO4J_POOL_MAXIMO,
+        'connection_acquisition_timeout': espera,
+        'connection_timeout': espera,
+        'max_connection_lifetime': settings.NEO4J_CONEXAO_VIDA_SEGUNDOS,
+        'liveness_check_timeout': settings.NEO4J_TESTE_OCIOSA_SEGUNDOS,
+    }
+
+
 def get_neo4j_driver():
     global _driver
 
-    if GraphDatabase is None:
+    pacote = _neo4j()
+    if pacote is None:
         raise Neo4jServiceError(
             "Pacote 'neo4j' nao instalado no ambiente atual. Instale as dependencias antes de executar os comandos Neo4j."
         )
+    GraphDatabase, exceptions = pacote
 
     if _driver is None:
         uri, user, password = _get_neo4j_settings()
         try:
-            _driver = GraphDatabase.driver(uri, auth=(user, password))
-        except ConfigurationError as exc:
+            _driver = GraphDatabase.driver(
+                uri, auth=(user, password), **_configuracao_do_pool(),
+            )
+        except exceptions.ConfigurationError as exc:
             raise Neo4jServiceError(f"Configuracao Neo4j invalida para '{uri}': {exc}") from exc
         except Exception as exc:
             raise Neo4jServiceError(
@@ -175,17 +200,22 @@ def get_neo4j_driver():
 
 def _raise_neo4j_operation_error(action: str, exc: Exception) -> None:
     uri = getattr(settings, 'NEO4J_URI', '')
+    # Aqui o driver ja existe - so chega excecao depois de `get_neo4j_driver`.
+    pacote = _neo4j()
+    if pacote is None:  # pragma: no cover - depende do ambiente local
+        raise Neo4jServiceError(f'Falha inesperada durante {action}: {exc}') from exc
+    exceptions = pacote[1]
 
-    if isinstance(exc, AuthError):
+    if isinstance(exc, exceptions.AuthError):
         raise Neo4jServiceError(
             'Falha de autenticacao no Neo4j. Verifique NEO4J_USER e NEO4J_PASSWORD.'
         ) from exc
-    if isinstance(exc, ServiceUnavailable):
+    if isinstance(exc, exceptions.ServiceUnavailable):
         raise Neo4jServiceError(
             f"Nao foi possivel conectar ao Neo4j em '{uri}' durante {action}. "
             'Verifique se o servidor esta ativo e acessivel.'
         ) from exc
-    if isinstance(exc, Neo4jError):
+    if isinstance(exc, exceptions.Neo4jError):
         raise Neo4jServiceError(f'Erro no Neo4j durante {action}: {exc}') from exc
 
     raise Neo4jServiceError(f'Falha inesperada durante {action}: {exc}') from exc
@@ -266,23 +296,45 @@ def executar_read(
         _raise_neo4j_operation_error('a leitura no Neo4j', exc)
 
 
+# Marca de "nao esta no cache": `None` e resposta valida do detalhe (404).
+_AUSENTE = object()
+
+
+def _em_cache(nome: str, ler):
+    """`ler()`, guardado sob a versao do grafo por `NEO4J_CACHE_SEGUNDOS`.
+
+    A versao e o id da ultima projecao (`ExecucaoProjecao.versao_do_grafo`,
+    gravada por `db.projecao.projetar`): uma consulta a uma tabela de poucas
+    linhas no PostgreSQL, bem mais barata que a ida ao Neo4j que ela evita. Reprojetar muda o id, e as entradas antigas deixam de
+    ser alcancadas sem que ninguem precise apaga-las.
+
+    Sem projecao registrada nao ha como saber quando o grafo muda: le direto.
+    Erro do Neo4j nunca entra no cache - a proxima requisicao tenta de novo.
+    """
+    from django.core.cache import cache
+
+    segundos = settings.NEO4J_CACHE_SEGUNDOS
+    versao = ExecucaoProjecao.versao_do_grafo() if segundos > 0 else None
+    if versao is None:
+        return ler()
+
+    chave = f'grafo:{versao}:{nome}'
+    guardado = cache.get(chave, _AUSENTE)
+    if guardado is not _AUSENTE:
+        return guardado
+    valor = ler()
+    cache.set(chave, valor, segundos)
+    return valor
+
+
 def listar_localizacoes_grafo() -> list[dict[str, Any]]:
-    return executar_read(LISTAR_LOCALIZACOES_GRAFO_QUERY)
+    return _em_cache('localizacoes', lambda: executar_read(LISTAR_LOCALIZACOES_GRAFO_QUERY))
 
 
 def obter_localizacao_grafo(slug: str) -> dict[str, Any] | None:
-    parameters = {'localizacao_id': build_localizacao_id(slug)}
-    localizacoes = executar_read(OBTER_LOCALIZACAO_GRAFO_QUERY, parameters)
-    if not localizacoes:
-        return None
+    def ler():
+        parameters = {'localizacao_id': build_localizacao_id(slug)}
+        localizacoes = executar_read(OBTER_DETALHE_LOCALIZACAO_GRAFO_QUERY, parameters)
+        return localizacoes[0] if localizacoes else None
 
-    localizacao = localizacoes[0]
-    localizacao['especies'] = executar_read(
-        LISTAR_ESPECIES_LOCALIZACAO_GRAFO_QUERY,
-        parameters,
-    )
-    localizacao['predicoes'] = executar_read(
-        LISTAR_PREDICOES_LOCALIZACAO_GRAFO_QUERY,
-        parameters,
-    )
-    return localizacao
+    return _em_cache(f'localizacao:{slug}', ler)
@@ -11,15 +11,37 @@ O que protegem, em ordem de gravidade:
    que `n_medicoes` afirma; senao e afirmacao sem prova.
 4. **Uma consulta so para a lista inteira.** Nove agregacoes separadas
    passariam despercebidas ate a pagina ficar lenta.
+5. 🚨 **O resumo guardado conta o que o banco tem.** Reingerir a mesma janela
+   nao soma de novo; o que passa por fora do `gravar` aparece como
+   divergencia, e `reconstruir` corrige.
+
+As medicoes entram por `persistencia.gravar`, o caminho que mantem o resumo.
 """
 
 from datetime import date
+from io import StringIO
 
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from aquaculture import cobertura
-from aquaculture.models import DatasetCatalogo, LocalRecife, MedicaoAmbiental
+from aquaculture.models import (
+    CoberturaResumo,
+    DatasetCatalogo,
+    LocalRecife,
+    MedicaoAmbiental,
+)
+from ingestao.persistencia import gravar
+
+
+def medicao(local, dia, variavel='sst', valor=25.0):
+    return MedicaoAmbiental(
+        local_recife=local, data=dia, variavel=variavel, valor=valor,
+        unidade='°C', fonte='noaa_crw', dataset_id='dhw_5km',
+    )
 
 
 class BaseCatalogo(TestCase):
@@ -33,16 +55,11 @@ class BaseCatalogo(TestCase):
             cidade='Caravelas', latitude=-17.9, longitude=-38.6,
         )
 
-        for dia, variavel in (
-            (date(2026, 7, 20), 'sst'),
-            (date(2026, 7, 21), 'sst'),
-            (date(2026, 7, 21), 'dhw'),
-        ):
-            MedicaoAmbiental.objects.create(
-                local_recife=self.local, data=dia, variavel=variavel,
-                valor=25.0, unidade='°C', fonte='noaa_crw',
-                dataset_id='dhw_5km',
-            )
+        gravar([
+            medicao(self.local, date(2026, 7, 20), 'sst'),
+            medicao(self.local, date(2026, 7, 21), 'sst'),
+            medicao(self.local, date(2026, 7, 21), 'dhw'),
+        ])
 
         self.espelhado = DatasetCatalogo.objects.create(
             id='teste-crw', titulo='CRW', fonte='NOAA', tipo_dado='Oceanografico',
@@ -128,10 +145,7 @@ class CalculoTests(BaseCatalogo):
             slug='teste-picao', nome='Picao', estado='PB', cidade='JP',
             latitude=-7.1, longitude=-34.8,
         )
-        MedicaoAmbiental.objects.create(
-            local_recife=outro, data=date(2026, 7, 21), variavel='sst',
-            valor=28.0, unidade='°C', fonte='noaa_crw', dataset_id='dhw_5km',
-        )
+        gravar([medicao(outro, date(2026, 7, 21), valor=28.0)])
 
         c = cobertura.calcular([self.espelhado])['teste-crw']
 
@@ -150,6 +164,48 @@ class CalculoTests(BaseCatalogo):
             cobertura.calcular(datasets)
 
 
+class ResumoGuardadoTests(BaseCatalogo):
+    def sst(self):
+        return CoberturaResumo.objects.get(local_recife=self.local, variavel='sst')
+
+    def test_reingerir_a_mesma_janela_nao_soma_de_novo(self):
+        """🚨 A janela diaria regrava os ultimos dias todo dia."""
+        gravar([
+            medicao(self.local, date(2026, 7, 21), valor=26.0),
+            medicao(self.local, date(2026, 7, 22), valor=26.5),
+        ])
+
+        resumo = self.sst()
+        self.assertEqual(resumo.n, 3)
+        self.assertEqual((resumo.inicio, resumo.fim), (date(2026, 7, 20), date(2026, 7, 22)))
+        self.assertEqual(cobertura.divergencias(), [])
+
+    def test_o_que_passa_por_fora_do_gravar_diverge_e_reconstruir_corrige(self):
+        MedicaoAmbiental.objects.filter(variavel='dhw').delete()
+        self.assertEqual(
+            cobertura.divergencias(), [(self.local.pk, 'noaa_crw', 'dhw')],
+        )
+
+        self.assertEqual(cobertura.reconstruir(), 1)
+
+        self.assertEqual(cobertura.divergencias(), [])
+        self.assertFalse(CoberturaResumo.objects.filter(variavel='dhw').exists())
+
+    def test_comando_confere_e_refaz(self):
+        MedicaoAmbiental.objects.filter(variavel='dhw').delete()
+
+        with self.assertRaises(SystemExit):
+            call_command('reconstruir_cobertura', '--conferir', stdout=StringIO())
+        call_command('reconstruir_cobertura', stdout=StringIO())
+        call_command('reconstruir_cobertura', '--conferir', stdout=StringIO())
+
+    def test_a_leitura_nao_toca_nas_medicoes(self):
+        with CaptureQueriesContext(connection) as consultas:
+            cobertura.resumo()
+
+        self.assertNotIn('aquaculture_medicaoambiental', consultas[0]['sql'])
+
+
 class RespostaDaApiTests(BaseCatalogo):
     def buscar(self):
         with override_settings(OFFLINE_MODE=False):
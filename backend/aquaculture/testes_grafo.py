@@ -0,0 +1,149 @@
+"""Testes do caminho de leitura do grafo: uma consulta, pool e cache.
+
+O que protegem:
+
+1. 🚨 **Uma ida ao Neo4j por pagina de detalhe**, com as especies e as
+   predicoes na mesma resposta - e nenhuma quando o cache ja tem a pagina.
+2. **Reprojetar invalida o cache.** A chave leva o id da ultima projecao; um
+   grafo reconstruido nunca e respondido com a pagina do anterior.
+3. **Sem projecao registrada, nada de cache**, e erro do Neo4j nunca e
+   guardado.
+4. **O pool sai das settings.** Em especial a espera curta: com o Neo4j fora,
+   o padrao do driver prendia o worker um minuto.
+
+Nao tocam no Neo4j: `executar_read` e o pacote do driver sao trocados.
+"""
+
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from aquaculture import neo4j_service
+from aquaculture.models import ExecucaoProjecao
+
+DETALHE = {
+    'slug': 'abrolhos-ba', 'nome': 'Abrolhos', 'estado': 'BA', 'cidade': 'Caravelas',
+    'descricao': '', 'ultima_atualizacao': None, 'ativo': True,
+    'especies': [{'nome_cientifico': 'Mussismilia braziliensis'}],
+    'predicoes': [],
+}
+
+
+def projetada():
+    return ExecucaoProjecao.objects.create(concluida_em=timezone.now())
+
+
+@patch('aquaculture.neo4j_service.executar_read')
+class CacheDoGrafoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_o_detalhe_e_uma_consulta_so(self, executar_read_mock):
+        executar_read_mock.return_value = [DETALHE]
+
+        neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+
+        executar_read_mock.assert_called_once()
+        cypher = executar_read_mock.call_args.args[0]
+        self.assertIs(cypher, neo4j_service.OBTER_DETALHE_LOCALIZACAO_GRAFO_QUERY)
+        self.assertIn('AS especies', cypher)
+        self.assertIn('AS predicoes', cypher)
+
+    def test_segunda_visita_nao_vai_ao_neo4j(self, executar_read_mock):
+        projetada()
+        executar_read_mock.return_value = [DETALHE]
+
+        primeira = neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+        segunda = neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+
+        self.assertEqual(primeira, segunda)
+        executar_read_mock.assert_called_once()
+
+    def test_nova_projecao_invalida_o_que_estava_guardado(self, executar_read_mock):
+        projetada()
+        executar_read_mock.return_value = [DETALHE]
+        neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+        neo4j_service.listar_localizacoes_grafo()
+
+        projetada()
+        executar_read_mock.return_value = [dict(DETALHE, nome='Abrolhos reprojetado')]
+        detalhe = neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+        neo4j_service.listar_localizacoes_grafo()
+
+        self.assertEqual(detalhe['nome'], 'Abrolhos reprojetado')
+        self.assertEqual(executar_read_mock.call_count, 4)
+
+    def test_projecao_em_andamento_nao_muda_a_versao(self, executar_read_mock):
+        projetada()
+        executar_read_mock.return_value = [DETALHE]
+        neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+
+        ExecucaoProjecao.objects.create()
+        neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+
+        executar_read_mock.assert_called_once()
+
+    def test_local_ausente_tambem_fica_guardado(self, executar_read_mock):
+        projetada()
+        executar_read_mock.return_value = []
+
+        self.assertIsNone(neo4j_service.obter_localizacao_grafo('inexistente'))
+        self.assertIsNone(neo4j_service.obter_localizacao_grafo('inexistente'))
+
+        executar_read_mock.assert_called_once()
+
+    def test_sem_projecao_registrada_le_sempre(self, executar_read_mock):
+        executar_read_mock.return_value = [DETALHE]
+
+        neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+        neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+
+        self.assertEqual(executar_read_mock.call_count, 2)
+
+    @override_settings(NEO4J_CACHE_SEGUNDOS=0)
+    def test_zero_desliga_o_cache(self, executar_read_mock):
+        projetada()
+        executar_read_mock.return_value = [DETALHE]
+
+        neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+        neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+
+        self.assertEqual(executar_read_mock.call_count, 2)
+
+    def test_erro_do_neo4j_nao_e_guardado(self, executar_read_mock):
+        projetada()
+        executar_read_mock.side_effect = [
+            neo4j_service.Neo4jServiceError('fora do ar'), [DETALHE],
+        ]
+
+        with self.assertRaises(neo4j_service.Neo4jServiceError):
+            neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+        detalhe = neo4j_service.obter_localizacao_grafo('abrolhos-ba')
+
+        self.assertEqual(detalhe['slug'], 'abrolhos-ba')
+
+
+@override_settings(
+    NEO4J_URI='bolt://grafo:7687', NEO4J_USER='neo4j', NEO4J_PASSWORD='senha-de-teste',
+    NEO4J_POOL_MAXIMO=4, NEO4J_POOL_ESPERA_SEGUNDOS=2.5,
+    NEO4J_CONEXAO_VIDA_SEGUNDOS=600, NEO4J_TESTE_OCIOSA_SEGUNDOS=30,
+)
+class PoolDoDriverTests(TestCase):
+    def test_o_driver_nasce_com_o_pool_das_settings(self):
+        graph_database = MagicMock()
+        with patch.object(neo4j_service, '_driver', None), \
+                patch.object(neo4j_service, '_neo4j', return_value=(graph_database, MagicMock())):
+            neo4j_service.get_neo4j_driver()
+            neo4j_service.get_neo4j_driver()
+
+        graph_database.driver.assert_called_once_with(
+            'bolt://grafo:7687', auth=('neo4j', 'senha-de-teste'),
+            max_connection_pool_size=4,
+            connection_acquisition_timeout=2.5,
+            connection_timeout=2.5,
+            max_connection_lifetime=600,
+            liveness_check_timeout=30,
+        )
@@ -0,0 +1,84 @@
+"""Testes da proveniencia normalizada de `MedicaoAmbiental`.
+
+O que protegem:
+
+1. 🚨 **O texto lido e o texto gravado.** Unidade, dataset e observacao saem
+   pela API, pelo CSV e pelo grafo exatamente como entraram - so mudou onde
+   moram.
+2. **Uma linha por texto distinto.** Gravar mil medicoes da mesma variavel
+   nao cria mil origens.
+3. **Sem N+1.** Quem le em lote por `com_proveniencia()` faz uma consulta, e
+   nao uma por medicao.
+4. **O upsert acompanha a observacao.** Um valor que deixa de ser reprovado
+   perde o motivo antigo.
+"""
+
+from datetime import date
+
+from django.test import TestCase
+
+from aquaculture.models import (
+    LocalRecife,
+    MedicaoAmbiental,
+    ObservacaoMedicao,
+    OrigemMedicao,
+)
+from ingestao.persistencia import gravar
+
+
+class ProvenienciaTests(TestCase):
+    def setUp(self):
+        MedicaoAmbiental.objects.all().delete()
+        self.local = LocalRecife.objects.create(
+            slug='teste-proveniencia', nome='Teste', estado='PE',
+            cidade='Recife', latitude=-8.0, longitude=-34.8,
+        )
+
+    def medicao(self, dia, **extras):
+        campos = {
+            'local_recife': self.local, 'data': dia, 'variavel': 'sst',
+            'valor': 27.0, 'unidade': '°C', 'fonte': 'noaa_crw',
+            'dataset_id': 'dhw_5km',
+        }
+        campos.update(extras)
+        return MedicaoAmbiental(**campos)
+
+    def test_textos_repetidos_viram_uma_linha_cada(self):
+        reprovada = 'Valor 999.0 fora da faixa fisica de sst; gravado como nulo.'
+        gravar([
+            self.medicao(date(2026, 7, dia), observacao=reprovada if dia > 3 else '')
+            for dia in range(1, 7)
+        ])
+
+        self.assertEqual(MedicaoAmbiental.objects.count(), 6)
+        self.assertEqual(OrigemMedicao.objects.filter(dataset_id='dhw_5km').count(), 1)
+        self.assertEqual(ObservacaoMedicao.objects.filter(texto=reprovada).count(), 1)
+        self.assertEqual(MedicaoAmbiental.objects.filter(nota__isnull=True).count(), 3)
+
+    def test_leitura_em_lote_devolve_o_texto_em_uma_consulta(self):
+        for dia in range(1, 4):
+            self.medicao(date(2026, 7, dia), observacao='motivo').save()
+
+        with self.assertNumQueries(1):
+            lidas = list(MedicaoAmbiental.objects.com_proveniencia().order_by('data'))
+            textos = {(m.unidade, m.dataset_id, m.observacao) for m in lidas}
+
+        self.assertEqual(textos, {('°C', 'dhw_5km', 'motivo')})
+
+    def test_sem_anotacao_le_da_tabela_pequena(self):
+        self.medicao(date(2026, 7, 1)).save()
+
+        medicao = MedicaoAmbiental.objects.get()
+
+        self.assertEqual((medicao.unidade, medicao.dataset_id), ('°C', 'dhw_5km'))
+        self.assertEqual(medicao.observacao, '')
+
+    def test_upsert_que_aprova_o_valor_apaga_o_motivo(self):
+        dia = date(2026, 7, 1)
+        gravar([self.medicao(dia, valor=None, quality_flag='invalido', observacao='fora')])
+        gravar([self.medicao(dia, valor=27.5)])
+
+        medicao = MedicaoAmbiental.objects.com_proveniencia().get()
+        self.assertEqual(medicao.quality_flag, 'ok')
+        self.assertEqual(medicao.observacao, '')
+        self.assertIsNone(medicao.nota_id)
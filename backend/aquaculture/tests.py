@@ -394,49 +394,47 @@ class Neo4jServiceReadTests(TestCase):
 
     @patch('aquaculture.neo4j_service.executar_read')
     def test_obter_localizacao_grafo_returns_local_with_species_and_predictions(self, executar_read_mock):
-        executar_read_mock.side_effect = [
-            [
-                {
-                    'slug': 'abrolhos-ba',
-                    'nome': 'Parque Nacional Marinho de Abrolhos',
-                    'estado': 'Bahia',
-                    'cidade': 'Caravelas',
-                    'descricao': 'Local de teste para o grafo.',
-                    'ultima_atualizacao': '2026-04-16',
-                    'ativo': True,
-                }
-            ],
-            [
-                {
-                    'nome_cientifico': 'Mussismilia braziliensis',
-                    'nome_comum': 'Coral-cerebro brasileiro',
-                    'tipo': 'CORAL',
-                    'descricao': 'Especie formadora de recife.',
-                    'iucn_categoria': 'VU',
-                    'credito_imagem': 'Equipe local',
-                    'fonte_imagem_url': 'https://exemplo.org/imagem',
-                    'fonte_url': 'https://exemplo.org/especie',
-                }
-            ],
-            [
-                {
-                    'local_slug': 'abrolhos-ba',
-                    'data': '2026-04-16',
-                    'sst_atual': 29.1,
-                    'limite_termico': 27.0,
-                    'anomalia': 2.1,
-                    'dhw_calculado': 6.4,
-                    'irradiancia': 32.5,
-                    'turbidez': 0.18,
-                    'salinidade': 36.0,
-                    'ph': 8.1,
-                    'oxigenio': 6.5,
-                    'nitrato': 0.4,
-                    'clorofila': 0.7,
-                    'risco_integrado': 78.0,
-                    'nivel_alerta': 'ALERTA_1',
-                }
-            ],
+        executar_read_mock.return_value = [
+            {
+                'slug': 'abrolhos-ba',
+                'nome': 'Parque Nacional Marinho de Abrolhos',
+                'estado': 'Bahia',
+                'cidade': 'Caravelas',
+                'descricao': 'Local de teste para o grafo.',
+                'ultima_atualizacao': '2026-04-16',
+                'ativo': True,
+                'especies': [
+                    {
+                        'nome_cientifico': 'Mussismilia braziliensis',
+                        'nome_comum': 'Coral-cerebro brasileiro',
+                        'tipo': 'CORAL',
+                        'descricao': 'Especie formadora de recife.',
+                        'iucn_categoria': 'VU',
+                        'credito_imagem': 'Equipe local',
+                        'fonte_imagem_url': 'https://exemplo.org/imagem',
+                        'fonte_url': 'https://exemplo.org/especie',
+                    }
+                ],
+                'predicoes': [
+                    {
+                        'local_slug': 'abrolhos-ba',
+                        'data': '2026-04-16',
+                        'sst_atual': 29.1,
+                        'limite_termico': 27.0,
+                        'anomalia': 2.1,
+                        'dhw_calculado': 6.4,
+                        'irradiancia': 32.5,
+                        'turbidez': 0.18,
+                        'salinidade': 36.0,
+                        'ph': 8.1,
+                        'oxigenio': 6.5,
+                        'nitrato': 0.4,
+                        'clorofila': 0.7,
+                        'risco_integrado': 78.0,
+                        'nivel_alerta': 'ALERTA_1',
+                    }
+                ],
+            }
         ]
 
         payload = obter_localizacao_grafo('abrolhos-ba')
@@ -446,9 +444,8 @@ class Neo4jServiceReadTests(TestCase):
         self.assertEqual(payload['especies'][0]['nome_cientifico'], 'Mussismilia braziliensis')
         self.assertEqual(payload['predicoes'][0]['nivel_alerta'], 'ALERTA_1')
         expected_parameters = {'localizacao_id': 'abrolhos-ba'}
-        self.assertEqual(executar_read_mock.call_args_list[0].args[1], expected_parameters)
-        self.assertEqual(executar_read_mock.call_args_list[1].args[1], expected_parameters)
-        self.assertEqual(executar_read_mock.call_args_list[2].args[1], expected_parameters)
+        executar_read_mock.assert_called_once()
+        self.assertEqual(executar_read_mock.call_args.args[1], expected_parameters)
 
 
 class Neo4jCommandWiringTests(TestCase):
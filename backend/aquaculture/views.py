@@ -386,6 +386,37 @@ class ApiStatusView(generics.GenericAPIView):
         )
 
 
+class ProntidaoView(APIView):
+    """Prontidao do worker: 200 quando pode receber trafego, 503 antes.
+
+    Com `AQUECER_NA_PARTIDA` ligado, "pronto" e "aquecido": bibliotecas, escala
+    e modelo ja carregados. Desligado, o worker esta pronto assim que responde,
+    e o aquecimento acontece na primeira visita ao painel, como sempre.
+
+    ⚠️ Sem `OfflineModeMixin` de proposito, como `ApiStatusView`: o site em
+    manutencao continua sendo um processo de pe. E um modelo ausente nao tira o
+    worker do ar - a etapa aparece com `ok: false` e o erro.
+    """
+
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, *args, **kwargs):
+        from coral_site import aquecimento
+
+        ligado = getattr(settings, 'AQUECER_NA_PARTIDA', False)
+        situacao = aquecimento.estado()
+        pronto = situacao.concluido or not ligado
+        return Response(
+            {
+                'pronto': pronto,
+                'aquecer_na_partida': ligado,
+                **situacao.como_payload(),
+            },
+            status=status.HTTP_200_OK if pronto else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+
 class GrafoLocalizacaoList(OfflineModeMixin, APIView):
     authentication_classes = []
     permission_classes = []
@@ -472,6 +503,7 @@ class MedicaoAmbientalList(OfflineModeMixin, generics.ListAPIView):
         parametros = self.request.query_params
         queryset = (
             MedicaoAmbiental.objects
+            .com_proveniencia()
             .select_related('local_recife')
             .order_by(*self.ORDEM)
         )
@@ -639,7 +671,7 @@ class PainelRiscoBase(OfflineModeMixin, APIView):
             raise ModeloIndisponivel(str(erro)) from erro
 
     def limiar(self):
-        return float(getattr(settings, 'PAINEL_LIMIAR', 0.20))
+        return float(settings.PAINEL_LIMIAR)
 
     def escala(self):
         """A escala de aviso configurada, ou a canonica de `ml/niveis.py`."""
@@ -0,0 +1,21 @@
+"""Benchmarks dos caminhos quentes, sobre dados sinteticos em escala.
+
+Sem medida, otimizacao e palpite: nao ha como saber se a troca ajudou, nem se
+a seguinte desfez o ganho. Este pacote mede sempre os mesmos caminhos, sobre
+os mesmos dados, e guarda o resultado em JSON para comparar entre commits.
+
+| Modulo | Papel |
+|---|---|
+| `sintetico` | gera recifes e series com a forma dos reais, em qualquer escala |
+| `casos` | os caminhos medidos: conector, ingestao, conjunto, predicao, limiar, API e log |
+| `execucao` | cronometra, grava a rodada em JSON e compara duas rodadas |
+
+Uso normal:
+
+    python backend/manage.py benchmark                          # 3 recifes, 6 anos
+    python backend/manage.py benchmark --recifes 30 --anos 10
+    python backend/manage.py benchmark --comparar dados/benchmarks/antes.json
+
+⚠️ O comando roda num **banco de teste descartavel**, criado e destruido como
+o do `manage.py test`. Os recifes sinteticos nunca tocam o banco de verdade.
+"""
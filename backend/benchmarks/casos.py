@@ -0,0 +1,335 @@
+"""Os caminhos quentes medidos, um caso por funcao.
+
+Cada caso recebe o `Cenario` e devolve `(funcao, itens)`: a funcao sem
+argumentos que sera cronometrada, e quantas unidades ela processa. Tudo o que
+nao e o caminho medido - gerar o quadro, treinar o modelo, logar o usuario -
+fica fora da funcao, na preparacao.
+
+O `Cenario` monta o que os casos compartilham so quando algum caso pede:
+rodar `--casos conector` nao paga o treino do modelo.
+
+Para acrescentar um caso, decore uma funcao com `@caso(...)`. O nome e a chave
+da comparacao entre rodadas; renomear um caso faz a proxima comparacao dizer
+"sumiu" e "novo" em vez de comparar.
+"""
+
+import logging
+import tempfile
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+
+from . import sintetico
+
+NOME_MODELO = 'benchmark_sintetico'
+
+# As variaveis que os casos de ML exigem da escala.
+PARA_O_MODELO = ('sst', 'dhw', 'baa', 'hotspot', 'salinidade', 'oxigenio')
+
+
+@dataclass(frozen=True)
+class Caso:
+    nome: str
+    grupo: str
+    preparar: object
+    exige: tuple = ()
+
+
+CASOS = {}
+
+
+def caso(nome, grupo, exige=()):
+    def registrar(preparar):
+        CASOS[nome] = Caso(nome, grupo, preparar, tuple(exige))
+        return preparar
+    return registrar
+
+
+def selecionar(filtros=()):
+    """Os casos cujo nome comeca por algum dos filtros; sem filtro, todos."""
+    return [
+        c for nome, c in CASOS.items()
+        if not filtros or any(nome.startswith(f) for f in filtros)
+    ]
+
+
+class Cenario:
+    """O que os casos compartilham, montado sob demanda."""
+
+    def __init__(self, escala):
+        self.escala = escala
+        self._pasta = tempfile.TemporaryDirectory(prefix='coral-benchmark-')
+        self.pasta = Path(self._pasta.name)
+        # O que algum caso abriu e precisa fechar antes da pasta sumir.
+        self.ao_fechar = []
+
+    def fechar(self):
+        for fechar in reversed(self.ao_fechar):
+            fechar()
+        self._pasta.cleanup()
+
+    @cached_property
+    def locais(self):
+        return sintetico.popular(self.escala, prefixo='benchmark')
+
+    @cached_property
+    def conjunto(self):
+        from ml import dataset
+
+        return dataset.montar_todos(self.locais, horizonte=7)
+
+    @cached_property
+    def quadro_erddap(self):
+        return sintetico.quadro_erddap(self.escala)
+
+    @cached_property
+    def modelo(self):
+        """Treina e grava o artefato como `treinar_final`. Devolve o nome."""
+        from ml import modelo, persistencia
+
+        conjunto = self.conjunto
+        ajuste = modelo.treinar(
+            conjunto.quadro, conjunto.colunas_de_entrada, calibrar='isotonic'
+        )
+        persistencia.salvar(
+            ajuste, NOME_MODELO, pasta=self.pasta, amostra=conjunto.quadro,
+            extras={'locais': sorted(local.slug for local in self.locais)},
+        )
+        return NOME_MODELO
+
+    @cached_property
+    def cliente(self):
+        from django.contrib.auth import get_user_model
+        from django.test import Client
+
+        # O CSV exige conta aprovada; superusuario e o caminho mais curto.
+        usuario = get_user_model().objects.create_superuser(
+            'benchmark', 'benchmark@example.com', 'benchmark'
+        )
+        cliente = Client()
+        cliente.force_login(usuario)
+        return cliente
+
+    def pedir(self, caminho, painel=False):
+        """GET com o modo offline desligado; `painel` aponta o modelo para a pasta."""
+        from django.test import override_settings
+
+        from ml import persistencia
+
+        ajustes = {'OFFLINE_MODE': False}
+        if painel:
+            ajustes['PAINEL_MODELO'] = self.modelo
+        with override_settings(**ajustes):
+            anterior, persistencia.PASTA_PADRAO = persistencia.PASTA_PADRAO, self.pasta
+            try:
+                resposta = self.cliente.get(caminho)
+                if resposta.streaming:
+                    b''.join(resposta.streaming_content)
+            finally:
+                persistencia.PASTA_PADRAO = anterior
+        if resposta.status_code != 200:
+            raise RuntimeError(f'{caminho} respondeu {resposta.status_code}.')
+        return resposta
+
+
+# ---------------------------------------------------------------------------
+# Ingestao
+# ---------------------------------------------------------------------------
+
+@caso('conector.extrair', 'ingestao')
+def _conector_extrair(cenario):
+    from ingestao.conectores.noaa_crw import ConectorNoaaCrw
+
+    conector = ConectorNoaaCrw(servidor='-', dataset_id='dhw_5km')
+    quadro = cenario.quadro_erddap
+    return (lambda: conector._extrair(quadro)), len(quadro)
+
+
+@caso('ingestao.preparar_e_gravar', 'ingestao')
+def _preparar_e_gravar(cenario):
+    """Reingerir o mesmo periodo: o caminho do upsert, que e o do cron."""
+    from aquaculture.models import LocalRecife
+    from ingestao.conectores.noaa_crw import ConectorNoaaCrw
+    from ingestao.persistencia import gravar, preparar_medicoes
+
+    conector = ConectorNoaaCrw(servidor='-', dataset_id='dhw_5km')
+    resultado = conector._extrair(cenario.quadro_erddap)
+    local = LocalRecife.objects.create(
+        slug='benchmark-ingestao', nome='Ingestao', estado='BA', cidade='Sintetica',
+        latitude=-17.9, longitude=-38.6,
+    )
+
+    def rodar():
+        medicoes, _, _ = preparar_medicoes(local, resultado, 'noaa_crw')
+        gravar(medicoes)
+
+    return rodar, len(resultado.observacoes)
+
+
+# ---------------------------------------------------------------------------
+# Conjunto supervisionado
+# ---------------------------------------------------------------------------
+
+@caso('dataset.carregar_largo', 'dataset')
+def _carregar_largo(cenario):
+    from ml import dataset
+
+    local, variaveis = cenario.locais[0], cenario.escala.variaveis
+    return (lambda: dataset.carregar_largo(local, variaveis)), cenario.escala.dias
+
+
+@caso('dataset.montar_todos', 'dataset', exige=PARA_O_MODELO)
+def _montar_todos(cenario):
+    from ml import dataset
+
+    locais = cenario.locais
+    return (
+        (lambda: dataset.montar_todos(locais, horizonte=7)),
+        cenario.escala.recifes * cenario.escala.dias,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Predicao e limiar
+# ---------------------------------------------------------------------------
+
+def _calcular(cenario, compilado):
+    from ml import predicao
+
+    ajuste, _ = predicao.carregar_modelo(
+        cenario.modelo, pasta=cenario.pasta, compilado=compilado
+    )
+    locais, hoje = cenario.locais, cenario.escala.fim
+
+    def rodar():
+        for local in locais:
+            predicao.calcular(local, ajuste, 0.20, hoje=hoje)
+
+    return rodar, len(locais)
+
+
+@caso('predicao.calcular', 'predicao', exige=PARA_O_MODELO)
+def _calcular_pontuador(cenario):
+    return _calcular(cenario, compilado=True)
+
+
+@caso('predicao.calcular_pipeline', 'predicao', exige=PARA_O_MODELO)
+def _calcular_pipeline(cenario):
+    """O mesmo, pelo pipeline do scikit-learn: o custo que o pontuador evita."""
+    return _calcular(cenario, compilado=False)
+
+
+@caso('limiar.varrer', 'predicao', exige=PARA_O_MODELO)
+def _varrer(cenario):
+    from ml import limiar
+
+    conjunto = cenario.conjunto
+    return (lambda: limiar.varrer(conjunto)), conjunto.n
+
+
+# ---------------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------------
+
+@caso('api.medicoes_json', 'api')
+def _medicoes_json(cenario):
+    """A primeira pagina de uma variavel em todos os recifes - o filtro largo."""
+    variavel = cenario.escala.variaveis[0]
+    caminho = f'/api/medicoes/?variavel={variavel}'
+    cenario.locais  # noqa: B018 - popula fora do cronometro
+    return (lambda: cenario.pedir(caminho)), 1
+
+
+@caso('api.medicoes_csv', 'api')
+def _medicoes_csv(cenario):
+    """A serie inteira de um recife, como o download do site."""
+    from aquaculture.models import MedicaoAmbiental
+
+    local = cenario.locais[0]
+    caminho = f'/api/medicoes/?formato=csv&local={local.slug}'
+    linhas = MedicaoAmbiental.objects.filter(local_recife=local).count()
+    return (lambda: cenario.pedir(caminho)), linhas
+
+
+@caso('api.painel_risco', 'api', exige=PARA_O_MODELO)
+def _painel_risco(cenario):
+    cenario.modelo  # noqa: B018 - treina fora do cronometro
+    return (lambda: cenario.pedir('/api/painel-risco/', painel=True)), cenario.escala.recifes
+
+
+# ---------------------------------------------------------------------------
+# Log
+# ---------------------------------------------------------------------------
+# O custo de um `logger.info` com `extra=` na thread de quem loga, escrevendo
+# nos dois JSONL - o que cada bloco de ingestao e cada requisicao pagam. Os dois
+# casos logam as mesmas linhas; muda so o handler.
+
+LINHAS_LOG = 2000
+
+
+def _logar(cenario, nome, handlers):
+    from observabilidade import contexto
+    from observabilidade.correlacao import FiltroCorrelacao
+
+    logger = logging.getLogger(f'benchmark.log.{nome}')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    for handler in handlers:
+        handler.addFilter(FiltroCorrelacao())
+        logger.addHandler(handler)
+        cenario.ao_fechar.append(handler.close)
+
+    def rodar():
+        # O comando desliga INFO durante a rodada (`logging.disable`); aqui o
+        # INFO e justamente o que se mede.
+        desligado = logging.root.manager.disable
+        logging.disable(logging.NOTSET)
+        try:
+            with contexto(fluxo='benchmark', fonte='noaa_crw', local='benchmark-log'):
+                for numero in range(LINHAS_LOG):
+                    logger.info('Bloco gravado', extra={'gravadas': numero, 'rejeitadas': 3})
+        finally:
+            logging.disable(desligado)
+
+    return rodar, LINHAS_LOG
+
+
+@caso('log.arquivo_direto', 'log')
+def _log_direto(cenario):
+    """Os dois `RotatingFileHandler` ligados ao logger, como era antes da fila."""
+    from logging.handlers import RotatingFileHandler
+
+    from observabilidade.formatadores import JsonLinhas
+
+    handlers = []
+    for nome, nivel in (('direto.jsonl', logging.DEBUG), ('direto-erros.jsonl', logging.ERROR)):
+        handler = RotatingFileHandler(
+            cenario.pasta / nome, maxBytes=20 * 1024 * 1024, backupCount=1,
+            encoding='utf-8', delay=True,
+        )
+        handler.setLevel(nivel)
+        handler.setFormatter(JsonLinhas())
+        handlers.append(handler)
+    return _logar(cenario, 'direto', handlers)
+
+
+@caso('log.arquivo_em_fila', 'log')
+def _log_em_fila(cenario):
+    """Os mesmos arquivos atras de `ArquivosEmFila`: mede so o enfileirar.
+
+    ⚠️ A thread de escrita roda durante a medida e disputa o GIL com quem loga;
+    esse custo entra no numero. A fila e grande o bastante para nada ser
+    descartado - descarte deixaria o caso rapido por nao registrar.
+    """
+    from observabilidade.fila import ArquivosEmFila
+
+    handler = ArquivosEmFila(
+        [
+            {'filename': str(cenario.pasta / 'fila.jsonl'), 'level': 'DEBUG',
+             'maxBytes': 20 * 1024 * 1024, 'backupCount': 1},
+            {'filename': str(cenario.pasta / 'fila-erros.jsonl'), 'level': 'ERROR',
+             'maxBytes': 20 * 1024 * 1024, 'backupCount': 1},
+        ],
+        tamanho=1_000_000,
+    )
+    return _logar(cenario, 'em_fila', [handler])
@@ -0,0 +1,219 @@
+"""Cronometragem, registro em JSON e comparacao entre rodadas.
+
+Cada caso roda uma vez para aquecer - cache do ORM, import preguicoso,
+`carregar_modelo` - e depois `repeticoes` vezes cronometradas. O numero que
+vale e a **mediana**: o minimo premia a rodada sortuda e a media e puxada pela
+que pegou o coletor de lixo.
+
+⚠️ **Regressao e relativa e tem piso absoluto.** Com tolerancia de 20%, um
+caso de 2 ms que foi para 2,5 ms seria "regressao" - e e ruido de agendador.
+So conta como regressao o que passa da tolerancia **e** do piso em ms.
+
+🚨 **Rodadas de escala ou banco diferentes nao se comparam.** O mesmo caso
+sobre 3 e 300 recifes, ou sobre SQLite e PostgreSQL, mede coisas diferentes;
+`comparar` recusa em vez de devolver uma razao sem sentido.
+"""
+
+import json
+import platform
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+FORMATO = 1
+TOLERANCIA_PADRAO = 0.20
+PISO_MS_PADRAO = 1.0
+
+
+class RodadasIncomparaveis(ValueError):
+    """Escala ou banco diferentes entre as duas rodadas."""
+
+
+@dataclass
+class Medida:
+    nome: str
+    grupo: str
+    repeticoes: int
+    mediana_ms: float
+    minimo_ms: float
+    maximo_ms: float
+    # Quantas unidades o caso processa por execucao (linhas, recifes,
+    # requisicoes) - o que permite ler a medida como vazao.
+    itens: int = 1
+
+    @property
+    def por_item_us(self):
+        return self.mediana_ms * 1000 / max(self.itens, 1)
+
+
+@dataclass
+class Rodada:
+    escala: dict
+    banco: str
+    medidas: list = field(default_factory=list)
+    commit: str = ''
+    alterado: bool = False
+    gerado_em: str = ''
+    python: str = ''
+    maquina: str = ''
+    pulados: dict = field(default_factory=dict)
+
+    def medida(self, nome):
+        return next((m for m in self.medidas if m.nome == nome), None)
+
+    def como_dict(self):
+        return {
+            'formato': FORMATO,
+            **{k: v for k, v in asdict(self).items() if k != 'medidas'},
+            'medidas': [asdict(m) for m in self.medidas],
+        }
+
+    def salvar(self, caminho):
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        caminho.write_text(
+            json.dumps(self.como_dict(), indent=2, ensure_ascii=False), encoding='utf-8'
+        )
+        return caminho
+
+
+def ler(caminho):
+    dados = json.loads(Path(caminho).read_text(encoding='utf-8'))
+    if dados.get('formato') != FORMATO:
+        raise RodadasIncomparaveis(
+            f'{caminho} tem formato {dados.get("formato")}, este codigo le {FORMATO}.'
+        )
+    medidas = [Medida(**m) for m in dados.pop('medidas')]
+    dados.pop('formato')
+    return Rodada(medidas=medidas, **dados)
+
+
+def cronometrar(funcao, repeticoes, aquecer=1):
+    """Tempos de `repeticoes` chamadas, em ms, depois de `aquecer` descartadas."""
+    for _ in range(aquecer):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        comeco = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - comeco) * 1000)
+    return tempos
+
+
+def medir(nome, grupo, funcao, repeticoes, itens=1):
+    import statistics
+
+    tempos = cronometrar(funcao, repeticoes)
+    return Medida(
+        nome=nome,
+        grupo=grupo,
+        repeticoes=repeticoes,
+        mediana_ms=round(statistics.median(tempos), 3),
+        minimo_ms=round(min(tempos), 3),
+        maximo_ms=round(max(tempos), 3),
+        itens=itens,
+    )
+
+
+def executar(casos, cenario, repeticoes, ao_medir=None):
+    """Mede cada caso sobre o cenario. Devolve a `Rodada`, ainda sem identificacao.
+
+    Caso que exige variavel fora da escala e pulado com o motivo, e nao
+    quebrado: `--variaveis sst,dhw` continua medindo ingestao e API.
+    """
+    from django.db import connection
+
+    rodada = Rodada(escala=cenario.escala.como_dict(), banco=connection.vendor)
+    for caso in casos:
+        faltando = [v for v in caso.exige if v not in cenario.escala.variaveis]
+        if faltando:
+            rodada.pulados[caso.nome] = f'exige {", ".join(faltando)}'
+            continue
+        funcao, itens = caso.preparar(cenario)
+        medida = medir(caso.nome, caso.grupo, funcao, repeticoes, itens)
+        rodada.medidas.append(medida)
+        if ao_medir:
+            ao_medir(medida)
+    return rodada
+
+
+def identificar(rodada):
+    """Preenche commit, maquina e horario. Fora do git, o commit fica vazio."""
+    raiz = Path(__file__).resolve().parents[2]
+
+    def git(*argumentos):
+        try:
+            return subprocess.run(
+                ['git', *argumentos], cwd=raiz, capture_output=True, text=True,
+                check=True, timeout=10,
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ''
+
+    rodada.commit = git('rev-parse', '--short', 'HEAD')
+    # Medida de arvore alterada nao e medida do commit: fica marcada.
+    rodada.alterado = bool(git('status', '--porcelain', '--untracked-files=no'))
+    rodada.gerado_em = datetime.now().isoformat(timespec='seconds')
+    rodada.python = platform.python_version()
+    rodada.maquina = platform.node()
+    return rodada
+
+
+@dataclass
+class Diferenca:
+    nome: str
+    base_ms: float | None
+    atual_ms: float | None
+    situacao: str  # 'regrediu' | 'melhorou' | 'estavel' | 'novo' | 'sumiu'
+
+    @property
+    def razao(self):
+        if not self.base_ms or self.atual_ms is None:
+            return None
+        return self.atual_ms / self.base_ms
+
+
+def exigir_comparavel(base, escala, banco):
+    """Levanta `RodadasIncomparaveis` se `base` nao mediu a mesma coisa."""
+    if base.escala != escala:
+        raise RodadasIncomparaveis(
+            f'Escalas diferentes: {base.escala} contra {escala}. '
+            'Rode as duas com os mesmos --recifes, --anos e --variaveis.'
+        )
+    if base.banco != banco:
+        raise RodadasIncomparaveis(f'Bancos diferentes: {base.banco} contra {banco}.')
+
+
+def comparar(base, atual, tolerancia=TOLERANCIA_PADRAO, piso_ms=PISO_MS_PADRAO,
+             nomes=None):
+    """Compara as medianas caso a caso. Devolve `[Diferenca]` na ordem de `atual`.
+
+    `nomes` restringe o "sumiu" aos casos que a rodada atual pediu: rodar so
+    `--casos api` nao deve acusar o sumico do resto.
+    """
+    exigir_comparavel(base, atual.escala, atual.banco)
+
+    diferencas = []
+    for medida in atual.medidas:
+        anterior = base.medida(medida.nome)
+        if anterior is None:
+            diferencas.append(Diferenca(medida.nome, None, medida.mediana_ms, 'novo'))
+            continue
+        delta = medida.mediana_ms - anterior.mediana_ms
+        if abs(delta) < piso_ms or abs(delta) <= tolerancia * anterior.mediana_ms:
+            situacao = 'estavel'
+        else:
+            situacao = 'regrediu' if delta > 0 else 'melhorou'
+        diferencas.append(
+            Diferenca(medida.nome, anterior.mediana_ms, medida.mediana_ms, situacao)
+        )
+
+    medidos = {m.nome for m in atual.medidas}
+    diferencas += [
+        Diferenca(m.nome, m.mediana_ms, None, 'sumiu')
+        for m in base.medidas
+        if m.nome not in medidos and (nomes is None or m.nome in nomes)
+    ]
+    return diferencas
@@ -0,0 +1,676 @@
+"""Dados sinteticos com a forma dos reais, em qualquer escala.
+
+Benchmark sobre os tres recifes de hoje mede pouco: 57 mil medicoes cabem em
+cache de tudo, e uma regressao O(n²) passa despercebida em n pequeno. Aqui a
+escala e parametro - recifes, anos e variaveis - e os dados saem com as
+propriedades que os caminhos quentes de fato exercitam:
+
+- **Sazonalidade e ruido autocorrelacionado na SST**, com pico em marco, como
+  no litoral brasileiro. Ruido branco faria toda janela de variacao ficar
+  parecida, e o modelo nao teria o que aprender.
+- **Anos quentes em comum entre recifes.** Os episodios de estresse caem nos
+  mesmos anos em todo o litoral, por serem o mesmo forcante (ver
+  `ml/dataset.py::montar_todos`). Sorteados pela semente, e nao por recife.
+- **DHW e BAA pela regra da NOAA**, derivados do HotSpot e nao sorteados a
+  parte: BAA 3 so existe com DHW >= 4, como no produto real.
+- **Lacunas onde o produto real tem.** O CRW perde dias inteiros, de todas as
+  variaveis ao mesmo tempo (6 datas em 2020-2026, tres consecutivas); o KD490
+  so existe a partir de 2023-11-15.
+- **Flags de qualidade pela validacao de verdade.** Uma SST rara com o valor
+  de preenchimento do netCDF (327,67) sai `invalido`, com valor nulo; a pluma
+  de rio que derruba a salinidade abaixo de 30 sai `degradado`. Quem decide e
+  `ingestao.qualidade.validar`, a mesma funcao da ingestao real.
+
+`popular` grava pelo caminho em massa - `COPY` no PostgreSQL - e junto as
+`ExecucaoIngestao` que teriam produzido as linhas: uma carga do historico por
+(fonte, recife) e as diarias do ultimo mes, com falhas ocasionais. `gcbd_csv`
+escreve um CSV no formato do GCBD, para as rotinas da entrega 2.
+
+⚠️ Nada disto e dado para ciencia. Serve para medir tempo e memoria; um
+modelo treinado aqui aprende a regra com que os dados foram gerados, e o F1
+dele nao diz nada sobre o mundo.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+# Variaveis que o gerador sabe produzir, com (fonte, dataset_id) - os mesmos
+# pares que a ingestao real grava.
+ORIGENS = {
+    'sst': ('noaa_crw', 'dhw_5km'),
+    'dhw': ('noaa_crw', 'dhw_5km'),
+    'baa': ('noaa_crw', 'dhw_5km'),
+    'baa_area_alerta': ('noaa_crw', 'dhw_5km'),
+    'hotspot': ('noaa_crw', 'dhw_5km'),
+    'sst_anomalia': ('noaa_crw', 'dhw_5km'),
+    'salinidade': ('copernicus', 'cmems_mod_glo_phy_my_0.083deg_P1D-m'),
+    'oxigenio': ('copernicus', 'cmems_mod_glo_bgc_my_0.25deg_P1D-m'),
+    'kd490': ('copernicus', 'cmems_mod_glo_bgc-optics_anfc_0.25deg_P1D-m'),
+}
+
+VARIAVEIS_CRW = tuple(v for v, (fonte, _) in ORIGENS.items() if fonte == 'noaa_crw')
+
+# O que o modelo do painel le: as quatro do baseline, o alvo e as linhas de
+# base. Com menos que isto os casos de ML nao tem o que montar.
+VARIAVEIS_PADRAO = ('sst', 'dhw', 'baa', 'hotspot', 'salinidade', 'oxigenio')
+
+# Fracao de dias sem CRW. 6 em ~2.400 no produto real.
+FRACAO_LACUNA_CRW = 0.0025
+INICIO_KD490 = date(2023, 11, 15)
+
+# Fracao dos anos com episodio de estresse. No CRW brasileiro, 2019, 2020,
+# 2024 e 2025 em 2019-2026.
+FRACAO_ANOS_QUENTES = 0.35
+
+# Fracao de dias com a SST no valor de preenchimento do netCDF do CRW (32767
+# com escala 0,01): fora da faixa fisica, vira `invalido` na validacao.
+FRACAO_INVALIDA = 0.0005
+VALOR_DE_PREENCHIMENTO = 327.67
+
+# Plumas de rio por ano, derrubando a salinidade por uma ou duas semanas.
+PLUMAS_POR_ANO = 1.5
+
+
+@dataclass(frozen=True)
+class Escala:
+    """Quantos recifes, quantos anos, quais variaveis."""
+
+    recifes: int = 3
+    anos: int = 6
+    variaveis: tuple = VARIAVEIS_PADRAO
+    fim: date = date(2026, 7, 24)
+    semente: int = 42
+
+    def __post_init__(self):
+        desconhecidas = [v for v in self.variaveis if v not in ORIGENS]
+        if desconhecidas:
+            raise ValueError(
+                f'O gerador nao sabe produzir {desconhecidas}. '
+                f'Disponiveis: {sorted(ORIGENS)}.'
+            )
+        if self.recifes < 1 or self.anos < 1:
+            raise ValueError('Escala precisa de pelo menos 1 recife e 1 ano.')
+
+    @property
+    def inicio(self):
+        return self.fim - timedelta(days=self.dias - 1)
+
+    @property
+    def dias(self):
+        return round(self.anos * 365.25)
+
+    @property
+    def medicoes(self):
+        """Ordem de grandeza das linhas em `MedicaoAmbiental` (sem as lacunas)."""
+        return self.recifes * self.dias * len(self.variaveis)
+
+    def como_dict(self):
+        return {
+            'recifes': self.recifes,
+            'anos': self.anos,
+            'variaveis': list(self.variaveis),
+            'fim': self.fim.isoformat(),
+            'semente': self.semente,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        return cls(
+            recifes=dados['recifes'],
+            anos=dados['anos'],
+            variaveis=tuple(dados['variaveis']),
+            fim=date.fromisoformat(dados['fim']),
+            semente=dados['semente'],
+        )
+
+
+def datas(escala):
+    """As datas da serie, em dias corridos."""
+    return [escala.inicio + timedelta(days=n) for n in range(escala.dias)]
+
+
+def _anos_quentes(escala):
+    """Os anos com episodio - os mesmos para todos os recifes."""
+    import numpy as np
+
+    rng = np.random.default_rng(escala.semente)
+    anos = range(escala.inicio.year, escala.fim.year + 1)
+    quentes = {ano for ano in anos if rng.random() < FRACAO_ANOS_QUENTES}
+    # Sem nenhum ano quente nao ha alvo positivo, e o treino nem roda.
+    return quentes or {escala.fim.year}
+
+
+def series(escala, indice):
+    """As series diarias do recife `indice`: `{variavel: ndarray}`, NaN na lacuna."""
+    import numpy as np
+    from scipy.signal import lfilter
+
+    rng = np.random.default_rng([escala.semente, indice])
+    dias = datas(escala)
+    n = len(dias)
+    dia_do_ano = np.array([d.timetuple().tm_yday for d in dias], dtype=float)
+    ano = np.array([d.year for d in dias])
+
+    # Climatologia: pico no comeco de marco (dia ~75), amplitude de ~1,4 °C.
+    base = 26.8 + rng.uniform(-0.8, 0.8)
+    amplitude = 1.4 + rng.uniform(-0.3, 0.3)
+    climatologia = base + amplitude * np.sin(2 * np.pi * (dia_do_ano + 16) / 365.25)
+    # A MMM fica logo abaixo do pico da climatologia, como no produto real.
+    mmm = base + amplitude - 0.2
+
+    # Ruido AR(1): dia quente puxa dia quente.
+    ruido = lfilter([1.0], [1.0, -0.9], rng.normal(0, 0.12, n))
+
+    # Episodio: uma lomba de calor no verao dos anos quentes.
+    pulso = np.zeros(n)
+    for quente in _anos_quentes(escala):
+        intensidade = rng.uniform(1.2, 2.2)
+        centro = 80 + rng.uniform(-20, 20)
+        no_ano = ano == quente
+        pulso[no_ano] += intensidade * np.exp(-((dia_do_ano[no_ano] - centro) / 35) ** 2)
+
+    sst = climatologia + ruido + pulso
+    hotspot = np.clip(sst - mmm, 0, None)
+
+    # DHW: soma dos HotSpots >= 1 nas ultimas 12 semanas, em semanas.
+    acumulavel = np.where(hotspot >= 1, hotspot, 0.0)
+    soma = np.cumsum(acumulavel)
+    soma[84:] = soma[84:] - soma[:-84]
+    dhw = soma / 7
+
+    # BAA pela tabela da NOAA.
+    baa = np.select(
+        [hotspot <= 0, hotspot < 1, dhw < 4, dhw < 8],
+        [0, 1, 2, 3],
+        default=4,
+    ).astype(float)
+    area = np.where(
+        baa >= 3, rng.uniform(0.5, 1.0, n),
+        np.where(baa == 2, rng.uniform(0, 0.2, n), 0.0),
+    )
+
+    todas = {
+        'sst': sst,
+        'dhw': dhw,
+        'baa': baa,
+        'baa_area_alerta': area,
+        'hotspot': hotspot,
+        'sst_anomalia': sst - climatologia,
+        'salinidade': (
+            36.2 + 0.3 * np.sin(2 * np.pi * dia_do_ano / 365.25)
+            + lfilter([1.0], [1.0, -0.95], rng.normal(0, 0.02, n))
+        ),
+        'oxigenio': 205 - 3.0 * (sst - base) + rng.normal(0, 1.5, n),
+        'kd490': 0.05 * rng.lognormal(0, 0.3, n),
+    }
+
+    # Pluma: queda brusca e volta em ~10 dias. As mais fortes passam de 30
+    # PSU para baixo e saem `degradado`.
+    pluma = np.zeros(n)
+    for comeco in np.flatnonzero(rng.random(n) < PLUMAS_POR_ANO / 365.25):
+        duracao = min(n - comeco, 30)
+        pluma[comeco:comeco + duracao] -= (
+            rng.uniform(2, 9) * np.exp(-np.arange(duracao) / 10)
+        )
+    todas['salinidade'] = todas['salinidade'] + pluma
+    # Depois das derivadas: o preenchimento e defeito do arquivo, nao calor.
+    todas['sst'] = np.where(
+        rng.random(n) < FRACAO_INVALIDA, VALOR_DE_PREENCHIMENTO, todas['sst']
+    )
+
+    # O CRW perde o dia inteiro, de todas as variaveis.
+    sem_crw = rng.random(n) < FRACAO_LACUNA_CRW
+    resultado = {}
+    for variavel in escala.variaveis:
+        valores = todas[variavel].astype(float)
+        if ORIGENS[variavel][0] == 'noaa_crw':
+            valores[sem_crw] = np.nan
+        if variavel == 'kd490':
+            valores[np.array([d < INICIO_KD490 for d in dias])] = np.nan
+        resultado[variavel] = valores
+    return resultado
+
+
+def locais(escala, prefixo='sintetico'):
+    """`LocalRecife` nao gravados, espalhados pelo litoral (-5° a -24°)."""
+    from aquaculture.models import LocalRecife
+
+    # Largura fixa: a ordem do slug e a ordem do indice, que `popular` usa
+    # para casar cada recife gravado com a sua serie.
+    largura = max(4, len(str(escala.recifes - 1)))
+    return [
+        LocalRecife(
+            slug=f'{prefixo}-{indice:0{largura}d}',
+            nome=f'Recife sintetico {indice}',
+            estado='BA',
+            cidade='Sintetica',
+            latitude=-5 - 19 * indice / max(escala.recifes - 1, 1),
+            longitude=-35 - 5 * indice / max(escala.recifes - 1, 1),
+        )
+        for indice in range(escala.recifes)
+    ]
+
+
+# Colunas gravadas em massa, na ordem das tuplas de `linhas` e `execucoes`.
+# `data_coleta` e `iniciado_em` vao explicitos: o COPY nao passa pelo
+# `auto_now` do ORM. Unidade, dataset e observacao vao como chave das tabelas
+# de proveniencia (`proveniencia`).
+COLUNAS_MEDICAO = (
+    'local_recife_id', 'data', 'variavel', 'valor', 'fonte', 'quality_flag',
+    'origem_id', 'nota_id', 'data_coleta',
+)
+COLUNAS_EXECUCAO = (
+    'fonte', 'local_recife_id', 'inicio_periodo', 'fim_periodo', 'iniciado_em',
+    'concluido_em', 'status', 'registros_gravados', 'registros_rejeitados',
+    'mensagem_erro', 'correlacao',
+)
+
+# A rotina diaria cobre o ultimo mes; antes disso, uma carga do historico.
+DIAS_DIARIOS = 30
+# Cada diaria reingere os ultimos dias - o que cobre a falha da vespera.
+JANELA_DIARIA = 3
+FRACAO_FALHA = 0.02
+FALHAS = {
+    'noaa_crw': 'HTTP 503 Service Unavailable do servidor ERDDAP.',
+    'copernicus': 'Tempo esgotado esperando o Copernicus Marine (120 s).',
+}
+
+
+@dataclass
+class Avaliada:
+    """Uma serie ja validada. `presente` e False na lacuna, que nao vira linha."""
+
+    valores: object
+    presente: object
+    flags: object
+    observacoes: object
+
+
+def avaliar(escala, indice):
+    """As series do recife passadas pela validacao fisica: `{variavel: Avaliada}`.
+
+    `validar` e a regra; o filtro vetorizado so evita chama-la para os valores
+    que estao dentro das duas faixas - quase todos.
+    """
+    import numpy as np
+
+    from ingestao.qualidade import FAIXAS_ESPERADAS, FAIXAS_VALIDAS, validar
+
+    resultado = {}
+    for variavel, brutos in series(escala, indice).items():
+        valores = brutos.copy()
+        flags = np.full(len(brutos), 'ok', dtype=object)
+        observacoes = np.full(len(brutos), '', dtype=object)
+        suspeitos = np.zeros(len(brutos), dtype=bool)
+        for faixas in (FAIXAS_VALIDAS, FAIXAS_ESPERADAS):
+            if variavel in faixas:
+                minimo, maximo = faixas[variavel]
+                suspeitos |= (brutos < minimo) | (brutos > maximo)
+        for posicao in np.flatnonzero(suspeitos):
+            checado = validar(variavel, float(brutos[posicao]))
+            valores[posicao] = np.nan if checado.valor is None else checado.valor
+            flags[posicao] = checado.quality_flag
+            observacoes[posicao] = checado.observacao
+        resultado[variavel] = Avaliada(valores, ~np.isnan(brutos), flags, observacoes)
+    return resultado
+
+
+def _rodadas(escala, indice):
+    """`(posicao_inicio, posicao_fim, iniciado_em)` de cada execucao do recife.
+
+    A primeira e a carga do historico; as outras, as diarias do ultimo mes,
+    cada uma na manha seguinte ao dia que fecha. Recifes em sequencia, um
+    minuto apos o outro, como no cron.
+    """
+    from datetime import UTC, datetime, time
+
+    dias = datas(escala)
+    corte = max(escala.dias - DIAS_DIARIOS, 1)
+    atraso = timedelta(minutes=indice)
+    rodadas = [(0, corte - 1, datetime.combine(dias[corte - 1], time(3), UTC) + atraso)]
+    for posicao in range(corte, escala.dias):
+        rodadas.append((
+            max(posicao - JANELA_DIARIA + 1, 0),
+            posicao,
+            datetime.combine(dias[posicao] + timedelta(days=1), time(6), UTC) + atraso,
+        ))
+    return rodadas
+
+
+def _coletas(escala, rodadas):
+    """Para cada dia, o horario da ultima execucao que o gravou - o `auto_now`."""
+    corte = escala.dias - (len(rodadas) - 1)
+    coletas = []
+    for posicao in range(escala.dias):
+        ultima = min(posicao + JANELA_DIARIA - 1, escala.dias - 1)
+        coletas.append(rodadas[0][2] if ultima < corte else rodadas[1 + ultima - corte][2])
+    return coletas
+
+
+def proveniencia(avaliadas):
+    """`(origens, notas)` das series: as chaves de unidade/dataset e de observacao.
+
+    Gravadas antes das medicoes, pelo mesmo caminho da ingestao - as linhas
+    em massa so levam as chaves.
+    """
+    from aquaculture.models import MedicaoAmbiental
+    from ingestao.normalizacao import UNIDADES
+
+    return MedicaoAmbiental.chaves_de_proveniencia(
+        {(UNIDADES[variavel], ORIGENS[variavel][1]) for variavel in avaliadas},
+        {texto for avaliada in avaliadas.values() for texto in avaliada.observacoes if texto},
+    )
+
+
+def linhas(local_id, escala, avaliadas, coletas, chaves):
+    """As tuplas de `MedicaoAmbiental` de um recife, em `COLUNAS_MEDICAO`.
+
+    Reprovada vira linha com valor nulo e o motivo, como na ingestao real;
+    lacuna nao vira linha. `chaves` e o `(origens, notas)` de `proveniencia`.
+
+    ⚠️ `chaves` vem pronto, e nao e lido aqui: isto e um gerador consumido
+    dentro do `COPY`, e no PostgreSQL a conexao nao aceita outra consulta
+    com o `COPY` aberto.
+    """
+    import numpy as np
+
+    from ingestao.normalizacao import UNIDADES
+
+    origens, notas = chaves
+    dias = datas(escala)
+    for variavel, avaliada in avaliadas.items():
+        fonte, dataset_id = ORIGENS[variavel]
+        origem_id = origens[(UNIDADES[variavel], dataset_id)]
+        for posicao in np.flatnonzero(avaliada.presente):
+            valor = avaliada.valores[posicao]
+            yield (
+                local_id, dias[posicao], variavel,
+                None if np.isnan(valor) else float(valor), fonte,
+                avaliada.flags[posicao], origem_id,
+                notas.get(avaliada.observacoes[posicao]), coletas[posicao],
+            )
+
+
+def execucoes(local_id, escala, avaliadas, rodadas, indice):
+    """As tuplas de `ExecucaoIngestao` de um recife, em `COLUNAS_EXECUCAO`.
+
+    Os totais saem das proprias linhas: gravados e rejeitados de cada execucao
+    batem com o que ela teria escrito, e o status segue a regra de
+    `ingestao.registro` - parcial quando houve rejeicao.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng([escala.semente, indice, 1])
+    dias = datas(escala)
+    resultado = []
+    for fonte in dict.fromkeys(ORIGENS[v][0] for v in avaliadas):
+        daqui = [a for v, a in avaliadas.items() if ORIGENS[v][0] == fonte]
+        gravadas = np.cumsum(sum(a.presente.astype(int) for a in daqui))
+        rejeitadas = np.cumsum(sum((a.flags == 'invalido').astype(int) for a in daqui))
+
+        def no_periodo(acumulado, inicio, fim):
+            return int(acumulado[fim] - (acumulado[inicio - 1] if inicio else 0))
+
+        for numero, (inicio, fim, iniciado_em) in enumerate(rodadas):
+            falhou = numero > 0 and rng.random() < FRACAO_FALHA
+            if falhou:
+                gravados = rejeitados = 0
+                status, mensagem = 'falha', FALHAS[fonte]
+                duracao = 120.0
+            else:
+                gravados = no_periodo(gravadas, inicio, fim)
+                rejeitados = no_periodo(rejeitadas, inicio, fim)
+                status, mensagem = ('parcial' if rejeitados else 'sucesso'), ''
+                duracao = 2 + gravados / 2000 + rng.exponential(3)
+            resultado.append((
+                fonte, local_id, dias[inicio], dias[fim], iniciado_em,
+                iniciado_em + timedelta(seconds=duracao), status, gravados,
+                rejeitados, mensagem, f'{int(rng.integers(1 << 48)):012x}',
+            ))
+    return resultado
+
+
+def inserir(modelo, colunas, tuplas, lote=5000):
+    """Grava as tuplas pelo caminho em massa do banco. Devolve quantas.
+
+    No PostgreSQL e `COPY ... FROM STDIN`, que nao monta um INSERT por lote
+    nem passa pelo ORM. Nos outros bancos, `executemany` em lotes, com os
+    valores adaptados pelos proprios campos do modelo.
+    """
+    from itertools import islice
+
+    from django.db import DEFAULT_DB_ALIAS, connections
+    from django.db.models import DateField
+
+    # A conexao de verdade, e nao o proxy `connection`: cada atributo lido
+    # pelo proxy custa uma busca, e aqui sao milhoes.
+    conexao = connections[DEFAULT_DB_ALIAS]
+    nome = conexao.ops.quote_name
+    tabela = nome(modelo._meta.db_table)
+    lista = ', '.join(nome(coluna) for coluna in colunas)
+    total = 0
+    with conexao.cursor() as cursor:
+        if conexao.vendor == 'postgresql':
+            with cursor.cursor.copy(f'COPY {tabela} ({lista}) FROM STDIN') as copia:
+                for tupla in tuplas:
+                    copia.write_row(tupla)
+                    total += 1
+            return total
+
+        # So data e data-hora precisam de adaptacao (fuso, formato do banco),
+        # e os mesmos dias se repetem por variavel: adaptados uma vez cada.
+        campos = {c.column: c for c in modelo._meta.concrete_fields}
+        datas_em = [
+            (posicao, campos[coluna], {}) for posicao, coluna in enumerate(colunas)
+            if isinstance(campos[coluna], DateField)
+        ]
+        sql = f'INSERT INTO {tabela} ({lista}) VALUES ({", ".join(["%s"] * len(colunas))})'
+        tuplas = iter(tuplas)
+        while bloco := list(islice(tuplas, lote)):
+            adaptadas = []
+            for tupla in bloco:
+                tupla = list(tupla)
+                for posicao, campo, ja_vistos in datas_em:
+                    valor = tupla[posicao]
+                    if valor not in ja_vistos:
+                        ja_vistos[valor] = campo.get_db_prep_value(valor, conexao)
+                    tupla[posicao] = ja_vistos[valor]
+                adaptadas.append(tupla)
+            cursor.executemany(sql, adaptadas)
+            total += len(bloco)
+    return total
+
+
+def popular(escala, prefixo='sintetico', lote=5000, com_execucoes=True, ao_progredir=None):
+    """Grava os recifes, as series e as execucoes. Devolve os `LocalRecife` gravados.
+
+    Um recife por transacao: interromper no meio deixa recifes inteiros, e
+    `apagar` limpa o que ficou.
+    """
+    from django.db import transaction
+
+    from aquaculture import cobertura
+    from aquaculture.models import ExecucaoIngestao, LocalRecife, MedicaoAmbiental
+
+    novos = locais(escala, prefixo)
+    LocalRecife.objects.bulk_create(novos, batch_size=lote)
+    # Relidos: nem todo backend devolve a chave primaria no bulk_create.
+    gravados = list(
+        LocalRecife.objects.filter(slug__in=[local.slug for local in novos]).order_by('slug')
+    )
+    for indice, local in enumerate(gravados):
+        avaliadas = avaliar(escala, indice)
+        rodadas = _rodadas(escala, indice)
+        with transaction.atomic():
+            chaves = proveniencia(avaliadas)
+            medicoes = inserir(
+                MedicaoAmbiental, COLUNAS_MEDICAO,
+                linhas(local.pk, escala, avaliadas, _coletas(escala, rodadas), chaves), lote,
+            )
+            if com_execucoes:
+                inserir(
+                    ExecucaoIngestao, COLUNAS_EXECUCAO,
+                    execucoes(local.pk, escala, avaliadas, rodadas, indice), lote,
+                )
+        if ao_progredir:
+            ao_progredir(indice + 1, medicoes)
+    # O COPY passa por fora do `gravar`, que e quem mantem o resumo do
+    # catalogo: refeito aqui, so para os recifes gravados.
+    cobertura.reconstruir(locais=gravados)
+    return gravados
+
+
+def apagar(prefixo='sintetico'):
+    """Apaga os recifes do prefixo e tudo o que e deles. Devolve quantas medicoes.
+
+    Medicoes e execucoes vao antes, num DELETE so cada: sem sinal nem FK
+    apontando para elas, o Django nao precisa carregar linha por linha. Apagar
+    direto os recifes faria a cascata juntar milhoes de ids em memoria.
+    """
+    from aquaculture.models import ExecucaoIngestao, LocalRecife, MedicaoAmbiental
+
+    recifes = LocalRecife.objects.filter(slug__startswith=f'{prefixo}-')
+    medicoes, _ = MedicaoAmbiental.objects.filter(local_recife__in=recifes).delete()
+    ExecucaoIngestao.objects.filter(local_recife__in=recifes).delete()
+    recifes.delete()
+    return medicoes
+
+
+def quadro_erddap(escala, indice=0, pixels=121):
+    """O DataFrame que `erddapy.to_pandas()` devolve para um recife.
+
+    Uma linha por (dia, pixel), nomes de coluna com a unidade entre parenteses
+    e o tempo como texto ISO - exatamente o que `ConectorNoaaCrw._extrair`
+    recebe. 121 pixels e a bbox 11x11 de um recife em 5 km.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from ingestao.conectores.noaa_crw import VARIAVEIS_ERDDAP
+
+    rng = np.random.default_rng([escala.semente, indice, pixels])
+    diarias = series(
+        Escala(1, escala.anos, VARIAVEIS_CRW, escala.fim, escala.semente), indice
+    )
+    lado = int(np.ceil(np.sqrt(pixels)))
+    dias = datas(escala)
+    n = len(dias) * pixels
+
+    def por_pixel(valores, desvio):
+        return np.repeat(valores, pixels) + rng.normal(0, desvio, n)
+
+    sst = por_pixel(diarias['sst'], 0.15)
+    hotspot = np.clip(por_pixel(diarias['hotspot'], 0.15), 0, None)
+    baa = np.clip(
+        np.repeat(diarias['baa'], pixels) + rng.choice([-1, 0, 0, 0, 1], n), 0, 4
+    )
+    colunas = {
+        'CRW_SST': ('degree_C', sst),
+        'CRW_DHW': ('degree_C_weeks', np.clip(por_pixel(diarias['dhw'], 0.1), 0, None)),
+        'CRW_BAA': ('1', baa),
+        'CRW_HOTSPOT': ('degree_C', hotspot),
+        'CRW_SSTANOMALY': ('degree_C', por_pixel(diarias['sst_anomalia'], 0.15)),
+    }
+    quadro = pd.DataFrame({
+        'time (UTC)': np.repeat([f'{d.isoformat()}T12:00:00Z' for d in dias], pixels),
+        'latitude (degrees_north)': np.tile(-17.9 + 0.05 * (np.arange(pixels) // lado), len(dias)),
+        'longitude (degrees_east)': np.tile(-38.6 + 0.05 * (np.arange(pixels) % lado), len(dias)),
+        **{f'{nome} ({unidade})': valores
+           for nome, (unidade, valores) in colunas.items() if nome in VARIAVEIS_ERDDAP},
+    })
+    return quadro
+
+
+# ---------------------------------------------------------------------------
+# GCBD
+# ---------------------------------------------------------------------------
+
+# (pais, peso, latitude, longitude). O Brasil e uma fracao pequena, como no
+# arquivo real: a maior parte do custo de `carregar` e filtrar o resto fora.
+PAISES_GCBD = (
+    ('Brazil', 0.2, (-24, -1), (-48, -32)),
+    ('Australia', 0.3, (-28, -10), (142, 154)),
+    ('Indonesia', 0.2, (-10, 5), (95, 140)),
+    ('Mexico', 0.15, (15, 25), (-98, -86)),
+    ('Kenya', 0.15, (-5, -1), (39, 42)),
+)
+SUBSTRATOS_GCBD = ('Hard Coral', 'Nutrient Indicator Algae', 'Fleshy Seaweed')
+# Fracao de celulas com `nd` no lugar do numero, nas colunas que o tem.
+FRACAO_ND = 0.02
+
+
+def gcbd_csv(caminho, visitas=20000, semente=42):
+    """Escreve um CSV no formato do GCBD. Devolve quantas linhas.
+
+    Reproduz o que `ml.gcbd` trata: uma linha por substrato da visita, com
+    termicas e alvo repetidos; `ClimSST` com a sentinela 262,15 em ~35% das
+    linhas; `SSTA_Mean` constante em zero; `nd` no meio de colunas numericas.
+    O branqueamento sai de uma logistica sobre TSA_DHW e TSA, para que os
+    modelos tenham o que aprender.
+    """
+    from pathlib import Path
+
+    import numpy as np
+    import pandas as pd
+
+    from ml import gcbd
+
+    rng = np.random.default_rng(semente)
+    n_sitios = max(visitas // 3, 1)
+    paises = rng.choice(len(PAISES_GCBD), n_sitios, p=[p[1] for p in PAISES_GCBD])
+    latitude = np.array([rng.uniform(*PAISES_GCBD[p][2]) for p in paises])
+    longitude = np.array([rng.uniform(*PAISES_GCBD[p][3]) for p in paises])
+    # O que e do sitio: climatologia e contexto, constantes entre visitas.
+    do_sitio = {
+        coluna: (299 + rng.normal(0, 1.5, n_sitios) if coluna.startswith('Temperature')
+                 else rng.gamma(2.0, 0.5, n_sitios))
+        for coluna in (*gcbd.CLIMATOLOGIA_DO_SITIO, *gcbd.CONTEXTO_DO_SITIO)
+    }
+
+    sitio = rng.integers(n_sitios, size=visitas)
+    data = pd.Timestamp('1998-01-01') + pd.to_timedelta(rng.integers(0, 23 * 365, visitas), 'D')
+    tsa_dhw = rng.gamma(0.8, 2.5, visitas)
+    tsa = rng.normal(0, 1.2, visitas)
+    chance = 1 / (1 + np.exp(-(-2.5 + 0.6 * tsa_dhw + 0.5 * tsa)))
+    branqueou = rng.random(visitas) < chance
+    quadro = pd.DataFrame({
+        'Site_ID': sitio + 1,
+        'Country_Name': [PAISES_GCBD[p][0] for p in paises[sitio]],
+        'Site_Name': [f'Sitio sintetico {s + 1}' for s in sitio],
+        'Ecoregion_Name': [f'Ecorregiao {p}' for p in paises[sitio]],
+        'Exposure': rng.choice(['Exposed', 'Sheltered', 'Sometimes'], n_sitios)[sitio],
+        'Date': data.strftime('%Y-%m-%d'),
+        'Date_Year': data.year,
+        'Latitude_Degrees': latitude[sitio].round(4),
+        'Longitude_Degrees': longitude[sitio].round(4),
+        gcbd.COLUNA_ALVO: np.where(branqueou, rng.uniform(1, 80, visitas), 0.0).round(2),
+        'Temperature_Kelvin': (300 + tsa).round(2),
+        'SSTA': (0.8 * tsa + rng.normal(0, 0.3, visitas)).round(2),
+        'SSTA_Frequency': rng.poisson(2, visitas),
+        'SSTA_DHW': (0.9 * tsa_dhw).round(2),
+        'TSA': tsa.round(2),
+        'TSA_Frequency': rng.poisson(1, visitas),
+        'TSA_DHW': tsa_dhw.round(2),
+        'Windspeed': rng.gamma(4, 1.5, visitas).round(1),
+        **{coluna: valores[sitio].round(3) for coluna, valores in do_sitio.items()},
+        'ClimSST': np.where(
+            rng.random(visitas) < 0.35, gcbd.SENTINELAS['ClimSST'],
+            (299 + rng.normal(0, 1, visitas)).round(2),
+        ),
+        'SSTA_Mean': 0.0,
+    })
+    for coluna in ('Windspeed', 'Turbidity', gcbd.COLUNA_ALVO):
+        quadro[coluna] = quadro[coluna].astype(object)
+        quadro.loc[rng.random(visitas) < FRACAO_ND, coluna] = 'nd'
+
+    # Uma linha por substrato amostrado, tudo o mais repetido.
+    por_visita = rng.integers(1, len(SUBSTRATOS_GCBD) + 1, visitas)
+    quadro = quadro.loc[quadro.index.repeat(por_visita)].reset_index(drop=True)
+    quadro.insert(5, 'Substrate_Name', [
+        SUBSTRATOS_GCBD[i] for n in por_visita for i in range(n)
+    ])
+
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    quadro.to_csv(caminho, index=False)
+    return len(quadro)
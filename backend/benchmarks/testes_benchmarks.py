@@ -0,0 +1,261 @@
+"""Testes do gerador sintetico e da comparacao entre rodadas.
+
+O que protegem:
+
+1. 🚨 **Os dados sinteticos seguem as regras do produto real.** BAA derivado
+   do DHW pela tabela da NOAA, lacuna do CRW no dia inteiro, episodios nos
+   mesmos anos em todos os recifes. Um gerador que sorteasse cada variavel a
+   parte mediria caminhos que os dados reais nunca exercitam.
+2. **O quadro do ERDDAP passa pelo conector de verdade** e volta um valor por
+   dia - e isso que faz `conector.extrair` medir o caminho real.
+3. **Regressao so com tolerancia e piso vencidos**, e rodadas de escala
+   diferente sao recusadas em vez de comparadas.
+4. **Todo caso roda** sobre uma escala minima: caso quebrado so seria
+   descoberto na hora de medir a otimizacao que ele deveria validar.
+5. **O `gerar_sintetico` grava o que a ingestao gravaria**: flags pela
+   validacao real, execucoes cujos totais batem com as linhas, e um CSV que o
+   `ml.gcbd` le como se fosse o arquivo de verdade.
+"""
+
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from benchmarks import casos, execucao, sintetico
+
+
+class SinteticoTests(SimpleTestCase):
+    def setUp(self):
+        self.escala = sintetico.Escala(recifes=3, anos=6)
+
+    def test_mesma_semente_mesmos_dados(self):
+        import numpy as np
+
+        a = sintetico.series(self.escala, 1)
+        b = sintetico.series(self.escala, 1)
+        outro = sintetico.series(self.escala, 2)
+
+        np.testing.assert_array_equal(a['sst'], b['sst'])
+        self.assertFalse(np.allclose(a['sst'], outro['sst'], equal_nan=True))
+
+    def test_baa_segue_a_tabela_da_noaa(self):
+        import numpy as np
+
+        serie = sintetico.series(self.escala, 0)
+        baa, dhw, hotspot = serie['baa'], serie['dhw'], serie['hotspot']
+        valido = ~np.isnan(baa)
+
+        self.assertTrue((dhw[valido & (baa >= 3)] >= 4).all())
+        self.assertTrue((hotspot[valido & (baa >= 2)] >= 1).all())
+        self.assertTrue((baa[valido & (hotspot <= 0)] == 0).all())
+        self.assertGreater((baa >= 3).sum(), 0, 'sem episodio o modelo nao treina')
+
+    def test_lacuna_do_crw_e_do_dia_inteiro(self):
+        import numpy as np
+
+        serie = sintetico.series(self.escala, 0)
+        sem_sst = np.isnan(serie['sst'])
+
+        self.assertGreater(sem_sst.sum(), 0)
+        np.testing.assert_array_equal(sem_sst, np.isnan(serie['dhw']))
+        self.assertFalse(np.isnan(serie['salinidade']).any())
+
+    def test_episodios_nos_mesmos_anos_em_todos_os_recifes(self):
+        anos = [
+            {d.year for d, baa in zip(sintetico.datas(self.escala),
+                                      sintetico.series(self.escala, i)['baa'], strict=True)
+             if baa >= 3}
+            for i in range(3)
+        ]
+
+        self.assertTrue(anos[0])
+        self.assertTrue(anos[0] & anos[1] & anos[2])
+
+    def test_variavel_desconhecida_e_recusada(self):
+        with self.assertRaisesMessage(ValueError, 'ph'):
+            sintetico.Escala(variaveis=('sst', 'ph'))
+
+    def test_quadro_erddap_passa_pelo_conector(self):
+        from ingestao.conectores.noaa_crw import COLUNA_FRACAO_ALERTA, ConectorNoaaCrw
+
+        escala = sintetico.Escala(anos=1)
+        quadro = sintetico.quadro_erddap(escala, pixels=9)
+        resultado = ConectorNoaaCrw(servidor='-', dataset_id='x')._extrair(quadro)
+
+        self.assertFalse(resultado.houve_falha)
+        self.assertEqual(len(quadro), escala.dias * 9)
+        self.assertEqual(len({o.data for o in resultado.observacoes}), escala.dias)
+        self.assertIn(COLUNA_FRACAO_ALERTA, {o.coluna for o in resultado.observacoes})
+
+
+def rodada(escala=None, banco='sqlite', **medianas):
+    return execucao.Rodada(
+        escala=escala or {'recifes': 3},
+        banco=banco,
+        medidas=[
+            execucao.Medida(nome, 'g', 5, ms, ms, ms) for nome, ms in medianas.items()
+        ],
+    )
+
+
+class ComparacaoTests(SimpleTestCase):
+    def situacoes(self, base, atual, **argumentos):
+        return {
+            d.nome: d.situacao for d in execucao.comparar(base, atual, **argumentos)
+        }
+
+    def test_regressao_so_alem_da_tolerancia(self):
+        situacoes = self.situacoes(
+            rodada(a=100, b=100, c=100), rodada(a=115, b=130, c=60), tolerancia=0.2
+        )
+
+        self.assertEqual(situacoes, {'a': 'estavel', 'b': 'regrediu', 'c': 'melhorou'})
+
+    def test_caso_rapido_tem_piso_absoluto(self):
+        """2 ms -> 2,8 ms e 40% - e ruido de agendador, nao regressao."""
+        situacoes = self.situacoes(rodada(a=2.0), rodada(a=2.8), piso_ms=1.0)
+
+        self.assertEqual(situacoes, {'a': 'estavel'})
+
+    def test_caso_novo_e_caso_que_sumiu(self):
+        situacoes = self.situacoes(rodada(a=10, b=10), rodada(a=10, c=10))
+
+        self.assertEqual(situacoes, {'a': 'estavel', 'c': 'novo', 'b': 'sumiu'})
+
+    def test_rodada_parcial_nao_acusa_sumico_do_resto(self):
+        situacoes = self.situacoes(rodada(a=10, b=10), rodada(a=10), nomes=['a'])
+
+        self.assertEqual(situacoes, {'a': 'estavel'})
+
+    def test_escala_ou_banco_diferentes_sao_recusados(self):
+        with self.assertRaises(execucao.RodadasIncomparaveis):
+            execucao.comparar(rodada({'recifes': 3}, a=1), rodada({'recifes': 30}, a=1))
+        with self.assertRaises(execucao.RodadasIncomparaveis):
+            execucao.comparar(rodada(banco='sqlite', a=1), rodada(banco='postgresql', a=1))
+
+    def test_json_volta_igual(self):
+        original = rodada(a=12.5)
+        original.pulados = {'b': 'exige sst'}
+
+        with tempfile.TemporaryDirectory() as pasta:
+            lida = execucao.ler(original.salvar(Path(pasta) / 'r.json'))
+
+        self.assertEqual(lida, original)
+
+
+class CasosTests(TestCase):
+    """Cada caso, uma vez, sobre a menor escala em que o modelo ainda treina."""
+
+    def test_todos_os_casos_rodam(self):
+        cenario = casos.Cenario(sintetico.Escala(recifes=2, anos=3))
+        self.addCleanup(cenario.fechar)
+
+        resultado = execucao.executar(casos.selecionar(), cenario, repeticoes=1)
+
+        self.assertEqual(
+            [m.nome for m in resultado.medidas], list(casos.CASOS)
+        )
+        self.assertEqual(resultado.pulados, {})
+
+    def test_caso_sem_as_variaveis_do_modelo_e_pulado(self):
+        cenario = casos.Cenario(sintetico.Escala(recifes=1, anos=1, variaveis=('sst',)))
+        self.addCleanup(cenario.fechar)
+
+        resultado = execucao.executar(
+            casos.selecionar(['predicao.calcular', 'dataset.carregar_largo', 'api.medicoes']),
+            cenario, repeticoes=1,
+        )
+
+        self.assertEqual(
+            [m.nome for m in resultado.medidas],
+            ['dataset.carregar_largo', 'api.medicoes_json', 'api.medicoes_csv'],
+        )
+        self.assertIn('exige', resultado.pulados['predicao.calcular'])
+
+
+class GeracaoTests(TestCase):
+    def test_flags_saem_da_validacao(self):
+        import numpy as np
+
+        avaliadas = sintetico.avaliar(sintetico.Escala(recifes=1, anos=6), 0)
+        sst, salinidade = avaliadas['sst'], avaliadas['salinidade']
+        invalidas = sst.flags == 'invalido'
+
+        self.assertGreater(invalidas.sum(), 0)
+        self.assertTrue(np.isnan(sst.valores[invalidas]).all())
+        self.assertTrue(sst.presente[invalidas].all(), 'reprovada ainda vira linha')
+        self.assertIn('degradado', set(salinidade.flags))
+        self.assertEqual(set(avaliadas['dhw'].flags), {'ok'})
+
+    def test_execucoes_batem_com_as_medicoes(self):
+        from aquaculture.models import ExecucaoIngestao, MedicaoAmbiental
+
+        escala = sintetico.Escala(recifes=2, anos=1)
+        local = sintetico.popular(escala)[0]
+
+        carga = ExecucaoIngestao.objects.filter(
+            local_recife=local, fonte='noaa_crw'
+        ).order_by('iniciado_em').first()
+        medicoes = MedicaoAmbiental.objects.filter(
+            local_recife=local, fonte='noaa_crw', data__lte=carga.fim_periodo
+        )
+        self.assertEqual(carga.inicio_periodo, escala.inicio)
+        self.assertEqual(carga.registros_gravados, medicoes.count())
+        self.assertEqual(
+            carga.registros_rejeitados, medicoes.filter(quality_flag='invalido').count()
+        )
+        self.assertEqual(
+            ExecucaoIngestao.objects.filter(local_recife=local).count(),
+            2 * (1 + sintetico.DIAS_DIARIOS),
+        )
+        self.assertFalse(
+            ExecucaoIngestao.objects.filter(status='parcial', registros_rejeitados=0).exists()
+        )
+        ultima = MedicaoAmbiental.objects.filter(local_recife=local, data=escala.fim).first()
+        self.assertEqual(ultima.data_coleta.date(), escala.fim + sintetico.timedelta(days=1))
+
+    def test_apagar_so_leva_o_prefixo(self):
+        from aquaculture.models import ExecucaoIngestao, LocalRecife, MedicaoAmbiental
+
+        escala = sintetico.Escala(recifes=1, anos=1, variaveis=('sst',))
+        sintetico.popular(escala, prefixo='fica')
+        sintetico.popular(escala, prefixo='sai')
+
+        apagadas = sintetico.apagar('sai')
+
+        self.assertGreater(apagadas, 0)
+        self.assertFalse(LocalRecife.objects.filter(slug__startswith='sai-').exists())
+        self.assertFalse(MedicaoAmbiental.objects.filter(local_recife__slug__startswith='sai-').exists())
+        self.assertFalse(ExecucaoIngestao.objects.filter(local_recife__slug__startswith='sai-').exists())
+        self.assertTrue(MedicaoAmbiental.objects.filter(local_recife__slug='fica-0000').exists())
+
+    def test_gcbd_sintetico_e_lido_pelo_modulo_real(self):
+        from ml import gcbd
+
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = Path(pasta) / 'gcbd.csv'
+            linhas = sintetico.gcbd_csv(caminho, visitas=600)
+            with mock.patch.object(gcbd, 'PASTA_DAS_COPIAS', Path(pasta) / 'copias'):
+                conjunto = gcbd.montar(caminho)
+
+        self.assertGreater(linhas, 600, 'uma linha por substrato')
+        self.assertLess(conjunto.visitas, 600, 'so o Brasil, e so com alvo')
+        self.assertIn('ClimSST', conjunto.sentinelas_trocadas)
+        self.assertGreater(conjunto.positivos, 0)
+        self.assertLess(conjunto.positivos, conjunto.n)
+
+    def test_comando_recusa_fora_do_debug_e_prefixo_repetido(self):
+        opcoes = {'recifes': 1, 'anos': 1, 'variaveis': 'sst', 'stdout': StringIO()}
+
+        with override_settings(DEBUG=False), self.assertRaisesMessage(CommandError, 'DEBUG'):
+            call_command('gerar_sintetico', **opcoes)
+
+        with override_settings(DEBUG=True):
+            call_command('gerar_sintetico', **opcoes)
+            with self.assertRaisesMessage(CommandError, '--limpar'):
+                call_command('gerar_sintetico', **opcoes)
+            call_command('gerar_sintetico', limpar=True, **opcoes)
@@ -0,0 +1,152 @@
+"""Aquece o worker antes da primeira requisicao. Opcional: `AQUECER_NA_PARTIDA`.
+
+`predicao.carregar_modelo` e preguicoso de proposito - `manage.py` e a suite
+nao devem pagar por um modelo que nao vao usar. O preco disso cai na primeira
+visita a `/api/painel-risco/` de cada worker: importar numpy e pandas, ler o
+artefato, validar a escala. Quem chega primeiro depois de um deploy espera
+pelo servidor inteiro.
+
+Aqui esse trabalho sai da requisicao e vai para a partida. `wsgi.py` e
+`asgi.py` chamam `aquecer()` logo depois de montar a aplicacao, quando a
+configuracao pede.
+
+⚠️ **Por que em `wsgi.py`/`asgi.py`, e nao em `AppConfig.ready`.** `ready`
+roda em todo `manage.py` - migracao, ingestao, cada teste. Carregar modelo ali
+cobraria de todos o que so o servidor precisa. O modulo WSGI so e importado por
+quem vai servir.
+
+**Com `gunicorn --preload`** o modulo WSGI e importado uma vez, no processo
+mestre, antes do `fork`: bibliotecas e modelo ficam em paginas que os workers
+herdam por copy-on-write, em vez de cada um carregar a sua copia. Sem
+`--preload`, cada worker aquece a si mesmo ao subir - ainda antes de aceitar
+conexao.
+
+🚨 **Aquecer nunca derruba a partida.** Um modelo ausente ja tem resposta
+propria (503 pedindo `treinar_final`); se o aquecimento levantasse, o mesmo
+defeito derrubaria tambem a API de medicoes e o catalogo. A etapa que falha
+fica registrada com o erro, e `/api/pronto/` mostra qual foi.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Etapa:
+    nome: str
+    duracao_ms: float
+    erro: str = ''
+
+    @property
+    def ok(self):
+        return not self.erro
+
+
+@dataclass
+class Estado:
+    """O que o aquecimento fez neste processo."""
+
+    iniciado: bool = False
+    concluido: bool = False
+    duracao_ms: float = 0.0
+    etapas: list = field(default_factory=list)
+
+    def como_payload(self):
+        return {
+            'aquecido': self.concluido,
+            'duracao_ms': self.duracao_ms,
+            'etapas': [
+                {'nome': e.nome, 'ok': e.ok, 'duracao_ms': e.duracao_ms,
+                 **({'erro': e.erro} if e.erro else {})}
+                for e in self.etapas
+            ],
+        }
+
+
+_TRAVA = threading.Lock()
+_ESTADO = Estado()
+
+
+def _bibliotecas():
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+
+
+def _configuracao():
+    """Le a escala e o limiar do painel: erro de configuracao aparece agora."""
+    from django.conf import settings
+    from ml import niveis
+
+    niveis.de_configuracao(getattr(settings, 'PAINEL_NIVEIS', None))
+    float(settings.PAINEL_LIMIAR)
+
+
+def _modelo():
+    """O mesmo `carregar_modelo` do painel: o cache dele e que fica quente."""
+    from django.conf import settings
+    from ml import predicao
+
+    predicao.carregar_modelo(getattr(settings, 'PAINEL_MODELO', 'entrega1_baa'))
+
+
+ETAPAS = (
+    ('bibliotecas', _bibliotecas),
+    ('configuracao', _configuracao),
+    ('modelo', _modelo),
+)
+
+
+def aquecer(etapas=ETAPAS):
+    """Roda as etapas uma vez por processo. Devolve o `Estado`."""
+    with _TRAVA:
+        if _ESTADO.iniciado:
+            return _ESTADO
+        _ESTADO.iniciado = True
+
+        comeco = time.perf_counter()
+        for nome, funcao in etapas:
+            antes = time.perf_counter()
+            erro = ''
+            try:
+                funcao()
+            except Exception as excecao:  # noqa: BLE001 - ver o cabecalho
+                erro = f'{type(excecao).__name__}: {excecao}'
+                logger.warning('Aquecimento: etapa "%s" falhou | %s', nome, erro)
+            _ESTADO.etapas.append(
+                Etapa(nome, round((time.perf_counter() - antes) * 1000, 1), erro)
+            )
+
+        _ESTADO.duracao_ms = round((time.perf_counter() - comeco) * 1000, 1)
+        _ESTADO.concluido = True
+
+    logger.info(
+        'Aquecimento concluido',
+        extra={
+            'duracao_ms': _ESTADO.duracao_ms,
+            **{f'{e.nome}_ms': e.duracao_ms for e in _ESTADO.etapas},
+        },
+    )
+    return _ESTADO
+
+
+def estado():
+    return _ESTADO
+
+
+def esquecer():
+    """Volta ao estado de processo novo. Existe para teste."""
+    global _ESTADO
+    with _TRAVA:
+        _ESTADO = Estado()
+
+
+def na_partida():
+    """Gancho de `wsgi.py` e `asgi.py`: aquece so se a configuracao pedir."""
+    from django.conf import settings
+
+    if getattr(settings, 'AQUECER_NA_PARTIDA', False):
+        aquecer()
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coral_site.settings')
 
 application = get_asgi_application()
+
+# Depois da aplicacao montada, e so se AQUECER_NA_PARTIDA pedir. Com
+# `gunicorn --preload`, roda uma vez no mestre e os workers herdam.
+from coral_site.aquecimento import na_partida  # noqa: E402
+
+na_partida()
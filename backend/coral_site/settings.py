@@ -287,6 +287,35 @@ LOG_NIVEL_CONSOLE = env(
 # tinha feito a ingestao.
 LOG_EM_ARQUIVO = env.bool('LOG_EM_ARQUIVO', default=not _RODANDO_TESTE)
 
+# Os arquivos escritos por uma thread propria, em lote: quem loga so enfileira.
+# `LOG_EM_FILA=False` volta a escrita para a thread de quem loga - util para
+# depurar o proprio log. Fila cheia descarta DEBUG/INFO e conta em /metricas/.
+LOG_EM_FILA = env.bool('LOG_EM_FILA', default=True)
+
+# Amostragem (`observabilidade/amostragem.py`): por logger, passa uma em
+# `um_em` das linhas INFO rapidas e com 2xx; WARNING+, as acima de `lento_ms` e
+# as de outro status passam sempre. `rotas` troca o `um_em` por prefixo do
+# caminho. A cada LOG_AMOSTRAGEM_RESUMO_S sai um resumo com contagem e
+# percentis do que ficou de fora. LOG_AMOSTRAGEM_HTTP=1 desliga para a API.
+# Para a ingestao, o mesmo formato: 'ingestao.registro': {'um_em': 10} deixa
+# um `Bloco gravado` em dez e todo `Bloco falhou` (WARNING).
+LOG_AMOSTRAGEM = {
+    'observabilidade.middleware': {
+        'um_em': env.int('LOG_AMOSTRAGEM_HTTP', default=10),
+        'lento_ms': env.int('LOG_AMOSTRAGEM_LENTO_MS', default=300),
+        # O painel pergunta se o worker aqueceu a cada poucos segundos.
+        'rotas': {'/api/pronto/': 100},
+    },
+}
+LOG_AMOSTRAGEM_RESUMO_S = env.int('LOG_AMOSTRAGEM_RESUMO_S', default=60)
+
+# Rastros (`observabilidade/rastro.py`): a raiz que passou de RASTRO_MINIMO_MS
+# vira um arquivo em `logs/rastros/` no formato de eventos do Chrome, para abrir
+# em https://ui.perfetto.dev. A divisao por etapa sai no log de qualquer jeito.
+RASTRO_CHROME = env.bool('RASTRO_CHROME', default=LOG_EM_ARQUIVO)
+RASTRO_MINIMO_MS = env.int('RASTRO_MINIMO_MS', default=1000)
+RASTRO_PASTA = LOG_PASTA / 'rastros'
+
 # Nivel por dominio: LOG_NIVEL_INGESTAO=DEBUG deixa so a ingestao falante.
 _NIVEIS_POR_DOMINIO = {
     dominio: env(f'LOG_NIVEL_{dominio.upper()}', default=LOG_NIVEL).upper()
@@ -302,7 +331,38 @@ LOGGING = observabilidade_config.montar(
     rotacao_mb=env.int('LOG_ROTACAO_MB', default=observabilidade_config.ROTACAO_MB_PADRAO),
     backups=env.int('LOG_BACKUPS', default=observabilidade_config.BACKUPS_PADRAO),
     niveis_por_dominio=_NIVEIS_POR_DOMINIO,
+    em_fila=LOG_EM_FILA,
+    fila_tamanho=env.int('LOG_FILA_TAMANHO', default=0) or None,
+    amostragem=LOG_AMOSTRAGEM,
+    resumo_s=LOG_AMOSTRAGEM_RESUMO_S,
+)
+
+# Orcamento por rota: `ms`, `consultas` e `repeticoes` (o mesmo SQL N vezes, o
+# N+1). Vale o prefixo mais longo, sobre `ORCAMENTO_PADRAO` de
+# `observabilidade/middleware.py`; `None` desliga um limite. A requisicao que
+# estoura sai em WARNING com `orcamento_estourado`.
+ORCAMENTOS_REQUISICAO = {
+    # Uma leitura de medicoes por recife, de proposito: a predicao e por recife.
+    # O que vigia o painel e o tempo, nao a repeticao.
+    '/api/painel-risco/': {'ms': 2000, 'consultas': None, 'repeticoes': None},
+    # Cypher nao passa pelo ORM; aqui o tempo e o do Neo4j.
+    '/api/grafo/': {'ms': 2000},
+    '/admin/': {'consultas': None, 'repeticoes': None},
+}
+
+# Consultas lentas (`db/lentas.py`): a consulta do ORM acima de
+# CONSULTAS_LENTAS_MS vira uma linha em `ConsultaLenta`, com impressao, origem,
+# correlacao e o plano estimado, tirados fora da requisicao. Guarda as ultimas
+# CONSULTAS_LENTAS_MAXIMO; `conferir_persistencia` imprime as piores. 0 desliga
+# - e o padrao na suite, onde o tempo de cada consulta nao quer dizer nada.
+CONSULTAS_LENTAS_MS = env.int(
+    'CONSULTAS_LENTAS_MS', default=0 if _RODANDO_TESTE else 200,
 )
+CONSULTAS_LENTAS_MAXIMO = env.int('CONSULTAS_LENTAS_MAXIMO', default=2000)
+
+# `/metricas/` (formato texto do Prometheus). Sem token, so responde para a
+# propria maquina; atras de proxy todo pedido vem do proxy, entao defina um.
+METRICAS_TOKEN = env('METRICAS_TOKEN', default='')
 
 # --- Fontes externas de dados (pipeline de ingestao) ------------------------
 # Servidor e dataset andam em par: cada espelho ERDDAP publica o produto do
@@ -348,6 +408,29 @@ NEO4J_URI = env('NEO4J_URI', default='bolt://localhost:7687')
 NEO4J_USER = env('NEO4J_USER', default='neo4j')
 NEO4J_PASSWORD = env('NEO4J_PASSWORD', default='')
 
+# Pool do driver Neo4j (`aquaculture/neo4j_service.get_neo4j_driver`). O pool e
+# do processo: com N workers do gunicorn sao N pools, e o teto do servidor
+# precisa caber N x NEO4J_POOL_MAXIMO. Uma requisicao usa uma conexao por vez,
+# entao o maximo so passa de 1 com workers em thread.
+NEO4J_POOL_MAXIMO = env.int('NEO4J_POOL_MAXIMO', default=10)
+# Quanto uma requisicao espera por conexao livre, ou para abrir uma. O padrao
+# do driver e 60 s: com o Neo4j fora, cada pagina do grafo prendia o worker um
+# minuto antes do 503. Cinco segundos ja e muito para uma pagina.
+NEO4J_POOL_ESPERA_SEGUNDOS = env.float('NEO4J_POOL_ESPERA_SEGUNDOS', default=5.0)
+# Conexao mais velha que isto e fechada ao voltar ao pool. Abaixo do tempo em
+# que proxy e firewall derrubam conexao parada, que o driver so descobriria ao
+# usar.
+NEO4J_CONEXAO_VIDA_SEGUNDOS = env.int('NEO4J_CONEXAO_VIDA_SEGUNDOS', default=1800)
+# Conexao parada ha mais que isto e testada antes de ser entregue. Custa uma
+# ida ao servidor so depois de ociosidade, e evita que a primeira pagina apos
+# uma madrugada quieta caia numa conexao morta.
+NEO4J_TESTE_OCIOSA_SEGUNDOS = env.int('NEO4J_TESTE_OCIOSA_SEGUNDOS', default=60)
+
+# Por quanto tempo o detalhe e a lista do grafo ficam no cache. A chave leva o
+# id da ultima projecao (`db/projecao.py`): reprojetar ja invalida tudo, e o
+# prazo so limita o que escapou da projecao. 0 desliga o cache.
+NEO4J_CACHE_SEGUNDOS = env.int('NEO4J_CACHE_SEGUNDOS', default=3600)
+
 # ---------------------------------------------------------------------------
 # Django REST Framework
 # ---------------------------------------------------------------------------
@@ -395,6 +478,11 @@ REST_FRAMEWORK = {
 # "manage.py treinar_final" em vez de servir predicao de origem desconhecida.
 PAINEL_MODELO = env('PAINEL_MODELO', default='entrega1_baa')
 
+# Carrega o modelo acima, as bibliotecas e a escala na partida do servidor, e
+# nao na primeira visita ao painel. Desligado por padrao: so `wsgi.py` e
+# `asgi.py` olham isto. Ver coral_site/aquecimento.py e /api/pronto/.
+AQUECER_NA_PARTIDA = env.bool('AQUECER_NA_PARTIDA', default=False)
+
 # 🚨 **O limiar de alerta e decisao de produto, e por isso mora aqui e vai no
 # payload — nao esta escondido no codigo do modelo.**
 #
@@ -420,6 +508,9 @@ PAINEL_MODELO = env('PAINEL_MODELO', default='entrega1_baa')
 #
 # ⚠️ **Nenhum corte pega todos os episodios.** Um evento de Picaozinho
 # (21–23/04/2026) escapa em todos os varridos. O teto ai e do modelo.
+#
+# O painel e o aquecimento leem `settings.PAINEL_LIMIAR` sem valor reserva:
+# o aquecimento valida o mesmo limiar que o painel usa, com o padrao daqui.
 PAINEL_LIMIAR = env.float('PAINEL_LIMIAR', default=0.20)
 
 # ---------------------------------------------------------------------------
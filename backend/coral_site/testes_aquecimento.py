@@ -0,0 +1,98 @@
+"""Testes do aquecimento na partida e de `/api/pronto/`.
+
+O que protegem: que o aquecimento **rode uma vez por processo**, que uma etapa
+que falha **nao derrube a partida** e fique visivel, e que `/api/pronto/` so
+responda 200 quando o worker esta de fato pronto.
+"""
+
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from coral_site import aquecimento
+
+
+class AquecimentoTests(SimpleTestCase):
+    def setUp(self):
+        aquecimento.esquecer()
+        self.addCleanup(aquecimento.esquecer)
+
+    def test_roda_cada_etapa_uma_vez_por_processo(self):
+        chamadas = []
+        etapas = (('a', lambda: chamadas.append('a')), ('b', lambda: chamadas.append('b')))
+
+        aquecimento.aquecer(etapas)
+        aquecimento.aquecer(etapas)
+
+        self.assertEqual(chamadas, ['a', 'b'])
+        self.assertTrue(aquecimento.estado().concluido)
+
+    def test_etapa_que_falha_fica_registrada_e_nao_levanta(self):
+        """🚨 Modelo ausente nao pode derrubar a API inteira na partida."""
+        def sem_modelo():
+            raise FileNotFoundError('entrega1_baa.json nao existe')
+
+        with self.assertLogs('coral_site.aquecimento', 'WARNING'):
+            estado = aquecimento.aquecer((('modelo', sem_modelo), ('depois', lambda: None)))
+
+        self.assertTrue(estado.concluido)
+        modelo, depois = estado.etapas
+        self.assertFalse(modelo.ok)
+        self.assertIn('FileNotFoundError', modelo.erro)
+        self.assertTrue(depois.ok)
+
+    def test_as_etapas_padrao_carregam_o_modelo_do_painel(self):
+        with mock.patch('ml.predicao.carregar_modelo') as carregar, \
+                override_settings(PAINEL_MODELO='outro'):
+            estado = aquecimento.aquecer()
+
+        carregar.assert_called_once_with('outro')
+        self.assertEqual(
+            [e.nome for e in estado.etapas], ['bibliotecas', 'configuracao', 'modelo']
+        )
+        self.assertTrue(all(e.ok for e in estado.etapas))
+
+    @override_settings(AQUECER_NA_PARTIDA=False)
+    def test_desligado_a_partida_nao_aquece(self):
+        with mock.patch.object(aquecimento, 'aquecer') as aquecer:
+            aquecimento.na_partida()
+
+        aquecer.assert_not_called()
+
+    @override_settings(AQUECER_NA_PARTIDA=True)
+    def test_ligado_a_partida_aquece(self):
+        with mock.patch.object(aquecimento, 'aquecer') as aquecer:
+            aquecimento.na_partida()
+
+        aquecer.assert_called_once_with()
+
+
+class ProntidaoTests(SimpleTestCase):
+    def setUp(self):
+        aquecimento.esquecer()
+        self.addCleanup(aquecimento.esquecer)
+
+    @override_settings(AQUECER_NA_PARTIDA=False)
+    def test_desligado_esta_pronto_sem_aquecer(self):
+        resposta = self.client.get('/api/pronto/')
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.json()['pronto'])
+        self.assertFalse(resposta.json()['aquecido'])
+
+    @override_settings(AQUECER_NA_PARTIDA=True)
+    def test_ligado_responde_503_ate_aquecer(self):
+        antes = self.client.get('/api/pronto/')
+        aquecimento.aquecer((('bibliotecas', lambda: None),))
+        depois = self.client.get('/api/pronto/')
+
+        self.assertEqual(antes.status_code, 503)
+        self.assertEqual(depois.status_code, 200)
+        self.assertTrue(depois.json()['aquecido'])
+        self.assertEqual(depois.json()['etapas'][0]['nome'], 'bibliotecas')
+
+    @override_settings(AQUECER_NA_PARTIDA=True, OFFLINE_MODE=True)
+    def test_responde_mesmo_em_manutencao(self):
+        aquecimento.aquecer(())
+
+        self.assertEqual(self.client.get('/api/pronto/').status_code, 200)
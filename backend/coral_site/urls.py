@@ -21,12 +21,15 @@ from django.views.generic.base import RedirectView
 from django.conf import settings
 from django.conf.urls.static import static
 
+from observabilidade.metricas import exposicao_view
+
 urlpatterns = [
     # Redireciona a raiz para a API
     path('', RedirectView.as_view(url='/api/especies/', permanent=False)),
     
     path('admin/', admin.site.urls),
     path('api/', include('aquaculture.urls')),
+    path('metricas/', exposicao_view, name='metricas'),
 ]
 
 #CONFIGURAÇÃO NOVA (ISSO FAZ A IMAGEM APARECER)
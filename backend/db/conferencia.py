@@ -19,8 +19,19 @@ que so existe na cabeca de quem a fez nao e verificacao.
 A suite roda contra um banco vazio, entao nao consegue dizer nada sobre
 desempenho com 57 mil linhas. Este modulo roda contra o banco de verdade, e por
 isso nao pode virar teste automatico.
+
+**Planos contra a linha de base.** O limite de `LIMITE_MS` so pega a consulta
+que ja esta lenta. Com 57 mil linhas, um `Seq Scan` no lugar do `Index Scan`
+ainda cabe nos 500 ms - e e a mesma consulta que vai passar deles com o dobro
+de dados. Cada medida grava a forma do plano (`PlanoConsultaQuente`) e e
+comparada com a ultima sem regressao: acesso por indice que virou varredura,
+ou tempo acima de `FATOR_TEMPO` vezes o da base, reprova. No SQLite a forma sai
+do `EXPLAIN QUERY PLAN`, e o tempo, do relogio.
 """
 
+import re
+import subprocess
+import time
 from dataclasses import dataclass
 
 # Limite acima do qual uma consulta quente vira falha, e nao observacao.
@@ -32,6 +43,17 @@ from dataclasses import dataclass
 # grandeza, nao ruido de medicao.
 LIMITE_MS = 500.0
 
+# Regressao de tempo contra a linha de base: mais que o dobro **e** pelo menos
+# `PISO_MS` a mais. Sem o piso, 0,4 ms que viram 0,9 ms reprovariam o deploy.
+FATOR_TEMPO = 2.0
+PISO_MS = 5.0
+
+# Acesso por indice: se a relacao so tinha destes e passa a ter `Seq Scan`,
+# o indice deixou de servir - sumiu, ou o planejador desistiu dele.
+ACESSOS_POR_INDICE = frozenset({
+    'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan', 'Bitmap Index Scan',
+})
+
 # Constraints e indices que precisam existir no PostgreSQL.
 #
 # Declarados por colunas, e nao por nome: o Django gera nomes com hash
@@ -52,6 +74,10 @@ INDICES_ESPERADOS = {
     'aquaculture_execucaoingestao': (
         ('fonte', 'iniciado_em'),
     ),
+    'aquaculture_coberturaresumo': (
+        # O upsert do `cobertura.acumular` e a trava por grupo.
+        ('local_recife_id', 'fonte', 'variavel'),
+    ),
 }
 
 # Rotulo -> propriedades que precisam ter constraint de unicidade no grafo.
@@ -78,11 +104,12 @@ CONSULTAS_QUENTES = {
         ORDER BY m.data DESC
         LIMIT 100
     """,
-    'GET /api/datasets/ (cobertura derivada)': """
-        SELECT m.fonte, m.variavel, l.slug, COUNT(*), MIN(m.data), MAX(m.data)
-        FROM aquaculture_medicaoambiental m
-        JOIN aquaculture_localrecife l ON m.local_recife_id = l.id
-        GROUP BY 1, 2, 3
+    # Ate a 0032 era um GROUP BY sobre as medicoes; agora le o resumo.
+    'GET /api/datasets/ (resumo de cobertura)': """
+        SELECT c.fonte, c.variavel, l.slug, c.n, c.inicio, c.fim
+        FROM aquaculture_coberturaresumo c
+        JOIN aquaculture_localrecife l ON c.local_recife_id = l.id
+        WHERE c.n > 0
     """,
     'GET /api/painel-risco/ (janela de 7 dias)': """
         SELECT m.data, m.variavel, m.valor, m.fonte
@@ -119,17 +146,33 @@ def _indices_da_tabela(cursor, tabela):
     return [linha[0] for linha in cursor.fetchall()]
 
 
+def _indices_da_tabela_sqlite(cursor, tabela):
+    # O `sql` de `sqlite_master` e nulo nos indices que o SQLite cria para
+    # `UNIQUE` - justamente o da idempotencia. As colunas vem do PRAGMA.
+    cursor.execute(f'PRAGMA index_list("{tabela}")')
+    nomes = [linha[1] for linha in cursor.fetchall()]
+    definicoes = []
+    for nome in nomes:
+        cursor.execute(f'PRAGMA index_info("{nome}")')
+        colunas = ', '.join(linha[2] for linha in cursor.fetchall())
+        definicoes.append(f'{nome} ({colunas})')
+    return definicoes
+
+
 def conferir_indices():
     """Todo indice declarado existe no banco?"""
     from django.db import connection
 
-    if connection.vendor != 'postgresql':
-        return [Achado('indices', 'PostgreSQL', False, 'banco nao e PostgreSQL')]
+    ler = {
+        'postgresql': _indices_da_tabela, 'sqlite': _indices_da_tabela_sqlite,
+    }.get(connection.vendor)
+    if ler is None:
+        return [Achado('indices', connection.vendor, False, 'banco sem conferencia de indices')]
 
     achados = []
     with connection.cursor() as cursor:
         for tabela, grupos in INDICES_ESPERADOS.items():
-            definicoes = _indices_da_tabela(cursor, tabela)
+            definicoes = ler(cursor, tabela)
             for colunas in grupos:
                 achou = any(
                     all(c in definicao for c in colunas)
@@ -144,37 +187,183 @@ def conferir_indices():
     return achados
 
 
-def medir_consultas(slug=None):
-    """Roda cada consulta quente e mede o tempo real de execucao.
+def _no_do_postgres(no):
+    return {
+        'tipo': no.get('Node Type', '?'),
+        'relacao': no.get('Alias') or no.get('Relation Name'),
+        'indice': no.get('Index Name'),
+        'estimadas': no.get('Plan Rows'),
+        'reais': no.get('Actual Rows'),
+    }
+
+
+def forma_do_postgres(plano):
+    """Os nos de um `EXPLAIN (FORMAT JSON)`, em pre-ordem."""
+    nos, pendentes = [], [plano['Plan']]
+    while pendentes:
+        no = pendentes.pop()
+        nos.append(_no_do_postgres(no))
+        pendentes.extend(reversed(no.get('Plans', [])))
+    return nos
+
+
+_DETALHE_SQLITE = re.compile(
+    r'^(?P<acao>SCAN|SEARCH) (?P<relacao>\S+)'
+    r'(?: USING (?P<cobre>COVERING )?INDEX (?P<indice>\S+)'
+    r'| USING (?:INTEGER )?PRIMARY KEY)?'
+)
+
+
+def forma_do_sqlite(linhas):
+    """Os nos de um `EXPLAIN QUERY PLAN`, no mesmo vocabulario do PostgreSQL.
 
-    Usa `EXPLAIN (ANALYZE)` em vez de cronometrar no Python: o que interessa e
-    o tempo do banco, sem a latencia de transporte e a montagem de objetos do
-    ORM, que variam por motivo alheio ao indice.
+    `SCAN m` sem indice e a varredura (`Seq Scan`); `SEARCH`/`SCAN ... USING
+    INDEX` e acesso por indice. O resto (`USE TEMP B-TREE`, `CO-ROUTINE`) fica
+    com o proprio texto como tipo.
+    """
+    nos = []
+    for detalhe in linhas:
+        casou = _DETALHE_SQLITE.match(detalhe)
+        if casou is None:
+            nos.append({'tipo': detalhe, 'relacao': None, 'indice': None})
+            continue
+        if casou['indice']:
+            tipo = 'Index Only Scan' if casou['cobre'] else 'Index Scan'
+            indice = casou['indice']
+        elif casou['acao'] == 'SEARCH':
+            tipo, indice = 'Index Scan', 'rowid'
+        else:
+            tipo, indice = 'Seq Scan', None
+        nos.append({'tipo': tipo, 'relacao': casou['relacao'], 'indice': indice})
+    return nos
+
+
+def _acessos(forma):
+    acessos = {}
+    for no in forma:
+        if no.get('relacao'):
+            acessos.setdefault(no['relacao'], set()).add(no['tipo'])
+    return acessos
+
+
+def _resumo(forma):
+    return ' > '.join(
+        no['tipo'] + (f' em {no["relacao"]}' if no.get('relacao') else '')
+        for no in forma
+    )
+
+
+def comparar(base, forma, tempo_ms):
+    """`(regressoes, mudancas)` de uma medida contra a linha de base.
+
+    Regressao reprova; mudanca so e relatada - um plano que troca um indice
+    por outro melhor tambem muda.
+    """
+    regressoes, mudancas = [], []
+
+    antes, depois = _acessos(base.forma), _acessos(forma)
+    for relacao, tipos in antes.items():
+        agora = depois.get(relacao, set())
+        por_indice = tipos & ACESSOS_POR_INDICE
+        if por_indice and 'Seq Scan' in agora and not agora & ACESSOS_POR_INDICE:
+            regressoes.append(f'{"/".join(sorted(por_indice))} em {relacao} virou Seq Scan')
+
+    if tempo_ms > base.tempo_ms * FATOR_TEMPO and tempo_ms - base.tempo_ms >= PISO_MS:
+        regressoes.append(f'mais de {FATOR_TEMPO:.0f}x os {base.tempo_ms:.1f} ms da base')
+
+    indices_antes = {no['indice'] for no in base.forma if no.get('indice')}
+    indices_depois = {no['indice'] for no in forma if no.get('indice')}
+    for indice in sorted(indices_antes - indices_depois):
+        mudancas.append(f'deixou de usar {indice}')
+    if not regressoes and not mudancas and _resumo(base.forma) != _resumo(forma):
+        mudancas.append(f'plano mudou: {_resumo(base.forma)} -> {_resumo(forma)}')
+    return regressoes, mudancas
+
+
+def _versao():
+    """Commit curto do codigo medido, como em `benchmarks/execucao.py`."""
+    from django.conf import settings
+
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True, timeout=10,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def _medir_postgres(cursor, sql, parametros):
+    # `EXPLAIN (ANALYZE)` em vez de cronometrar no Python: o que interessa e
+    # o tempo do banco, sem a latencia de transporte e a montagem de objetos
+    # do ORM, que variam por motivo alheio ao indice.
+    cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, parametros)
+    plano = cursor.fetchone()[0]
+    if isinstance(plano, list):
+        plano = plano[0]
+    return float(plano['Execution Time']), forma_do_postgres(plano)
+
+
+def _medir_sqlite(cursor, sql, parametros):
+    # Sem ANALYZE no SQLite: o plano e o estimado, e o tempo e o do relogio -
+    # em processo, sem transporte, entao ainda e o tempo do banco.
+    # ⚠️ O `sqlite3` do Python guarda o comando preparado pelo texto, e o
+    # `EXPLAIN` preparado nao confere se o schema mudou: depois de um `DROP
+    # INDEX` na mesma conexao, devolveria o plano com o indice que nao existe
+    # mais. A versao do schema no comentario muda o texto quando o schema muda.
+    cursor.execute('PRAGMA schema_version')
+    versao = cursor.fetchone()[0]
+    cursor.execute(f'EXPLAIN QUERY PLAN /* schema {versao} */ ' + sql, parametros)
+    forma = forma_do_sqlite([linha[3] for linha in cursor.fetchall()])
+    comeco = time.perf_counter()
+    cursor.execute(sql, parametros)
+    cursor.fetchall()
+    return (time.perf_counter() - comeco) * 1000, forma
+
+
+def medir_consultas(slug=None, aceitar=False):
+    """Roda cada consulta quente, mede, e compara o plano com a linha de base.
+
+    Toda medida vira um `PlanoConsultaQuente`. Com `aceitar`, a medida entra
+    como linha de base mesmo que tenha regredido - a mudanca era esperada.
     """
     from django.db import connection
 
-    from aquaculture.models import LocalRecife
+    from aquaculture.models import LocalRecife, PlanoConsultaQuente
 
-    if connection.vendor != 'postgresql':
-        return [Achado('consultas', 'PostgreSQL', False, 'banco nao e PostgreSQL')]
+    medir = {'postgresql': _medir_postgres, 'sqlite': _medir_sqlite}.get(connection.vendor)
+    if medir is None:
+        return [Achado('consultas', connection.vendor, False, 'banco sem plano conhecido')]
 
     if slug is None:
         primeiro = LocalRecife.objects.order_by('slug').first()
         slug = primeiro.slug if primeiro else ''
 
+    versao = _versao()
     achados = []
     with connection.cursor() as cursor:
         for nome, sql in CONSULTAS_QUENTES.items():
-            cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, {'slug': slug})
-            plano = cursor.fetchone()[0]
-            if isinstance(plano, list):
-                plano = plano[0]
-            ms = float(plano['Execution Time'])
-
-            achados.append(Achado(
-                'consultas', nome, ms <= LIMITE_MS,
-                f'{ms:.1f} ms' + ('' if ms <= LIMITE_MS else f' (limite {LIMITE_MS:.0f})'),
-            ))
+            ms, forma = medir(cursor, sql, {'slug': slug})
+            base = PlanoConsultaQuente.objects.filter(
+                consulta=nome, banco=connection.vendor, regrediu=False,
+            ).first()
+            regressoes, mudancas = comparar(base, forma, ms) if base else ([], [])
+            if ms > LIMITE_MS:
+                regressoes.insert(0, f'limite {LIMITE_MS:.0f}')
+
+            partes = regressoes + mudancas
+            if base is None:
+                partes.append('primeira medida, vira a linha de base')
+            elif aceitar and regressoes:
+                partes.append('aceita como nova linha de base')
+            detalhe = f'{ms:.1f} ms' + (f' ({"; ".join(partes)})' if partes else '')
+
+            PlanoConsultaQuente.objects.create(
+                consulta=nome, banco=connection.vendor, versao=versao,
+                tempo_ms=round(ms, 3), forma=forma,
+                regrediu=bool(regressoes) and not aceitar, detalhe=detalhe[:300],
+            )
+            achados.append(Achado('consultas', nome, aceitar or not regressoes, detalhe))
     return achados
 
 
@@ -211,8 +400,104 @@ def conferir_neo4j():
     return achados
 
 
-def conferir_tudo(incluir_neo4j=True):
-    achados = conferir_indices() + medir_consultas()
+# Tabelas cujo tamanho `tamanhos` relata: a grande e as de proveniencia que
+# a estreitam (migracao 0031).
+TABELAS_MEDIDAS = (
+    'aquaculture_medicaoambiental',
+    'aquaculture_origemmedicao',
+    'aquaculture_observacaomedicao',
+)
+
+
+@dataclass(frozen=True)
+class Tamanho:
+    tabela: str
+    linhas: int
+    tabela_bytes: int
+    indices_bytes: int
+
+
+def _tamanho_postgres(cursor, tabela):
+    # `pg_partition_tree` nao devolve nada para a tabela comum, por isso ela
+    # entra pelo `UNION`; particionada, a mae (`relkind` 'p') nao tem dado e
+    # fica de fora, e so as folhas somam. `reltuples` e a estimativa do
+    # ANALYZE: contar seria ler tudo.
+    cursor.execute(
+        """
+        SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0),
+               COALESCE(SUM(pg_table_size(c.oid)), 0),
+               COALESCE(SUM(pg_indexes_size(c.oid)), 0)
+        FROM pg_class c
+        WHERE c.relkind <> 'p' AND c.oid IN (
+            SELECT relid FROM pg_partition_tree(%s::regclass) WHERE isleaf
+            UNION SELECT %s::regclass
+        )
+        """,
+        [tabela, tabela],
+    )
+    return cursor.fetchone()
+
+
+def _tamanho_sqlite(cursor, tabela):
+    # `dbstat` soma as paginas de cada b-tree; os indices de `UNIQUE` tambem
+    # estao no `sqlite_master`, com `sql` nulo.
+    cursor.execute(f'SELECT COUNT(*) FROM "{tabela}"')
+    linhas = cursor.fetchone()[0]
+    cursor.execute(
+        """
+        SELECT COALESCE(SUM(CASE WHEN d.name = %s THEN d.pgsize END), 0),
+               COALESCE(SUM(CASE WHEN d.name <> %s THEN d.pgsize END), 0)
+        FROM dbstat d JOIN sqlite_master m ON m.name = d.name
+        WHERE m.tbl_name = %s
+        """,
+        [tabela, tabela, tabela],
+    )
+    return (linhas, *cursor.fetchone())
+
+
+def tamanhos(tabelas=TABELAS_MEDIDAS):
+    """Linhas e bytes de tabela e de indices. So relatorio, nunca reprova.
+
+    Para comparar antes e depois de mexer no esquema: a conta de quanto uma
+    coluna custa e feita aqui, e nao de cabeca. Vazio no banco que nao sabe
+    medir (SQLite compilado sem `dbstat`).
+    """
+    from django.db import DatabaseError, connection
+
+    medir = {
+        'postgresql': _tamanho_postgres, 'sqlite': _tamanho_sqlite,
+    }.get(connection.vendor)
+    if medir is None:
+        return []
+    try:
+        with connection.cursor() as cursor:
+            return [Tamanho(tabela, *map(int, medir(cursor, tabela))) for tabela in tabelas]
+    except DatabaseError:
+        return []
+
+
+def conferir_cobertura():
+    """O resumo de cobertura do catalogo bate com as medicoes?
+
+    Roda a agregacao cara uma vez, aqui, para que o catalogo nao precise.
+    Divergencia e medicao gravada ou apagada por fora do `gravar`.
+    """
+    from aquaculture import cobertura
+
+    divergentes = cobertura.divergencias()
+    detalhe = ''
+    if divergentes:
+        exemplos = ', '.join(
+            f'{fonte}/{variavel} (recife {local})' for local, fonte, variavel in divergentes[:3]
+        )
+        detalhe = f'{len(divergentes)} grupo(s) divergem: {exemplos}'
+    return [Achado('cobertura', 'CoberturaResumo x MedicaoAmbiental', not divergentes, detalhe)]
+
+
+def conferir_tudo(incluir_neo4j=True, aceitar_planos=False):
+    achados = (
+        conferir_indices() + medir_consultas(aceitar=aceitar_planos) + conferir_cobertura()
+    )
     if incluir_neo4j:
         achados += conferir_neo4j()
     return achados
@@ -90,7 +90,7 @@ PASSOS = (
         comando='conferir_persistencia',
         motivo=(
             'Valida o resultado, e nao a intencao: indices, constraints e o '
-            'tempo das consultas quentes.'
+            'tempo e o plano das consultas quentes contra o deploy anterior.'
         ),
     ),
 )
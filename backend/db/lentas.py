@@ -0,0 +1,352 @@
+"""Captura, em uso real, das consultas do ORM que passam de um limite.
+
+`conferencia.medir_consultas` mede as quatro `CONSULTAS_QUENTES`, copiadas a
+mao do plano do ORM, e so quando alguem roda `conferir_persistencia`. A
+consulta lenta que ninguem lembrou de copiar - um filtro novo na API, um
+`order_by` sem indice - so aparece quando alguem reclama da pagina.
+
+`Capturador` e um `execute_wrapper` instalado em toda conexao (por
+`instalar`, chamado no `ready` do app quando `CONSULTAS_LENTAS_MS` > 0). A
+consulta que passa do limite vira uma `ConsultaLenta` com:
+
+- a **impressao**: hash do SQL normalizado (`IN (%s, %s, %s)` vira
+  `IN (...)`, literal vira `?`), que junta a mesma consulta com outros valores;
+- a **origem**: o primeiro quadro do projeto na pilha - a view, o serializer;
+- a **correlacao** e a rota do log, para achar a requisicao que a disparou;
+- o **plano** (`EXPLAIN (FORMAT JSON)` no PostgreSQL, `EXPLAIN QUERY PLAN` no
+  SQLite), no maximo um por impressao por hora.
+
+🚨 **O plano e a gravacao saem da requisicao.** Na thread de quem consultou
+so acontece o cronometro, a normalizacao e um `put` numa fila; uma thread
+propria tira o plano e grava, com a conexao dela. A fila tem limite: cheia,
+a captura e descartada - melhor perder uma amostra que segurar a requisicao.
+
+⚠️ `EXPLAIN` sem `ANALYZE`: o plano e o estimado, e a consulta **nao** roda de
+novo. Um `UPDATE` lento nao e reaplicado para ser explicado.
+
+⚠️ Os parametros so vivem ate o `EXPLAIN`; nao sao gravados nem logados.
+
+`piores` e o relatorio que `conferir_persistencia` imprime: as impressoes que
+mais somaram tempo no periodo, com o resumo do ultimo plano.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+LIMITE_MS_PADRAO = 200
+MAXIMO_PADRAO = 2_000
+# Uma impressao ja explicada nao e explicada de novo antes disto.
+PLANO_VALIDADE_S = 3600
+TAMANHO_FILA = 100
+
+_EXPLICAVEIS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+# Dentro da captura (a thread de gravacao, ou a gravacao sincrona dos testes):
+# o INSERT da propria `ConsultaLenta` tambem passa pelo wrapper.
+_CAPTURANDO = contextvars.ContextVar('coral_capturando_lenta', default=False)
+
+_LISTA_DE_PARAMETROS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r'(?<![\w"%])-?\d+(?:\.\d+)?\b')
+_ESPACOS = re.compile(r'\s+')
+
+
+def normalizar(sql):
+    """O SQL sem os valores: o que e igual entre duas execucoes da mesma consulta."""
+    sql = _TEXTO.sub('?', sql)
+    sql = _NUMERO.sub('?', sql)
+    sql = _LISTA_DE_PARAMETROS.sub('(...)', sql)
+    return _ESPACOS.sub(' ', sql).strip()
+
+
+def impressao(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode('utf-8')).hexdigest()[:16]
+
+
+def origem(base=None):
+    """`arquivo:linha funcao` do quadro do projeto mais perto da consulta."""
+    from django.conf import settings
+
+    base = str(base or settings.BASE_DIR)
+    quadro = sys._getframe(1)
+    while quadro is not None:
+        arquivo = quadro.f_code.co_filename
+        if (
+            arquivo.startswith(base)
+            and 'site-packages' not in arquivo
+            and arquivo != __file__
+            and not arquivo.endswith(os.path.join('observabilidade', 'consultas.py'))
+        ):
+            relativo = os.path.relpath(arquivo, base).replace(os.sep, '/')
+            return f'{relativo}:{quadro.f_lineno} {quadro.f_code.co_name}'
+        quadro = quadro.f_back
+    return ''
+
+
+@dataclass
+class _Captura:
+    alias: str
+    sql: str
+    parametros: object
+    many: bool
+    impressao: str
+    normalizado: str
+    duracao_ms: float
+    origem: str
+    correlacao: str
+    rota: str
+
+
+class Capturador:
+    """O `execute_wrapper` que guarda as consultas acima de `limite_ms`.
+
+    Com `assincrono=False`, tira o plano e grava na hora, na conexao de quem
+    consultou (os testes, que precisam ver a linha dentro da transacao).
+    """
+
+    def __init__(self, limite_ms=LIMITE_MS_PADRAO, maximo=MAXIMO_PADRAO,
+                 assincrono=True, tamanho_fila=TAMANHO_FILA):
+        self.limite_ms = limite_ms
+        self.maximo = maximo
+        self.assincrono = assincrono
+        self.tamanho_fila = tamanho_fila
+        self.descartadas = 0
+        self._explicadas = {}
+        self._preparar_processo()
+
+    def _preparar_processo(self):
+        # Mesmo cuidado da fila do log: com `--preload`, a thread do mestre
+        # nao atravessa o fork.
+        self._pid = os.getpid()
+        self._fila = queue.Queue(maxsize=self.tamanho_fila)
+        self._gravador = None
+        self._partida = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if _CAPTURANDO.get():
+            return execute(sql, params, many, context)
+        comeco = time.perf_counter()
+        resultado = execute(sql, params, many, context)
+        decorrido = (time.perf_counter() - comeco) * 1000
+        if decorrido >= self.limite_ms:
+            self._capturar(sql, params, many, context, decorrido)
+        return resultado
+
+    def _capturar(self, sql, params, many, context, decorrido):
+        from observabilidade import contexto_atual, correlacao_atual
+
+        # 🚨 Nada daqui pode quebrar a consulta, que ja deu certo.
+        try:
+            normalizado = normalizar(sql)
+            captura = _Captura(
+                alias=context['connection'].alias,
+                sql=sql,
+                parametros=params,
+                many=many,
+                impressao=impressao(normalizado),
+                normalizado=normalizado,
+                duracao_ms=round(decorrido, 1),
+                origem=origem(),
+                correlacao=correlacao_atual() or '',
+                rota=str(contexto_atual().get('rota', ''))[:300],
+            )
+            logger.info('Consulta lenta', extra={
+                'impressao': captura.impressao,
+                'sql_ms': captura.duracao_ms,
+                'origem': captura.origem,
+            })
+            if not self.assincrono:
+                self.gravar(captura)
+                return
+            self._garantir_gravador()
+            self._fila.put_nowait(captura)
+        except queue.Full:
+            self.descartadas += 1
+        except Exception:
+            logger.warning('Falha ao capturar consulta lenta', exc_info=True)
+
+    def _garantir_gravador(self):
+        if self._pid != os.getpid():
+            self._preparar_processo()
+        if self._gravador is None:
+            with self._partida:
+                if self._gravador is None:
+                    self._gravador = threading.Thread(
+                        target=self._gravar_da_fila, args=(self._fila,),
+                        name='consultas-lentas', daemon=True,
+                    )
+                    self._gravador.start()
+
+    def _gravar_da_fila(self, fila):
+        from django.db import close_old_connections
+
+        _CAPTURANDO.set(True)
+        while True:
+            captura = fila.get()
+            close_old_connections()
+            try:
+                self.gravar(captura)
+            except Exception:
+                logger.warning('Falha ao gravar consulta lenta', exc_info=True)
+            finally:
+                close_old_connections()
+                fila.task_done()
+
+    # -- gravacao -----------------------------------------------------------
+
+    def gravar(self, captura):
+        """Tira o plano (se ainda nao ha um recente) e grava, respeitando o teto."""
+        from aquaculture.models import ConsultaLenta
+
+        token = _CAPTURANDO.set(True)
+        try:
+            plano, erro = None, ''
+            agora = time.monotonic()
+            ultima = self._explicadas.get(captura.impressao)
+            if ultima is None or agora - ultima >= PLANO_VALIDADE_S:
+                plano, erro = explicar(captura.alias, captura.sql, captura.parametros, captura.many)
+                self._explicadas[captura.impressao] = agora
+
+            objetos = ConsultaLenta.objects.using(captura.alias)
+            objetos.create(
+                impressao=captura.impressao,
+                sql=captura.normalizado,
+                duracao_ms=captura.duracao_ms,
+                origem=captura.origem[:300],
+                correlacao=captura.correlacao[:32],
+                rota=captura.rota,
+                plano=plano,
+                plano_erro=erro[:300],
+            )
+            corte = list(
+                objetos.order_by('-id').values_list('id', flat=True)[self.maximo:self.maximo + 1]
+            )
+            if corte:
+                objetos.filter(id__lte=corte[0]).delete()
+        finally:
+            _CAPTURANDO.reset(token)
+
+
+def explicar(alias, sql, parametros, many=False):
+    """`(plano, erro)`: o plano estimado da consulta, sem executa-la."""
+    from django.db import connections
+
+    if many:
+        return None, 'executemany: sem plano'
+    if sql.lstrip().split(None, 1)[0].upper() not in _EXPLICAVEIS:
+        return None, 'comando sem plano'
+
+    conexao = connections[alias]
+    try:
+        with conexao.cursor() as cursor:
+            if conexao.vendor == 'postgresql':
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, parametros)
+                plano = cursor.fetchone()[0]
+                if isinstance(plano, str):
+                    plano = json.loads(plano)
+                return (plano[0] if isinstance(plano, list) else plano), ''
+            if conexao.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, parametros)
+                return [
+                    {'id': linha[0], 'pai': linha[1], 'detalhe': linha[3]}
+                    for linha in cursor.fetchall()
+                ], ''
+    except Exception as erro:  # noqa: BLE001 - o erro vira o registro
+        return None, f'{type(erro).__name__}: {erro}'
+    return None, f'EXPLAIN nao suportado em {conexao.vendor}'
+
+
+def resumo_do_plano(plano):
+    """Uma linha do plano: os nos caros e o custo estimado total."""
+    if not plano:
+        return ''
+    if isinstance(plano, list):
+        return '; '.join(no['detalhe'] for no in plano)
+
+    raiz = plano.get('Plan', {})
+    nos, pendentes = [], [raiz]
+    while pendentes:
+        no = pendentes.pop()
+        tipo = no.get('Node Type', '?')
+        if 'Scan' in tipo or 'Sort' in tipo:
+            relacao = no.get('Relation Name') or no.get('Index Name')
+            nos.append(f'{tipo} em {relacao}' if relacao else tipo)
+        pendentes.extend(no.get('Plans', []))
+    custo = raiz.get('Total Cost')
+    partes = nos + ([f'custo {custo:,.0f}'] if custo is not None else [])
+    return '; '.join(partes)
+
+
+@dataclass(frozen=True)
+class Ofensora:
+    impressao: str
+    vezes: int
+    total_ms: float
+    max_ms: float
+    sql: str
+    origem: str
+    plano: str
+
+
+def piores(limite=10, dias=7):
+    """As impressoes que mais somaram tempo nos ultimos `dias`."""
+    from datetime import timedelta
+
+    from django.db.models import Count, Max, Sum
+    from django.utils import timezone
+
+    from aquaculture.models import ConsultaLenta
+
+    recentes = ConsultaLenta.objects.filter(
+        capturada_em__gte=timezone.now() - timedelta(days=dias)
+    )
+    grupos = (
+        recentes.values('impressao')
+        .annotate(vezes=Count('id'), total_ms=Sum('duracao_ms'), max_ms=Max('duracao_ms'))
+        .order_by('-total_ms')[:limite]
+    )
+    ofensoras = []
+    for grupo in grupos:
+        ultima = recentes.filter(impressao=grupo['impressao']).first()
+        com_plano = ConsultaLenta.objects.filter(
+            impressao=grupo['impressao'], plano__isnull=False,
+        ).first()
+        ofensoras.append(Ofensora(
+            impressao=grupo['impressao'],
+            vezes=grupo['vezes'],
+            total_ms=grupo['total_ms'],
+            max_ms=grupo['max_ms'],
+            sql=ultima.sql,
+            origem=ultima.origem,
+            plano=resumo_do_plano(com_plano.plano) if com_plano else '',
+        ))
+    return ofensoras
+
+
+def instalar(limite_ms=LIMITE_MS_PADRAO, maximo=MAXIMO_PADRAO):
+    """Poe um `Capturador` em toda conexao aberta daqui em diante. Devolve-o."""
+    from django.db.backends.signals import connection_created
+
+    capturador = Capturador(limite_ms, maximo)
+
+    def ao_conectar(sender, connection, **kwargs):
+        # ⚠️ Na frente da lista, e nao no fim: `execute_wrapper` (o do
+        # `medir_sql`) sai com `pop()`, e tiraria este se ele tivesse entrado
+        # depois, no meio do bloco. E a conexao reabre a cada requisicao com
+        # `CONN_MAX_AGE=0`, sem perder a lista: dai o `not in`.
+        if capturador not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, capturador)
+
+    connection_created.connect(ao_conectar, weak=False, dispatch_uid='db.lentas')
+    return capturador
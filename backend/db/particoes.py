@@ -0,0 +1,272 @@
+"""Particionamento de `MedicaoAmbiental` por ano, no PostgreSQL. Opcional.
+
+`MedicaoAmbiental` e uma tabela so, que cresce todo dia por recife e por
+variavel - e o plano e multiplicar os recifes. Os dois B-tree por data servem
+o painel, mas o painel le uma janela de dias, a exportacao le um periodo, e as
+duas acabam passando por indices do tamanho da serie inteira. Particionada por
+faixa de `data`, uma particao por ano:
+
+- a leitura com filtro de data so abre as particoes do periodo (*pruning*);
+- o ano velho pode passar por `VACUUM`, ser copiado e desanexado sozinho, sem
+  reescrever nem travar o resto;
+- o BRIN sobre `data` (migracao `0030`) fica pequeno e justo: a tabela e
+  escrita em ordem de tempo, e cada particao cobre um ano.
+
+**A conversao nao e uma migracao, de proposito.** Reescreve a tabela inteira
+sob `ACCESS EXCLUSIVE`, e o `migrate` do `preparar_deploy` nao e hora de
+descobrir isso. Quem converte e `manage.py particionar_medicoes --converter`,
+uma vez, numa janela escolhida. A migracao `0030` so cria o BRIN, que vale com
+ou sem particao.
+
+Como a conversao preserva o que o Django espera:
+
+- mesmos nomes de indice e de constraint, relidos do catalogo, para que uma
+  migracao futura que remova um deles pelo nome continue funcionando;
+- 🚨 a chave primaria passa a `(id, data)`: no PostgreSQL, toda chave unica de
+  tabela particionada inclui a chave da particao. O `id` continua unico na
+  pratica (sai de uma sequencia), e a unicidade que importa - a do upsert,
+  `(local_recife, data, variavel, fonte)` - ja tinha `data`;
+- o `id` sai de uma sequencia (`DEFAULT nextval`), e nao de `IDENTITY`, que so
+  existe em tabela particionada a partir do PostgreSQL 17.
+
+⚠️ Uma particao `_padrao` recebe o que nao tem ano criado: o ano novo nunca
+falha a ingestao. `garantir_anos` cria os anos que faltam e tira da `_padrao`
+as linhas deles - rode no comeco de cada ano, ou deixe o `--ate-ano` no cron.
+
+No SQLite nada disto se aplica; o comando diz isso e sai.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import date
+
+TABELA = 'aquaculture_medicaoambiental'
+PADRAO = f'{TABELA}_padrao'
+SEQUENCIA = f'{TABELA}_id_seq'
+BRIN = 'aquaculture_medicao_data_brin'
+
+_FAIXA = re.compile(r"FROM \('(\d{4})-\d{2}-\d{2}'\) TO \('(\d{4})-\d{2}-\d{2}'\)")
+
+
+class ParticionamentoIndisponivel(RuntimeError):
+    """O banco nao e PostgreSQL, ou a tabela ja esta (ou ainda nao esta) particionada."""
+
+
+@dataclass(frozen=True)
+class Particao:
+    nome: str
+    # Ano coberto; None na `_padrao`.
+    ano: object
+    linhas: int
+    bytes: int
+
+
+@dataclass(frozen=True)
+class Conversao:
+    linhas: int
+    anos: tuple
+
+
+def nome_da_particao(ano):
+    return f'{TABELA}_{ano}'
+
+
+def ano_da_faixa(limite):
+    """O ano de `FOR VALUES FROM (...) TO (...)`; None na `DEFAULT`."""
+    casou = _FAIXA.search(limite)
+    return int(casou[1]) if casou else None
+
+
+def anos_da_conversao(primeira, ultima, hoje=None, a_frente=1):
+    """Os anos com particao propria: da primeira medicao ate um alem do atual."""
+    hoje = hoje or date.today()
+    inicio = primeira.year if primeira else hoje.year
+    fim = max(ultima.year if ultima else hoje.year, hoje.year) + a_frente
+    return tuple(range(inicio, fim + 1))
+
+
+def _exigir_postgres(conexao):
+    if conexao.vendor != 'postgresql':
+        raise ParticionamentoIndisponivel(
+            f'particionamento so no PostgreSQL (este banco e {conexao.vendor})'
+        )
+
+
+def particionada(cursor):
+    cursor.execute(
+        'SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [TABELA]
+    )
+    return cursor.fetchone() is not None
+
+
+def particoes(cursor):
+    """As particoes, com linhas estimadas pelo `ANALYZE` e o tamanho em disco."""
+    cursor.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples,
+               pg_total_relation_size(c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+        """,
+        [TABELA],
+    )
+    return [
+        Particao(nome, ano_da_faixa(limite), max(int(linhas), 0), tamanho)
+        for nome, limite, linhas, tamanho in cursor.fetchall()
+    ]
+
+
+def _definicoes(cursor):
+    """Constraints e indices da tabela, como o catalogo os recria."""
+    cursor.execute(
+        """
+        SELECT conname, contype, pg_get_constraintdef(oid), conindid
+        FROM pg_constraint WHERE conrelid = %s::regclass
+        ORDER BY contype = 'p' DESC, conname
+        """,
+        [TABELA],
+    )
+    constraints = cursor.fetchall()
+    dos_constraints = [indice for *_, indice in constraints if indice]
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(indexrelid) FROM pg_index
+        WHERE indrelid = %s::regclass AND NOT (indexrelid = ANY(%s::oid[]))
+        ORDER BY indexrelid
+        """,
+        [TABELA, dos_constraints],
+    )
+    indices = [linha[0] for linha in cursor.fetchall()]
+    return constraints, indices
+
+
+def _criar_particao(cursor, ano):
+    """Cria o ano e traz da `_padrao` as linhas dele, se houver.
+
+    `CREATE TABLE ... PARTITION OF` recusa a faixa quando a `_padrao` tem linha
+    nela. Por isso a particao nasce solta, recebe as linhas e so entao e anexada.
+    """
+    nome = nome_da_particao(ano)
+    de, ate = f'{ano}-01-01', f'{ano + 1}-01-01'
+    cursor.execute(f'CREATE TABLE "{nome}" (LIKE "{TABELA}" INCLUDING DEFAULTS)')
+    cursor.execute(
+        f"""
+        WITH movidas AS (
+            DELETE FROM "{PADRAO}" WHERE data >= %s AND data < %s RETURNING *
+        )
+        INSERT INTO "{nome}" SELECT * FROM movidas
+        """,
+        [de, ate],
+    )
+    movidas = cursor.rowcount
+    cursor.execute(
+        f'ALTER TABLE "{TABELA}" ATTACH PARTITION "{nome}" '
+        f"FOR VALUES FROM ('{de}') TO ('{ate}')"
+    )
+    return max(movidas, 0)
+
+
+def converter(conexao, hoje=None, a_frente=1):
+    """Troca a tabela comum pela particionada, com os mesmos dados e nomes.
+
+    Tudo numa transacao: se qualquer passo falha, a tabela original volta
+    intacta. Confere a contagem antes de apagar a original.
+    """
+    from django.db import transaction
+
+    _exigir_postgres(conexao)
+    with transaction.atomic(using=conexao.alias), conexao.cursor() as cursor:
+        if particionada(cursor):
+            raise ParticionamentoIndisponivel(f'{TABELA} ja esta particionada')
+
+        cursor.execute(f'LOCK TABLE "{TABELA}" IN ACCESS EXCLUSIVE MODE')
+        # As FKs do Django sao `DEFERRABLE INITIALLY DEFERRED`: se a transacao
+        # em volta ja escreveu medicoes, as conferencias delas estao pendentes
+        # na tabela antiga, e o `DROP TABLE` la embaixo e recusado ("pending
+        # trigger events"). Conferidas agora, antes de mexer em qualquer coisa.
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        constraints, indices = _definicoes(cursor)
+        cursor.execute(f'SELECT MIN(data), MAX(data), COUNT(*), MAX(id) FROM "{TABELA}"')
+        primeira, ultima, linhas, maior_id = cursor.fetchone()
+        anos = anos_da_conversao(primeira, ultima, hoje, a_frente)
+
+        antiga = f'{TABELA}_antiga'
+        cursor.execute(f'ALTER TABLE "{TABELA}" RENAME TO "{antiga}"')
+        cursor.execute(
+            f'CREATE TABLE "{TABELA}" (LIKE "{antiga}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (data)'
+        )
+        cursor.execute(f'CREATE TABLE "{PADRAO}" PARTITION OF "{TABELA}" DEFAULT')
+        for ano in anos:
+            cursor.execute(
+                f'CREATE TABLE "{nome_da_particao(ano)}" PARTITION OF "{TABELA}" '
+                f"FOR VALUES FROM ('{ano}-01-01') TO ('{ano + 1}-01-01')"
+            )
+
+        # Em ordem de data: cada particao e escrita em sequencia, e o BRIN
+        # nasce com faixas justas.
+        cursor.execute(f'INSERT INTO "{TABELA}" SELECT * FROM "{antiga}" ORDER BY data, id')
+        if cursor.rowcount != linhas:
+            raise ParticionamentoIndisponivel(
+                f'copiou {cursor.rowcount} de {linhas} linhas; nada foi alterado'
+            )
+        # Libera os nomes dos indices e das constraints, e a sequencia do IDENTITY.
+        cursor.execute(f'DROP TABLE "{antiga}"')
+
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCIA}" OWNED BY "{TABELA}".id')
+        cursor.execute(
+            f'ALTER TABLE "{TABELA}" ALTER COLUMN id SET DEFAULT nextval(%s)', [SEQUENCIA]
+        )
+        cursor.execute('SELECT setval(%s, %s, %s)', [SEQUENCIA, maior_id or 1, maior_id is not None])
+
+        for nome, tipo, definicao, _ in constraints:
+            if tipo == 'p':
+                definicao = 'PRIMARY KEY (id, data)'
+            cursor.execute(f'ALTER TABLE "{TABELA}" ADD CONSTRAINT "{nome}" {definicao}')
+        for definicao in indices:
+            cursor.execute(definicao)
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS "{BRIN}" ON "{TABELA}" USING brin (data)')
+        cursor.execute(f'ANALYZE "{TABELA}"')
+    return Conversao(linhas=linhas, anos=anos)
+
+
+def garantir_anos(conexao, ate_ano):
+    """Cria as particoes que faltam ate `ate_ano`. Devolve `{ano: linhas movidas}`."""
+    from django.db import transaction
+
+    _exigir_postgres(conexao)
+    criadas = {}
+    with transaction.atomic(using=conexao.alias), conexao.cursor() as cursor:
+        if not particionada(cursor):
+            raise ParticionamentoIndisponivel(f'{TABELA} nao esta particionada')
+        existentes = {p.ano for p in particoes(cursor) if p.ano is not None}
+        # Tambem os anos do meio que faltem, e os que so existem na `_padrao`.
+        cursor.execute(
+            f'SELECT DISTINCT EXTRACT(YEAR FROM data)::int FROM "{PADRAO}"'
+        )
+        na_padrao = {linha[0] for linha in cursor.fetchall()}
+        inicio = min(existentes | na_padrao | {ate_ano})
+        for ano in sorted(set(range(inicio, ate_ano + 1)) | na_padrao):
+            if ano not in existentes:
+                criadas[ano] = _criar_particao(cursor, ano)
+    return criadas
+
+
+def desanexar(conexao, ano):
+    """Tira o ano da tabela sem apagar: vira uma tabela solta, para arquivar.
+
+    ⚠️ Daqui em diante o site nao ve as medicoes desse ano - o painel, a API e
+    o treino. E o ponto: so desanexe o que ja foi copiado para outro lugar.
+    """
+    from django.db import transaction
+
+    _exigir_postgres(conexao)
+    nome = nome_da_particao(ano)
+    with transaction.atomic(using=conexao.alias), conexao.cursor() as cursor:
+        if not particionada(cursor):
+            raise ParticionamentoIndisponivel(f'{TABELA} nao esta particionada')
+        if ano not in {p.ano for p in particoes(cursor)}:
+            raise ParticionamentoIndisponivel(f'nao ha particao de {ano}')
+        cursor.execute(f'ALTER TABLE "{TABELA}" DETACH PARTITION "{nome}"')
+    return nome
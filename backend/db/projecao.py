@@ -48,6 +48,7 @@ import logging
 from dataclasses import dataclass, field
 
 from db.connection import Neo4jConnection
+from observabilidade import trecho
 
 logger = logging.getLogger(__name__)
 
@@ -250,7 +251,7 @@ def projetar_fontes(conexao=Neo4jConnection):
     from aquaculture.models import MedicaoAmbiental
 
     pares = (
-        MedicaoAmbiental.objects.order_by()
+        MedicaoAmbiental.objects.com_proveniencia().order_by()
         .values_list('fonte', 'dataset_id')
         .distinct()
     )
@@ -315,9 +316,8 @@ def projetar_medicoes(conexao=Neo4jConnection, lote=LOTE, ao_progredir=None):
             ao_progredir(escritos, total)
         pendentes.clear()
 
-    for linha in MedicaoAmbiental.objects.order_by('pk').values(*campos).iterator(
-        chunk_size=lote
-    ):
+    medicoes = MedicaoAmbiental.objects.com_proveniencia().order_by('pk')
+    for linha in medicoes.values(*campos).iterator(chunk_size=lote):
         slug = linha['local_recife__slug']
         data = linha['data'].isoformat()
         variavel = linha['variavel']
@@ -350,29 +350,61 @@ def projetar_medicoes(conexao=Neo4jConnection, lote=LOTE, ao_progredir=None):
 
 def projetar(conexao=Neo4jConnection, limpar_antes=True, lote=LOTE,
              ao_progredir=None):
-    """Reconstrói o grafo inteiro a partir do PostgreSQL."""
-    resultado = Resultado()
+    """Reconstrói o grafo inteiro a partir do PostgreSQL.
 
-    garantir_constraints(conexao)
-    if limpar_antes:
-        resultado.apagados = limpar(conexao)
+    Cada etapa e um trecho: o `Rastro concluido` no fim diz quanto da
+    reconstrucao foi limpar o grafo e quanto foi escrever medicoes.
 
-    resultado.localizacoes = projetar_localizacoes(conexao)
-    resultado.especies, resultado.rel_abriga = projetar_especies(conexao)
-    resultado.fontes = projetar_fontes(conexao)
+    Cada chamada vira uma `ExecucaoProjecao`, concluida ate quando falha: o id
+    da ultima concluida e o que invalida o cache das paginas do grafo
+    (`neo4j_service`).
+    """
+    from django.utils import timezone
+
+    from aquaculture.models import ExecucaoProjecao
+
+    execucao = ExecucaoProjecao.objects.create()
+    resultado = Resultado()
+    try:
+        _projetar(conexao, limpar_antes, lote, ao_progredir, resultado)
+    except Exception as erro:
+        execucao.erro = f'{type(erro).__name__}: {erro}'
+        raise
+    finally:
+        execucao.nos = resultado.nos
+        execucao.relacoes = resultado.relacoes
+        execucao.concluida_em = timezone.now()
+        execucao.save()
+    return resultado
 
-    if resultado.localizacoes == 0:
-        resultado.avisos.append(
-            'Nenhuma Localizacao projetada: as medicoes ficariam orfas e '
-            'foram puladas.'
-        )
-        return resultado
 
-    resultado.medicoes = projetar_medicoes(conexao, lote, ao_progredir)
+def _projetar(conexao, limpar_antes, lote, ao_progredir, resultado):
+    with trecho('projecao'):
+        with trecho('projecao.constraints'):
+            garantir_constraints(conexao)
+        if limpar_antes:
+            with trecho('projecao.limpar'):
+                resultado.apagados = limpar(conexao)
+
+        with trecho('projecao.localizacoes'):
+            resultado.localizacoes = projetar_localizacoes(conexao)
+        with trecho('projecao.especies'):
+            resultado.especies, resultado.rel_abriga = projetar_especies(conexao)
+        with trecho('projecao.fontes'):
+            resultado.fontes = projetar_fontes(conexao)
+
+        if resultado.localizacoes == 0:
+            resultado.avisos.append(
+                'Nenhuma Localizacao projetada: as medicoes ficariam orfas e '
+                'foram puladas.'
+            )
+            return
+
+        with trecho('projecao.medicoes'):
+            resultado.medicoes = projetar_medicoes(conexao, lote, ao_progredir)
     # Cada medicao gera exatamente uma de cada.
     resultado.rel_tem_medicao = resultado.medicoes
     resultado.rel_proveniente = resultado.medicoes
-    return resultado
 
 
 def conferir(conexao=Neo4jConnection):
@@ -388,7 +420,7 @@ def conferir(conexao=Neo4jConnection):
         return conexao.run(cypher)[0]['n']
 
     esperado_fontes = len(set(
-        MedicaoAmbiental.objects.order_by()
+        MedicaoAmbiental.objects.com_proveniencia().order_by()
         .values_list('fonte', 'dataset_id').distinct()
     ))
 
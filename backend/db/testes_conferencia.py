@@ -0,0 +1,177 @@
+"""Testes dos planos das consultas quentes contra a linha de base.
+
+O que protegem:
+
+1. 🚨 **Indice que some reprova.** O acesso por indice que vira `Seq Scan`
+   falha a conferencia - e portanto o `preparar_deploy` - mesmo dentro do
+   `LIMITE_MS`.
+2. **A regressao nao vira base.** Rodar de novo nao a apaga; so corrigir, ou
+   aceitar com `aceitar`.
+3. **O tempo tem piso.** O dobro de quase nada nao e regressao.
+
+Rodam no banco da suite. Os de indice derrubado, so no SQLite, com o `EXPLAIN
+QUERY PLAN` de verdade: no PostgreSQL a tabela vazia ja sai em `Seq Scan`.
+"""
+
+from datetime import date
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from aquaculture.models import LocalRecife, MedicaoAmbiental, PlanoConsultaQuente
+from db import conferencia
+
+PRIMEIRA_PAGINA = 'GET /api/medicoes/ (1a pagina, sem filtro)'
+
+# Uma consulta com um indice so: o que ela perde nao tem substituto. Nas
+# medicoes, a unicidade de (local_recife_id, ...) cobre qualquer indice que
+# caia - e nao da para derruba-la.
+EXECUCOES = {
+    'execucoes da fonte': """
+        SELECT id FROM aquaculture_execucaoingestao
+        WHERE fonte = 'noaa' ORDER BY iniciado_em DESC
+    """,
+}
+
+
+class FormaTests(SimpleTestCase):
+    def test_detalhes_do_sqlite_no_vocabulario_do_postgres(self):
+        forma = conferencia.forma_do_sqlite([
+            'SEARCH l USING COVERING INDEX sqlite_autoindex_l_1 (slug=?)',
+            'SEARCH m USING INDEX idx_m (local_recife_id=?)',
+            'SEARCH l USING INTEGER PRIMARY KEY (rowid=?)',
+            'SCAN m',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ])
+
+        self.assertEqual([(no['tipo'], no['indice']) for no in forma], [
+            ('Index Only Scan', 'sqlite_autoindex_l_1'),
+            ('Index Scan', 'idx_m'),
+            ('Index Scan', 'rowid'),
+            ('Seq Scan', None),
+            ('USE TEMP B-TREE FOR ORDER BY', None),
+        ])
+
+    def test_nos_do_postgres_em_pre_ordem_com_linhas(self):
+        plano = {'Plan': {
+            'Node Type': 'Limit', 'Plan Rows': 100, 'Actual Rows': 100,
+            'Plans': [{
+                'Node Type': 'Nested Loop', 'Plans': [
+                    {'Node Type': 'Index Scan', 'Relation Name': 'aquaculture_medicaoambiental',
+                     'Alias': 'm', 'Index Name': 'idx', 'Plan Rows': 57420, 'Actual Rows': 100},
+                    {'Node Type': 'Seq Scan', 'Relation Name': 'aquaculture_localrecife',
+                     'Alias': 'l'},
+                ],
+            }],
+        }}
+
+        forma = conferencia.forma_do_postgres(plano)
+
+        self.assertEqual([no['tipo'] for no in forma],
+                         ['Limit', 'Nested Loop', 'Index Scan', 'Seq Scan'])
+        self.assertEqual(forma[2], {
+            'tipo': 'Index Scan', 'relacao': 'm', 'indice': 'idx',
+            'estimadas': 57420, 'reais': 100,
+        })
+
+    def test_tempo_so_regride_acima_do_piso(self):
+        base = PlanoConsultaQuente(tempo_ms=0.4, forma=[])
+
+        self.assertEqual(conferencia.comparar(base, [], 0.9), ([], []))
+        regressoes, _ = conferencia.comparar(base, [], 12.0)
+        self.assertEqual(len(regressoes), 1)
+
+    def test_troca_de_indice_e_mudanca_e_nao_regressao(self):
+        base = PlanoConsultaQuente(tempo_ms=1.0, forma=[
+            {'tipo': 'Index Scan', 'relacao': 'm', 'indice': 'idx_antigo'},
+        ])
+
+        regressoes, mudancas = conferencia.comparar(base, [
+            {'tipo': 'Index Only Scan', 'relacao': 'm', 'indice': 'idx_novo'},
+        ], 1.0)
+
+        self.assertEqual(regressoes, [])
+        self.assertEqual(mudancas, ['deixou de usar idx_antigo'])
+
+
+class LinhaDeBaseTests(TestCase):
+    def achado(self, achados, nome=PRIMEIRA_PAGINA):
+        return next(a for a in achados if a.item == nome)
+
+    def derrubar_indice(self, tabela, *colunas):
+        with connection.cursor() as cursor:
+            for definicao in conferencia._indices_da_tabela_sqlite(cursor, tabela):
+                nome, cobertas = definicao.split(' ', 1)
+                if cobertas == f'({", ".join(colunas)})':
+                    cursor.execute(f'DROP INDEX "{nome}"')
+                    return
+        self.fail(f'nenhum indice em {colunas}')
+
+    def test_primeira_medida_vira_base_e_a_segunda_compara(self):
+        primeira = conferencia.medir_consultas()
+        segunda = conferencia.medir_consultas()
+
+        self.assertTrue(all(a.ok for a in primeira + segunda))
+        self.assertIn('linha de base', self.achado(primeira).detalhe)
+        self.assertEqual(PlanoConsultaQuente.objects.count(), 2 * len(conferencia.CONSULTAS_QUENTES))
+        self.assertEqual(
+            PlanoConsultaQuente.objects.filter(banco=connection.vendor, regrediu=False).count(),
+            2 * len(conferencia.CONSULTAS_QUENTES),
+        )
+
+    @skipUnless(connection.vendor == 'sqlite', 'derruba pelo PRAGMA do SQLite')
+    @mock.patch.dict(conferencia.CONSULTAS_QUENTES, EXECUCOES, clear=True)
+    def test_indice_derrubado_reprova_ate_ser_aceito(self):
+        def medir(**opcoes):
+            return self.achado(conferencia.medir_consultas(**opcoes), 'execucoes da fonte')
+
+        self.assertTrue(medir().ok)
+        self.derrubar_indice('aquaculture_execucaoingestao', 'fonte', 'iniciado_em')
+
+        regrediu = medir()
+        self.assertFalse(regrediu.ok)
+        self.assertIn('em aquaculture_execucaoingestao virou Seq Scan', regrediu.detalhe)
+
+        # A medida que regrediu nao e base: a proxima ainda reprova.
+        self.assertFalse(medir().ok)
+
+        aceito = medir(aceitar=True)
+        self.assertTrue(aceito.ok)
+        self.assertIn('aceita como nova linha de base', aceito.detalhe)
+        self.assertTrue(medir().ok)
+
+    @skipUnless(connection.vendor == 'sqlite', 'derruba pelo PRAGMA do SQLite')
+    def test_indice_trocado_por_outro_passa_relatando(self):
+        conferencia.medir_consultas()
+        self.derrubar_indice('aquaculture_medicaoambiental', 'local_recife_id', 'data')
+
+        trocou = self.achado(conferencia.medir_consultas())
+        self.assertTrue(trocou.ok)
+        self.assertIn('deixou de usar', trocou.detalhe)
+
+    def test_indices_conferidos_no_sqlite(self):
+        achados = conferencia.conferir_indices()
+
+        self.assertTrue(achados)
+        self.assertTrue(all(a.ok for a in achados), [str(a) for a in achados])
+
+
+class TamanhosTests(TestCase):
+    def test_mede_tabela_e_indices_da_medicao_e_da_proveniencia(self):
+        # No PostgreSQL a tabela vazia nao tem pagina nenhuma.
+        local = LocalRecife.objects.create(slug='tamanhos', nome='Tamanhos')
+        MedicaoAmbiental.objects.create(
+            local_recife=local, data=date(2026, 7, 24), variavel='sst',
+            valor=25.0, unidade='°C', fonte='noaa_crw', dataset_id='dhw_5km',
+        )
+
+        medidas = {medida.tabela: medida for medida in conferencia.tamanhos()}
+        if not medidas:
+            self.skipTest('SQLite sem dbstat')
+
+        self.assertEqual(set(medidas), set(conferencia.TABELAS_MEDIDAS))
+        medicao = medidas['aquaculture_medicaoambiental']
+        self.assertGreater(medicao.tabela_bytes, 0)
+        # A unicidade do upsert e os dois indices por data, no minimo.
+        self.assertGreaterEqual(medicao.indices_bytes, 3 * 512)
@@ -0,0 +1,146 @@
+"""Testes da captura de consultas lentas.
+
+O que protegem:
+
+1. **A impressao junta a mesma consulta.** Outro valor, outro tamanho de
+   `IN (...)`: mesma impressao. Sem isso o relatorio vira uma linha por recife.
+2. **A captura diz de onde veio.** Origem no codigo, correlacao e rota do log,
+   e o plano - um por impressao, nao um por execucao.
+3. **A tabela tem teto.** Guarda as ultimas `maximo`, e a gravacao da propria
+   captura nao e capturada.
+4. 🚨 **O wrapper entra na frente da lista.** `medir_sql` sai com `pop()`.
+
+Rodam no banco da suite, com a gravacao sincrona; no SQLite o `EXPLAIN QUERY
+PLAN` faz as vezes do `EXPLAIN (FORMAT JSON)`.
+"""
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import SimpleTestCase, TestCase
+
+from aquaculture.models import ConsultaLenta, LocalRecife
+from db import lentas
+from observabilidade import contexto
+
+
+class NormalizacaoTests(SimpleTestCase):
+    def test_valores_e_listas_viram_marcadores(self):
+        sql = (
+            "SELECT * FROM t WHERE slug = 'tamandare' AND n > 42\n"
+            '   AND id IN (%s, %s, %s) AND x = %s'
+        )
+
+        self.assertEqual(
+            lentas.normalizar(sql),
+            'SELECT * FROM t WHERE slug = ? AND n > ? AND id IN (...) AND x = %s',
+        )
+
+    def test_mesma_consulta_com_outros_valores_tem_a_mesma_impressao(self):
+        uma = lentas.normalizar('SELECT 1 FROM t WHERE id IN (%s, %s) AND a = 7')
+        outra = lentas.normalizar('SELECT 1 FROM t WHERE id IN (%s) AND a = 9')
+
+        self.assertEqual(lentas.impressao(uma), lentas.impressao(outra))
+        self.assertNotEqual(
+            lentas.impressao(uma),
+            lentas.impressao(lentas.normalizar('SELECT 2 FROM t')),
+        )
+
+    def test_nome_com_digito_nao_vira_marcador(self):
+        self.assertIn('"t2"."col1"', lentas.normalizar('SELECT "t2"."col1" FROM t2'))
+
+    def test_resumo_do_plano_do_postgres(self):
+        plano = {'Plan': {
+            'Node Type': 'Sort', 'Total Cost': 1234.5,
+            'Plans': [{
+                'Node Type': 'Seq Scan',
+                'Relation Name': 'aquaculture_medicaoambiental',
+            }],
+        }}
+
+        self.assertEqual(
+            lentas.resumo_do_plano(plano),
+            'Sort; Seq Scan em aquaculture_medicaoambiental; custo 1,234',
+        )
+
+
+class CapturaTests(TestCase):
+    def setUp(self):
+        LocalRecife.objects.create(nome='Tamandare', slug='tamandare')
+
+    def consultar(self, capturador, slug='tamandare'):
+        with connection.execute_wrapper(capturador):
+            return list(LocalRecife.objects.filter(slug=slug))
+
+    def test_captura_com_origem_correlacao_rota_e_plano(self):
+        capturador = lentas.Capturador(limite_ms=0, assincrono=False)
+
+        with contexto(fluxo='http', rota='/api/locais/') as correlacao:
+            self.consultar(capturador)
+
+        captura = ConsultaLenta.objects.get()
+        self.assertIn('aquaculture_localrecife', captura.sql)
+        self.assertTrue(captura.origem.startswith('db/testes_lentas.py:'))
+        self.assertTrue(captura.origem.endswith(' consultar'))
+        self.assertEqual(captura.correlacao, correlacao)
+        self.assertEqual(captura.rota, '/api/locais/')
+        self.assertTrue(captura.plano)
+        self.assertTrue(lentas.resumo_do_plano(captura.plano))
+        self.assertEqual(captura.plano_erro, '')
+
+    def test_abaixo_do_limite_nao_captura(self):
+        self.consultar(lentas.Capturador(limite_ms=60_000, assincrono=False))
+
+        self.assertFalse(ConsultaLenta.objects.exists())
+
+    def test_um_plano_por_impressao(self):
+        capturador = lentas.Capturador(limite_ms=0, assincrono=False)
+
+        self.consultar(capturador, 'tamandare')
+        self.consultar(capturador, 'outro')
+
+        capturas = list(ConsultaLenta.objects.order_by('id'))
+        self.assertEqual(len({c.impressao for c in capturas}), 1)
+        self.assertIsNotNone(capturas[0].plano)
+        self.assertIsNone(capturas[1].plano)
+
+    def test_teto_guarda_as_ultimas_e_nao_captura_a_si_mesma(self):
+        capturador = lentas.Capturador(limite_ms=0, maximo=3, assincrono=False)
+
+        for _ in range(5):
+            self.consultar(capturador)
+
+        self.assertEqual(ConsultaLenta.objects.count(), 3)
+        self.assertFalse(
+            ConsultaLenta.objects.filter(sql__contains='aquaculture_consultalenta').exists()
+        )
+
+    def test_piores_soma_por_impressao(self):
+        capturador = lentas.Capturador(limite_ms=0, assincrono=False)
+        for _ in range(3):
+            self.consultar(capturador)
+        with connection.execute_wrapper(capturador):
+            LocalRecife.objects.count()
+        ConsultaLenta.objects.filter(sql__contains='COUNT').update(duracao_ms=1.0)
+        ConsultaLenta.objects.exclude(sql__contains='COUNT').update(duracao_ms=50.0)
+
+        primeira, segunda = lentas.piores()
+
+        self.assertEqual((primeira.vezes, primeira.total_ms, primeira.max_ms), (3, 150.0, 50.0))
+        self.assertIn('aquaculture_localrecife', primeira.plano)
+        self.assertEqual(segunda.vezes, 1)
+
+
+class InstalacaoTests(SimpleTestCase):
+    def test_entra_na_frente_e_uma_vez_so(self):
+        class Conexao:
+            execute_wrappers = []
+
+        conexao = Conexao()
+        capturador = lentas.instalar(limite_ms=100)
+        self.addCleanup(connection_created.disconnect, dispatch_uid='db.lentas')
+
+        conexao.execute_wrappers.append('medir_sql')
+        connection_created.send(sender=None, connection=conexao)
+        connection_created.send(sender=None, connection=conexao)
+
+        self.assertEqual(conexao.execute_wrappers, [capturador, 'medir_sql'])
@@ -0,0 +1,250 @@
+"""Testes do particionamento de `MedicaoAmbiental`.
+
+O que protegem:
+
+1. 🚨 **A conversao nao perde nome nem linha.** Constraints e indices voltam
+   com os nomes do catalogo, a chave primaria ganha `data`, e a tabela antiga
+   so cai depois de a contagem bater.
+2. **Os anos.** Da primeira medicao ate um alem do ano corrente, com a
+   `_padrao` para o que sobrar.
+3. **No SQLite, recusa clara** em vez de SQL que nao existe ali.
+4. 🚨 **No PostgreSQL de verdade**, a conversao de uma tabela com linhas, e o
+   upsert do `gravar` (`ON CONFLICT`) contra a tabela ja particionada.
+
+Os de 1 a 3 nao tocam num PostgreSQL: uma conexao falsa registra o SQL e
+devolve o que o catalogo devolveria. Os de 4 so rodam com `DATABASE_URL`
+apontando para um PostgreSQL; no SQLite sao pulados.
+"""
+
+from datetime import date
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from aquaculture.models import LocalRecife, MedicaoAmbiental
+from db import conferencia, particoes
+from ingestao.persistencia import gravar
+
+
+class CursorFalso:
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.rowcount = -1
+        self._resposta = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        return False
+
+    def execute(self, sql, parametros=None):
+        self.conexao.comandos.append(' '.join(sql.split()))
+        self._resposta = []
+        for trecho, resposta in self.conexao.respostas.items():
+            if trecho in sql:
+                self._resposta = resposta
+                break
+        if sql.startswith('INSERT'):
+            self.rowcount = self.conexao.copiadas
+
+    def fetchone(self):
+        return self._resposta[0] if self._resposta else None
+
+    def fetchall(self):
+        return list(self._resposta)
+
+
+class ConexaoFalsa:
+    vendor = 'postgresql'
+    alias = 'default'
+
+    def __init__(self, copiadas=3):
+        self.comandos = []
+        self.copiadas = copiadas
+        self.respostas = {
+            'pg_partitioned_table': [],
+            'FROM pg_constraint': [
+                ('aquaculture_medicaoambiental_pkey', 'p', 'PRIMARY KEY (id)', 101),
+                ('aquaculture_unique_medicao_local_data_variavel_fonte', 'u',
+                 'UNIQUE (local_recife_id, data, variavel, fonte)', 102),
+                ('aquaculture_medicaoam_local_recife_id_fk', 'f',
+                 'FOREIGN KEY (local_recife_id) REFERENCES aquaculture_localrecife(id) '
+                 'DEFERRABLE INITIALLY DEFERRED', 0),
+            ],
+            'FROM pg_index': [
+                ('CREATE INDEX aquaculture_variave_b4854a_idx ON '
+                 'public.aquaculture_medicaoambiental USING btree (variavel, data)',),
+            ],
+            'SELECT MIN(data)': [(date(2024, 5, 1), date(2026, 3, 1), 3, 42)],
+        }
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def posicao(self, trecho):
+        return next(i for i, sql in enumerate(self.comandos) if trecho in sql)
+
+
+class AnosTests(SimpleTestCase):
+    def test_da_primeira_medicao_ate_um_alem_do_ano_corrente(self):
+        self.assertEqual(
+            particoes.anos_da_conversao(date(2023, 3, 1), date(2026, 10, 1), date(2026, 10, 19)),
+            (2023, 2024, 2025, 2026, 2027),
+        )
+        self.assertEqual(
+            particoes.anos_da_conversao(None, None, date(2026, 10, 19)), (2026, 2027),
+        )
+
+    def test_ano_da_faixa_do_catalogo(self):
+        self.assertEqual(
+            particoes.ano_da_faixa("FOR VALUES FROM ('2023-01-01') TO ('2024-01-01')"), 2023,
+        )
+        self.assertIsNone(particoes.ano_da_faixa('DEFAULT'))
+
+
+class ConversaoTests(TestCase):
+    def test_recria_nomes_com_data_na_chave_e_apaga_a_antiga_por_ultimo(self):
+        conexao = ConexaoFalsa()
+
+        conversao = particoes.converter(conexao, hoje=date(2026, 10, 19))
+
+        self.assertEqual(conversao.linhas, 3)
+        self.assertEqual(conversao.anos, (2024, 2025, 2026, 2027))
+        comandos = conexao.comandos
+        self.assertIn(
+            'ALTER TABLE "aquaculture_medicaoambiental" ADD CONSTRAINT '
+            '"aquaculture_medicaoambiental_pkey" PRIMARY KEY (id, data)',
+            comandos,
+        )
+        self.assertIn(
+            'ALTER TABLE "aquaculture_medicaoambiental" ADD CONSTRAINT '
+            '"aquaculture_unique_medicao_local_data_variavel_fonte" '
+            'UNIQUE (local_recife_id, data, variavel, fonte)',
+            comandos,
+        )
+        self.assertIn(
+            'CREATE TABLE "aquaculture_medicaoambiental_2027" PARTITION OF '
+            '"aquaculture_medicaoambiental" FOR VALUES FROM (\'2027-01-01\') TO (\'2028-01-01\')',
+            comandos,
+        )
+        self.assertIn('PARTITION OF "aquaculture_medicaoambiental" DEFAULT', ' '.join(comandos))
+        # A ordem que importa: copiar, apagar a antiga (libera os nomes), e so
+        # entao recriar constraints e indices.
+        self.assertLess(conexao.posicao('INSERT INTO'), conexao.posicao('DROP TABLE'))
+        self.assertLess(conexao.posicao('DROP TABLE'), conexao.posicao('ADD CONSTRAINT'))
+        self.assertLess(
+            conexao.posicao('DROP TABLE'), conexao.posicao('aquaculture_variave_b4854a_idx'),
+        )
+        self.assertIn('USING brin (data)', comandos[-2])
+
+    def test_contagem_que_nao_bate_desiste_antes_de_apagar(self):
+        conexao = ConexaoFalsa(copiadas=2)
+
+        with self.assertRaisesMessage(particoes.ParticionamentoIndisponivel, 'copiou 2 de 3'):
+            particoes.converter(conexao)
+
+        self.assertFalse(any(sql.startswith('DROP TABLE') for sql in conexao.comandos))
+
+    def test_tabela_ja_particionada_nao_converte_de_novo(self):
+        conexao = ConexaoFalsa()
+        conexao.respostas['pg_partitioned_table'] = [(1,)]
+
+        with self.assertRaises(particoes.ParticionamentoIndisponivel):
+            particoes.converter(conexao)
+
+
+class ComandoTests(TestCase):
+    @skipUnless(connection.vendor == 'sqlite', 'a recusa e a do SQLite')
+    def test_no_sqlite_recusa_com_motivo(self):
+        with self.assertRaisesMessage(CommandError, 'so no PostgreSQL'):
+            call_command('particionar_medicoes', stdout=StringIO())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'conversao real so no PostgreSQL')
+class ConversaoNoPostgresTests(TestCase):
+    """A conversao de verdade. O DDL do PostgreSQL e transacional: o rollback
+    do fim de cada teste devolve a tabela comum."""
+
+    def setUp(self):
+        MedicaoAmbiental.objects.all().delete()
+        self.local = LocalRecife.objects.create(
+            slug='teste-particao', nome='Teste', estado='PE',
+            cidade='Recife', latitude=-8.0, longitude=-34.8,
+        )
+
+    def medicao(self, dia, valor=27.0):
+        return MedicaoAmbiental(
+            local_recife=self.local, data=dia, variavel='sst', valor=valor,
+            unidade='°C', fonte='noaa_crw', dataset_id='dhw_5km',
+        )
+
+    def definicao(self, nome):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_get_constraintdef(oid) FROM pg_constraint '
+                'WHERE conrelid = %s::regclass AND conname = %s',
+                [particoes.TABELA, nome],
+            )
+            return cursor.fetchone()[0]
+
+    def particao_de(self, dia):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT tableoid::regclass::text FROM "{particoes.TABELA}" '
+                f'WHERE local_recife_id = %s AND data = %s',
+                [self.local.pk, dia],
+            )
+            return cursor.fetchone()[0]
+
+    def test_converte_com_linhas_e_o_upsert_continua_valendo(self):
+        gravar([self.medicao(date(2024, 3, 1)), self.medicao(date(2026, 9, 30))])
+
+        conversao = particoes.converter(connection, hoje=date(2026, 10, 19))
+
+        self.assertEqual(conversao.linhas, 2)
+        self.assertEqual(conversao.anos, (2024, 2025, 2026, 2027))
+        with connection.cursor() as cursor:
+            self.assertTrue(particoes.particionada(cursor))
+            nomes = {p.nome for p in particoes.particoes(cursor)}
+        self.assertEqual(nomes, {
+            particoes.PADRAO, *(particoes.nome_da_particao(ano) for ano in conversao.anos),
+        })
+        self.assertEqual(
+            self.definicao('aquaculture_medicaoambiental_pkey'), 'PRIMARY KEY (id, data)',
+        )
+        self.assertEqual(
+            self.definicao('aquaculture_unique_medicao_local_data_variavel_fonte'),
+            'UNIQUE (local_recife_id, data, variavel, fonte)',
+        )
+        self.assertEqual(self.particao_de(date(2024, 3, 1)), 'aquaculture_medicaoambiental_2024')
+        # Particionada, a mae nao tem dado: o tamanho e o das filhas.
+        tamanho, = conferencia.tamanhos([particoes.TABELA])
+        self.assertGreater(tamanho.tabela_bytes, 0)
+        self.assertGreater(tamanho.indices_bytes, 0)
+
+        # O upsert do `gravar`: a mesma chave atualiza, a nova entra no ano dela.
+        gravar([self.medicao(date(2026, 9, 30), valor=28.5), self.medicao(date(2027, 1, 2))])
+
+        self.assertEqual(MedicaoAmbiental.objects.count(), 3)
+        self.assertEqual(MedicaoAmbiental.objects.get(data=date(2026, 9, 30)).valor, 28.5)
+        self.assertEqual(self.particao_de(date(2027, 1, 2)), 'aquaculture_medicaoambiental_2027')
+        ids = list(MedicaoAmbiental.objects.values_list('id', flat=True))
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_ano_sem_particao_cai_na_padrao_e_garantir_anos_o_tira_de_la(self):
+        gravar([self.medicao(date(2026, 5, 1))])
+        particoes.converter(connection, hoje=date(2026, 10, 19))
+
+        gravar([self.medicao(date(2029, 2, 1))])
+        self.assertEqual(self.particao_de(date(2029, 2, 1)), particoes.PADRAO)
+
+        criadas = particoes.garantir_anos(connection, 2029)
+
+        self.assertEqual(criadas, {2028: 0, 2029: 1})
+        self.assertEqual(self.particao_de(date(2029, 2, 1)), 'aquaculture_medicaoambiental_2029')
+        gravar([self.medicao(date(2029, 2, 1), valor=30.0)])
+        self.assertEqual(MedicaoAmbiental.objects.get(data=date(2029, 2, 1)).valor, 30.0)
@@ -11,6 +11,8 @@ O que protegem, em ordem de gravidade:
    grafo parcial e silencioso; a conferencia e o que transforma "rodou" em
    "esta certo".
 4. **Toda medicao tem proveniencia.** E a razao de o grafo existir.
+5. **Toda projecao fica registrada**, ate a que falha: o id dela e a versao
+   que invalida o cache das paginas do grafo.
 
 Nao tocam no Neo4j: injetam uma conexao falsa que registra o Cypher.
 """
@@ -19,7 +21,7 @@ from datetime import date
 
 from django.test import TestCase
 
-from aquaculture.models import Especie, LocalRecife, MedicaoAmbiental
+from aquaculture.models import Especie, ExecucaoProjecao, LocalRecife, MedicaoAmbiental
 from db import projecao
 
 
@@ -352,3 +354,32 @@ class ProjecaoTests(TestCase):
 
         self.assertEqual(resultado.medicoes, 0)
         self.assertTrue(resultado.avisos)
+
+    # --- o registro da execucao ---------------------------------------------
+
+    def test_projetar_registra_a_execucao_concluida(self):
+        resultado = projecao.projetar(ConexaoFalsa(), limpar_antes=False)
+
+        execucao = ExecucaoProjecao.objects.get()
+        self.assertIsNotNone(execucao.concluida_em)
+        self.assertEqual(execucao.erro, '')
+        self.assertEqual((execucao.nos, execucao.relacoes), (resultado.nos, resultado.relacoes))
+        self.assertEqual(ExecucaoProjecao.versao_do_grafo(), execucao.pk)
+
+    def test_projecao_que_falha_tambem_muda_a_versao(self):
+        """O grafo ja foi mexido: o cache da versao anterior nao vale mais."""
+        projecao.projetar(ConexaoFalsa(), limpar_antes=False)
+        anterior = ExecucaoProjecao.versao_do_grafo()
+
+        class Quebra(ConexaoFalsa):
+            def run(self, cypher, parametros=None):
+                if 'MedicaoAmbiental {id' in cypher:
+                    raise RuntimeError('conexao caiu')
+                return super().run(cypher, parametros)
+
+        with self.assertRaises(RuntimeError):
+            projecao.projetar(Quebra(), limpar_antes=False)
+
+        falha = ExecucaoProjecao.objects.latest('iniciada_em')
+        self.assertEqual(falha.erro, 'RuntimeError: conexao caiu')
+        self.assertNotEqual(ExecucaoProjecao.versao_do_grafo(), anterior)
@@ -42,6 +42,9 @@ class ResultadoColeta:
     # espelho nao publica. Vai para `ExecucaoIngestao.mensagem_erro` sem
     # marcar a execucao como falha.
     nota: str = ''
+    # Tamanho do que a fonte devolveu, ja decodificado. So para a metrica
+    # `ingestao_bytes_recebidos_total`; zero quando o conector nao informa.
+    bytes_recebidos: int = 0
 
     @property
     def houve_falha(self):
@@ -30,6 +30,8 @@ from datetime import date, timedelta
 
 from django.conf import settings
 
+from observabilidade import trecho
+
 from ..base import ConectorBase, Observacao, PeriodoIndisponivel, ResultadoColeta
 from ..erros import resumir_erro
 from ..retentativa import TENTATIVAS_PADRAO, executar_com_retentativa
@@ -115,6 +117,8 @@ class ConectorCopernicus(ConectorBase):
         # `abrir` existe para injetar um duble nos testes: a alternativa seria
         # nao cobrir nada do planejamento da emenda sem bater na rede.
         self._abrir = abrir or self._abrir_cmems
+        # Tamanho dos recortes lidos na coleta corrente (ResultadoColeta.bytes_recebidos).
+        self._recebidos = 0
 
     def _abrir_cmems(self, fonte, bbox):
         """Abre o dataset preguicosamente, sem recortar o tempo ainda.
@@ -142,7 +146,8 @@ class ConectorCopernicus(ConectorBase):
         `ultima_data` e o fim da cobertura do dataset, nao do trecho - quem
         chama usa isso para saber onde a proxima fonte deve continuar.
         """
-        ds = self._abrir(fonte, bbox)
+        with trecho('copernicus.abrir', dataset=fonte.dataset_id):
+            ds = self._abrir(fonte, bbox)
 
         disponivel_ate = _como_data(ds.time.values[-1])
         disponivel_de = _como_data(ds.time.values[0])
@@ -152,26 +157,32 @@ class ConectorCopernicus(ConectorBase):
         if recorte_inicio > recorte_fim:
             return [], disponivel_ate
 
-        serie = ds[fonte.variavel].sel(
-            time=slice(recorte_inicio.isoformat(), recorte_fim.isoformat())
-        )
-        dimensoes = [d for d in DIMENSOES_AGREGADAS if d in serie.dims]
-        if dimensoes:
-            serie = serie.mean(dim=dimensoes, skipna=True)
-
-        quadro = serie.to_dataframe().reset_index()
-
-        observacoes = []
-        for _, linha in quadro.iterrows():
-            valor = linha[fonte.variavel]
-            observacoes.append(
-                Observacao(
-                    data=_como_data(linha['time']),
-                    coluna=fonte.variavel,
-                    valor=None if valor != valor else float(valor),  # NaN
-                    dataset_id=fonte.dataset_id,
-                )
+        # O dataset e preguicoso: o download acontece aqui, na media e no
+        # `to_dataframe`, e nao no `open_dataset`.
+        with trecho('copernicus.download', dataset=fonte.dataset_id):
+            serie = ds[fonte.variavel].sel(
+                time=slice(recorte_inicio.isoformat(), recorte_fim.isoformat())
             )
+            # Antes da media: e o recorte inteiro que o open_dataset baixa.
+            self._recebidos += int(serie.nbytes)
+            dimensoes = [d for d in DIMENSOES_AGREGADAS if d in serie.dims]
+            if dimensoes:
+                serie = serie.mean(dim=dimensoes, skipna=True)
+
+            quadro = serie.to_dataframe().reset_index()
+
+        with trecho('copernicus.extrair', linhas=len(quadro)):
+            observacoes = []
+            for _, linha in quadro.iterrows():
+                valor = linha[fonte.variavel]
+                observacoes.append(
+                    Observacao(
+                        data=_como_data(linha['time']),
+                        coluna=fonte.variavel,
+                        valor=None if valor != valor else float(valor),  # NaN
+                        dataset_id=fonte.dataset_id,
+                    )
+                )
 
         return observacoes, disponivel_ate
 
@@ -242,9 +253,16 @@ class ConectorCopernicus(ConectorBase):
         if usados:
             notas.append('Datasets usados: ' + ', '.join(sorted(set(usados))))
 
-        return ResultadoColeta(observacoes=observacoes, nota=' | '.join(notas))
+        return ResultadoColeta(
+            observacoes=observacoes,
+            nota=' | '.join(notas),
+            bytes_recebidos=self._recebidos,
+        )
 
     def _coletar_tudo(self, bbox, inicio, fim):
+        # Zerado aqui, e nao em `coletar`: a retentativa chama de novo, e o
+        # que conta e o recorte da tentativa que deu certo.
+        self._recebidos = 0
         observacoes, usados = [], []
         for nome_serie in self.series:
             trecho, fontes = self._coletar_serie(nome_serie, bbox, inicio, fim)
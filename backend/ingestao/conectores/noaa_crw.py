@@ -21,6 +21,8 @@ from datetime import datetime, timezone
 
 from django.conf import settings
 
+from observabilidade import trecho
+
 from ..base import ConectorBase, Observacao, PeriodoIndisponivel, ResultadoColeta
 from ..erros import resumir_erro
 from ..retentativa import TENTATIVAS_PADRAO, executar_com_retentativa
@@ -383,9 +385,10 @@ class ConectorNoaaCrw(ConectorBase):
             if self._dormir is not None:
                 argumentos['dormir'] = self._dormir
 
-            df, nota = executar_com_retentativa(
-                lambda: self._buscar(bbox, inicio, fim), **argumentos
-            )
+            with trecho('noaa.download'):
+                df, nota = executar_com_retentativa(
+                    lambda: self._buscar(bbox, inicio, fim), **argumentos
+                )
         except PeriodoIndisponivel as exc:
             # Nao e falha: a fonte so ainda nao publicou o periodo pedido.
             logger.info('NOAA CRW sem dado novo: %s', exc)
@@ -397,7 +400,10 @@ class ConectorNoaaCrw(ConectorBase):
             logger.debug('Detalhe completo da falha do NOAA CRW', exc_info=exc)
             return ResultadoColeta(erro=resumo, dataset_id=self.dataset_id)
 
-        resultado = self._extrair(df)
+        with trecho('noaa.extrair', linhas=0 if df is None else len(df)):
+            resultado = self._extrair(df)
+        if df is not None:
+            resultado.bytes_recebidos = int(df.memory_usage(deep=True).sum())
         if nota and not resultado.nota:
             resultado.nota = nota
         return resultado
@@ -9,6 +9,11 @@ Aqui a gravacao usa upsert sobre a constraint
 atualiza os mesmos registros em vez de duplicar ou apagar.
 """
 
+from itertools import groupby
+
+from django.db import transaction
+
+from aquaculture import cobertura
 from aquaculture.models import MedicaoAmbiental
 
 from .normalizacao import ColunaRecusada, normalizar
@@ -16,10 +21,10 @@ from .qualidade import validar
 
 CAMPOS_ATUALIZAVEIS = [
     'valor',
-    'unidade',
-    'dataset_id',
+    # Unidade e dataset (`origem`) e o texto da observacao (`nota`).
+    'origem',
     'quality_flag',
-    'observacao',
+    'nota',
     'data_coleta',
 ]
 
@@ -74,17 +79,37 @@ def preparar_medicoes(local, resultado, fonte):
 
 
 def gravar(medicoes):
-    """Upsert idempotente. Retorna a quantidade de registros processados."""
+    """Upsert idempotente, em ordem de data e um lote por ano.
+
+    Com a tabela particionada por ano (`db/particoes.py`), cada `INSERT ... ON
+    CONFLICT` cai numa particao so, em vez de espalhar o lote do backfill de
+    varios anos por todas elas. Sem particao, a ordem ainda vale: a tabela
+    continua crescendo em ordem de tempo, que e o que mantem justo o BRIN de
+    `data`, e dois upserts concorrentes travam as linhas na mesma ordem.
+
+    Retorna a quantidade de registros processados.
+    """
     if not medicoes:
         return 0
 
-    MedicaoAmbiental.objects.bulk_create(
-        medicoes,
-        update_conflicts=True,
-        unique_fields=['local_recife', 'data', 'variavel', 'fonte'],
-        update_fields=CAMPOS_ATUALIZAVEIS,
-        batch_size=500,
+    # O texto de unidade, dataset e observacao vira chave antes do lote:
+    # `bulk_create` nao passa pelo `save`.
+    MedicaoAmbiental.resolver_proveniencia(medicoes)
+    ordenadas = sorted(
+        medicoes, key=lambda m: (m.data, m.local_recife_id, m.variavel, m.fonte),
     )
+    # Uma transacao com o resumo de cobertura: o catalogo nunca conta
+    # medicao que nao foi gravada, nem deixa de contar a que foi.
+    with transaction.atomic():
+        cobertura.acumular(ordenadas)
+        for _, do_ano in groupby(ordenadas, key=lambda m: m.data.year):
+            MedicaoAmbiental.objects.bulk_create(
+                list(do_ano),
+                update_conflicts=True,
+                unique_fields=['local_recife', 'data', 'variavel', 'fonte'],
+                update_fields=CAMPOS_ATUALIZAVEIS,
+                batch_size=500,
+            )
     return len(medicoes)
 
 
@@ -9,28 +9,38 @@ em 25/07/2026: pedir 2020-2026 de uma vez (cerca de 2.400 dias x 5 variaveis x
 e a execucao inteira terminou com zero medicoes. Blocos tambem tornam o
 backfill retomavel - cada bloco e gravado assim que chega, entao uma
 interrupcao no meio nao joga fora o que ja veio.
+
+Cada bloco alimenta as metricas de `observabilidade.metricas`: medicoes
+gravadas e rejeitadas e tamanho recebido por (fonte, local), duracao do bloco
+por fonte e execucoes por status. O `ExecucaoIngestao` diz como foi cada
+execucao; as metricas dizem a vazao ao longo do dia sem consultar o banco.
 """
 
 import logging
+import time
 from datetime import timedelta
+from functools import cache
 
 from django.conf import settings
 from django.utils import timezone
+from django.utils.module_loading import import_string
 
 from aquaculture.models import ExecucaoIngestao
-from observabilidade import contexto
+from observabilidade import contexto, metricas, trecho
 
 from .base import ResultadoColeta
-from .conectores.copernicus import ConectorCopernicus
-from .conectores.noaa_crw import ConectorNoaaCrw
 from .erros import resumir_erro
 from .persistencia import gravar, preparar_medicoes, ultima_data_ingerida
 
 logger = logging.getLogger(__name__)
 
+# Slug -> caminho da classe. O modulo do conector so e importado quando ele e
+# pedido: listar as fontes, ou ingerir so uma delas, nao paga pelas outras.
+# 🚨 O slug aqui tem de ser o `slug` da propria classe; `ingestao/tests.py`
+# confere, porque a divergencia so apareceria na ingestao daquela fonte.
 CONECTORES = {
-    ConectorNoaaCrw.slug: ConectorNoaaCrw,
-    ConectorCopernicus.slug: ConectorCopernicus,
+    'noaa_crw': 'ingestao.conectores.noaa_crw.ConectorNoaaCrw',
+    'copernicus': 'ingestao.conectores.copernicus.ConectorCopernicus',
 }
 
 # Tamanho do bloco. 180 dias deixa cada requisicao em torno de 22 mil linhas
@@ -47,12 +57,48 @@ LIMITE_FALHAS_SEGUIDAS = 3
 # contagem: uma mensagem com dezenas de blocos nao ajuda a diagnosticar.
 LIMITE_ERROS_REGISTRADOS = 5
 
-
-def obter_conector(slug):
+GRAVADOS = metricas.contador(
+    'ingestao_registros_gravados_total',
+    'Medicoes gravadas pela ingestao.',
+    ('fonte', 'local'),
+)
+REJEITADOS = metricas.contador(
+    'ingestao_registros_rejeitados_total',
+    'Medicoes recusadas pela validacao de qualidade.',
+    ('fonte', 'local'),
+)
+# ⚠️ Tamanho do que a fonte devolveu ja decodificado (o quadro do ERDDAP, o
+# recorte do xarray), e nao bytes na rede: nenhum dos dois clientes expoe o
+# corpo cru. Serve para comparar fontes e blocos entre si.
+RECEBIDOS = metricas.contador(
+    'ingestao_bytes_recebidos_total',
+    'Tamanho decodificado dos dados devolvidos pela fonte, em bytes.',
+    ('fonte', 'local'),
+)
+DURACAO_BLOCO = metricas.histograma(
+    'ingestao_bloco_segundos',
+    'Duracao de um bloco (coleta, validacao e gravacao), por fonte e resultado.',
+    ('fonte', 'resultado'),
+    faixas=metricas.FAIXAS_BLOCO,
+)
+EXECUCOES = metricas.contador(
+    'ingestao_execucoes_total',
+    'Execucoes de ingestao concluidas, por fonte e status.',
+    ('fonte', 'status'),
+)
+
+
+@cache
+def classe_do_conector(slug):
+    """A classe registrada em `slug`, importada na primeira vez que e pedida."""
     if slug not in CONECTORES:
         disponiveis = ', '.join(sorted(CONECTORES))
         raise KeyError(f'Conector "{slug}" nao existe. Disponiveis: {disponiveis}')
-    return CONECTORES[slug]()
+    return import_string(CONECTORES[slug])
+
+
+def obter_conector(slug):
+    return classe_do_conector(slug)()
 
 
 def dividir_periodo(inicio, fim, dias):
@@ -123,7 +169,7 @@ def ingerir(local, inicio, fim, conector, incremental=True, janela_dias=None,
     """
     with contexto(
         fluxo='ingestao', fonte=conector.slug, local=local.slug
-    ) as correlacao:
+    ) as correlacao, trecho('ingestao'):
         execucao = _executar(
             local, inicio, fim, conector, incremental, janela_dias, progresso,
             correlacao,
@@ -183,11 +229,18 @@ def _executar(local, inicio, fim, conector, incremental, janela_dias,
         rotulo = f'{bloco_inicio} a {bloco_fim}'
         # ⚠️ Contexto por bloco: e o que faz a linha escrita la dentro de
         # `qualidade.py` ou de `persistencia.py` — modulos que nao conhecem
-        # esta camada — sair dizendo de qual bloco ela fala.
-        with contexto(bloco=rotulo, bloco_numero=numero, blocos=len(blocos)):
+        # esta camada — sair dizendo de qual bloco ela fala. O trecho e o
+        # mesmo contexto, cronometrado: download, extracao, preparo e gravacao
+        # viram as etapas do bloco no `Rastro concluido`.
+        with trecho('ingestao.bloco', bloco=rotulo, bloco_numero=numero, blocos=len(blocos)):
+            comeco = time.perf_counter()
             resultado = _coletar_bloco(conector, local, bloco_inicio, bloco_fim)
+            RECEBIDOS.inc(resultado.bytes_recebidos, fonte=conector.slug, local=local.slug)
 
             if resultado.houve_falha:
+                DURACAO_BLOCO.observar(
+                    time.perf_counter() - comeco, fonte=conector.slug, resultado='falha'
+                )
                 falhas_seguidas += 1
                 erros.append(f'[{rotulo}] {resultado.erro}')
                 logger.warning(
@@ -209,13 +262,22 @@ def _executar(local, inicio, fim, conector, incremental, janela_dias,
                 continue
 
             falhas_seguidas = 0
-            medicoes, rejeitadas, recusas = preparar_medicoes(
-                local, resultado, conector.slug
-            )
+            # Os trechos ficam aqui, e nao em `persistencia.py`: aquele modulo
+            # nao conhece a camada de observabilidade, e assim continua.
+            with trecho('ingestao.preparar'):
+                medicoes, rejeitadas, recusas = preparar_medicoes(
+                    local, resultado, conector.slug
+                )
             # Gravar por bloco, e nao no fim: um backfill longo interrompido no
             # meio preserva o que ja chegou, e a proxima execucao incremental
             # retoma dali.
-            gravadas = gravar(medicoes)
+            with trecho('ingestao.gravar', medicoes=len(medicoes)):
+                gravadas = gravar(medicoes)
+            DURACAO_BLOCO.observar(
+                time.perf_counter() - comeco, fonte=conector.slug, resultado='gravado'
+            )
+            GRAVADOS.inc(gravadas, fonte=conector.slug, local=local.slug)
+            REJEITADOS.inc(rejeitadas, fonte=conector.slug, local=local.slug)
 
             total_gravado += gravadas
             total_rejeitado += rejeitadas
@@ -262,5 +324,6 @@ def _executar(local, inicio, fim, conector, incremental, janela_dias,
     )
     execucao.concluido_em = timezone.now()
     execucao.save()
+    EXECUCOES.inc(fonte=conector.slug, status=execucao.status)
 
     return execucao
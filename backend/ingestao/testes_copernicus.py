@@ -128,6 +128,13 @@ class EmendaDeProdutosTests(TestCase):
         self.assertEqual(max(por_origem[REANALISE_SAL]), date(2026, 6, 23))
         self.assertEqual(min(por_origem[ANALISE_SAL]), date(2026, 6, 24))
 
+    def test_tamanho_recebido_soma_os_recortes_dos_dois_produtos(self):
+        so_reanalise, _ = self._coletar(date(2026, 6, 1), date(2026, 6, 23))
+        emendado, _ = self._coletar(date(2026, 6, 1), date(2026, 7, 10))
+
+        self.assertGreater(so_reanalise.bytes_recebidos, 0)
+        self.assertGreater(emendado.bytes_recebidos, so_reanalise.bytes_recebidos)
+
     def test_emenda_nao_duplica_datas(self):
         """Os dois produtos se sobrepoem de 2022 a 2026 - so um pode valer."""
         resultado, _ = self._coletar(date(2026, 6, 1), date(2026, 7, 10))
@@ -153,7 +160,7 @@ class EmendaDeProdutosTests(TestCase):
         ingerir(self.local, date(2026, 6, 1), date(2026, 7, 10), conector)
 
         datasets = set(
-            MedicaoAmbiental.objects.filter(fonte='copernicus')
+            MedicaoAmbiental.objects.com_proveniencia().filter(fonte='copernicus')
             .values_list('dataset_id', flat=True)
         )
         self.assertEqual(datasets, {REANALISE_SAL, ANALISE_SAL})
@@ -26,9 +26,15 @@ from ingestao.conectores.noaa_crw import (
 )
 from ingestao.erros import parece_documento_html, resumir_erro
 from ingestao.normalizacao import ColunaRecusada, normalizar, resolver_variavel
-from ingestao.persistencia import preparar_medicoes, ultima_data_ingerida
+from ingestao.persistencia import gravar, preparar_medicoes, ultima_data_ingerida
 from ingestao.qualidade import detectar_saltos, validar
-from ingestao.registro import dividir_periodo, ingerir
+from ingestao.registro import (
+    CONECTORES,
+    classe_do_conector,
+    dividir_periodo,
+    ingerir,
+    obter_conector,
+)
 from ingestao.retentativa import e_transitorio, executar_com_retentativa
 
 # Mensagem literal devolvida pelo ERDDAP do pfeg em 25/07/2026.
@@ -335,6 +341,13 @@ class ConectorNoaaCrwTests(TestCase):
             },
         )
 
+    def test_informa_o_tamanho_do_que_recebeu(self):
+        conector = ConectorNoaaCrw(cliente=ClienteErddapFalso(df_crw(dias=3)))
+
+        resultado = conector.coletar(self.local, date(2026, 1, 1), date(2026, 1, 3))
+
+        self.assertGreater(resultado.bytes_recebidos, 0)
+
     def test_falha_de_rede_nao_levanta_excecao(self):
         """Uma fonte fora do ar nao pode derrubar o pipeline."""
         conector = ConectorNoaaCrw(
@@ -649,6 +662,42 @@ class PreparacaoMedicoesTests(TestCase):
         self.assertEqual(len(recusas), 1)
         self.assertIn('Alcalinidade', recusas[0])
 
+    def test_gravar_em_ordem_de_data_e_um_lote_por_ano(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def medicao(dia, valor):
+            return MedicaoAmbiental(
+                local_recife=self.local, data=dia, variavel='sst', valor=valor,
+                unidade='°C', fonte='fonte_teste',
+            )
+
+        virada = [
+            medicao(date(2026, 1, 2), 27.0),
+            medicao(date(2025, 12, 31), 26.0),
+            medicao(date(2026, 1, 1), 26.5),
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(gravar(virada), 3)
+
+        # Uma por ano; a origem nova (unidade e dataset) entra a parte.
+        insercoes = [
+            c['sql'] for c in consultas
+            if c['sql'].startswith('INSERT INTO "aquaculture_medicaoambiental"')
+        ]
+        self.assertEqual(len(insercoes), 2)
+        self.assertEqual(
+            list(MedicaoAmbiental.objects.order_by('id').values_list('data', flat=True)),
+            [date(2025, 12, 31), date(2026, 1, 1), date(2026, 1, 2)],
+        )
+
+        # Continua upsert atravessando os lotes.
+        gravar([medicao(date(2025, 12, 31), 25.0), medicao(date(2026, 1, 2), 28.0)])
+        self.assertEqual(MedicaoAmbiental.objects.count(), 3)
+        self.assertEqual(
+            MedicaoAmbiental.objects.get(data=date(2025, 12, 31)).valor, 25.0,
+        )
+
 
 class TratamentoDeErroTests(TestCase):
     """Regressoes de duas falhas encontradas ao rodar contra o NOAA real.
@@ -911,6 +960,26 @@ class ConstraintsGriddapTests(TestCase):
         self.assertIn('depth', str(ctx.exception))
 
 
+class RegistroTests(TestCase):
+    def test_o_slug_registrado_e_o_da_propria_classe(self):
+        """A chave e escrita a mao; a divergencia so apareceria na ingestao."""
+        for slug in CONECTORES:
+            with self.subTest(slug=slug):
+                self.assertEqual(classe_do_conector(slug).slug, slug)
+
+    def test_obter_devolve_uma_instancia_nova(self):
+        primeiro, segundo = obter_conector('noaa_crw'), obter_conector('noaa_crw')
+
+        self.assertIsInstance(primeiro, classe_do_conector('noaa_crw'))
+        self.assertIsNot(primeiro, segundo)
+
+    def test_slug_desconhecido_lista_os_disponiveis(self):
+        with self.assertRaises(KeyError) as contexto:
+            obter_conector('inexistente')
+
+        self.assertIn('copernicus', str(contexto.exception))
+
+
 class DividirPeriodoTests(TestCase):
     """Fatiamento do periodo em blocos.
 
@@ -981,6 +1050,46 @@ class IngestaoPorBlocosTests(TestCase):
                 return ResultadoColeta(erro=f'falha simulada no bloco {numero}')
             return self._extrair(df_crw(dias=1))
 
+    def test_blocos_alimentam_as_metricas_da_fonte(self):
+        from ingestao import registro
+
+        # As metricas sao do processo e outros testes tambem ingerem noaa_crw:
+        # compara-se a diferenca, e nao o valor.
+        def leitura():
+            return (
+                registro.GRAVADOS.valor(fonte='noaa_crw', local=self.local.slug),
+                registro.DURACAO_BLOCO.contagem(fonte='noaa_crw', resultado='falha'),
+                registro.DURACAO_BLOCO.contagem(fonte='noaa_crw', resultado='gravado'),
+                registro.EXECUCOES.valor(fonte='noaa_crw', status='parcial'),
+            )
+
+        antes = leitura()
+        conector = self.ConectorPorBloco(blocos_que_falham=[2], dormir=Relogio())
+        execucao = ingerir(
+            self.local, date(2026, 1, 1), date(2026, 3, 31), conector, janela_dias=30,
+        )
+        depois = leitura()
+
+        diferenca = [d - a for a, d in zip(antes, depois, strict=True)]
+        self.assertEqual(diferenca, [execucao.registros_gravados, 1, 2, 1])
+        self.assertGreater(execucao.registros_gravados, 0)
+
+    def test_execucao_conclui_o_rastro_com_as_etapas(self):
+        conector = self.ConectorPorBloco(dormir=Relogio())
+
+        with self.assertLogs('observabilidade.rastro', 'INFO') as capturado:
+            ingerir(
+                self.local, date(2026, 1, 1), date(2026, 3, 31), conector, janela_dias=30,
+            )
+
+        final = capturado.records[-1]
+        self.assertEqual(final.getMessage(), 'Rastro concluido')
+        self.assertEqual(final.nome, 'ingestao')
+        self.assertLessEqual(
+            {'ingestao.bloco', 'ingestao.preparar', 'ingestao.gravar', 'proprio'},
+            set(final.por_etapa),
+        )
+
     def test_periodo_longo_e_dividido_em_varias_chamadas(self):
         conector = self.ConectorPorBloco(dormir=Relogio())
 
@@ -199,21 +199,59 @@ def avaliar(verdadeiro, previsto):
     )
 
 
+def numerar_dias(datas):
+    """Datas -> numero do dia (inteiro), para comparar e ordenar por vetor.
+
+    Aceita `date` e `Timestamp`; so a diferenca entre dois numeros tem
+    significado, e ela e em dias corridos.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if not len(datas):
+        return np.zeros(0, dtype=np.int64)
+    return (
+        pd.to_datetime(pd.Series(datas))
+        .to_numpy(dtype='datetime64[D]').astype(np.int64)
+    )
+
+
+def intervalos(dias, folga_dias=FOLGA_EPISODIO_DIAS):
+    """Dias ja ordenados -> posicoes do primeiro e do ultimo dia de cada episodio.
+
+    E `agrupar_episodios` sem montar lista: o episodio `k` vai de
+    `dias[primeiro[k]]` a `dias[ultimo[k]]`, e tem `ultimo[k] - primeiro[k] + 1`
+    dias.
+    """
+    import numpy as np
+
+    if not len(dias):
+        vazio = np.zeros(0, dtype=np.int64)
+        return vazio, vazio
+
+    quebra = np.flatnonzero(np.diff(dias) > folga_dias)
+    return np.r_[0, quebra + 1], np.r_[quebra, len(dias) - 1]
+
+
+def contar_dentro(dias, inicio, fim):
+    """Quantos `dias` (ordenados) caem em cada intervalo `[inicio, fim]`.
+
+    Duas buscas binarias por intervalo, em vez de perguntar dia a dia se ele
+    esta num conjunto.
+    """
+    import numpy as np
+
+    return (
+        np.searchsorted(dias, fim, side='right')
+        - np.searchsorted(dias, inicio, side='left')
+    )
+
+
 def agrupar_episodios(datas, folga_dias=FOLGA_EPISODIO_DIAS):
     """Agrupa datas em episodios contiguos. Retorna lista de listas de datas."""
     datas = sorted(datas)
-    if not datas:
-        return []
-
-    episodios, atual = [], [datas[0]]
-    for data in datas[1:]:
-        if (data - atual[-1]).days <= folga_dias:
-            atual.append(data)
-        else:
-            episodios.append(atual)
-            atual = [data]
-    episodios.append(atual)
-    return episodios
+    primeiro, ultimo = intervalos(numerar_dias(datas), folga_dias)
+    return [datas[i:f + 1] for i, f in zip(primeiro, ultimo, strict=True)]
 
 
 @dataclass(frozen=True)
@@ -235,38 +273,52 @@ class DesempenhoEpisodio:
         )
 
 
-def _episodios_de_um_local(quadro, previsto, folga_dias, rotulo):
-    alerta_real = quadro['alvo'] >= LIMIAR_ALERTA
-    alerta_previsto = previsto >= LIMIAR_ALERTA
+def _episodios_de_um_local(datas, dias, real, previsto, folga_dias, rotulo):
+    """Um local, ja ordenado por dia: episodios como intervalos `[inicio, fim]`.
 
+    Nada aqui percorre dia a dia. Os episodios reais e os previstos viram
+    vetores de inicio e fim, e as duas perguntas — quantos dias de cada
+    episodio real foram previstos, e se um episodio previsto encosta em dia
+    real — sao contagens de dias "real e previsto" dentro de cada intervalo.
+
+    Serve para o alarme falso porque os dias previstos dentro de um episodio
+    previsto sao exatamente os dias dele: encostar em evento real e ter algum
+    dia real e previsto ali dentro.
+    """
     # Indexado pela data do alvo: e o dia sobre o qual a previsao fala.
-    datas_reais = list(quadro.loc[alerta_real, 'alvo_data'])
-    datas_previstas = list(quadro.loc[alerta_previsto, 'alvo_data'])
-
-    reais = agrupar_episodios(datas_reais, folga_dias)
-    previstos = agrupar_episodios(datas_previstas, folga_dias)
-
-    previstas = set(datas_previstas)
-    detalhes, detectados = [], 0
-    for episodio in reais:
-        acertados = sum(1 for d in episodio if d in previstas)
-        if acertados:
-            detectados += 1
-        detalhes.append(
-            {
-                'local': rotulo,
-                'inicio': episodio[0],
-                'fim': episodio[-1],
-                'dias': len(episodio),
-                'dias_previstos': acertados,
-                'detectado': bool(acertados),
-            }
-        )
+    dias_reais = dias[real]
+    acertados_por_dia = dias[real & previsto]
 
-    reais_por_dia = set(datas_reais)
-    falsos = sum(1 for ep in previstos if not any(d in reais_por_dia for d in ep))
+    primeiro, ultimo = intervalos(dias_reais, folga_dias)
+    acertados = contar_dentro(
+        acertados_por_dia, dias_reais[primeiro], dias_reais[ultimo]
+    )
+    posicoes = real.nonzero()[0]
+
+    detalhes = [
+        {
+            'local': rotulo,
+            'inicio': datas[posicoes[i]],
+            'fim': datas[posicoes[f]],
+            'dias': int(f - i + 1),
+            'dias_previstos': int(a),
+            'detectado': bool(a),
+        }
+        for i, f, a in zip(primeiro, ultimo, acertados, strict=True)
+    ]
+
+    dias_previstos = dias[previsto]
+    p_primeiro, p_ultimo = intervalos(dias_previstos, folga_dias)
+    tocados = contar_dentro(
+        acertados_por_dia, dias_previstos[p_primeiro], dias_previstos[p_ultimo]
+    )
 
-    return len(reais), detectados, falsos, detalhes
+    return (
+        len(primeiro),
+        int((acertados > 0).sum()),
+        int((tocados == 0).sum()),
+        detalhes,
+    )
 
 
 def avaliar_episodios(quadro, previsto, folga_dias=FOLGA_EPISODIO_DIAS,
@@ -286,22 +338,40 @@ def avaliar_episodios(quadro, previsto, folga_dias=FOLGA_EPISODIO_DIAS,
     diferentes num evento so - foi o que aconteceu na primeira execucao real,
     onde 19 episodios viraram 7. Se `coluna_grupo` nao existir no quadro, o
     calculo e feito como local unico.
+
+    O quadro e ordenado uma vez, por local e data, e cortado nas fronteiras
+    entre locais - e nao refiltrado local a local. O custo fica linear no
+    numero de linhas, o que importa quando a mesma avaliacao roda para cada
+    modelo, limiar e horizonte.
     """
+    import numpy as np
+    import pandas as pd
+
     if coluna_grupo in getattr(quadro, 'columns', []):
-        grupos = [
-            (rotulo, quadro[quadro[coluna_grupo] == rotulo])
-            for rotulo in sorted(quadro[coluna_grupo].unique())
-        ]
+        codigos, rotulos = pd.factorize(quadro[coluna_grupo], sort=True)
     else:
-        grupos = [('', quadro)]
+        codigos, rotulos = np.zeros(len(quadro), dtype=np.int64), ['']
+
+    dias = numerar_dias(quadro['alvo_data'].to_numpy())
+    ordem = np.lexsort((dias, codigos))
+
+    codigos, dias = codigos[ordem], dias[ordem]
+    datas = quadro['alvo_data'].to_numpy()[ordem]
+    real = (quadro['alvo'] >= LIMIAR_ALERTA).to_numpy()[ordem]
+    previsto = (previsto.loc[quadro.index] >= LIMIAR_ALERTA).to_numpy()[ordem]
+
+    cortes = np.flatnonzero(np.diff(codigos)) + 1
+    inicios = np.r_[0, cortes] if len(codigos) else []
+    fins = np.r_[cortes, len(codigos)] if len(codigos) else []
 
     reais = detectados = falsos = 0
     detalhes = []
-    for rotulo, parte in grupos:
-        r, d, f, det = _episodios_de_um_local(
-            parte, previsto.loc[parte.index], folga_dias, rotulo
+    for i, f in zip(inicios, fins, strict=True):
+        r, d, fa, det = _episodios_de_um_local(
+            datas[i:f], dias[i:f], real[i:f], previsto[i:f], folga_dias,
+            rotulos[codigos[i]],
         )
-        reais, detectados, falsos = reais + r, detectados + d, falsos + f
+        reais, detectados, falsos = reais + r, detectados + d, falsos + fa
         detalhes.extend(det)
 
     return DesempenhoEpisodio(reais, detectados, falsos, detalhes)
@@ -0,0 +1,210 @@
+"""Intervalos por reamostragem para as metricas que o projeto relata.
+
+Ate aqui `Comparacao`, `ResultadoValidacao` e `Varredura` relatavam numero
+sozinho: "PR-AUC 0,712" sem dizer se o proximo conjunto de visitas daria 0,70
+ou 0,55. Com 166 visitas e ~4 anos-evento, a diferenca entre essas leituras e
+a diferenca entre um resultado e um acaso.
+
+**Reamostra-se o peso, nao a linha.** Uma reamostra bootstrap e so quantas
+vezes cada linha foi sorteada. Guardar isso como uma matriz de pesos
+(reamostras x linhas) deixa calcular a metrica de **todas** as reamostras de
+uma vez, com produto de matrizes e soma acumulada, em vez de chamar
+`average_precision_score` milhares de vezes. `pr_auc` da exatamente o que o
+scikit-learn da com `sample_weight` igual a esses pesos.
+
+**Reamostragem por bloco.** Linhas do mesmo sitio, ou do mesmo ano, nao sao
+independentes - e o mesmo motivo pelo qual a validacao e agrupada. Com
+`blocos`, o sorteio e de blocos inteiros, e cada linha herda o peso do seu
+bloco. E o que deve acompanhar uma validacao agrupada pelo mesmo criterio.
+
+⚠️ **O intervalo e de percentil e mede so a variacao de amostragem.** Nao
+corrige vies: o limiar escolhido olhando a mesma tabela continua otimista
+(docs/RESULTADOS.md secao 12.3), com ou sem intervalo ao lado.
+"""
+
+from dataclasses import dataclass
+
+REAMOSTRAS_PADRAO = 2000
+COBERTURA_PADRAO = 0.95
+
+# Reamostras geradas por vez. A matriz inteira de pesos de uma serie longa
+# (milhares de reamostras x dezenas de milhares de dias) nao cabe com folga
+# na memoria; em lotes, o custo e o mesmo e o pico fica limitado.
+LOTE_PADRAO = 250
+
+
+@dataclass(frozen=True)
+class Intervalo:
+    """Estimativa pontual e o intervalo de percentil das reamostras."""
+
+    estimativa: float
+    baixo: float
+    alto: float
+    cobertura: float = COBERTURA_PADRAO
+    # Reamostras em que a metrica foi definida. Uma reamostra sem nenhum
+    # positivo nao tem PR-AUC, e fica de fora em vez de virar zero.
+    reamostras: int = 0
+
+    def __str__(self):
+        return f'{self.estimativa:.3f} [{self.baixo:.3f}, {self.alto:.3f}]'
+
+
+def reamostrar(n, reamostras=REAMOSTRAS_PADRAO, semente=42, blocos=None,
+               lote=LOTE_PADRAO):
+    """Gera as matrizes de pesos, `lote` reamostras por vez.
+
+    Sem `blocos`, sorteia `n` linhas com reposicao. Com `blocos` (um rotulo
+    por linha), sorteia tantos blocos quantos existem, com reposicao, e cada
+    linha recebe o numero de vezes que o seu bloco saiu.
+    """
+    import numpy as np
+    import pandas as pd
+
+    gerador = np.random.default_rng(semente)
+    if blocos is None:
+        codigos, unidades = None, n
+    else:
+        codigos, rotulos = pd.factorize(np.asarray(blocos))
+        unidades = len(rotulos)
+
+    feitas = 0
+    while feitas < reamostras:
+        tamanho = min(lote, reamostras - feitas)
+        sorteio = gerador.integers(0, unidades, size=(tamanho, unidades))
+        deslocado = sorteio + (np.arange(tamanho) * unidades)[:, None]
+        contagem = np.bincount(
+            deslocado.ravel(), minlength=tamanho * unidades
+        ).reshape(tamanho, unidades)
+        yield contagem if codigos is None else contagem[:, codigos]
+        feitas += tamanho
+
+
+def pr_auc(verdadeiro, probabilidade, pesos):
+    """Precisao media (PR-AUC) de cada linha de `pesos`.
+
+    Mesma definicao de `average_precision_score`: soma, sobre os cortes
+    distintos, do ganho de revocacao vezes a precisao no corte. Empates de
+    probabilidade formam um corte so. NaN onde a reamostra nao tem positivo.
+    """
+    import numpy as np
+
+    y = np.asarray(verdadeiro).astype(bool)
+    p = np.asarray(probabilidade, dtype=float)
+    pesos = np.atleast_2d(pesos)
+
+    ordem = np.argsort(-p, kind='stable')
+    p_ordenada = p[ordem]
+    # Ultima posicao de cada corrida de probabilidades iguais: e ali que o
+    # corte "avisa todos com p >= este valor" termina.
+    fins = np.flatnonzero(np.r_[np.diff(p_ordenada) != 0, True])
+
+    w = pesos[:, ordem].astype(float)
+    vp = np.cumsum(w * y[ordem], axis=1)[:, fins]
+    avisados = np.cumsum(w, axis=1)[:, fins]
+
+    positivos = vp[:, -1:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precisao = np.where(avisados > 0, vp / avisados, 0.0)
+        revocacao = vp / positivos
+    ganho = np.diff(revocacao, axis=1, prepend=0.0)
+    valores = (ganho * precisao).sum(axis=1)
+    return np.where(positivos[:, 0] > 0, valores, np.nan)
+
+
+def brier(verdadeiro, probabilidade, pesos):
+    """Brier ponderado de cada linha de `pesos`."""
+    import numpy as np
+
+    erro = (np.asarray(probabilidade, dtype=float) - np.asarray(verdadeiro)) ** 2
+    pesos = np.atleast_2d(pesos).astype(float)
+    total = pesos.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, pesos @ erro / total, np.nan)
+
+
+def razao(numerador, denominador, pesos):
+    """`soma(numerador) / soma(denominador)` de cada reamostra.
+
+    Serve para taxa de deteccao (episodios detectados / reais) e afins.
+    `numerador` pode ter uma coluna por limiar: sai uma coluna por limiar.
+    """
+    import numpy as np
+
+    pesos = np.atleast_2d(pesos).astype(float)
+    cima = pesos @ np.asarray(numerador, dtype=float)
+    baixo = pesos @ np.asarray(denominador, dtype=float)
+    if cima.ndim == 2:
+        baixo = baixo[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(baixo > 0, cima / baixo, np.nan)
+
+
+def distribuicao(estatistica, n, reamostras=REAMOSTRAS_PADRAO, semente=42,
+                 blocos=None):
+    """`estatistica(pesos)` sobre todas as reamostras, empilhada."""
+    import numpy as np
+
+    return np.concatenate([
+        np.asarray(estatistica(pesos))
+        for pesos in reamostrar(n, reamostras, semente, blocos)
+    ])
+
+
+def intervalo(estimativa, amostras, cobertura=COBERTURA_PADRAO):
+    """Intervalo de percentil; `amostras` com uma coluna da varios intervalos."""
+    import numpy as np
+
+    amostras = np.asarray(amostras, dtype=float)
+    cauda = (1 - cobertura) / 2 * 100
+    if amostras.ndim == 2:
+        return tuple(
+            intervalo(e, amostras[:, j], cobertura)
+            for j, e in enumerate(estimativa)
+        )
+
+    validas = amostras[~np.isnan(amostras)]
+    if not len(validas):
+        return Intervalo(float(estimativa), np.nan, np.nan, cobertura, 0)
+    baixo, alto = np.percentile(validas, [cauda, 100 - cauda])
+    return Intervalo(float(estimativa), float(baixo), float(alto), cobertura,
+                     len(validas))
+
+
+def intervalo_pr_auc(verdadeiro, probabilidade, reamostras=REAMOSTRAS_PADRAO,
+                     semente=42, blocos=None, cobertura=COBERTURA_PADRAO):
+    import numpy as np
+
+    n = len(probabilidade)
+    estimativa = pr_auc(verdadeiro, probabilidade, np.ones((1, n)))[0]
+    amostras = distribuicao(
+        lambda pesos: pr_auc(verdadeiro, probabilidade, pesos),
+        n, reamostras, semente, blocos,
+    )
+    return intervalo(estimativa, amostras, cobertura)
+
+
+def intervalo_brier(verdadeiro, probabilidade, reamostras=REAMOSTRAS_PADRAO,
+                    semente=42, blocos=None, cobertura=COBERTURA_PADRAO):
+    import numpy as np
+
+    n = len(probabilidade)
+    estimativa = brier(verdadeiro, probabilidade, np.ones((1, n)))[0]
+    amostras = distribuicao(
+        lambda pesos: brier(verdadeiro, probabilidade, pesos),
+        n, reamostras, semente, blocos,
+    )
+    return intervalo(estimativa, amostras, cobertura)
+
+
+def intervalo_razao(numerador, denominador, reamostras=REAMOSTRAS_PADRAO,
+                    semente=42, blocos=None, cobertura=COBERTURA_PADRAO):
+    """Intervalo de `razao`; um por coluna se `numerador` tiver colunas."""
+    import numpy as np
+
+    n = len(denominador)
+    estimativa = razao(numerador, denominador, np.ones((1, n)))[0]
+    amostras = distribuicao(
+        lambda pesos: razao(numerador, denominador, pesos),
+        n, reamostras, semente, blocos,
+    )
+    return intervalo(estimativa, amostras, cobertura)
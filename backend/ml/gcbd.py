@@ -37,16 +37,24 @@ dois lados, e como a climatologia do sitio e constante, o modelo poderia
 reconhece-lo em vez de aprender o fenomeno. Ver `validar`.
 """
 
+import hashlib
+import logging
 import os
 from dataclasses import dataclass, field
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 # O arquivo nao e versionado (16 MB, reconstruivel pelo DOI - ver docs/GCBD.md).
 # A raiz do projeto e tres niveis acima deste arquivo: backend/ml/gcbd.py.
 RAIZ = Path(__file__).resolve().parents[2]
 CAMINHO_PADRAO = RAIZ / 'dados' / 'global_bleaching_environmental.csv'
 VARIAVEL_DE_AMBIENTE = 'GCBD_CSV'
 
+# Copia tipada do CSV, em Parquet, com o hash do arquivo de origem no nome.
+# Tambem nao versionada: se o CSV mudar, o hash muda e a copia e refeita.
+PASTA_DAS_COPIAS = RAIZ / 'dados' / 'cache'
+
 PAIS_PADRAO = 'Brazil'
 
 # ---------------------------------------------------------------------------
@@ -180,6 +188,25 @@ LIMIAR_DHW_NOAA = 4.0
 COLUNA_DHW = 'TSA_DHW'
 
 
+# ---------------------------------------------------------------------------
+# A leitura
+# ---------------------------------------------------------------------------
+
+# As colunas que alguma parte do projeto usa. O arquivo tem mais de 60; ler
+# todas como texto (`low_memory=False`) para depois jogar fora dois tercos era
+# o grosso do tempo de `treinar_gcbd` e `ingerir_gcbd`.
+COLUNAS_DE_TEXTO = (
+    'Country_Name', 'Site_Name', 'Ecoregion_Name', 'Exposure', 'Date',
+)
+COLUNAS_NUMERICAS = (
+    'Site_ID', 'Latitude_Degrees', 'Longitude_Degrees', 'Date_Year',
+    COLUNA_ALVO,
+    *TERMICAS_DO_DIA, *CLIMATOLOGIA_DO_SITIO, *CONTEXTO_DO_SITIO,
+    *SENTINELAS, *(c for c in COLUNAS_RECUSADAS if c not in SENTINELAS),
+)
+COLUNAS_LIDAS = (*COLUNAS_DE_TEXTO, *COLUNAS_NUMERICAS)
+
+
 class ArquivoAusente(FileNotFoundError):
     """O CSV do GCBD nao esta onde deveria."""
 
@@ -192,14 +219,17 @@ def caminho_do_csv(caminho=None):
     return Path(do_ambiente) if do_ambiente else CAMINHO_PADRAO
 
 
-def carregar(caminho=None, pais=PAIS_PADRAO):
+def carregar(caminho=None, pais=PAIS_PADRAO, colunas=()):
     """Le o CSV e devolve o recorte do pais, com o alvo ja numerico.
 
-    Nao agrega nem filtra coluna: devolve as linhas cruas do recorte, para que
-    `agregar_por_visita` possa ser testada em separado.
-    """
-    import pandas as pd
+    Nao agrega: devolve as linhas cruas do recorte, para que
+    `agregar_por_visita` possa ser testada em separado. Traz so `COLUNAS_LIDAS`,
+    ja tipadas, mais as `colunas` pedidas que nao estejam entre elas.
 
+    A primeira leitura de um arquivo grava uma copia tipada em Parquet
+    (`PASTA_DAS_COPIAS`); as seguintes leem a copia, ja filtrando o pais na
+    propria leitura. Pedir coluna fora de `COLUNAS_LIDAS` le o CSV direto.
+    """
     arquivo = caminho_do_csv(caminho)
     if not arquivo.exists():
         raise ArquivoAusente(
@@ -208,13 +238,91 @@ def carregar(caminho=None, pais=PAIS_PADRAO):
             f'{CAMINHO_PADRAO}, ou aponte {VARIAVEL_DE_AMBIENTE} para ele.'
         )
 
-    quadro = pd.read_csv(arquivo, low_memory=False)
-    if pais:
-        do_pais = quadro['Country_Name'].astype(str).str.strip() == pais
-        quadro = quadro[do_pais].copy()
+    extras = tuple(c for c in colunas if c not in COLUNAS_LIDAS)
+    if extras or not _tem_pyarrow():
+        quadro = _ler_csv(arquivo, (*COLUNAS_LIDAS, *extras))
+        if pais:
+            quadro = quadro[quadro['Country_Name'] == pais]
+    else:
+        quadro = _ler_copia(arquivo, pais)
+
+    return quadro[quadro[COLUNA_ALVO].notna()].reset_index(drop=True)
+
+
+def _tem_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _ler_csv(arquivo, colunas):
+    """So as `colunas` que o arquivo tiver, ja tipadas.
+
+    Tudo e lido como texto e convertido depois, com `errors='coerce'`: o GCBD
+    marca ausencia com texto (`nd`) no meio de colunas numericas, e um tipo
+    declarado na leitura quebraria no primeiro. Continua muito mais rapido
+    que ler as mais de 60 colunas.
+    """
+    import pandas as pd
+
+    cabecalho = pd.read_csv(arquivo, nrows=0).columns
+    presentes = [c for c in colunas if c in cabecalho]
+    quadro = pd.read_csv(
+        arquivo, usecols=presentes, dtype=str,
+        engine='pyarrow' if _tem_pyarrow() else 'c',
+    )
+    for coluna in presentes:
+        if coluna in COLUNAS_DE_TEXTO:
+            quadro[coluna] = quadro[coluna].str.strip()
+        else:
+            quadro[coluna] = pd.to_numeric(quadro[coluna], errors='coerce')
+    return quadro[presentes]
+
+
+def _impressao_digital(arquivo):
+    resumo = hashlib.sha256()
+    with open(arquivo, 'rb') as entrada:
+        for bloco in iter(lambda: entrada.read(1 << 20), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()[:16]
+
+
+def _ler_copia(arquivo, pais):
+    """O recorte do pais lido da copia em Parquet, que e feita se faltar."""
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    copia = PASTA_DAS_COPIAS / f'{arquivo.stem}-{_impressao_digital(arquivo)}.parquet'
+    if not copia.exists():
+        quadro = _ler_csv(arquivo, COLUNAS_LIDAS)
+        _gravar_copia(quadro, copia, arquivo.stem)
+        if pais:
+            quadro = quadro[quadro['Country_Name'] == pais]
+        return quadro
+
+    filtro = ds.field('Country_Name') == pais if pais else None
+    return pq.read_table(copia, filters=filtro).to_pandas()
+
+
+def _gravar_copia(quadro, copia, prefixo):
+    """Grava a copia de uma vez so e apaga as de versoes anteriores do CSV.
 
-    quadro[COLUNA_ALVO] = pd.to_numeric(quadro[COLUNA_ALVO], errors='coerce')
-    return quadro[quadro[COLUNA_ALVO].notna()].copy()
+    Nao conseguir gravar nao e erro: a leitura ja foi feita, so a proxima nao
+    fica mais rapida.
+    """
+    provisoria = copia.with_suffix('.parquet.tmp')
+    try:
+        copia.parent.mkdir(parents=True, exist_ok=True)
+        quadro.to_parquet(provisoria, index=False)
+        os.replace(provisoria, copia)
+    except OSError as erro:
+        logger.warning('Copia tipada do GCBD nao gravada em %s: %s', copia, erro)
+        return
+    for antiga in copia.parent.glob(f'{prefixo}-*.parquet'):
+        if antiga != copia:
+            antiga.unlink(missing_ok=True)
 
 
 def limpar_sentinelas(quadro):
@@ -325,7 +433,7 @@ def montar(caminho=None, pais=PAIS_PADRAO, features=FEATURES_PADRAO,
         motivos = '; '.join(f'"{f}": {COLUNAS_RECUSADAS[f]}' for f in recusadas)
         raise ValueError(f'Coluna(s) recusada(s) como feature - {motivos}')
 
-    cru = carregar(caminho, pais)
+    cru = carregar(caminho, pais, colunas=features)
     linhas = len(cru)
 
     cru, trocados = limpar_sentinelas(cru)
@@ -465,6 +573,9 @@ class ResultadoValidacao:
     desempenho: object = None
     desempenho_noaa: object = None
     por_dobra: list = field(default_factory=list)
+    # `bootstrap.Intervalo`s, reamostrando os mesmos grupos da validacao.
+    intervalo_pr_auc: object = None
+    intervalo_brier: object = None
 
     @property
     def ganho_sobre_acaso(self):
@@ -482,6 +593,16 @@ class ResultadoValidacao:
             f'  PR-AUC = {self.pr_auc:.3f}   (taxa base = {self.taxa_base:.3f}, '
             f'ganho = {self.ganho_sobre_acaso:.2f}x)',
             f'  Brier  = {self.brier:.3f}',
+        ]
+        if self.intervalo_pr_auc is not None:
+            linhas.append(
+                f'  IC 95% reamostrando por {self.agrupamento}: '
+                f'PR-AUC {self.intervalo_pr_auc.baixo:.3f} a '
+                f'{self.intervalo_pr_auc.alto:.3f}, '
+                f'Brier {self.intervalo_brier.baixo:.3f} a '
+                f'{self.intervalo_brier.alto:.3f}'
+            )
+        linhas += [
             '',
             f'  modelo:      {self.desempenho}',
             f'  regra NOAA:  {self.desempenho_noaa}',
@@ -496,8 +617,96 @@ class ResultadoValidacao:
         return '\n'.join(linhas)
 
 
+# ---------------------------------------------------------------------------
+# Dobras em paralelo
+# ---------------------------------------------------------------------------
+#
+# Cada dobra e independente das outras: ajusta no treino, preve no teste. Com
+# `trabalhadores` > 1 elas vao para processos separados pelo `joblib`, que ja
+# vem com o scikit-learn. A matriz de features vai como array NumPy, e o
+# `joblib` a entrega aos processos por memmap em vez de copia-la em cada um.
+#
+# O padrao e 1, serial, de proposito: com as 166 visitas brasileiras subir
+# processos custa mais que ajustar as dobras. Paralelo compensa no GCBD global
+# e em `validar_repetido`, que multiplica as dobras pelas repeticoes.
+
+
+def _executar(funcao, tarefas, trabalhadores=1):
+    """`funcao(*tarefa)` para cada tarefa, na ordem, em serie ou em processos."""
+    tarefas = list(tarefas)
+    if trabalhadores in (None, 1) or len(tarefas) < 2:
+        return [funcao(*tarefa) for tarefa in tarefas]
+
+    from joblib import Parallel, delayed
+
+    return Parallel(n_jobs=trabalhadores, max_nbytes='1M', mmap_mode='r')(
+        delayed(funcao)(*tarefa) for tarefa in tarefas
+    )
+
+
+def _matrizes(conjunto, agrupar_por):
+    """(X, y, grupos, colunas) como arrays, prontos para ir aos processos."""
+    if agrupar_por not in AGRUPAMENTOS:
+        raise ValueError(
+            f'Agrupamento "{agrupar_por}" desconhecido. '
+            f'Disponiveis: {list(AGRUPAMENTOS)}.'
+        )
+    quadro = conjunto.quadro
+    colunas = list(conjunto.features)
+    return (
+        quadro[colunas].to_numpy(dtype=float),
+        quadro['alvo'].to_numpy(),
+        quadro[AGRUPAMENTOS[agrupar_por]].to_numpy(),
+        colunas,
+    )
+
+
+def _particoes(X, y, grupos, agrupar_por, n_dobras, embaralhar_com=None):
+    """As dobras agrupadas. `embaralhar_com` sorteia quais grupos vao juntos."""
+    import numpy as np
+    from sklearn.model_selection import GroupKFold
+
+    n_grupos = len(np.unique(grupos))
+    dobras = min(n_dobras, n_grupos)
+    if dobras < 2:
+        raise ValueError(
+            f'Ha apenas {n_grupos} grupo(s) de "{agrupar_por}" - nao da para '
+            f'validar de forma agrupada.'
+        )
+    if embaralhar_com is None:
+        divisor = GroupKFold(n_splits=dobras)
+    else:
+        divisor = GroupKFold(
+            n_splits=dobras, shuffle=True, random_state=embaralhar_com
+        )
+    return list(divisor.split(X, y, grupos))
+
+
+def _quadro(X, colunas):
+    import pandas as pd
+
+    return pd.DataFrame(X, columns=colunas)
+
+
+def _prever_dobra(nome, semente, X, y, colunas, treino, teste):
+    """Probabilidade no teste de um modelo ajustado no treino.
+
+    None quando o treino tem uma classe so: uma dobra assim nao ensina o modelo
+    a distinguir nada - e `fit` nem aceita alvo de uma classe so.
+    """
+    import numpy as np
+
+    from .modelo import construir
+
+    if len(np.unique(y[treino])) < 2:
+        return None
+    pipeline = construir(nome, semente)
+    pipeline.fit(_quadro(X[treino], colunas), y[treino])
+    return pipeline.predict_proba(_quadro(X[teste], colunas))[:, 1]
+
+
 def validar(conjunto, nome='logistica', agrupar_por='sitio', n_dobras=5,
-            limiar=0.5, semente=42):
+            limiar=0.5, semente=42, trabalhadores=1, reamostras=None):
     """Validacao cruzada agrupada, com as predicoes fora-da-dobra reunidas.
 
     ⚠️ **O agrupamento nao e detalhe.** Sao 166 visitas em 119 sitios: varias
@@ -514,48 +723,38 @@ def validar(conjunto, nome='logistica', agrupar_por='sitio', n_dobras=5,
     media de PR-AUC por dobra daria o mesmo peso a uma dobra de 1 amostra e a
     uma de 33. Reunir as predicoes fora-da-dobra e calcular uma metrica so trata
     cada visita uma vez, que e o que se quer.
+
+    `trabalhadores` ajusta as dobras em processos separados; o resultado e o
+    mesmo da execucao serial.
+
+    PR-AUC e Brier saem com intervalo bootstrap que sorteia **grupos
+    inteiros** do mesmo `agrupar_por` (`reamostras=0` desliga).
     """
     import numpy as np
     import pandas as pd
     from sklearn.metrics import average_precision_score, brier_score_loss
-    from sklearn.model_selection import GroupKFold
-
-    from .modelo import construir
 
-    if agrupar_por not in AGRUPAMENTOS:
-        raise ValueError(
-            f'Agrupamento "{agrupar_por}" desconhecido. '
-            f'Disponiveis: {list(AGRUPAMENTOS)}.'
-        )
+    X, y_array, grupos, colunas = _matrizes(conjunto, agrupar_por)
+    particoes = _particoes(X, y_array, grupos, agrupar_por, n_dobras)
 
     quadro = conjunto.quadro
-    colunas = list(conjunto.features)
-    X = quadro[colunas]
     y = quadro['alvo']
-    grupos = quadro[AGRUPAMENTOS[agrupar_por]]
 
-    n_grupos = grupos.nunique()
-    dobras = min(n_dobras, n_grupos)
-    if dobras < 2:
-        raise ValueError(
-            f'Ha apenas {n_grupos} grupo(s) de "{agrupar_por}" - nao da para '
-            f'validar de forma agrupada.'
-        )
+    previsoes = _executar(
+        _prever_dobra,
+        ((nome, semente, X, y_array, colunas, treino, teste)
+         for treino, teste in particoes),
+        trabalhadores,
+    )
 
     probabilidade = np.full(len(quadro), np.nan)
     por_dobra = []
 
-    for indice, (treino, teste) in enumerate(
-        GroupKFold(n_splits=dobras).split(X, y, grupos), start=1
+    for indice, ((_, teste), p) in enumerate(
+        zip(particoes, previsoes, strict=True), start=1
     ):
-        # Uma dobra sem as duas classes no treino nao ensina o modelo a
-        # distinguir nada - e `fit` nem aceita alvo de uma classe so.
-        if y.iloc[treino].nunique() < 2:
+        if p is None:
             continue
-
-        pipeline = construir(nome, semente)
-        pipeline.fit(X.iloc[treino], y.iloc[treino])
-        p = pipeline.predict_proba(X.iloc[teste])[:, 1]
         probabilidade[teste] = p
 
         prev_dobra = (p >= limiar).astype(int)
@@ -574,6 +773,21 @@ def validar(conjunto, nome='logistica', agrupar_por='sitio', n_dobras=5,
 
     taxa_base = float(y_avaliado.mean()) if len(y_avaliado) else 0.0
 
+    intervalos = {}
+    if reamostras != 0 and y_avaliado.nunique() > 1:
+        from . import bootstrap
+
+        blocos = grupos[avaliadas]
+        reamostras = reamostras or bootstrap.REAMOSTRAS_PADRAO
+        intervalos = {
+            'intervalo_pr_auc': bootstrap.intervalo_pr_auc(
+                y_avaliado, p_avaliada, reamostras, semente, blocos
+            ),
+            'intervalo_brier': bootstrap.intervalo_brier(
+                y_avaliado, p_avaliada, reamostras, semente, blocos
+            ),
+        }
+
     return ResultadoValidacao(
         modelo=nome,
         agrupamento=agrupar_por,
@@ -590,6 +804,121 @@ def validar(conjunto, nome='logistica', agrupar_por='sitio', n_dobras=5,
             y_avaliado, prever_regra_noaa(quadro.loc[y_avaliado.index])
         ),
         por_dobra=por_dobra,
+        **intervalos,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Validacao repetida
+# ---------------------------------------------------------------------------
+
+# Quantas vezes sortear de novo quais grupos caem juntos em cada dobra.
+REPETICOES_CV_PADRAO = 20
+
+
+@dataclass
+class ValidacaoRepetida:
+    """A mesma validacao agrupada, sobre varios sorteios das dobras.
+
+    ⚠️ **A faixa nao e intervalo de confianca.** Ela mede quanto a PR-AUC
+    depende de como os grupos cairam nas dobras - com 119 sitios em 5 dobras,
+    isso nao e pouco. A incerteza de amostragem (outras 166 visitas) e outra
+    pergunta, e continua de fora.
+    """
+
+    modelo: str
+    agrupamento: str
+    n_dobras: int
+    pr_auc: tuple = ()
+    brier: tuple = ()
+    taxa_base: float = 0.0
+
+    @staticmethod
+    def _faixa(valores, cobertura=0.95):
+        import numpy as np
+
+        if not len(valores):
+            return (0.0, 0.0)
+        cauda = (1 - cobertura) / 2 * 100
+        baixo, alto = np.percentile(valores, [cauda, 100 - cauda])
+        return float(baixo), float(alto)
+
+    @property
+    def pr_auc_media(self):
+        return sum(self.pr_auc) / len(self.pr_auc) if self.pr_auc else 0.0
+
+    @property
+    def brier_medio(self):
+        return sum(self.brier) / len(self.brier) if self.brier else 0.0
+
+    @property
+    def faixa_pr_auc(self):
+        return self._faixa(self.pr_auc)
+
+    @property
+    def faixa_brier(self):
+        return self._faixa(self.brier)
+
+    def resumo(self):
+        baixo, alto = self.faixa_pr_auc
+        b_baixo, b_alto = self.faixa_brier
+        return '\n'.join([
+            f'Modelo "{self.modelo}" - {len(self.pr_auc)} sorteios de '
+            f'{self.n_dobras} dobras agrupadas por {self.agrupamento}',
+            '',
+            f'  PR-AUC = {self.pr_auc_media:.3f}   (95% dos sorteios entre '
+            f'{baixo:.3f} e {alto:.3f}; taxa base = {self.taxa_base:.3f})',
+            f'  Brier  = {self.brier_medio:.3f}   (entre {b_baixo:.3f} e {b_alto:.3f})',
+        ])
+
+
+def validar_repetido(conjunto, nome='logistica', agrupar_por='sitio',
+                     n_dobras=5, repeticoes=REPETICOES_CV_PADRAO, semente=42,
+                     trabalhadores=1):
+    """`validar` repetida sobre `repeticoes` sorteios de dobras agrupadas.
+
+    Cada sorteio reune as predicoes fora-da-dobra e calcula uma PR-AUC e um
+    Brier, exatamente como `validar`. Todas as dobras de todos os sorteios vao
+    de uma vez para `trabalhadores` processos (`-1` = um por nucleo, como no
+    `joblib`): com nucleos suficientes, custa o tempo de uma validacao serial.
+    O padrao e serial, como em `validar`.
+    """
+    import numpy as np
+    from sklearn.metrics import average_precision_score, brier_score_loss
+
+    X, y, grupos, colunas = _matrizes(conjunto, agrupar_por)
+    sorteios = [
+        _particoes(X, y, grupos, agrupar_por, n_dobras, embaralhar_com=semente + r)
+        for r in range(repeticoes)
+    ]
+    previsoes = iter(_executar(
+        _prever_dobra,
+        ((nome, semente, X, y, colunas, treino, teste)
+         for particoes in sorteios for treino, teste in particoes),
+        trabalhadores,
+    ))
+
+    pr_aucs, briers = [], []
+    for particoes in sorteios:
+        probabilidade = np.full(len(y), np.nan)
+        for (_, teste), p in zip(particoes, previsoes, strict=False):
+            if p is not None:
+                probabilidade[teste] = p
+        avaliadas = ~np.isnan(probabilidade)
+        if len(np.unique(y[avaliadas])) < 2:
+            continue
+        pr_aucs.append(float(average_precision_score(
+            y[avaliadas], probabilidade[avaliadas]
+        )))
+        briers.append(float(brier_score_loss(y[avaliadas], probabilidade[avaliadas])))
+
+    return ValidacaoRepetida(
+        modelo=nome,
+        agrupamento=agrupar_por,
+        n_dobras=len(sorteios[0]) if sorteios else 0,
+        pr_auc=tuple(pr_aucs),
+        brier=tuple(briers),
+        taxa_base=float(np.mean(y)) if len(y) else 0.0,
     )
 
 
@@ -633,66 +962,86 @@ class ImportanciaGCBD:
         return '\n'.join(linhas)
 
 
+def _importancia_da_dobra(nome, semente, X, y, colunas, treino, teste,
+                          repeticoes):
+    """Queda media do PR-AUC por coluna e coeficientes, numa dobra.
+
+    None quando treino ou teste tem uma classe so: sem as duas no teste, a
+    PR-AUC nem e definida.
+    """
+    import numpy as np
+    from sklearn.metrics import average_precision_score
+
+    from .modelo import construir
+
+    if len(np.unique(y[treino])) < 2 or len(np.unique(y[teste])) < 2:
+        return None
+
+    pipeline = construir(nome, semente)
+    pipeline.fit(_quadro(X[treino], colunas), y[treino])
+
+    fora = X[teste]
+    y_fora = y[teste]
+    base = float(average_precision_score(
+        y_fora, pipeline.predict_proba(_quadro(fora, colunas))[:, 1]
+    ))
+
+    # Um gerador novo por dobra, com a mesma semente: o sorteio de cada dobra
+    # nao depende da ordem em que os processos terminam.
+    gerador = np.random.default_rng(semente)
+    quedas = {}
+    for j, coluna in enumerate(colunas):
+        por_repeticao = []
+        for _ in range(repeticoes):
+            embaralhado = fora.copy()
+            embaralhado[:, j] = fora[gerador.permutation(len(fora)), j]
+            por_repeticao.append(base - float(average_precision_score(
+                y_fora, pipeline.predict_proba(_quadro(embaralhado, colunas))[:, 1]
+            )))
+        quedas[coluna] = float(np.mean(por_repeticao))
+
+    estimador = pipeline.named_steps['estimador']
+    coeficientes = (
+        dict(zip(colunas, map(float, estimador.coef_[0]), strict=True))
+        if hasattr(estimador, 'coef_') else None
+    )
+    return quedas, coeficientes
+
+
 def medir_importancia(conjunto, nome='logistica', agrupar_por='ano',
-                      repeticoes=REPETICOES_PADRAO, semente=42, n_dobras=5):
+                      repeticoes=REPETICOES_PADRAO, semente=42, n_dobras=5,
+                      trabalhadores=1):
     """Permutacao medida **na dobra deixada de fora**, nunca no treino.
 
     Importancia calculada onde o modelo ja viu a resposta mede memoria, e nao
     uso - mesma regra de ml/importancia.py. Aqui nao ha grupo de colunas a
     embaralhar junto: cada variavel do GCBD e uma coluna so, sem janelas
-    derivadas.
+    derivadas. As dobras podem ir para `trabalhadores` processos.
     """
-    import numpy as np
-    from sklearn.metrics import average_precision_score
     from sklearn.model_selection import GroupKFold
 
-    from .modelo import construir
+    X, y, grupos, colunas = _matrizes(conjunto, agrupar_por)
+    dobras = min(n_dobras, len(set(grupos)))
 
-    if agrupar_por not in AGRUPAMENTOS:
-        raise ValueError(f'Agrupamento "{agrupar_por}" desconhecido.')
-
-    quadro = conjunto.quadro
-    colunas = list(conjunto.features)
-    X, y = quadro[colunas], quadro['alvo']
-    grupos = quadro[AGRUPAMENTOS[agrupar_por]]
-    dobras = min(n_dobras, grupos.nunique())
+    por_dobra = _executar(
+        _importancia_da_dobra,
+        ((nome, semente, X, y, colunas, treino, teste, repeticoes)
+         for treino, teste in GroupKFold(n_splits=dobras).split(X, y, grupos)),
+        trabalhadores,
+    )
 
     acumulado = {c: [] for c in colunas}
     acumulado_coef = {c: [] for c in colunas}
     medidas = 0
-
-    for treino, teste in GroupKFold(n_splits=dobras).split(X, y, grupos):
-        if y.iloc[treino].nunique() < 2 or y.iloc[teste].nunique() < 2:
-            # Dobra de uma classe so nao tem PR-AUC definida.
+    for medida in por_dobra:
+        if medida is None:
             continue
-
-        pipeline = construir(nome, semente)
-        pipeline.fit(X.iloc[treino], y.iloc[treino])
-
-        fora = X.iloc[teste]
-        y_fora = y.iloc[teste]
-        base = float(average_precision_score(
-            y_fora, pipeline.predict_proba(fora)[:, 1]
-        ))
+        quedas, coeficientes = medida
         medidas += 1
-
-        gerador = np.random.default_rng(semente)
-        for coluna in colunas:
-            quedas = []
-            for _ in range(repeticoes):
-                embaralhado = fora.copy()
-                embaralhado[coluna] = fora[coluna].to_numpy()[
-                    gerador.permutation(len(fora))
-                ]
-                quedas.append(base - float(average_precision_score(
-                    y_fora, pipeline.predict_proba(embaralhado)[:, 1]
-                )))
-            acumulado[coluna].append(float(np.mean(quedas)))
-
-        estimador = pipeline.named_steps['estimador']
-        if hasattr(estimador, 'coef_'):
-            for coluna, valor in zip(colunas, estimador.coef_[0]):
-                acumulado_coef[coluna].append(float(valor))
+        for coluna, valor in quedas.items():
+            acumulado[coluna].append(valor)
+        for coluna, valor in (coeficientes or {}).items():
+            acumulado_coef[coluna].append(valor)
 
     def media(mapa):
         return {c: sum(v) / len(v) for c, v in mapa.items() if v}
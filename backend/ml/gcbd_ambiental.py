@@ -38,6 +38,7 @@ neutra:
 """
 
 import logging
+import weakref
 from dataclasses import dataclass
 from datetime import timedelta
 from pathlib import Path
@@ -45,7 +46,7 @@ from pathlib import Path
 logger = logging.getLogger(__name__)
 
 RAIZ = Path(__file__).resolve().parents[2]
-CAMINHO_CACHE = RAIZ / 'dados' / 'gcbd_janelas_ambientais.csv'
+CAMINHO_CACHE = RAIZ / 'dados' / 'gcbd_janelas_ambientais.sqlite3'
 
 DIAS_DA_JANELA = 90
 
@@ -171,20 +172,131 @@ def _recortar(serie, lat, lon, raio):
     )
 
 
+# Margem relativa da busca na arvore. A arvore mede |celula - centro| <= raio;
+# `_recortar` compara celula >= centro - raio e celula <= centro + raio. Em
+# ponto flutuante as duas contas podem divergir na ultima casa, justo quando a
+# celula cai na borda do quadrado. A arvore busca com folga e `celulas` refaz o
+# teste exato, para o indice dar sempre o mesmo recorte do `sel`.
+_FOLGA_DA_ARVORE = 1e-9
+
+
+@dataclass
+class IndiceDeOceano:
+    """As celulas de oceano de uma mascara, numa arvore-k-d.
+
+    A distancia e a de Chebyshev (`p=inf`): "dentro do raio" e estar no
+    quadrado `[lat ± raio] x [lon ± raio]`, o mesmo de `_recortar`. Perguntar
+    qual o menor raio com oceano, ou quantas celulas ha nele, custa O(log n)
+    por visita, em vez de recortar e varrer a mascara inteira a cada raio.
+
+    `pesos` e quantos valores validos cada celula tem: 1 numa grade 2D, o
+    numero de profundidades com valor quando a mascara tem `depth`. E o que
+    `notnull().sum()` contava no recorte.
+    """
+
+    latitudes: object
+    longitudes: object
+    pesos: object
+    arvore: object
+
+    def celulas(self, lat, lon, raio):
+        """Posicoes, no indice, das celulas de oceano no quadrado do raio."""
+        import numpy as np
+
+        if not len(self.pesos):
+            return np.empty(0, dtype=np.int64)
+        perto = np.asarray(
+            self.arvore.query_ball_point(
+                [lat, lon], raio * (1 + _FOLGA_DA_ARVORE) + _FOLGA_DA_ARVORE,
+                p=np.inf,
+            ),
+            dtype=np.int64,
+        )
+        la = self.latitudes[perto]
+        lo = self.longitudes[perto]
+        dentro = (
+            (la >= lat - raio) & (la <= lat + raio)
+            & (lo >= lon - raio) & (lo <= lon + raio)
+        )
+        return perto[dentro]
+
+    def raio(self, lat, lon, raios=RAIOS_BUSCA):
+        """`(raio, n_celulas)` do menor raio com oceano; `(nan, 0)` se nenhum.
+
+        A celula mais proxima diz de que raio em diante vale a pena olhar; os
+        menores nem sao tentados.
+        """
+        import numpy as np
+
+        if not len(self.pesos):
+            return float('nan'), 0
+        distancia, _ = self.arvore.query([lat, lon], p=np.inf)
+        for raio in raios:
+            if raio < distancia * (1 - _FOLGA_DA_ARVORE) - _FOLGA_DA_ARVORE:
+                continue
+            dentro = self.celulas(lat, lon, raio)
+            if len(dentro):
+                return raio, int(self.pesos[dentro].sum())
+        return float('nan'), 0
+
+
+# Um indice por mascara, montado na primeira pergunta e solto junto com ela.
+# A chave e o `id`: DataArray redefine `==` e nao serve de chave de dicionario.
+_INDICES = {}
+
+
+def indice_de_oceano(mascara):
+    """O `IndiceDeOceano` desta mascara, montado uma vez so."""
+    chave = id(mascara)
+    indice = _INDICES.get(chave)
+    if indice is None:
+        indice = _montar_indice(mascara)
+        _INDICES[chave] = indice
+        weakref.finalize(mascara, _INDICES.pop, chave, None)
+    return indice
+
+
+def _montar_indice(mascara):
+    import numpy as np
+    from scipy.spatial import cKDTree
+
+    validas = mascara.notnull()
+    extras = [d for d in validas.dims if d not in ('latitude', 'longitude')]
+    if extras:
+        validas = validas.sum(dim=extras)
+    pesos = validas.transpose('latitude', 'longitude').to_numpy().astype(np.int64)
+
+    linha, coluna = np.nonzero(pesos)
+    latitudes = mascara['latitude'].to_numpy()[linha].astype(float)
+    longitudes = mascara['longitude'].to_numpy()[coluna].astype(float)
+    return IndiceDeOceano(
+        latitudes=latitudes,
+        longitudes=longitudes,
+        pesos=pesos[linha, coluna],
+        arvore=cKDTree(np.column_stack([latitudes, longitudes])),
+    )
+
+
 def mascara_de_oceano(ds, coluna):
-    """Um instante basta para saber onde e terra: a mascara nao muda no tempo."""
-    return ds[coluna].isel(time=0).squeeze().load()
+    """Um instante basta para saber onde e terra: a mascara nao muda no tempo.
+
+    O indice espacial das celulas de oceano ja sai montado junto
+    (`indice_de_oceano`), para toda visita deste produto usar o mesmo.
+    """
+    mascara = ds[coluna].isel(time=0).squeeze().load()
+    indice_de_oceano(mascara)
+    return mascara
 
 
 def raio_util(mascara, lat, lon, raios=RAIOS_BUSCA):
     """O menor raio que contem alguma celula de oceano. Erro se nenhum contiver."""
-    for raio in raios:
-        if int(_recortar(mascara, lat, lon, raio).notnull().sum()) > 0:
-            return raio
-    raise SemCelulaDeOceano(
-        f'Nenhuma celula de oceano em ({lat:.4f}, {lon:.4f}) ate '
-        f'{max(raios)}° de raio.'
-    )
+    raio, _ = indice_de_oceano(mascara).raio(lat, lon, raios)
+    if raio != raio:   # NaN
+        raise SemCelulaDeOceano(
+            f'Nenhuma celula de oceano em ({lat:.4f}, {lon:.4f}) ate '
+            f'{max(raios)}° de raio.'
+        )
+    return raio
 
 
 def extrair_janela(ds, coluna, mascara, lat, lon, data_obs, dias=DIAS_DA_JANELA,
@@ -196,6 +308,8 @@ def extrair_janela(ds, coluna, mascara, lat, lon, data_obs, dias=DIAS_DA_JANELA,
     coral branco.
     """
     raio = raio_util(mascara, lat, lon, raios)
+    indice = indice_de_oceano(mascara)
+    n_celulas = int(indice.pesos[indice.celulas(lat, lon, raio)].sum())
     inicio = data_obs - timedelta(days=dias)
 
     recorte = _recortar(ds[coluna], lat, lon, raio).sel(
@@ -205,9 +319,6 @@ def extrair_janela(ds, coluna, mascara, lat, lon, data_obs, dias=DIAS_DA_JANELA,
         d for d in ('latitude', 'longitude', 'depth', 'elevation')
         if d in recorte.dims
     ]
-    n_celulas = int(
-        _recortar(mascara, lat, lon, raio).notnull().sum()
-    )
     if dimensoes:
         recorte = recorte.mean(dim=dimensoes, skipna=True)
 
@@ -215,24 +326,334 @@ def extrair_janela(ds, coluna, mascara, lat, lon, data_obs, dias=DIAS_DA_JANELA,
     return quadro, raio, n_celulas
 
 
-def carregar_cache(caminho=None):
-    """O que ja foi extraido. Quadro vazio se o cache nao existe."""
+# ---------------------------------------------------------------------------
+# Todas as visitas de uma vez
+# ---------------------------------------------------------------------------
+
+# Visitas por leitura. Cada lote e **uma** leitura vetorizada por variavel e
+# uma gravacao no cache: as 166 visitas brasileiras cabem num lote so, e uma
+# extracao global continua retomavel de lote em lote se a rede cair no meio.
+TAMANHO_DO_LOTE = 500
+
+
+def _faixa(coordenadas, centros, raio):
+    """Posicoes `[de, ate)` das coordenadas em `[centro - raio, centro + raio]`.
+
+    E o mesmo recorte de `_recortar` — `sel` com `slice` inclui as duas
+    pontas —, feito por busca binaria para todos os centros de uma vez.
+    Supoe coordenada crescente, como nos produtos do CMEMS.
+    """
+    import numpy as np
+
+    return (
+        np.searchsorted(coordenadas, centros - raio, side='left'),
+        np.searchsorted(coordenadas, centros + raio, side='right'),
+    )
+
+
+def raios_uteis(mascara, latitudes, longitudes, raios=RAIOS_BUSCA):
+    """`raio_util` para todas as visitas, sobre o mesmo indice.
+
+    Devolve `(raio, n_celulas)` por visita. Onde nenhum raio acha oceano o
+    raio volta NaN, em vez de levantar: num lote, uma visita em terra nao pode
+    derrubar as outras.
+    """
+    import numpy as np
+
+    indice = indice_de_oceano(mascara)
+    achados = [
+        indice.raio(lat, lon, raios)
+        for lat, lon in zip(latitudes, longitudes, strict=True)
+    ]
+    raio = np.array([r for r, _ in achados], dtype=float)
+    n_celulas = np.array([n for _, n in achados], dtype=np.int64)
+    return raio, n_celulas
+
+
+def extrair_janelas(ds, coluna, mascara, visitas, dias=DIAS_DA_JANELA,
+                    raios=RAIOS_BUSCA, trabalhadores=None):
+    """`extrair_janela` para um lote inteiro de visitas, numa leitura so.
+
+    Monta o indice (visita x dia x celula) de todas as janelas e le tudo com
+    **uma** indexacao vetorizada do xarray. Sobre o produto aberto pelo
+    `copernicusmarine`, que e preguicoso e dividido em blocos pelo dask, essa
+    leitura baixa os blocos em paralelo (`trabalhadores` threads; `None` deixa
+    o dask decidir). Visita a visita, eram centenas de leituras pequenas e
+    sequenciais, cada uma com a sua ida e volta pela rede.
+
+    Devolve `(quadro, raio, n_celulas)`: `quadro` tem uma linha por (visita,
+    dia), com `visita` = posicao da visita no lote, `time` e a media espacial
+    em `coluna`; `raio` e `n_celulas` sao por visita, com raio NaN onde nao ha
+    oceano. A media e a mesma de `extrair_janela`: sobre todas as celulas e
+    profundidades validas do recorte, juntas.
+    """
+    import numpy as np
     import pandas as pd
+    import xarray as xr
+
+    serie = ds[coluna]
+    coord_lat = serie['latitude'].to_numpy()
+    coord_lon = serie['longitude'].to_numpy()
+    tempos = serie['time'].to_numpy()
+    dias_do_produto = tempos.astype('datetime64[D]')
+
+    raio, n_celulas = raios_uteis(
+        mascara, visitas['Latitude_Degrees'], visitas['Longitude_Degrees'], raios
+    )
+
+    observacao = pd.to_datetime(visitas['Date']).to_numpy().astype('datetime64[D]')
+    tempo_de = np.searchsorted(
+        dias_do_produto, observacao - np.timedelta64(dias, 'D'), side='left'
+    )
+    tempo_ate = np.searchsorted(dias_do_produto, observacao, side='right')
+
+    indices_t, indices_lat, indices_lon = [], [], []
+    grupos_visita, grupos_tempo, tamanhos = [], [], []
+    for i, (lat, lon, r) in enumerate(zip(
+        visitas['Latitude_Degrees'], visitas['Longitude_Degrees'], raio,
+        strict=True,
+    )):
+        if np.isnan(r):
+            continue
+        lat_de, lat_ate = _faixa(coord_lat, lat, r)
+        lon_de, lon_ate = _faixa(coord_lon, lon, r)
+        t, la, lo = np.meshgrid(
+            np.arange(tempo_de[i], tempo_ate[i]),
+            np.arange(lat_de, lat_ate),
+            np.arange(lon_de, lon_ate),
+            indexing='ij',
+        )
+        if not t.size:
+            continue
+        indices_t.append(t.ravel())
+        indices_lat.append(la.ravel())
+        indices_lon.append(lo.ravel())
+        grupos_visita.append(np.full(t.shape[0], i))
+        grupos_tempo.append(t[:, 0, 0])
+        tamanhos.append(np.full(t.shape[0], t[0].size))
+
+    colunas = ['visita', 'time', coluna]
+    if not indices_t:
+        return pd.DataFrame(columns=colunas), raio, n_celulas
+
+    ponto = 'ponto'
+    selecao = serie.isel(
+        time=xr.DataArray(np.concatenate(indices_t), dims=ponto),
+        latitude=xr.DataArray(np.concatenate(indices_lat), dims=ponto),
+        longitude=xr.DataArray(np.concatenate(indices_lon), dims=ponto),
+    )
+    lidos = selecao.compute(scheduler='threads', num_workers=trabalhadores)
+    valores = lidos.transpose(ponto, ...).to_numpy().reshape(lidos.sizes[ponto], -1)
+
+    # Os pontos de um mesmo (visita, dia) sao contiguos por construcao: a
+    # media de cada janela diaria e uma soma por trechos.
+    tamanhos = np.concatenate(tamanhos)
+    inicios = np.r_[0, np.cumsum(tamanhos)[:-1]]
+    validos = ~np.isnan(valores)
+    soma = np.add.reduceat(np.where(validos, valores, 0.0).sum(axis=1), inicios)
+    contagem = np.add.reduceat(validos.sum(axis=1), inicios)
+    media = np.divide(
+        soma, contagem, out=np.full(len(soma), np.nan), where=contagem > 0
+    )
+
+    quadro = pd.DataFrame({
+        'visita': np.concatenate(grupos_visita),
+        'time': tempos[np.concatenate(grupos_tempo)],
+        coluna: media,
+    })
+    return quadro, raio, n_celulas
+
+
+# ---------------------------------------------------------------------------
+# O cache: um SQLite em `dados/`, indexado pela chave da visita
+# ---------------------------------------------------------------------------
+#
+# Ate aqui o cache era um CSV que so crescia. Saber o que ja estava pronto
+# exigia reler e reinterpretar o arquivo inteiro, e com o GCBD global (dezenas
+# de milhares de visitas x 91 dias x variaveis) isso passa a custar mais que a
+# propria extracao. O SQLite vem com o Python, entao nao ha dependencia nova:
+#
+# - `janela` guarda os valores, com chave (variavel, sitio, visita, dia);
+# - `visita` guarda so as chaves prontas, uma linha por (variavel, sitio,
+#   visita) - a pergunta "o que falta" le esta tabela, nao os valores;
+# - cada lote entra numa transacao: ou o lote inteiro esta no cache, ou nada
+#   dele esta. Uma queda no meio da gravacao nao deixa visita pela metade.
+#
+# Um CSV do formato anterior, ao lado do banco e com o mesmo nome, e importado
+# na primeira abertura. Quem ainda passa o caminho `.csv` cai no banco vizinho.
+
+_ESQUEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS janela (
+        variavel TEXT NOT NULL,
+        Site_ID INTEGER NOT NULL,
+        Date_obs TEXT NOT NULL,
+        data TEXT NOT NULL,
+        valor REAL,
+        dataset_id TEXT,
+        raio_graus REAL,
+        n_celulas INTEGER,
+        PRIMARY KEY (variavel, Site_ID, Date_obs, data)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS visita (
+        variavel TEXT NOT NULL,
+        Site_ID INTEGER NOT NULL,
+        Date_obs TEXT NOT NULL,
+        PRIMARY KEY (variavel, Site_ID, Date_obs)
+    ) WITHOUT ROWID
+    """,
+)
+
 
+def _arquivo_do_cache(caminho=None):
     arquivo = Path(caminho or CAMINHO_CACHE)
-    if not arquivo.exists():
+    if arquivo.suffix == '.csv':
+        return arquivo.with_suffix('.sqlite3')
+    return arquivo
+
+
+def _abrir_cache(caminho=None):
+    """Conexao com o cache, criado (e o CSV antigo importado) se preciso."""
+    import sqlite3
+
+    arquivo = _arquivo_do_cache(caminho)
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+
+    antigo = arquivo.with_suffix('.csv')
+    if not arquivo.exists() and antigo.exists():
+        _importar_csv(antigo, arquivo)
+
+    conexao = sqlite3.connect(arquivo)
+    with conexao:
+        for comando in _ESQUEMA:
+            conexao.execute(comando)
+    return conexao
+
+
+def _importar_csv(antigo, arquivo):
+    """Importa o CSV do formato anterior num arquivo ao lado, e so no fim o poe
+    no lugar do cache.
+
+    🚨 Criado direto no lugar, uma importacao que falhasse (CSV truncado, disco
+    cheio, processo morto) deixava um cache que ja "existia": a abertura
+    seguinte nunca tentava de novo, e as janelas antigas sumiam em silencio.
+    """
+    import sqlite3
+
+    import pandas as pd
+
+    parcial = arquivo.with_name(f'{arquivo.name}.parcial')
+    parcial.unlink(missing_ok=True)
+    conexao = sqlite3.connect(parcial)
+    try:
+        with conexao:
+            for comando in _ESQUEMA:
+                conexao.execute(comando)
+        linhas = pd.read_csv(antigo)
+        gravar_lote(conexao, linhas)
+    except Exception:
+        conexao.close()
+        parcial.unlink(missing_ok=True)
+        raise
+    conexao.close()
+    parcial.replace(arquivo)
+    logger.info('Cache antigo importado de %s: %d linhas.', antigo, len(linhas))
+
+
+def _texto_de_data(serie):
+    import pandas as pd
+
+    return pd.to_datetime(serie).dt.strftime('%Y-%m-%d')
+
+
+def gravar_lote(conexao, linhas):
+    """Grava as linhas de um lote, e as chaves das visitas, numa transacao so."""
+    if linhas.empty:
+        return
+    linhas = linhas[list(COLUNAS_CACHE)].copy()
+    for coluna in ('Date_obs', 'data'):
+        linhas[coluna] = _texto_de_data(linhas[coluna])
+    linhas['Site_ID'] = linhas['Site_ID'].astype(int)
+    linhas['n_celulas'] = linhas['n_celulas'].astype(int)
+    linhas['valor'] = linhas['valor'].astype(float)
+    linhas = linhas.astype(object).where(linhas.notna(), None)
+
+    chaves = linhas[['variavel', 'Site_ID', 'Date_obs']].drop_duplicates()
+    with conexao:
+        conexao.executemany(
+            'INSERT OR REPLACE INTO janela '
+            '(variavel, Site_ID, Date_obs, data, valor, dataset_id, raio_graus, n_celulas) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            linhas[[
+                'variavel', 'Site_ID', 'Date_obs', 'data', 'valor',
+                'dataset_id', 'raio_graus', 'n_celulas',
+            ]].itertuples(index=False, name=None),
+        )
+        conexao.executemany(
+            'INSERT OR IGNORE INTO visita (variavel, Site_ID, Date_obs) VALUES (?, ?, ?)',
+            chaves.itertuples(index=False, name=None),
+        )
+
+
+def carregar_cache(caminho=None, variaveis=None):
+    """O que ja foi extraido. Quadro vazio se o cache nao existe.
+
+    `variaveis` restringe a leitura no proprio banco, pela chave.
+    """
+    import pandas as pd
+
+    arquivo = _arquivo_do_cache(caminho)
+    if not arquivo.exists() and not arquivo.with_suffix('.csv').exists():
         return pd.DataFrame(columns=list(COLUNAS_CACHE))
 
-    quadro = pd.read_csv(arquivo)
+    consulta = f'SELECT {", ".join(COLUNAS_CACHE)} FROM janela'
+    parametros = ()
+    if variaveis is not None:
+        variaveis = tuple(variaveis)
+        consulta += f' WHERE variavel IN ({", ".join("?" * len(variaveis))})'
+        parametros = variaveis
+
+    conexao = _abrir_cache(arquivo)
+    try:
+        quadro = pd.read_sql_query(consulta, conexao, params=parametros)
+    finally:
+        conexao.close()
     for coluna in ('Date_obs', 'data'):
-        quadro[coluna] = pd.to_datetime(quadro[coluna]).dt.date
+        quadro[coluna] = pd.to_datetime(quadro[coluna], format='%Y-%m-%d').dt.date
     return quadro
 
 
-def _chaves_prontas(cache):
-    if cache.empty:
+def _chaves_prontas(conexao, variavel):
+    """(sitio, data da visita) ja extraidos para `variavel`, sem ler os valores."""
+    import pandas as pd
+
+    linhas = conexao.execute(
+        'SELECT Site_ID, Date_obs FROM visita WHERE variavel = ?', (variavel,)
+    ).fetchall()
+    if not linhas:
         return set()
-    return set(zip(cache['Site_ID'], cache['Date_obs'], cache['variavel']))
+    sitios, datas = zip(*linhas, strict=True)
+    return set(zip(sitios, pd.to_datetime(list(datas)).date, strict=True))
+
+
+def _pendentes(conexao, visitas, variavel):
+    prontas = _chaves_prontas(conexao, variavel)
+    faltando = [
+        (sitio, data) not in prontas
+        for sitio, data in zip(visitas['Site_ID'], visitas['Date'], strict=True)
+    ]
+    return visitas[faltando].reset_index(drop=True)
+
+
+def visitas_faltando(visitas, variavel, caminho=None):
+    """As linhas de `visitas` que ainda nao tem janela de `variavel` no cache."""
+    conexao = _abrir_cache(caminho)
+    try:
+        return _pendentes(conexao, visitas, variavel)
+    finally:
+        conexao.close()
 
 
 @dataclass
@@ -257,19 +678,29 @@ class ResultadoExtracao:
 
 
 def extrair(conjunto, caminho=None, variaveis=VARIAVEIS, dias=DIAS_DA_JANELA,
-            limite=None, ao_progredir=None):
+            limite=None, ao_progredir=None, tamanho_lote=TAMANHO_DO_LOTE,
+            trabalhadores=None):
     """Extrai as janelas que faltam e as acrescenta ao cache.
 
-    **Grava a cada visita concluida.** A extracao inteira leva alguns minutos e
-    depende de rede; perder tudo por uma queda no meio seria desnecessario. Uma
-    segunda execucao continua de onde parou, porque o cache e consultado por
-    (sitio, data, variavel).
+    **Grava a cada lote concluido.** Cada lote de `tamanho_lote` visitas sai
+    de uma leitura vetorizada so (`extrair_janelas`) e entra no cache numa
+    transacao so. A extracao depende de rede; perder tudo por uma queda no
+    meio seria desnecessario. Uma segunda execucao continua de onde parou,
+    porque o cache e consultado por (sitio, data, variavel).
     """
-    import pandas as pd
+    conexao = _abrir_cache(caminho)
+    try:
+        return _extrair(
+            conexao, conjunto, variaveis, dias, limite, ao_progredir,
+            tamanho_lote, trabalhadores,
+        )
+    finally:
+        conexao.close()
 
-    arquivo = Path(caminho or CAMINHO_CACHE)
-    cache = carregar_cache(arquivo)
-    prontas = _chaves_prontas(cache)
+
+def _extrair(conexao, conjunto, variaveis, dias, limite, ao_progredir,
+             tamanho_lote, trabalhadores):
+    import pandas as pd
 
     visitas = visitas_de(conjunto)
     if limite:
@@ -278,60 +709,82 @@ def extrair(conjunto, caminho=None, variaveis=VARIAVEIS, dias=DIAS_DA_JANELA,
     resultado = ResultadoExtracao(falhas=[], raios_usados={})
     resultado.visitas_pedidas = len(visitas) * len(variaveis)
 
-    arquivo.parent.mkdir(parents=True, exist_ok=True)
-    escreveu_cabecalho = arquivo.exists()
-
     for variavel in variaveis:
-        pendentes = [
-            v for v in visitas.itertuples()
-            if (v.Site_ID, v.Date, variavel) not in prontas
-        ]
+        pendentes = _pendentes(conexao, visitas, variavel)
         resultado.ja_no_cache += len(visitas) - len(pendentes)
-        if not pendentes:
+        if pendentes.empty:
             continue
 
         ds, fonte = abrir_cobertura(variavel, visitas)
         mascara = mascara_de_oceano(ds, fonte.variavel)
 
-        for indice, visita in enumerate(pendentes, start=1):
+        for comeco in range(0, len(pendentes), tamanho_lote):
+            lote = pendentes.iloc[comeco:comeco + tamanho_lote].reset_index(drop=True)
             try:
-                quadro, raio, n_celulas = extrair_janela(
-                    ds, fonte.variavel, mascara,
-                    visita.Latitude_Degrees, visita.Longitude_Degrees,
-                    visita.Date, dias,
+                janelas, raios, celulas = extrair_janelas(
+                    ds, fonte.variavel, mascara, lote, dias,
+                    trabalhadores=trabalhadores,
                 )
             except Exception as erro:
-                resultado.falhas.append(
-                    (visita.Site_ID, visita.Date, variavel, str(erro)[:200])
-                )
+                for visita in lote.itertuples():
+                    resultado.falhas.append(
+                        (visita.Site_ID, visita.Date, variavel, str(erro)[:200])
+                    )
                 logger.warning(
-                    'Falha em %s/%s (%s): %s',
-                    visita.Site_ID, visita.Date, variavel, erro,
+                    'Falha no lote de %d visitas (%s): %s', len(lote), variavel, erro,
                 )
                 continue
 
+            extraidas = []
+            for posicao, visita in enumerate(lote.itertuples()):
+                raio = raios[posicao]
+                if raio != raio:   # NaN: nenhum raio achou oceano
+                    erro = SemCelulaDeOceano(
+                        f'Nenhuma celula de oceano em ({visita.Latitude_Degrees:.4f}, '
+                        f'{visita.Longitude_Degrees:.4f}) ate {max(RAIOS_BUSCA)}° de raio.'
+                    )
+                    resultado.falhas.append(
+                        (visita.Site_ID, visita.Date, variavel, str(erro)[:200])
+                    )
+                    logger.warning(
+                        'Falha em %s/%s (%s): %s',
+                        visita.Site_ID, visita.Date, variavel, erro,
+                    )
+                    continue
+                extraidas.append((posicao, visita, float(raio), int(celulas[posicao])))
+
+            if not extraidas:
+                continue
+
+            por_visita = pd.DataFrame(
+                [
+                    (posicao, visita.Site_ID, visita.Date, raio, n)
+                    for posicao, visita, raio, n in extraidas
+                ],
+                columns=['visita', 'Site_ID', 'Date_obs', 'raio_graus', 'n_celulas'],
+            )
+            linhas = janelas.merge(por_visita, on='visita', how='inner')
             linhas = pd.DataFrame({
-                'Site_ID': visita.Site_ID,
-                'Date_obs': visita.Date,
-                'data': pd.to_datetime(quadro['time']).dt.date,
+                'Site_ID': linhas['Site_ID'],
+                'Date_obs': linhas['Date_obs'],
+                'data': pd.to_datetime(linhas['time']).dt.date,
                 'variavel': variavel,
-                'valor': quadro[fonte.variavel].astype(float),
+                'valor': linhas[fonte.variavel].astype(float),
                 'dataset_id': fonte.dataset_id,
-                'raio_graus': raio,
-                'n_celulas': n_celulas,
+                'raio_graus': linhas['raio_graus'],
+                'n_celulas': linhas['n_celulas'],
             })[list(COLUNAS_CACHE)]
 
-            linhas.to_csv(
-                arquivo, mode='a', header=not escreveu_cabecalho, index=False,
-            )
-            escreveu_cabecalho = True
+            gravar_lote(conexao, linhas)
 
-            resultado.visitas_novas += 1
             resultado.linhas_gravadas += len(linhas)
-            resultado.raios_usados[raio] = resultado.raios_usados.get(raio, 0) + 1
-
-            if ao_progredir:
-                ao_progredir(variavel, indice, len(pendentes), visita, raio)
+            for posicao, visita, raio, _ in extraidas:
+                resultado.visitas_novas += 1
+                resultado.raios_usados[raio] = resultado.raios_usados.get(raio, 0) + 1
+                if ao_progredir:
+                    ao_progredir(
+                        variavel, comeco + posicao + 1, len(pendentes), visita, raio
+                    )
 
     return resultado
 
@@ -353,22 +806,22 @@ def extrair(conjunto, caminho=None, variaveis=VARIAVEIS, dias=DIAS_DA_JANELA,
 RESUMOS = ('media', 'variacao')
 
 
-def _resumir_serie(valores, resumo):
-    """`valores` ja vem ordenado por data."""
-    limpos = valores.dropna()
-    if limpos.empty:
-        return None
+def _resumir_grupos(valores, resumo):
+    """Um resumo por grupo; `valores` ja vem ordenado por data dentro do grupo.
+
+    NaN fica de fora de todos eles, e um grupo todo NaN resume para NaN.
+    """
     if resumo == 'media':
-        return float(limpos.mean())
+        return valores.mean()
     if resumo == 'variacao':
-        # Ultimo menos primeiro: a trajetoria ao longo da janela.
-        return float(limpos.iloc[-1] - limpos.iloc[0])
+        # Ultimo menos primeiro validos: a trajetoria ao longo da janela.
+        return valores.last() - valores.first()
     if resumo == 'minimo':
-        return float(limpos.min())
+        return valores.min()
     if resumo == 'maximo':
-        return float(limpos.max())
+        return valores.max()
     if resumo == 'desvio':
-        return float(limpos.std())
+        return valores.std()
     raise ValueError(f'Resumo "{resumo}" desconhecido.')
 
 
@@ -377,40 +830,46 @@ def nome_da_feature(variavel, resumo, dias=DIAS_DA_JANELA):
 
 
 def resumir(cache, variaveis=VARIAVEIS, resumos=RESUMOS, dias=DIAS_DA_JANELA):
-    """Janela diaria -> uma linha por visita, com as features resumidas."""
+    """Janela diaria -> uma linha por visita, com as features resumidas.
+
+    Tudo sai de uma agregacao por grupo do pandas, sem laco por visita: o
+    cache do GCBD global tem milhoes de valores diarios.
+    """
     import pandas as pd
 
+    cache = cache[cache['variavel'].isin(variaveis)]
     if cache.empty:
         return pd.DataFrame(columns=['Site_ID', 'Date_obs'])
 
-    ordenado = cache.sort_values(['Site_ID', 'Date_obs', 'variavel', 'data'])
-    linhas = {}
-    cobertura = {}
-
-    for (sitio, data_obs, variavel), grupo in ordenado.groupby(
-        ['Site_ID', 'Date_obs', 'variavel'], sort=False
-    ):
-        if variavel not in variaveis:
-            continue
-        chave = (sitio, data_obs)
-        linhas.setdefault(chave, {})
-        for resumo in resumos:
-            linhas[chave][nome_da_feature(variavel, resumo, dias)] = (
-                _resumir_serie(grupo['valor'], resumo)
-            )
-        # Guardado para o relatorio: uma janela com 40 de 91 dias nao vale o
-        # mesmo que uma completa, e isso precisa ser visivel.
-        cobertura.setdefault(chave, {})[variavel] = int(grupo['valor'].notna().sum())
-        linhas[chave][f'{variavel}_raio_graus'] = float(grupo['raio_graus'].iloc[0])
-
-    registros = []
-    for (sitio, data_obs), valores in linhas.items():
-        registro = {'Site_ID': sitio, 'Date_obs': data_obs, **valores}
-        for variavel, n in cobertura[(sitio, data_obs)].items():
-            registro[f'{variavel}_dias_validos'] = n
-        registros.append(registro)
-
-    return pd.DataFrame(registros)
+    chave = ['Site_ID', 'Date_obs', 'variavel']
+    ordenado = cache.sort_values([*chave, 'data'])
+    grupos = ordenado.groupby(chave, sort=False)
+    valores = grupos['valor']
+
+    campos = {resumo: _resumir_grupos(valores, resumo) for resumo in resumos}
+    campos['raio_graus'] = grupos['raio_graus'].first()
+    # Guardado para o relatorio: uma janela com 40 de 91 dias nao vale o
+    # mesmo que uma completa, e isso precisa ser visivel.
+    campos['dias_validos'] = valores.count()
+
+    largo = pd.DataFrame(campos).unstack('variavel')
+    # Janela sem dia valido (ou variavel sem janela) resume para `None`, como
+    # no cache, e nao para NaN; e tem zero dias validos, inteiro.
+    for campo, variavel in largo.columns:
+        coluna = largo[(campo, variavel)]
+        if campo == 'dias_validos':
+            largo[(campo, variavel)] = coluna.fillna(0).astype(int)
+        elif campo in resumos:
+            largo[(campo, variavel)] = coluna.astype(object).where(coluna.notna(), None)
+    nomes = {
+        (campo, variavel): (
+            nome_da_feature(variavel, campo, dias) if campo in resumos
+            else f'{variavel}_{campo}'
+        )
+        for campo, variavel in largo.columns
+    }
+    largo.columns = [nomes[coluna] for coluna in largo.columns]
+    return largo.reset_index()
 
 
 def features_de(variaveis=VARIAVEIS, resumos=RESUMOS, dias=DIAS_DA_JANELA):
@@ -453,6 +912,8 @@ def juntar(conjunto, cache=None, caminho=None, variaveis=VARIAVEIS,
     antes = len(juntado)
     juntado = juntado.dropna(subset=novas)
     perdidas = antes - len(juntado)
+    # Sem os `None` do `resumir`, as features voltam a ser numero para o modelo.
+    juntado[novas] = juntado[novas].astype(float)
 
     termicas = tuple(
         conjunto.features if features_termicas is None else features_termicas
@@ -128,6 +128,10 @@ class Varredura:
     positivos: int
     anos: int
     locais: int
+    # A maior probabilidade dentro de cada episodio real. O episodio e
+    # detectado em todo limiar ate ela, e e so disso que o intervalo da taxa
+    # de deteccao precisa. Ver `intervalos_de_deteccao`.
+    maximos: tuple = ()
 
     @property
     def taxa_base(self):
@@ -172,6 +176,28 @@ class Varredura:
         empatados = [p for p in self.pontos if p.episodios_detectados == teto]
         return max(empatados, key=lambda p: p.limiar)
 
+    def intervalos_de_deteccao(self, reamostras=None, semente=42):
+        """Taxa de episodios detectados, com intervalo, em cada limiar.
+
+        Reamostra os **episodios**: a pergunta e "com outros eventos do mesmo
+        tipo, quantos seriam pegos?". Com ~20 episodios o intervalo e largo, e
+        e exatamente isso que ele precisa mostrar.
+        """
+        import numpy as np
+
+        from . import bootstrap
+
+        if not self.maximos or not self.pontos:
+            return ()
+        maximos = np.asarray(self.maximos, dtype=float)
+        limiares = np.array([p.limiar for p in self.pontos])
+        return bootstrap.intervalo_razao(
+            maximos[:, None] >= limiares[None, :],
+            np.ones(len(maximos)),
+            reamostras or bootstrap.REAMOSTRAS_PADRAO,
+            semente,
+        )
+
     def nunca_detectados(self):
         """Episodios que escapam em **todos** os limiares varridos.
 
@@ -274,9 +300,7 @@ def varrer(conjunto, nome='logistica', semente=42, calibrar='isotonic',
     """
     import numpy as np
 
-    from .baseline import avaliar_episodios
     from .calibracao import predicoes_fora_da_dobra
-    from .modelo import como_baa
 
     y, p = predicoes_fora_da_dobra(conjunto, nome, semente, calibrar)
     quadro = conjunto.quadro.loc[y.index]
@@ -286,42 +310,316 @@ def varrer(conjunto, nome='logistica', semente=42, calibrar='isotonic',
         quadro['local'].nunique() if 'local' in quadro.columns else 1
     )
 
-    pontos = []
-    for limiar in limiares:
-        vp, fp, fn, vn = _matriz(y.to_numpy(), p.to_numpy(), limiar)
-
-        # Episodios sobre as mesmas amostras, com a mesma regra do experimento.
-        previsto = (p >= limiar).astype(int)
-        episodios = avaliar_episodios(quadro, como_baa(previsto))
-        _, no_primeiro, atraso = atraso_do_aviso(quadro, p, limiar)
-
-        pontos.append(Ponto(
-            limiar=float(limiar),
-            verdadeiros_positivos=vp,
-            falsos_positivos=fp,
-            falsos_negativos=fn,
-            verdadeiros_negativos=vn,
-            episodios_reais=episodios.episodios_reais,
-            episodios_detectados=episodios.episodios_detectados,
-            episodios_falsos=episodios.episodios_falsos,
-            perdidos=tuple(
-                {
-                    'local': d['local'],
-                    'inicio': d['inicio'],
-                    'fim': d['fim'],
-                    'dias': (d['fim'] - d['inicio']).days + 1,
-                }
-                for d in episodios.detalhes
-                if not d.get('detectado')
-            ),
-            episodios_no_primeiro_dia=no_primeiro,
-            atraso_medio_dias=atraso,
-        ))
-
     return Varredura(
-        pontos=tuple(pontos),
+        pontos=varrer_probabilidades(quadro, y, p, limiares),
         n=int(len(y)),
         positivos=int(np.asarray(y).sum()),
         anos=anos,
         locais=locais,
+        maximos=maximos_por_episodio(quadro, p),
+    )
+
+
+def maximos_por_episodio(quadro, probabilidade):
+    """A maior probabilidade dentro de cada episodio real, em ordem."""
+    import numpy as np
+
+    from .baseline import FOLGA_EPISODIO_DIAS, intervalos
+
+    linhas = _linhas_ordenadas(quadro, probabilidade, FOLGA_EPISODIO_DIAS)
+    reais = np.flatnonzero(linhas['real'])
+    inicios, _ = intervalos(linhas['chave'][reais], FOLGA_EPISODIO_DIAS)
+    if not len(inicios):
+        return ()
+    return tuple(
+        float(m) for m in np.maximum.reduceat(linhas['p'][reais], inicios)
+    )
+
+
+def varrer_probabilidades(quadro, verdadeiro, probabilidade,
+                          limiares=LIMIARES_PADRAO):
+    """Os `Ponto`s de todos os limiares de uma vez, sem refazer conta por limiar.
+
+    Da o mesmo resultado que rodar `_matriz`, `avaliar_episodios` e
+    `atraso_do_aviso` limiar a limiar — os testes conferem isso contra essas
+    tres, que continuam sendo a definicao. A diferenca e o custo: aquele
+    caminho refiltra o quadro e percorre os dias em Python a cada limiar, e
+    uma grade fina (milhares de cortes) levava minutos.
+
+    A ideia e uma so, repetida nas quatro contagens: cada uma delas vale 1
+    numa **faixa de limiares** que da para calcular olhando o dado uma vez.
+
+    - **Matriz de confusao:** o dia entra como alerta em todo limiar
+      `<= p`. Ordenando as probabilidades uma vez, a soma acumulada de
+      positivos da os quatro numeros de qualquer corte por `searchsorted`.
+    - **Episodio detectado:** basta um dia do episodio avisado, entao ele e
+      detectado em todo limiar `<=` a maior probabilidade dentro dele.
+    - **Episodio de alarme falso:** conta-se o total de episodios previstos e
+      os que encostam em evento real, ambos como "dias que abrem episodio"
+      numa faixa `(piso, p]`. Ver `_episodios_previstos`.
+    - **Atraso do aviso:** dentro de cada corrida de dias reais, o primeiro
+      aviso so muda de dia onde o maximo acumulado sobe. Ver `_atrasos`.
+
+    `verdadeiro` e `probabilidade` vem alinhados as linhas de `quadro`, na
+    mesma ordem.
+    """
+    import numpy as np
+
+    from .baseline import FOLGA_EPISODIO_DIAS
+
+    limiares = np.asarray(limiares, dtype=float)
+    if not len(limiares):
+        return ()
+
+    linhas = _linhas_ordenadas(quadro, probabilidade, FOLGA_EPISODIO_DIAS)
+    vp, fp, fn, vn = _matrizes(
+        np.asarray(verdadeiro), linhas['p_original'], limiares
+    )
+    reais, perdidos, detectados = _episodios_reais(
+        linhas, limiares, FOLGA_EPISODIO_DIAS
+    )
+    falsos = _episodios_previstos(linhas, limiares, FOLGA_EPISODIO_DIAS)
+    no_primeiro, atraso = _atrasos(linhas, limiares)
+
+    return tuple(
+        Ponto(
+            limiar=float(limiares[i]),
+            verdadeiros_positivos=int(vp[i]),
+            falsos_positivos=int(fp[i]),
+            falsos_negativos=int(fn[i]),
+            verdadeiros_negativos=int(vn[i]),
+            episodios_reais=reais,
+            episodios_detectados=int(detectados[i]),
+            episodios_falsos=int(falsos[i]),
+            perdidos=perdidos[i],
+            episodios_no_primeiro_dia=int(no_primeiro[i]),
+            atraso_medio_dias=float(atraso[i]),
+        )
+        for i in range(len(limiares))
+    )
+
+
+def _acima(valores, limiares):
+    """Para cada limiar, quantos `valores` sao `>=` a ele."""
+    import numpy as np
+
+    ordenados = np.sort(valores)
+    return len(ordenados) - np.searchsorted(ordenados, limiares, side='left')
+
+
+def _matrizes(verdadeiro, probabilidade, limiares):
+    """`_matriz` para todos os limiares: uma ordenacao e uma soma acumulada."""
+    import numpy as np
+
+    # NaN nunca e `>=` a nada, e aqui tambem nao pode ser: vai para o fim
+    # de baixo da ordem, como "nunca avisa".
+    p = np.where(np.isnan(probabilidade), -np.inf, probabilidade)
+    real = verdadeiro.astype(bool)
+
+    ordem = np.argsort(p, kind='stable')
+    corte = np.searchsorted(p[ordem], limiares, side='left')
+    acumulado = np.concatenate(([0], np.cumsum(real[ordem])))
+
+    positivos = int(acumulado[-1])
+    avisados = len(p) - corte
+    vp = positivos - acumulado[corte]
+    fp = avisados - vp
+    fn = positivos - vp
+    vn = (len(p) - positivos) - fp
+    return vp, fp, fn, vn
+
+
+def _linhas_ordenadas(quadro, probabilidade, folga_dias):
+    """O quadro reduzido a vetores, ordenado por local e data do alvo.
+
+    E a mesma ordem em que `avaliar_episodios` e `atraso_do_aviso` percorrem
+    os dias, feita uma vez so para todos os limiares.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from .baseline import numerar_dias
+
+    if 'local' in quadro.columns:
+        codigos, rotulos = pd.factorize(quadro['local'], sort=True)
+    else:
+        codigos, rotulos = np.zeros(len(quadro), dtype=np.int64), ['']
+
+    dias = numerar_dias(quadro['alvo_data'].to_numpy())
+    ordem = np.lexsort((dias, codigos))
+    codigos, dias = codigos[ordem], dias[ordem]
+
+    # Chave unica por (local, dia), com distancia entre locais maior que a
+    # folga: episodio e janela nunca atravessam de um recife para o
+    # outro, e os locais podem ser tratados como uma serie so.
+    base = dias.min() if len(dias) else 0
+    largura = int(dias.max() - base) + folga_dias + 2 if len(dias) else 0
+
+    p_original = np.asarray(probabilidade, dtype=float)
+    p = p_original[ordem]
+    return {
+        'p_original': p_original,
+        'local': codigos,
+        'rotulos': list(rotulos),
+        'dia': dias,
+        'chave': codigos * largura + (dias - base),
+        'data': quadro['alvo_data'].to_numpy()[ordem],
+        'real': (quadro['alvo'].to_numpy() >= _limiar_alerta())[ordem],
+        'p': np.where(np.isnan(p), -np.inf, p),
+    }
+
+
+def _episodios_reais(linhas, limiares, folga_dias):
+    """Episodios reais, e o que cada limiar detecta e perde deles.
+
+    Devolve `(quantos, perdidos por limiar, detectados por limiar)`.
+    """
+    import numpy as np
+
+    from .baseline import intervalos
+
+    reais = np.flatnonzero(linhas['real'])
+    inicios, fins = intervalos(linhas['chave'][reais], folga_dias)
+
+    episodios = tuple(
+        {
+            'local': linhas['rotulos'][linhas['local'][reais[i]]],
+            'inicio': linhas['data'][reais[i]],
+            'fim': linhas['data'][reais[f]],
+            'dias': int(linhas['dia'][reais[f]] - linhas['dia'][reais[i]]) + 1,
+        }
+        for i, f in zip(inicios, fins, strict=True)
+    )
+    if not episodios:
+        return 0, [()] * len(limiares), np.zeros(len(limiares), dtype=np.int64)
+
+    maximo = np.maximum.reduceat(linhas['p'][reais], inicios)
+    perdidos = [
+        tuple(e for e, m in zip(episodios, maximo, strict=True) if m < limiar)
+        for limiar in limiares
+    ]
+    return len(episodios), perdidos, _acima(maximo, limiares)
+
+
+def _piso_da_janela(linhas, folga_dias):
+    """Para cada dia, a maior probabilidade nos `folga_dias` anteriores.
+
+    Um dia avisado **abre** episodio previsto exatamente quando nenhum dia
+    dessa janela esta avisado — isto e, nos limiares da faixa `(piso, p]`.
+    """
+    import numpy as np
+
+    chave, p = linhas['chave'], linhas['p']
+    n = len(p)
+    piso = np.full(n, -np.inf)
+    if not n:
+        return piso
+
+    primeiro = np.searchsorted(chave, chave - folga_dias, side='left')
+
+    posicao = np.arange(n)
+    for atras in range(1, int((posicao - primeiro).max(initial=0)) + 1):
+        dentro = posicao - atras >= primeiro
+        anterior = np.where(dentro, p[np.maximum(posicao - atras, 0)], -np.inf)
+        piso = np.maximum(piso, anterior)
+    return piso
+
+
+def _episodios_previstos(linhas, limiares, folga_dias):
+    """Episodios de alarme falso em cada limiar.
+
+    Falsos = episodios previstos − episodios previstos com algum dia real.
+
+    O primeiro termo conta os dias que abrem episodio (`_piso_da_janela`). O
+    segundo conta, entre os dias reais avisados, o **primeiro de cada
+    episodio previsto**: o dia real `r` e o primeiro do seu episodio quando
+    nenhum dia real anterior `j` esta ligado a ele. `j` e `r` estao no mesmo
+    episodio no limiar `t` se `t <= p[j]` e se nenhum dia entre eles abre
+    episodio — o que vale para `t <= min(piso[j+1..r])`. O maior limiar em que
+    algum `j` alcanca `r` sai da recorrencia
+
+        alcance[r] = min(piso[r], max(alcance[r-1], p[r-1] se r-1 e real))
+
+    e `r` conta como primeiro na faixa `(alcance[r], p[r]]`. Nenhuma das duas
+    contagens depende do limiar, so a leitura final.
+    """
+    import numpy as np
+
+    p, real, local = linhas['p'], linhas['real'], linhas['local']
+    piso = _piso_da_janela(linhas, folga_dias)
+
+    # A unica passada sequencial: O(n), uma vez, independente de quantos
+    # limiares forem varridos.
+    alcance = np.full(len(p), -np.inf)
+    anterior, p_lista, real_lista = -np.inf, p.tolist(), real.tolist()
+    local_lista, piso_lista = local.tolist(), piso.tolist()
+    for i in range(len(p_lista)):
+        if i and local_lista[i] == local_lista[i - 1]:
+            ligado = max(anterior, p_lista[i - 1]) if real_lista[i - 1] else anterior
+            anterior = min(piso_lista[i], ligado)
+        else:
+            anterior = -np.inf
+        alcance[i] = anterior
+
+    abertos = _acima(p, limiares) - _acima(np.minimum(piso, p), limiares)
+    com_evento = (
+        _acima(p[real], limiares)
+        - _acima(np.minimum(alcance[real], p[real]), limiares)
+    )
+    return abertos - com_evento
+
+
+def _atrasos(linhas, limiares):
+    """`atraso_do_aviso` para todos os limiares.
+
+    Numa corrida de dias reais, o primeiro aviso no limiar `t` e o primeiro dia
+    em que o maximo acumulado da probabilidade chega a `t`. Esse maximo so
+    muda em poucos dias — os "recordes" —, e cada recorde e o primeiro aviso
+    para a faixa de limiares entre o recorde anterior e ele. O resto e somar
+    faixas com diferencas acumuladas.
+    """
+    import numpy as np
+    import pandas as pd
+
+    p, real, local, dia = linhas['p'], linhas['real'], linhas['local'], linhas['dia']
+    nenhum = np.zeros(len(limiares))
+    if not real.any():
+        return nenhum.astype(np.int64), nenhum
+
+    inicio = real.copy()
+    inicio[1:] &= ~real[:-1] | (local[1:] != local[:-1])
+    corrida = np.cumsum(inicio) - 1
+
+    posicoes = np.flatnonzero(real)
+    maximo = pd.Series(p[posicoes]).groupby(corrida[posicoes]).cummax().to_numpy()
+    primeira = inicio[posicoes]
+
+    recorde = primeira.copy()
+    recorde[1:] |= maximo[1:] > maximo[:-1]
+    antes = np.full(len(posicoes), -np.inf)
+    antes[1:] = np.where(primeira[1:], -np.inf, maximo[:-1])
+
+    dia_inicial = dia[np.flatnonzero(inicio)][corrida[posicoes]]
+    atraso = (dia[posicoes] - dia_inicial)[recorde]
+    de, ate = antes[recorde], maximo[recorde]
+
+    ordem = np.argsort(limiares, kind='stable')
+    ordenados = limiares[ordem]
+    lo = np.searchsorted(ordenados, de, side='right')
+    hi = np.searchsorted(ordenados, ate, side='right')
+
+    def faixas(peso):
+        soma = np.zeros(len(limiares) + 1, dtype=np.int64)
+        np.add.at(soma, lo, peso)
+        np.add.at(soma, hi, -peso)
+        acumulada = np.empty(len(limiares), dtype=np.int64)
+        acumulada[ordem] = np.cumsum(soma[:-1])
+        return acumulada
+
+    avisados = faixas(np.ones(len(atraso), dtype=np.int64))
+    no_primeiro = faixas((atraso == 0).astype(np.int64))
+    soma = faixas(atraso.astype(np.int64))
+    media = np.divide(
+        soma, avisados, out=np.zeros(len(limiares)), where=avisados > 0
     )
+    return no_primeiro, media
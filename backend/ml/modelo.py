@@ -277,6 +277,37 @@ class Comparacao:
             sum(getattr(r, atributo).episodios_falsos for r in avaliados),
         )
 
+    def intervalo(self, atributo, reamostras=None, semente=42):
+        """`media(atributo)` com intervalo bootstrap, reamostrando os anos.
+
+        O ano e o bloco natural aqui: e a unidade do leave-year-out, e os dias
+        de um mesmo ano nao sao independentes. Com ~4 anos-evento o intervalo
+        sai largo - e e isso que ele tem de mostrar.
+        """
+        import numpy as np
+
+        from . import bootstrap
+
+        avaliados = self.anos_com_evento
+        valores = np.array([getattr(r, atributo) for r in avaliados], dtype=float)
+        return bootstrap.intervalo_razao(
+            valores, np.ones(len(valores)),
+            reamostras or bootstrap.REAMOSTRAS_PADRAO, semente,
+        )
+
+    def intervalo_deteccao(self, atributo, reamostras=None, semente=42):
+        """Episodios detectados / reais, reamostrando os anos com evento."""
+        import numpy as np
+
+        from . import bootstrap
+
+        avaliados = self.anos_com_evento
+        return bootstrap.intervalo_razao(
+            np.array([getattr(r, atributo).episodios_detectados for r in avaliados]),
+            np.array([getattr(r, atributo).episodios_reais for r in avaliados]),
+            reamostras or bootstrap.REAMOSTRAS_PADRAO, semente,
+        )
+
     def resumo(self):
         linhas = [f'Modelo "{self.modelo}" - leave-year-out', '']
         linhas += [str(r) for r in self.anos]
@@ -288,8 +319,9 @@ class Comparacao:
             linhas += [
                 '',
                 f'  media sobre os {len(avaliados)} anos COM evento:',
-                f'    PR-AUC = {self.media("pr_auc"):.3f}   '
-                f'Brier = {self.media("brier"):.3f}',
+                f'    PR-AUC = {self.intervalo("pr_auc")}   '
+                f'Brier = {self.intervalo("brier")}   '
+                f'(IC 95% reamostrando os anos)',
                 f'    F1 alerta: modelo = {f1_m:.3f}  |  '
                 f'persistencia = {f1_p:.3f}  |  regra NOAA = {f1_r:.3f}',
             ]
@@ -299,9 +331,14 @@ class Comparacao:
                 ('regra NOAA  ', 'episodios_regra'),
             ):
                 detectados, reais, falsos = self.episodios(atributo)
+                deteccao = self.intervalo_deteccao(atributo)
+                faixa = (
+                    f' (IC 95% {deteccao.baixo:.0%} a {deteccao.alto:.0%})'
+                    if deteccao.reamostras else ''
+                )
                 linhas.append(
-                    f'    episodios {rotulo}: {detectados}/{reais} detectados, '
-                    f'{falsos} alarme(s) falso(s)'
+                    f'    episodios {rotulo}: {detectados}/{reais} detectados'
+                    f'{faixa}, {falsos} alarme(s) falso(s)'
                 )
         return '\n'.join(linhas)
 
@@ -31,6 +31,10 @@ confere a origem e a versao do scikit-learn, e recusa o que nao reconhece. Ver
 A versao do scikit-learn importa por um motivo pratico alem da seguranca: o
 pickle de um `Pipeline` nao tem compatibilidade garantida entre versoes, e a
 falha costuma ser silenciosa - o objeto carrega e preve errado.
+
+**4. Ao lado do pickle vai o pontuador, quando existe.** Um `.npz` so com
+arrays (`ml/pontuador.py`), conferido contra o `predict_proba` antes de ser
+gravado. E o que o painel carrega: le sem pickle e preve sem scikit-learn.
 """
 
 import json
@@ -62,14 +66,22 @@ def _caminhos(nome, pasta=None):
     return base / f'{nome}.joblib', base / f'{nome}.json'
 
 
+def _caminho_pontuador(nome, pasta=None):
+    return Path(pasta or PASTA_PADRAO) / f'{nome}.pontuador.npz'
+
+
 def _versao_sklearn():
     import sklearn
 
     return sklearn.__version__
 
 
-def salvar(ajuste, nome, pasta=None, extras=None):
-    """Grava o pipeline e os metadados. Devolve (caminho_modelo, caminho_json)."""
+def salvar(ajuste, nome, pasta=None, extras=None, amostra=None):
+    """Grava o pipeline e os metadados. Devolve (caminho_modelo, caminho_json).
+
+    `amostra` e o quadro sobre o qual o pontuador e conferido antes de ser
+    gravado; sem ela, a conferencia usa linhas sorteadas. Ver `_gravar_pontuador`.
+    """
     import joblib
 
     caminho_modelo, caminho_json = _caminhos(nome, pasta)
@@ -85,6 +97,7 @@ def salvar(ajuste, nome, pasta=None, extras=None):
     }
     if extras:
         metadados.update(extras)
+    metadados['pontuador'] = _gravar_pontuador(ajuste, nome, pasta, amostra)
 
     joblib.dump(ajuste.pipeline, caminho_modelo)
     caminho_json.write_text(
@@ -93,6 +106,47 @@ def salvar(ajuste, nome, pasta=None, extras=None):
     return caminho_modelo, caminho_json
 
 
+def _gravar_pontuador(ajuste, nome, pasta, amostra):
+    """Grava o `.npz` se o modelo tiver forma compacta e ela conferir.
+
+    Devolve o que vai para o JSON em `pontuador`: o arquivo e a diferenca
+    medida, ou so o `motivo` de nao haver pontuador. Um `.npz` de um treino
+    anterior e apagado nesse caso - senao o painel serviria o modelo velho.
+    """
+    import numpy as np
+
+    from . import pontuador
+
+    caminho = _caminho_pontuador(nome, pasta)
+    caminho.unlink(missing_ok=True)
+
+    try:
+        compilado = pontuador.compilar(ajuste)
+    except pontuador.NaoCompilavel as erro:
+        return {'motivo': str(erro)}
+
+    diferenca = pontuador.diferenca_maxima(compilado, ajuste, amostra)
+    if not diferenca <= pontuador.TOLERANCIA:
+        logger.warning(
+            'Pontuador de "%s" divergiu do pipeline em %.3g; nao gravado.',
+            nome, diferenca,
+        )
+        return {
+            'motivo': f'divergiu do predict_proba em {diferenca:.3g} '
+                      f'(tolerancia {pontuador.TOLERANCIA:g})',
+        }
+
+    with caminho.open('wb') as arquivo:
+        np.savez(arquivo, **compilado.como_arrays())
+    return {
+        'arquivo': caminho.name,
+        'diferenca_maxima': diferenca,
+        'linhas_conferidas': (
+            len(amostra) if amostra is not None else pontuador.LINHAS_SINTETICAS
+        ),
+    }
+
+
 def ler_metadados(nome, pasta=None):
     """Le o JSON **sem** tocar no pickle.
 
@@ -164,6 +218,24 @@ def carregar(nome, pasta=None, exigir_mesma_versao=True):
     )
 
 
+def carregar_pontuador(nome, pasta=None, metadados=None):
+    """O `Pontuador` gravado ao lado do modelo, ou `None` se nao houver.
+
+    Nao passa pela conferencia de versao do scikit-learn de `carregar`: sao
+    arrays lidos com `allow_pickle=False`, e a conta que os aplica e deste
+    projeto.
+    """
+    from . import pontuador
+
+    metadados = metadados or ler_metadados(nome, pasta)
+    if not (metadados.get('pontuador') or {}).get('arquivo'):
+        return None
+    caminho = _caminho_pontuador(nome, pasta)
+    if not caminho.exists():
+        return None
+    return pontuador.ler(caminho, metadados)
+
+
 def listar(pasta=None):
     """Os modelos disponiveis, com o resumo de cada um."""
     base = Path(pasta or PASTA_PADRAO)
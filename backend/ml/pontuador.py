@@ -0,0 +1,297 @@
+"""O modelo servido reduzido a arrays, e a conta que os aplica sem scikit-learn.
+
+O painel carregava o `Pipeline` inteiro via `joblib` e, a cada recife, montava
+um `DataFrame` de uma linha para chamar `predict_proba`. Para o que a
+logistica calibrada realmente faz, isso e muito aparato: **a conta inteira e
+escala, produto escalar e uma tabela de degraus**.
+
+    z = ((x - media) / desvio) . coeficientes + intercepto
+    p = isotonica(z)           # ou sigmoide(a*z + b), ou 1/(1+e^-z) se crua
+
+`CalibratedClassifierCV(cv=3)` guarda **tres** copias dessa conta, uma por
+dobra interna, e devolve a media das tres. O pontuador guarda as tres e tira a
+mesma media - nao escolhe uma.
+
+Por que vale a pena:
+
+- **Nenhum pickle no caminho da requisicao.** O `.npz` e lido com
+  `allow_pickle=False`: sao numeros, e nada ali executa codigo. O `.joblib`
+  continua sendo gravado - e o que `carregar` devolve para quem quer o
+  `Ajuste` de verdade (graficos, importancia, reavaliacao).
+- **O worker nao importa scikit-learn.** Partida a frio mais curta, e a
+  predicao de um recife passa a custar microssegundos.
+- **Independe da versao do scikit-learn.** O pickle de um `Pipeline` nao tem
+  compatibilidade garantida entre versoes (ver `persistencia`); arrays tem.
+
+🚨 **So existe pontuador conferido.** `compilar` le os atributos internos dos
+estimadores ajustados, e um scikit-learn futuro pode mudar o que eles
+significam sem mudar o nome. Por isso `persistencia.salvar` compara, na hora
+de gravar, o pontuador com o `predict_proba` do pipeline sobre as amostras do
+treino, e **so grava se coincidirem** (`TOLERANCIA`). Divergiu, o painel segue
+com o pipeline e o JSON diz por que.
+
+⚠️ O `boosting` nao tem forma compacta aqui: arvores nao viram uma tabela de
+degraus. Para ele `compilar` levanta `NaoCompilavel`, o artefato sai so com
+o `.joblib` e nada muda.
+"""
+
+from dataclasses import dataclass
+
+from .modelo import ColunaAusente
+
+# Diferenca maxima aceita entre o pontuador e o `predict_proba` do pipeline.
+# As contas sao as mesmas, na mesma ordem; o que sobra e arredondamento de
+# ponto flutuante, na casa de 1e-16.
+TOLERANCIA = 1e-9
+
+# Linhas sorteadas para conferir quando nao ha amostra do treino a mao.
+LINHAS_SINTETICAS = 2000
+
+
+class NaoCompilavel(ValueError):
+    """O pipeline tem uma etapa que o pontuador nao sabe reproduzir."""
+
+
+@dataclass(frozen=True)
+class Pontuador:
+    """A conta do modelo servido, em arrays. Uma linha por dobra interna.
+
+    Responde como um `Ajuste` para quem so preve: `colunas`, `horizonte`,
+    `nome`, `calibracao` e `prever_probabilidade(quadro)`. `pontuar` e o
+    atalho sem pandas para uma linha so, que e o caso do painel.
+    """
+
+    nome: str
+    colunas: tuple
+    horizonte: int
+    calibracao: object
+    media: object
+    desvio: object
+    coeficientes: object
+    intercepto: object
+    # Isotonica: os pontos de todas as dobras emendados, e `cortes` diz onde
+    # cada dobra comeca. Sigmoide: `a` e `b`, um por dobra.
+    limiares_x: object = None
+    limiares_y: object = None
+    cortes: object = None
+    a: object = None
+    b: object = None
+    n_treino: int = 0
+    positivos_treino: int = 0
+
+    def _logito(self, X):
+        import numpy as np
+
+        # (dobras, linhas): a mesma conta do `StandardScaler` seguido do
+        # `decision_function`, dobra a dobra.
+        escalado = (X[None, :, :] - self.media[:, None, :]) / self.desvio[:, None, :]
+        return np.einsum('kij,kj->ki', escalado, self.coeficientes) + self.intercepto[:, None]
+
+    def _calibrar(self, z):
+        import numpy as np
+
+        if self.calibracao is None:
+            return 1.0 / (1.0 + np.exp(-z))
+        if self.calibracao == 'sigmoid':
+            return 1.0 / (1.0 + np.exp(self.a[:, None] * z + self.b[:, None]))
+        return np.stack([
+            isotonica(
+                z[k],
+                self.limiares_x[self.cortes[k]:self.cortes[k + 1]],
+                self.limiares_y[self.cortes[k]:self.cortes[k + 1]],
+            )
+            for k in range(len(z))
+        ])
+
+    def probabilidades(self, X):
+        """`predict_proba(X)[:, 1]` para uma matriz ja na ordem de `colunas`."""
+        import numpy as np
+
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        p = self._calibrar(self._logito(X))
+        # Soma dobra a dobra e divide no fim, como `CalibratedClassifierCV`.
+        soma = np.zeros(p.shape[1])
+        for linha in p:
+            soma += linha
+        media = soma / len(p)
+        media[(media > 1.0) & (media <= 1.0 + 1e-5)] = 1.0
+        return media
+
+    def prever_probabilidade(self, quadro):
+        faltando = [c for c in self.colunas if c not in quadro.columns]
+        if faltando:
+            raise ColunaAusente(
+                f'O quadro nao tem {faltando}. O modelo "{self.nome}" foi '
+                f'treinado com {list(self.colunas)}.'
+            )
+        return self.probabilidades(quadro[list(self.colunas)].to_numpy(dtype=float))
+
+    def pontuar(self, valores):
+        """Probabilidade de uma linha dada como `{coluna: valor}`."""
+        faltando = [c for c in self.colunas if c not in valores]
+        if faltando:
+            raise ColunaAusente(
+                f'Faltam {faltando}. O modelo "{self.nome}" foi treinado com '
+                f'{list(self.colunas)}.'
+            )
+        return float(self.probabilidades([[valores[c] for c in self.colunas]])[0])
+
+    def como_arrays(self):
+        """O conteudo do `.npz`. Tudo numerico ou texto: nada que pede pickle."""
+        import numpy as np
+
+        arrays = {
+            'colunas': np.array(self.colunas, dtype=str),
+            'media': self.media,
+            'desvio': self.desvio,
+            'coeficientes': self.coeficientes,
+            'intercepto': self.intercepto,
+        }
+        for nome in ('limiares_x', 'limiares_y', 'cortes', 'a', 'b'):
+            if getattr(self, nome) is not None:
+                arrays[nome] = getattr(self, nome)
+        return arrays
+
+
+def isotonica(z, limiares_x, limiares_y):
+    """A `IsotonicRegression` ajustada, com `out_of_bounds='clip'`.
+
+    Entre dois limiares a isotonica do scikit-learn interpola em linha reta;
+    fora deles, repete a ponta. `searchsorted` acha o degrau de cada valor.
+    """
+    import numpy as np
+
+    if len(limiares_x) == 1:
+        return np.full(len(z), limiares_y[0], dtype=float)
+
+    z = np.clip(z, limiares_x[0], limiares_x[-1])
+    # Mesmo corte e mesma ordem de operacoes do `interp1d` que a isotonica
+    # usa por dentro: o resultado bate no ultimo bit, e nao so "de perto".
+    direita = np.clip(np.searchsorted(limiares_x, z), 1, len(limiares_x) - 1)
+    esquerda = direita - 1
+    x0, x1 = limiares_x[esquerda], limiares_x[direita]
+    y0, y1 = limiares_y[esquerda], limiares_y[direita]
+    return (y1 - y0) / (x1 - x0) * (z - x0) + y0
+
+
+def _linear(pipeline):
+    """`(media, desvio, coeficientes, intercepto)` de escala + logistica."""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    passos = dict(getattr(pipeline, 'named_steps', {}))
+    escala, estimador = passos.get('escala'), passos.get('estimador')
+    if not isinstance(estimador, LogisticRegression) or estimador.coef_.shape[0] != 1:
+        raise NaoCompilavel(
+            f'So a logistica binaria tem forma compacta; o estimador e '
+            f'{type(estimador).__name__}.'
+        )
+    if not isinstance(escala, StandardScaler):
+        raise NaoCompilavel(f'Escala {type(escala).__name__} nao suportada.')
+
+    colunas = len(estimador.coef_[0])
+    media = escala.mean_ if escala.with_mean else [0.0] * colunas
+    desvio = escala.scale_ if escala.with_std else [1.0] * colunas
+    return media, desvio, estimador.coef_[0], estimador.intercept_[0]
+
+
+def compilar(ajuste):
+    """O `Pontuador` de um `Ajuste`. Levanta `NaoCompilavel` se nao houver."""
+    import numpy as np
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.isotonic import IsotonicRegression
+
+    pipeline = ajuste.pipeline
+    extras = {}
+    if isinstance(pipeline, CalibratedClassifierCV):
+        dobras = pipeline.calibrated_classifiers_
+        lineares = [_linear(d.estimator) for d in dobras]
+        calibradores = [d.calibrators[0] for d in dobras]
+        if ajuste.calibracao == 'isotonic':
+            if not all(isinstance(c, IsotonicRegression) for c in calibradores):
+                raise NaoCompilavel('Calibrador diferente do declarado.')
+            if any(c.out_of_bounds != 'clip' for c in calibradores):
+                raise NaoCompilavel('Isotonica sem out_of_bounds="clip".')
+            tamanhos = [len(c.X_thresholds_) for c in calibradores]
+            extras = {
+                'limiares_x': np.concatenate([c.X_thresholds_ for c in calibradores]),
+                'limiares_y': np.concatenate([c.y_thresholds_ for c in calibradores]),
+                'cortes': np.concatenate([[0], np.cumsum(tamanhos)]),
+            }
+        elif ajuste.calibracao == 'sigmoid':
+            extras = {
+                'a': np.array([c.a_ for c in calibradores], dtype=float),
+                'b': np.array([c.b_ for c in calibradores], dtype=float),
+            }
+        else:
+            raise NaoCompilavel(f'Calibracao "{ajuste.calibracao}" desconhecida.')
+    else:
+        if ajuste.calibracao is not None:
+            raise NaoCompilavel('Calibracao declarada sem calibrador no pipeline.')
+        lineares = [_linear(pipeline)]
+
+    media, desvio, coeficientes, intercepto = (
+        np.array(parte, dtype=float) for parte in zip(*lineares, strict=True)
+    )
+    return Pontuador(
+        nome=ajuste.nome,
+        colunas=tuple(ajuste.colunas),
+        horizonte=ajuste.horizonte,
+        calibracao=ajuste.calibracao,
+        media=media,
+        desvio=desvio,
+        coeficientes=coeficientes,
+        intercepto=intercepto,
+        n_treino=ajuste.n_treino,
+        positivos_treino=ajuste.positivos_treino,
+        **extras,
+    )
+
+
+def diferenca_maxima(pontuador, ajuste, amostra=None, semente=42):
+    """Maior `|pontuador - predict_proba|` sobre `amostra`.
+
+    Sem amostra, sorteia linhas em torno da media de treino, ate tres desvios
+    para cada lado: cobre o miolo e as duas pontas clipadas da isotonica.
+    """
+    import numpy as np
+
+    colunas = list(pontuador.colunas)
+    if amostra is None:
+        import pandas as pd
+
+        gerador = np.random.default_rng(semente)
+        sorteio = gerador.uniform(-3, 3, size=(LINHAS_SINTETICAS, len(colunas)))
+        amostra = pd.DataFrame(
+            pontuador.media[0] + sorteio * pontuador.desvio[0], columns=colunas
+        )
+
+    esperado = np.asarray(ajuste.prever_probabilidade(amostra), dtype=float)
+    obtido = pontuador.prever_probabilidade(amostra)
+    return float(np.max(np.abs(esperado - obtido))) if len(esperado) else 0.0
+
+
+def ler(caminho, metadados):
+    """O `Pontuador` gravado em `caminho`, conferido contra os metadados."""
+    import numpy as np
+
+    from .persistencia import ArtefatoIncompativel
+
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        arrays = {nome: arquivo[nome] for nome in arquivo.files}
+
+    colunas = tuple(str(c) for c in arrays.pop('colunas'))
+    if colunas != tuple(metadados['colunas']):
+        raise ArtefatoIncompativel(
+            f'{caminho} tem as colunas {list(colunas)} e os metadados dizem '
+            f'{metadados["colunas"]}. Regere o artefato.'
+        )
+    return Pontuador(
+        nome=metadados['modelo'],
+        colunas=colunas,
+        horizonte=metadados.get('horizonte_dias', 0),
+        calibracao=metadados.get('calibracao'),
+        n_treino=metadados.get('n_treino', 0),
+        positivos_treino=metadados.get('positivos_treino', 0),
+        **arrays,
+    )
@@ -39,10 +39,13 @@ litoral; responder sobre um quarto seria inventar cobertura.
 """
 
 import threading
+import time
 from dataclasses import dataclass, field
 from datetime import date, timedelta
 from typing import NamedTuple
 
+from observabilidade import metricas, trecho
+
 from .dataset import Janela, aplicar_janela, carregar_largo
 
 # Sufixo que fecha o nome de uma feature de janela: `..._7d`.
@@ -316,15 +319,41 @@ def montar_entradas(local, colunas, hoje=None):
     return Entradas(data_base, valores, limitado_por)
 
 
+# Leitura da serie e inferencia separadas: o painel lento por causa do banco e
+# o painel lento por causa do modelo pedem correcoes diferentes.
+ENTRADAS = metricas.histograma(
+    'predicao_entradas_segundos',
+    'Montagem das entradas do modelo (leitura da serie e janelas), por recife.',
+)
+INFERENCIA = metricas.histograma(
+    'predicao_inferencia_segundos',
+    'Inferencia do modelo para um recife, por caminho (pontuador ou pipeline).',
+    ('caminho',),
+)
+
+
 def calcular(local, ajuste, limiar, hoje=None):
     """Aplica o modelo carregado ao estado atual de um recife."""
     import pandas as pd
 
-    hoje = hoje or date.today()
-    lidas = montar_entradas(local, ajuste.colunas, hoje)
+    from .pontuador import Pontuador
 
-    quadro = pd.DataFrame([lidas.valores])
-    probabilidade = float(ajuste.prever_probabilidade(quadro)[0])
+    hoje = hoje or date.today()
+    with trecho('predicao.calcular', local=local.slug):
+        with ENTRADAS.cronometrar(), trecho('predicao.entradas'):
+            lidas = montar_entradas(local, ajuste.colunas, hoje)
+
+        comeco = time.perf_counter()
+        with trecho('predicao.inferencia'):
+            if isinstance(ajuste, Pontuador):
+                # Uma linha, sem DataFrame e sem scikit-learn. Ver `ml/pontuador.py`.
+                probabilidade = ajuste.pontuar(lidas.valores)
+                caminho = 'pontuador'
+            else:
+                quadro = pd.DataFrame([lidas.valores])
+                probabilidade = float(ajuste.prever_probabilidade(quadro)[0])
+                caminho = 'pipeline'
+        INFERENCIA.observar(time.perf_counter() - comeco, caminho=caminho)
 
     return Risco(
         local=local.slug,
@@ -349,28 +378,60 @@ def calcular(local, ajuste, limiar, hoje=None):
 # reescreve o artefato; um cache por TTL continuaria servindo o modelo antigo
 # por N minutos depois de retreinar, sem nada indicando isso. O mtime muda no
 # instante em que o arquivo muda.
+#
+# Quando o artefato traz pontuador, e ele que volta, no lugar do `Ajuste`: o
+# painel so preve, e o pontuador preve igual sem desserializar pickle nem
+# importar scikit-learn. `compilado=False` forca o pipeline.
 _TRAVA = threading.Lock()
 _CACHE = {}
 
+# Taxa de acerto = acerto / (acerto + falta). Falta fora da partida e retreino
+# (ou mtime mudando sozinho) - e o modelo sendo relido por requisicao.
+CONSULTAS_CACHE = metricas.contador(
+    'predicao_cache_total',
+    'Consultas ao cache de modelos carregados, por resultado (acerto ou falta).',
+    ('resultado',),
+)
+metricas.medidor(
+    'predicao_cache_modelos',
+    'Modelos carregados no cache do processo.',
+    funcao=lambda: len(_CACHE),
+)
+
+
+def _marca(nome, pasta):
+    """mtime dos tres arquivos do artefato; `None` se o modelo nao existe."""
+    from . import persistencia
+
+    caminho_modelo, caminho_json = persistencia._caminhos(nome, pasta)
+    marcas = []
+    for caminho in (caminho_modelo, caminho_json, persistencia._caminho_pontuador(nome, pasta)):
+        try:
+            marcas.append(caminho.stat().st_mtime_ns)
+        except OSError:
+            marcas.append(None)
+    return None if marcas[0] is None else tuple(marcas)
+
 
-def carregar_modelo(nome, pasta=None):
+def carregar_modelo(nome, pasta=None, compilado=True):
     """Devolve `(ajuste, metadados)`, reaproveitando o artefato ja lido."""
     from . import persistencia
 
-    caminho_modelo, _ = persistencia._caminhos(nome, pasta)
-    try:
-        marca = caminho_modelo.stat().st_mtime_ns
-    except OSError:
-        marca = None
+    marca = _marca(nome, pasta)
 
-    chave = (nome, str(pasta or ''))
+    chave = (nome, str(pasta or ''), compilado)
     with _TRAVA:
         guardado = _CACHE.get(chave)
         if guardado and guardado[0] == marca and marca is not None:
+            CONSULTAS_CACHE.inc(resultado='acerto')
             return guardado[1], guardado[2]
+    CONSULTAS_CACHE.inc(resultado='falta')
 
-    metadados = persistencia.ler_metadados(nome, pasta)
-    ajuste = persistencia.carregar(nome, pasta)
+    with trecho('predicao.carregar_modelo', modelo=nome):
+        metadados = persistencia.ler_metadados(nome, pasta)
+        ajuste = compilado and persistencia.carregar_pontuador(nome, pasta, metadados)
+        if not ajuste:
+            ajuste = persistencia.carregar(nome, pasta)
 
     with _TRAVA:
         _CACHE[chave] = (marca, ajuste, metadados)
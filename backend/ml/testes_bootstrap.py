@@ -0,0 +1,131 @@
+"""Testes dos intervalos por reamostragem.
+
+O que protegem:
+
+1. 🚨 **A metrica vetorizada e a do scikit-learn.** `pr_auc` e `brier` com
+   uma matriz de pesos tem de dar, linha a linha, o que
+   `average_precision_score` e `brier_score_loss` dao com `sample_weight` -
+   senao o intervalo e de outra metrica que nao a relatada.
+2. **Bloco e sorteado inteiro.** Linhas do mesmo bloco tem sempre o mesmo peso.
+3. **Reamostra sem positivo nao vira zero.** Fica de fora do intervalo.
+"""
+
+from django.test import SimpleTestCase
+
+from ml import bootstrap
+
+
+def dados(semente=0, n=300):
+    import numpy as np
+
+    rng = np.random.default_rng(semente)
+    y = (rng.random(n) < 0.2).astype(int)
+    # Arredondado de proposito: empates formam um corte so.
+    p = np.round(np.clip(rng.random(n) * 0.7 + y * 0.3, 0, 1), 2)
+    return y, p
+
+
+class MetricasPonderadasTests(SimpleTestCase):
+    def test_pr_auc_igual_ao_scikit_learn_com_pesos(self):
+        from sklearn.metrics import average_precision_score
+
+        y, p = dados()
+        pesos = next(bootstrap.reamostrar(len(y), reamostras=20, semente=1))
+        obtido = bootstrap.pr_auc(y, p, pesos)
+
+        for linha, w in enumerate(pesos):
+            with self.subTest(linha=linha):
+                self.assertAlmostEqual(
+                    obtido[linha], average_precision_score(y, p, sample_weight=w)
+                )
+
+    def test_brier_igual_ao_scikit_learn_com_pesos(self):
+        from sklearn.metrics import brier_score_loss
+
+        y, p = dados(1)
+        pesos = next(bootstrap.reamostrar(len(y), reamostras=20, semente=2))
+        obtido = bootstrap.brier(y, p, pesos)
+
+        for linha, w in enumerate(pesos):
+            with self.subTest(linha=linha):
+                self.assertAlmostEqual(
+                    obtido[linha], brier_score_loss(y, p, sample_weight=w)
+                )
+
+    def test_sem_positivo_a_pr_auc_e_nan(self):
+        import numpy as np
+
+        resultado = bootstrap.pr_auc([1, 0, 0], [0.9, 0.2, 0.1], [[0, 2, 1]])
+
+        self.assertTrue(np.isnan(resultado[0]))
+
+
+class ReamostragemTests(SimpleTestCase):
+    def test_cada_reamostra_tem_n_sorteios(self):
+        lotes = list(bootstrap.reamostrar(50, reamostras=600, semente=3, lote=250))
+
+        self.assertEqual([len(lote) for lote in lotes], [250, 250, 100])
+        for lote in lotes:
+            self.assertTrue((lote.sum(axis=1) == 50).all())
+
+    def test_mesma_semente_mesmas_reamostras(self):
+        import numpy as np
+
+        a = np.concatenate(list(bootstrap.reamostrar(40, 100, semente=7)))
+        b = np.concatenate(list(bootstrap.reamostrar(40, 100, semente=7)))
+
+        np.testing.assert_array_equal(a, b)
+
+    def test_bloco_e_sorteado_inteiro(self):
+        import numpy as np
+
+        blocos = np.repeat(['a', 'b', 'c', 'd'], [3, 5, 1, 6])
+        pesos, = bootstrap.reamostrar(len(blocos), reamostras=200, blocos=blocos)
+
+        for rotulo in 'abcd':
+            coluna = pesos[:, blocos == rotulo]
+            self.assertTrue((coluna == coluna[:, :1]).all())
+        # Sorteiam-se 4 blocos por reamostra, nao 15 linhas.
+        por_bloco = pesos[:, [0, 3, 8, 9]]
+        self.assertTrue((por_bloco.sum(axis=1) == 4).all())
+
+
+class IntervaloTests(SimpleTestCase):
+    def test_intervalo_contem_a_estimativa(self):
+        from sklearn.metrics import average_precision_score
+
+        y, p = dados(4)
+        faixa = bootstrap.intervalo_pr_auc(y, p, reamostras=500)
+
+        self.assertAlmostEqual(faixa.estimativa, average_precision_score(y, p))
+        self.assertLess(faixa.baixo, faixa.estimativa)
+        self.assertGreater(faixa.alto, faixa.estimativa)
+        self.assertEqual(faixa.reamostras, 500)
+
+    def test_reamostras_sem_positivo_ficam_de_fora(self):
+        # Um positivo em 10 linhas: ~35% das reamostras nao o sorteiam.
+        y = [1] + [0] * 9
+        p = [0.9] + [0.1] * 9
+
+        faixa = bootstrap.intervalo_pr_auc(y, p, reamostras=400)
+
+        self.assertLess(faixa.reamostras, 400)
+        self.assertGreater(faixa.reamostras, 0)
+        self.assertEqual((faixa.baixo, faixa.alto), (1.0, 1.0))
+
+    def test_razao_com_colunas_da_um_intervalo_por_coluna(self):
+        import numpy as np
+
+        detectado = np.array([[1, 1], [1, 0], [0, 0], [1, 0]])
+
+        faixas = bootstrap.intervalo_razao(detectado, np.ones(4), reamostras=300)
+
+        self.assertEqual(len(faixas), 2)
+        self.assertEqual(
+            [f.estimativa for f in faixas], [0.75, 0.25]
+        )
+
+    def test_texto(self):
+        self.assertEqual(
+            str(bootstrap.Intervalo(0.7123, 0.65, 0.77)), '0.712 [0.650, 0.770]'
+        )
@@ -246,6 +246,23 @@ class ValidarTests(SimpleTestCase):
         self.assertEqual(len(resultado.verdadeiro), conjunto.n)
         self.assertGreater(resultado.pr_auc, resultado.taxa_base)
 
+    def test_intervalo_sorteia_sitios_inteiros(self):
+        resultado = gcbd.validar(
+            self._conjunto(), agrupar_por='sitio', reamostras=300
+        )
+
+        faixa = resultado.intervalo_pr_auc
+        self.assertAlmostEqual(faixa.estimativa, resultado.pr_auc)
+        self.assertLessEqual(faixa.baixo, faixa.estimativa)
+        self.assertGreaterEqual(faixa.alto, faixa.estimativa)
+        self.assertAlmostEqual(resultado.intervalo_brier.estimativa, resultado.brier)
+        self.assertIn('reamostrando por sitio', resultado.resumo())
+
+    def test_sem_reamostras_nao_ha_intervalo(self):
+        resultado = gcbd.validar(self._conjunto(), agrupar_por='sitio', reamostras=0)
+
+        self.assertIsNone(resultado.intervalo_pr_auc)
+
     def test_validacao_por_ano_roda(self):
         resultado = gcbd.validar(self._conjunto(), agrupar_por='ano', n_dobras=3)
 
@@ -263,6 +280,32 @@ class ValidarTests(SimpleTestCase):
 
         self.assertIn('grupo', str(contexto.exception))
 
+    def test_em_processos_da_o_mesmo_resultado_que_em_serie(self):
+        conjunto = self._conjunto()
+
+        serie = gcbd.validar(conjunto, agrupar_por='sitio')
+        paralelo = gcbd.validar(conjunto, agrupar_por='sitio', trabalhadores=2)
+
+        self.assertEqual(serie.pr_auc, paralelo.pr_auc)
+        self.assertEqual(serie.brier, paralelo.brier)
+        self.assertEqual(serie.por_dobra, paralelo.por_dobra)
+
+    def test_validacao_repetida_sorteia_dobras_diferentes(self):
+        repetida = gcbd.validar_repetido(
+            self._conjunto(), agrupar_por='sitio', repeticoes=4, trabalhadores=1,
+        )
+
+        self.assertEqual(len(repetida.pr_auc), 4)
+        self.assertEqual(len(repetida.brier), 4)
+        self.assertGreater(len(set(repetida.brier)), 1, 'os sorteios foram iguais')
+        baixo, alto = repetida.faixa_pr_auc
+        self.assertLessEqual(baixo, repetida.pr_auc_media)
+        self.assertLessEqual(repetida.pr_auc_media, alto)
+
+    def test_validacao_repetida_recusa_um_grupo_so(self):
+        with self.assertRaises(ValueError):
+            gcbd.validar_repetido(self._conjunto(n_sitios=1, por_sitio=6))
+
     def test_ganho_sobre_acaso_e_relativo_a_taxa_base(self):
         """PR-AUC de 0,53 com 53% de positivos nao e resultado nenhum."""
         resultado = gcbd.ResultadoValidacao(
@@ -295,6 +338,19 @@ class ImportanciaTests(SimpleTestCase):
         mais_importante = max(importancia.por_coluna.items(), key=lambda p: p[1])
         self.assertEqual(mais_importante[0], 'TSA_DHW')
 
+    def test_em_processos_da_a_mesma_importancia(self):
+        conjunto = ValidarTests()._conjunto()
+
+        serie = gcbd.medir_importancia(
+            conjunto, agrupar_por='sitio', repeticoes=2, n_dobras=3
+        )
+        paralelo = gcbd.medir_importancia(
+            conjunto, agrupar_por='sitio', repeticoes=2, n_dobras=3,
+            trabalhadores=2,
+        )
+
+        self.assertEqual(serie.por_coluna, paralelo.por_coluna)
+
     def test_coeficiente_do_dhw_e_positivo(self):
         """Estresse termico acumulado tem que aumentar o risco, nao diminuir."""
         conjunto = ValidarTests()._conjunto()
@@ -319,3 +375,80 @@ class CaminhoTests(SimpleTestCase):
         mensagem = str(contexto.exception)
         self.assertIn('docs/GCBD.md', mensagem)
         self.assertIn('GCBD_CSV', mensagem)
+
+
+class LeituraTests(SimpleTestCase):
+    """A leitura tipada e a copia em Parquet, sobre um CSV pequeno em disco."""
+
+    def setUp(self):
+        import tempfile
+        from pathlib import Path
+        from unittest import mock
+
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = Path(pasta.name)
+        self.copias = self.pasta / 'copias'
+        patcher = mock.patch.object(gcbd, 'PASTA_DAS_COPIAS', self.copias)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        linhas = [
+            visita(1, '2005-04-05', 10.0),
+            visita(1, '2005-04-05', 10.0, substrato='Algae'),
+            {**visita(2, '2006-01-10', 5.0), 'Country_Name': ' Brazil '},
+            {**visita(3, '2007-02-01', 0.0), 'Country_Name': 'Australia',
+             'TSA_DHW': 'nd'},
+            visita(4, '2008-03-01', 'nd'),
+        ]
+        self.csv = self.pasta / 'gcbd.csv'
+        pd.DataFrame(linhas).to_csv(self.csv, index=False)
+
+    def test_recorta_o_pais_e_descarta_alvo_ausente(self):
+        quadro = gcbd.carregar(self.csv)
+
+        self.assertEqual(sorted(quadro['Site_ID'].unique()), [1, 2])
+        self.assertEqual(len(quadro), 3)
+
+    def test_colunas_numericas_ja_saem_numericas(self):
+        quadro = gcbd.carregar(self.csv, pais=None)
+
+        self.assertTrue(pd.api.types.is_float_dtype(quadro['TSA_DHW']))
+        self.assertTrue(quadro.loc[quadro['Site_ID'] == 3, 'TSA_DHW'].isna().all())
+        self.assertNotIn('Substrate_Name', quadro.columns)
+
+    def test_a_segunda_leitura_vem_da_copia(self):
+        from unittest import mock
+
+        primeira = gcbd.carregar(self.csv, pais=None)
+        with mock.patch.object(gcbd, '_ler_csv', side_effect=AssertionError):
+            segunda = gcbd.carregar(self.csv, pais=None)
+
+        self.assertEqual(len(list(self.copias.glob('*.parquet'))), 1)
+        pd.testing.assert_frame_equal(
+            primeira.reset_index(drop=True), segunda, check_dtype=False
+        )
+
+    def test_csv_alterado_refaz_a_copia_e_apaga_a_antiga(self):
+        gcbd.carregar(self.csv)
+        antes = set(self.copias.glob('*.parquet'))
+
+        with open(self.csv, 'a') as arquivo:
+            arquivo.write('\n')
+        gcbd.carregar(self.csv)
+        depois = set(self.copias.glob('*.parquet'))
+
+        self.assertEqual(len(depois), 1)
+        self.assertNotEqual(antes, depois)
+
+    def test_coluna_fora_das_conhecidas_vem_do_csv(self):
+        quadro = gcbd.carregar(self.csv, colunas=('Substrate_Name',))
+
+        self.assertIn('Substrate_Name', quadro.columns)
+        self.assertFalse(self.copias.exists())
+
+    def test_montar_sobre_o_arquivo(self):
+        conjunto = gcbd.montar(self.csv, features=('TSA_DHW', 'TSA'))
+
+        self.assertEqual(conjunto.n, 2)
+        self.assertEqual(conjunto.linhas_originais, 3)
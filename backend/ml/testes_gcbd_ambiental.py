@@ -127,6 +127,50 @@ class RaioDeBuscaTests(SimpleTestCase):
         self.assertGreater(n_celulas, 0)
 
 
+class IndiceDeOceanoTests(SimpleTestCase):
+    """A arvore tem de devolver o mesmo recorte que o `sel` da mascara."""
+
+    def test_coincide_com_o_recorte_da_mascara(self):
+        ds = dataset_falso(buraco_de_terra=(-13.2, -12.6, -38.3, -37.7))
+        mascara = gcbd_ambiental.mascara_de_oceano(ds, 'so')
+        indice = gcbd_ambiental.indice_de_oceano(mascara)
+        sorteio = np.random.default_rng(0)
+
+        # Inclui centros em cima da grade, onde a borda do quadrado cai
+        # exatamente numa celula.
+        pontos = [(-13.0, -38.0), (-12.75, -37.75), (-13.5, -38.5)] + [
+            tuple(p) for p in sorteio.uniform([-13.8, -38.8], [-12.2, -37.2], (30, 2))
+        ]
+        for lat, lon in pontos:
+            for raio in gcbd_ambiental.RAIOS_BUSCA:
+                esperado = int(
+                    gcbd_ambiental._recortar(mascara, lat, lon, raio).notnull().sum()
+                )
+                obtido = int(indice.pesos[indice.celulas(lat, lon, raio)].sum())
+                self.assertEqual(obtido, esperado, (lat, lon, raio))
+
+    def test_montado_uma_vez_por_mascara(self):
+        mascara = gcbd_ambiental.mascara_de_oceano(dataset_falso(), 'so')
+
+        self.assertIs(
+            gcbd_ambiental.indice_de_oceano(mascara),
+            gcbd_ambiental.indice_de_oceano(mascara),
+        )
+
+    def test_mascara_com_profundidade_conta_cada_nivel(self):
+        ds = dataset_falso(buraco_de_terra=(-13.2, -12.8, -38.2, -37.8))
+        com_profundidade = ds['so'].expand_dims(depth=[0.5, 1.5]).copy()
+        com_profundidade[1, :, 0, :] = np.nan
+        mascara = com_profundidade.isel(time=0).load()
+
+        raio, n_celulas = gcbd_ambiental.indice_de_oceano(mascara).raio(-13.0, -38.0)
+
+        self.assertEqual(
+            n_celulas,
+            int(gcbd_ambiental._recortar(mascara, -13.0, -38.0, raio).notnull().sum()),
+        )
+
+
 class ResumirTests(SimpleTestCase):
     def _cache(self, valores, variavel='salinidade'):
         base = date(1993, 6, 1)
@@ -171,7 +215,11 @@ class ResumirTests(SimpleTestCase):
             self._cache([np.nan, np.nan]), variaveis=('salinidade',)
         )
 
-        self.assertTrue(pd.isna(resumido.loc[0, 'salinidade_media_90d']))
+        for resumo in gcbd_ambiental.RESUMOS:
+            self.assertIsNone(resumido.loc[0, f'salinidade_{resumo}_90d'])
+        dias = resumido.loc[0, 'salinidade_dias_validos']
+        self.assertEqual(dias, 0)
+        self.assertIsInstance(dias, (int, np.integer))
 
     def test_o_raio_atravessa_para_o_resumo(self):
         resumido = gcbd_ambiental.resumir(
@@ -262,6 +310,7 @@ class JuntarTests(SimpleTestCase):
         for nome in gcbd_ambiental.features_de():
             self.assertIn(nome, juntado.features)
             self.assertIn(nome, juntado.quadro.columns)
+            self.assertEqual(juntado.quadro[nome].dtype, float)
         self.assertEqual(juntado.n, conjunto.n)
 
     def test_as_termicas_continuam_presentes(self):
@@ -366,3 +415,213 @@ class CacheTests(SimpleTestCase):
         conjunto = gcbd.ConjuntoGCBD(quadro=quadro, features=(), limiar=0.0)
 
         self.assertEqual(len(gcbd_ambiental.visitas_de(conjunto)), 2)
+
+
+class ArmazemDoCacheTests(SimpleTestCase):
+    """O cache em SQLite: chave por visita, lote atomico, CSV antigo importado
+    - ou de novo na proxima abertura, se a importacao falhou."""
+
+    def setUp(self):
+        import tempfile
+        from pathlib import Path
+
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        self.caminho = Path(self.pasta.name) / 'janelas.sqlite3'
+
+    def _linhas(self, sitio, data_obs, variavel='salinidade', dias=3):
+        return pd.DataFrame({
+            'Site_ID': sitio,
+            'Date_obs': data_obs,
+            'data': [data_obs - timedelta(days=d) for d in range(dias)],
+            'variavel': variavel,
+            'valor': [36.0 + d for d in range(dias)],
+            'dataset_id': 'x',
+            'raio_graus': 0.15,
+            'n_celulas': 4,
+        })
+
+    def _gravar(self, *lotes):
+        conexao = gcbd_ambiental._abrir_cache(self.caminho)
+        try:
+            for linhas in lotes:
+                gcbd_ambiental.gravar_lote(conexao, linhas)
+        finally:
+            conexao.close()
+
+    def test_o_que_falta_sai_da_chave_da_visita(self):
+        self._gravar(self._linhas(1, date(2005, 4, 5)))
+        visitas = pd.DataFrame({
+            'Site_ID': [1, 2],
+            'Date': [date(2005, 4, 5), date(2005, 4, 5)],
+        })
+
+        faltando = gcbd_ambiental.visitas_faltando(visitas, 'salinidade', self.caminho)
+        de_outra_variavel = gcbd_ambiental.visitas_faltando(
+            visitas, 'oxigenio', self.caminho
+        )
+
+        self.assertEqual(list(faltando['Site_ID']), [2])
+        self.assertEqual(len(de_outra_variavel), 2)
+
+    def test_regravar_o_lote_nao_duplica(self):
+        linhas = self._linhas(1, date(2005, 4, 5))
+        self._gravar(linhas, linhas)
+
+        cache = gcbd_ambiental.carregar_cache(self.caminho)
+
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache['Date_obs'].iloc[0], date(2005, 4, 5))
+
+    def test_lote_que_falha_nao_entra_pela_metade(self):
+        import sqlite3
+
+        ruim = self._linhas(1, date(2005, 4, 5))
+        ruim.loc[2, 'variavel'] = None   # a ultima linha viola a chave
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            self._gravar(ruim)
+
+        self.assertTrue(gcbd_ambiental.carregar_cache(self.caminho).empty)
+
+    def test_le_so_as_variaveis_pedidas(self):
+        self._gravar(
+            self._linhas(1, date(2005, 4, 5)),
+            self._linhas(1, date(2005, 4, 5), variavel='oxigenio'),
+        )
+
+        cache = gcbd_ambiental.carregar_cache(self.caminho, variaveis=('oxigenio',))
+
+        self.assertEqual(set(cache['variavel']), {'oxigenio'})
+
+    def test_csv_antigo_e_importado_na_primeira_abertura(self):
+        antigo = self.caminho.with_suffix('.csv')
+        self._linhas(7, date(2005, 4, 5)).to_csv(antigo, index=False)
+
+        pelo_caminho_antigo = gcbd_ambiental.carregar_cache(antigo)
+        faltando = gcbd_ambiental.visitas_faltando(
+            pd.DataFrame({'Site_ID': [7], 'Date': [date(2005, 4, 5)]}),
+            'salinidade', self.caminho,
+        )
+
+        self.assertEqual(len(pelo_caminho_antigo), 3)
+        self.assertTrue(self.caminho.exists())
+        self.assertTrue(faltando.empty)
+
+    def test_importacao_que_falha_nao_deixa_cache_e_tenta_de_novo(self):
+        antigo = self.caminho.with_suffix('.csv')
+        self._linhas(7, date(2005, 4, 5)).drop(columns=['n_celulas']).to_csv(antigo, index=False)
+
+        with self.assertRaises(KeyError):
+            gcbd_ambiental.carregar_cache(self.caminho)
+
+        self.assertEqual(list(self.caminho.parent.iterdir()), [antigo])
+
+        self._linhas(7, date(2005, 4, 5)).to_csv(antigo, index=False)
+        self.assertEqual(len(gcbd_ambiental.carregar_cache(self.caminho)), 3)
+
+    def test_resumo_de_varias_visitas_e_variaveis(self):
+        cache = pd.concat([
+            self._linhas(1, date(2005, 4, 5)),
+            self._linhas(1, date(2005, 4, 5), variavel='oxigenio', dias=2),
+            self._linhas(2, date(2006, 1, 1)),
+        ])
+
+        resumido = gcbd_ambiental.resumir(cache).set_index('Site_ID')
+
+        # Valores da mais recente para a mais antiga: 36, 37, 38.
+        self.assertAlmostEqual(resumido.loc[1, 'salinidade_media_90d'], 37.0)
+        self.assertAlmostEqual(resumido.loc[1, 'salinidade_variacao_90d'], -2.0)
+        self.assertAlmostEqual(resumido.loc[1, 'oxigenio_variacao_90d'], -1.0)
+        self.assertEqual(resumido.loc[1, 'oxigenio_dias_validos'], 2)
+        self.assertTrue(pd.isna(resumido.loc[2, 'oxigenio_media_90d']))
+
+
+class ExtracaoEmLoteTests(SimpleTestCase):
+    """O lote le tudo de uma vez, mas tem de dar o mesmo que visita a visita."""
+
+    def setUp(self):
+        self.ds = dataset_falso(buraco_de_terra=(-13.2, -12.8, -38.2, -37.8))
+        self.mascara = gcbd_ambiental.mascara_de_oceano(self.ds, 'so')
+        self.visitas = pd.DataFrame({
+            'Site_ID': [1, 2, 3, 4],
+            'Date': [date(1993, 6, 1), date(1993, 3, 10), date(1993, 1, 20),
+                     date(1993, 6, 1)],
+            'Latitude_Degrees': [-13.0, -12.4, -13.6, -13.05],
+            'Longitude_Degrees': [-38.0, -37.6, -38.3, -37.95],
+        })
+
+    def test_coincide_com_a_extracao_visita_a_visita(self):
+        quadro, raios, celulas = gcbd_ambiental.extrair_janelas(
+            self.ds, 'so', self.mascara, self.visitas, dias=30
+        )
+
+        for posicao, visita in enumerate(self.visitas.itertuples()):
+            esperado, raio, n_celulas = gcbd_ambiental.extrair_janela(
+                self.ds, 'so', self.mascara,
+                visita.Latitude_Degrees, visita.Longitude_Degrees, visita.Date,
+                dias=30,
+            )
+            obtido = quadro[quadro['visita'] == posicao]
+
+            self.assertEqual(raios[posicao], raio)
+            self.assertEqual(celulas[posicao], n_celulas)
+            self.assertEqual(
+                list(pd.to_datetime(obtido['time'])),
+                list(pd.to_datetime(esperado['time'])),
+            )
+            for lido, referencia in zip(obtido['so'], esperado['so'], strict=True):
+                self.assertAlmostEqual(lido, referencia)
+
+    def test_visita_em_terra_nao_derruba_o_lote(self):
+        ds = dataset_falso(buraco_de_terra=(-99, 99, -38.5, 99))
+        mascara = gcbd_ambiental.mascara_de_oceano(ds, 'so')
+        visitas = pd.DataFrame({
+            'Site_ID': [1, 2],
+            'Date': [date(1993, 6, 1), date(1993, 6, 1)],
+            'Latitude_Degrees': [-13.0, -13.0],
+            'Longitude_Degrees': [-36.5, -38.9],
+        })
+
+        quadro, raios, _ = gcbd_ambiental.extrair_janelas(
+            ds, 'so', mascara, visitas, dias=10
+        )
+
+        self.assertTrue(np.isnan(raios[0]))
+        self.assertFalse(np.isnan(raios[1]))
+        self.assertEqual(set(quadro['visita']), {1})
+
+    def test_extrair_grava_o_lote_e_registra_a_falha(self):
+        import tempfile
+        from pathlib import Path
+        from types import SimpleNamespace
+        from unittest import mock
+
+        ds = dataset_falso(buraco_de_terra=(-99, 99, -38.5, 99))
+        visitas = pd.DataFrame({
+            'Site_ID': [1, 2, 3],
+            'Date': ['1993-06-01', '1993-05-01', '1993-06-01'],
+            'Latitude_Degrees': [-13.0, -13.2, -13.0],
+            'Longitude_Degrees': [-36.5, -38.9, -38.7],
+        })
+        conjunto = gcbd.ConjuntoGCBD(quadro=visitas, features=(), limiar=0.0)
+        fonte = SimpleNamespace(variavel='so', dataset_id='falso')
+
+        with tempfile.TemporaryDirectory() as pasta, mock.patch.object(
+            gcbd_ambiental, 'abrir_cobertura', return_value=(ds, fonte)
+        ):
+            caminho = Path(pasta) / 'cache.csv'
+            resultado = gcbd_ambiental.extrair(
+                conjunto, caminho, variaveis=('salinidade',), dias=5,
+                tamanho_lote=2,
+            )
+            cache = gcbd_ambiental.carregar_cache(caminho)
+            de_novo = gcbd_ambiental.extrair(
+                conjunto, caminho, variaveis=('salinidade',), dias=5,
+            )
+
+        self.assertEqual(resultado.visitas_novas, 2)
+        self.assertEqual([f[0] for f in resultado.falhas], [1])
+        self.assertEqual(len(cache), 2 * 6)
+        self.assertEqual(set(cache['Site_ID']), {2, 3})
+        self.assertEqual(de_novo.ja_no_cache, 2)
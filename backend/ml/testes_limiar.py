@@ -10,13 +10,24 @@ O que protegem, em ordem de gravidade:
    e por recife" e — desde que a divisao esteja certa.
 3. **Episodio nao e dia.** Um limiar pode perder muitos dias e ainda pegar
    todos os eventos, e e o evento que importa para avisar.
+4. **A varredura vetorizada e a mesma conta.** `varrer_probabilidades` tem de
+   devolver, ponto a ponto, o que `_matriz`, `avaliar_episodios` e
+   `atraso_do_aviso` devolvem limiar a limiar — elas sao a definicao.
 """
 
-from datetime import date
+from datetime import date, timedelta
 
 from django.test import SimpleTestCase
 
-from ml.limiar import LIMIARES_PADRAO, Ponto, Varredura, _matriz
+from ml.limiar import (
+    LIMIARES_PADRAO,
+    Ponto,
+    Varredura,
+    _matriz,
+    atraso_do_aviso,
+    maximos_por_episodio,
+    varrer_probabilidades,
+)
 
 
 def ponto(limiar=0.5, vp=10, fp=5, fn=2, vn=83, **extras):
@@ -174,3 +185,124 @@ class LimiaresPadraoTests(SimpleTestCase):
 
     def test_incluem_o_meio_termo_historico(self):
         self.assertIn(0.50, LIMIARES_PADRAO)
+
+
+class VarreduraVetorizadaTests(SimpleTestCase):
+    """🚨 A versao rapida so vale se for a mesma tabela."""
+
+    def quadro(self, semente, locais=3, dias=120):
+        import numpy as np
+        import pandas as pd
+
+        rng = np.random.default_rng(semente)
+        partes = []
+        for n in range(locais):
+            # Dias sorteados, e nao corridos: as lacunas e que exercitam a
+            # folga de `agrupar_episodios`.
+            sorteados = np.sort(rng.choice(dias * 2, dias, replace=False))
+            alvo = np.convolve(rng.random(dias) < 0.1, np.ones(3), 'same') > 0
+            partes.append(pd.DataFrame({
+                'local': f'recife-{n}',
+                'alvo_data': [date(2024, 1, 1) + timedelta(int(d)) for d in sorteados],
+                'alvo': alvo.astype(int) * 4,
+            }))
+        # Embaralhado: a varredura nao pode depender da ordem de chegada.
+        quadro = pd.concat(partes, ignore_index=True).sample(frac=1, random_state=semente)
+        real = quadro['alvo'].to_numpy() >= 3
+        p = np.round(rng.random(len(quadro)) * 0.6 + real * rng.random(len(quadro)) * 0.4, 2)
+        return quadro, real.astype(int), pd.Series(p, index=quadro.index)
+
+    def referencia(self, quadro, y, p, limiar):
+        from ml.baseline import avaliar_episodios
+        from ml.modelo import como_baa
+
+        episodios = avaliar_episodios(quadro, como_baa((p >= limiar).astype(int)))
+        _, no_primeiro, atraso = atraso_do_aviso(quadro, p, limiar)
+        return (
+            *_matriz(y, p.to_numpy(), limiar),
+            episodios.episodios_reais,
+            episodios.episodios_detectados,
+            episodios.episodios_falsos,
+            tuple(
+                (d['local'], d['inicio'], d['fim'], (d['fim'] - d['inicio']).days + 1)
+                for d in episodios.detalhes if not d['detectado']
+            ),
+            no_primeiro,
+            atraso,
+        )
+
+    def obtido(self, ponto):
+        return (
+            ponto.verdadeiros_positivos, ponto.falsos_positivos,
+            ponto.falsos_negativos, ponto.verdadeiros_negativos,
+            ponto.episodios_reais, ponto.episodios_detectados,
+            ponto.episodios_falsos,
+            tuple((e['local'], e['inicio'], e['fim'], e['dias']) for e in ponto.perdidos),
+            ponto.episodios_no_primeiro_dia,
+            ponto.atraso_medio_dias,
+        )
+
+    def test_coincide_com_o_calculo_limiar_a_limiar(self):
+        limiares = tuple(round(0.025 * n, 3) for n in range(41))
+
+        for semente in range(6):
+            quadro, y, p = self.quadro(semente)
+            pontos = varrer_probabilidades(quadro, y, p, limiares)
+
+            for limiar, ponto in zip(limiares, pontos, strict=True):
+                with self.subTest(semente=semente, limiar=limiar):
+                    self.assertEqual(
+                        self.obtido(ponto), self.referencia(quadro, y, p, limiar)
+                    )
+
+    def test_quadro_sem_coluna_local(self):
+        quadro, y, p = self.quadro(7, locais=1)
+        quadro = quadro.drop(columns='local')
+
+        ponto, = varrer_probabilidades(quadro, y, p, (0.3,))
+
+        self.assertEqual(self.obtido(ponto), self.referencia(quadro, y, p, 0.3))
+
+    def test_sem_episodio_real_nada_e_perdido(self):
+        import pandas as pd
+
+        quadro = pd.DataFrame({
+            'alvo_data': [date(2024, 3, d) for d in range(1, 6)],
+            'alvo': [0] * 5,
+        })
+        p = pd.Series([0.1, 0.9, 0.9, 0.1, 0.1])
+
+        ponto, = varrer_probabilidades(quadro, [0] * 5, p, (0.5,))
+
+        self.assertEqual(ponto.episodios_reais, 0)
+        self.assertEqual(ponto.episodios_falsos, 1)
+        self.assertEqual(ponto.perdidos, ())
+        self.assertEqual(ponto.atraso_medio_dias, 0.0)
+
+    def test_maximos_por_episodio_reproduzem_a_deteccao(self):
+        """O intervalo de deteccao parte dos maximos; o ponto tem de bater."""
+        import numpy as np
+
+        limiares = (0.1, 0.3, 0.5, 0.7, 0.9)
+        quadro, y, p = self.quadro(3)
+        pontos = varrer_probabilidades(quadro, y, p, limiares)
+        maximos = np.array(maximos_por_episodio(quadro, p))
+
+        varredura = Varredura(
+            pontos=pontos, n=len(y), positivos=int(y.sum()), anos=1, locais=3,
+            maximos=tuple(maximos),
+        )
+        intervalos = varredura.intervalos_de_deteccao(reamostras=200)
+
+        for ponto, faixa in zip(pontos, intervalos, strict=True):
+            with self.subTest(limiar=ponto.limiar):
+                self.assertEqual(len(maximos), ponto.episodios_reais)
+                self.assertEqual(
+                    int((maximos >= ponto.limiar).sum()), ponto.episodios_detectados
+                )
+                self.assertAlmostEqual(
+                    faixa.estimativa,
+                    ponto.episodios_detectados / ponto.episodios_reais,
+                )
+                self.assertLessEqual(faixa.baixo, faixa.estimativa)
+                self.assertGreaterEqual(faixa.alto, faixa.estimativa)
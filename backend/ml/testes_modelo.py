@@ -193,6 +193,16 @@ class ComparacaoTests(TestCase):
         self.assertIn('persistencia', texto)
         self.assertIn('regra NOAA', texto)
 
+    def test_intervalo_reamostra_os_anos_com_evento(self):
+        comparacao = comparar_com_linhas_de_base(self.conjunto)
+
+        faixa = comparacao.intervalo('pr_auc', reamostras=300)
+
+        self.assertAlmostEqual(faixa.estimativa, comparacao.media('pr_auc'))
+        self.assertLessEqual(faixa.baixo, faixa.estimativa)
+        self.assertGreaterEqual(faixa.alto, faixa.estimativa)
+        self.assertIn('IC 95%', comparacao.resumo())
+
     def test_treino_nunca_contem_o_ano_de_teste(self):
         """Se contivesse, o resultado seria decoreba e nao previsao."""
         from ml.baseline import anos_disponiveis, dividir_deixando_um_ano_de_fora
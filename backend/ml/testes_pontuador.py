@@ -0,0 +1,184 @@
+"""Testes do pontuador compacto.
+
+O que protegem, em ordem de gravidade:
+
+1. 🚨 **O pontuador preve o que o pipeline preve.** Ele substitui o
+   `predict_proba` no painel; qualquer diferenca alem do arredondamento seria
+   outro modelo no ar com o nome do treinado.
+2. **Pontuador que diverge nao e gravado**, e um `.npz` de treino anterior
+   nao sobrevive a um artefato sem pontuador.
+3. **Nada de pickle.** O arquivo abre com `allow_pickle=False`.
+"""
+
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from ml import modelo, persistencia, pontuador, predicao
+from ml.persistencia import ArtefatoIncompativel
+
+COLUNAS = ('sst_variacao_7d', 'dhw_variacao_7d', 'so_variacao_7d')
+
+
+def quadro(n=600, semente=0):
+    rng = np.random.default_rng(semente)
+    dados = pd.DataFrame({
+        'sst_variacao_7d': rng.normal(0.2, 0.5, n),
+        'dhw_variacao_7d': rng.normal(1.0, 2.0, n),
+        'so_variacao_7d': rng.normal(0.0, 0.1, n),
+    })
+    sinal = dados['sst_variacao_7d'] + dados['dhw_variacao_7d'] / 2
+    dados['alvo'] = ((sinal + rng.normal(0, 0.7, n)) > 1.2) * 4.0
+    return dados
+
+
+class CompilarTests(SimpleTestCase):
+    def test_preve_igual_ao_pipeline_em_cada_calibracao(self):
+        dados = quadro()
+        for calibracao in modelo.CALIBRACOES:
+            with self.subTest(calibracao=calibracao):
+                ajuste = modelo.treinar(dados, COLUNAS, calibrar=calibracao)
+                compilado = pontuador.compilar(ajuste)
+
+                esperado = ajuste.prever_probabilidade(dados)
+                obtido = compilado.prever_probabilidade(dados)
+
+                np.testing.assert_allclose(obtido, esperado, rtol=0, atol=1e-12)
+
+    def test_guarda_uma_conta_por_dobra_do_calibrador(self):
+        ajuste = modelo.treinar(quadro(), COLUNAS, calibrar='isotonic')
+
+        compilado = pontuador.compilar(ajuste)
+
+        dobras = len(ajuste.pipeline.calibrated_classifiers_)
+        self.assertEqual(compilado.coeficientes.shape, (dobras, len(COLUNAS)))
+        self.assertEqual(len(compilado.cortes), dobras + 1)
+
+    def test_pontuar_uma_linha_e_o_mesmo_numero(self):
+        dados = quadro()
+        ajuste = modelo.treinar(dados, COLUNAS, calibrar='isotonic')
+        compilado = pontuador.compilar(ajuste)
+        linha = {c: float(dados[c].iloc[7]) for c in reversed(COLUNAS)}
+
+        self.assertAlmostEqual(
+            compilado.pontuar(linha),
+            float(ajuste.prever_probabilidade(dados.iloc[[7]])[0]),
+            places=12,
+        )
+
+    def test_pontuar_sem_uma_coluna_recusa(self):
+        compilado = pontuador.compilar(modelo.treinar(quadro(), COLUNAS))
+
+        with self.assertRaises(modelo.ColunaAusente):
+            compilado.pontuar({'sst_variacao_7d': 0.1})
+
+    def test_boosting_nao_tem_forma_compacta(self):
+        ajuste = modelo.treinar(quadro(), COLUNAS, nome='boosting')
+
+        with self.assertRaises(pontuador.NaoCompilavel):
+            pontuador.compilar(ajuste)
+
+
+class IsotonicaTests(SimpleTestCase):
+    def test_igual_ao_scikit_learn_dentro_e_fora_da_faixa(self):
+        from sklearn.isotonic import IsotonicRegression
+
+        rng = np.random.default_rng(3)
+        x = rng.normal(size=400)
+        y = (x + rng.normal(size=400) > 0).astype(float)
+        ajustada = IsotonicRegression(out_of_bounds='clip').fit(x, y)
+        # Os proprios limiares, os pontos entre eles e as duas pontas.
+        pontos = np.concatenate([
+            ajustada.X_thresholds_, rng.normal(size=500) * 2, [-50.0, 50.0],
+        ])
+
+        np.testing.assert_array_equal(
+            pontuador.isotonica(pontos, ajustada.X_thresholds_, ajustada.y_thresholds_),
+            ajustada.predict(pontos),
+        )
+
+    def test_um_limiar_so_e_constante(self):
+        obtido = pontuador.isotonica(np.array([-1.0, 0.0, 3.0]), np.array([0.5]), np.array([0.2]))
+
+        self.assertEqual(list(obtido), [0.2, 0.2, 0.2])
+
+
+class GravacaoTests(SimpleTestCase):
+    def setUp(self):
+        self.pasta = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+        self.dados = quadro()
+        self.ajuste = modelo.treinar(self.dados, COLUNAS, calibrar='isotonic')
+        predicao.esquecer_modelos()
+        self.addCleanup(predicao.esquecer_modelos)
+
+    def _metadados(self, nome='teste'):
+        _, caminho_json = persistencia._caminhos(nome, self.pasta)
+        return json.loads(caminho_json.read_text(encoding='utf-8'))
+
+    def test_grava_o_pontuador_conferido_ao_lado_do_pickle(self):
+        persistencia.salvar(self.ajuste, 'teste', self.pasta, amostra=self.dados)
+
+        gravado = self._metadados()['pontuador']
+        self.assertEqual(gravado['arquivo'], 'teste.pontuador.npz')
+        self.assertLessEqual(gravado['diferenca_maxima'], pontuador.TOLERANCIA)
+        self.assertEqual(gravado['linhas_conferidas'], len(self.dados))
+
+    def test_o_arquivo_abre_sem_pickle_e_preve_igual(self):
+        persistencia.salvar(self.ajuste, 'teste', self.pasta)
+        caminho = persistencia._caminho_pontuador('teste', self.pasta)
+
+        with np.load(caminho, allow_pickle=False) as arquivo:
+            self.assertIn('limiares_x', arquivo.files)
+        lido = persistencia.carregar_pontuador('teste', self.pasta)
+
+        np.testing.assert_allclose(
+            lido.prever_probabilidade(self.dados),
+            self.ajuste.prever_probabilidade(self.dados),
+            rtol=0, atol=1e-12,
+        )
+        self.assertEqual(lido.calibracao, 'isotonic')
+        self.assertEqual(lido.horizonte, self.ajuste.horizonte)
+
+    def test_divergencia_nao_grava_e_diz_por_que(self):
+        with mock.patch.object(pontuador, 'diferenca_maxima', return_value=0.3):
+            persistencia.salvar(self.ajuste, 'teste', self.pasta)
+
+        self.assertFalse(persistencia._caminho_pontuador('teste', self.pasta).exists())
+        self.assertIn('divergiu', self._metadados()['pontuador']['motivo'])
+        self.assertIsNone(persistencia.carregar_pontuador('teste', self.pasta))
+
+    def test_modelo_sem_pontuador_apaga_o_do_treino_anterior(self):
+        """🚨 Senao o painel seguiria servindo a logistica depois do boosting."""
+        persistencia.salvar(self.ajuste, 'teste', self.pasta)
+        boosting = modelo.treinar(self.dados, COLUNAS, nome='boosting')
+
+        persistencia.salvar(boosting, 'teste', self.pasta)
+
+        self.assertFalse(persistencia._caminho_pontuador('teste', self.pasta).exists())
+        self.assertIn('motivo', self._metadados()['pontuador'])
+
+    def test_colunas_trocadas_sao_recusadas(self):
+        persistencia.salvar(self.ajuste, 'teste', self.pasta)
+        _, caminho_json = persistencia._caminhos('teste', self.pasta)
+        metadados = self._metadados()
+        metadados['colunas'] = list(reversed(metadados['colunas']))
+        caminho_json.write_text(json.dumps(metadados), encoding='utf-8')
+
+        with self.assertRaises(ArtefatoIncompativel):
+            persistencia.carregar_pontuador('teste', self.pasta)
+
+    def test_o_painel_carrega_o_pontuador_e_o_pipeline_sob_pedido(self):
+        persistencia.salvar(self.ajuste, 'teste', self.pasta)
+
+        servido, _ = predicao.carregar_modelo('teste', self.pasta)
+        completo, _ = predicao.carregar_modelo('teste', self.pasta, compilado=False)
+
+        self.assertIsInstance(servido, pontuador.Pontuador)
+        self.assertIsInstance(completo, modelo.Ajuste)
@@ -371,6 +371,13 @@ class CalcularTests(BaseComSerie):
 
         self.assertFalse(risco.no_extremo)
 
+    def test_inferencia_entra_na_metrica_do_caminho(self):
+        antes = predicao.INFERENCIA.contagem(caminho='pipeline')
+
+        predicao.calcular(self.local, self.AjusteFalso(fixa=0.37), 0.2)
+
+        self.assertEqual(predicao.INFERENCIA.contagem(caminho='pipeline'), antes + 1)
+
 
 class CacheDoModeloTests(TestCase):
     """O cache existe para nao desserializar o pickle a cada visita."""
@@ -409,6 +416,22 @@ class CacheDoModeloTests(TestCase):
 
             self.assertIs(primeiro, segundo)
 
+    def test_acerto_e_falta_sao_contados(self):
+        import tempfile
+        from pathlib import Path
+
+        contador = predicao.CONSULTAS_CACHE
+        acertos, faltas = contador.valor(resultado='acerto'), contador.valor(resultado='falta')
+        with tempfile.TemporaryDirectory() as tmp:
+            pasta = Path(tmp)
+            self._gravar(pasta)
+
+            for _ in range(3):
+                predicao.carregar_modelo('teste', pasta)
+
+        self.assertEqual(contador.valor(resultado='falta'), faltas + 1)
+        self.assertEqual(contador.valor(resultado='acerto'), acertos + 2)
+
     def test_regerar_o_artefato_invalida_o_cache(self):
         """🚨 Cache por TTL serviria o modelo antigo depois de retreinar."""
         import os
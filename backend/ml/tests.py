@@ -675,6 +675,40 @@ class EpisodioTests(TestCase):
 
         self.assertEqual(d.episodios_falsos, 0)
 
+    def test_quadro_fora_de_ordem_da_o_mesmo_resultado(self):
+        """A ordem das linhas nao e contrato: o previsto segue pelo indice."""
+        dias = [date(2024, 3, d) for d in range(1, 11)]
+        quadro = pd.DataFrame(
+            {
+                'local': ['b'] * 10 + ['a'] * 10,
+                'alvo_data': dias + dias,
+                'alvo': [0, 4, 4, 0, 0, 0, 0, 4, 0, 0] * 2,
+            }
+        )
+        previsto = pd.Series([0, 0, 4, 0, 0, 4, 0, 0, 0, 0] * 2)
+        embaralhado = quadro.sample(frac=1, random_state=3)
+
+        ordenado = avaliar_episodios(quadro, previsto)
+        fora = avaliar_episodios(embaralhado, previsto)
+
+        self.assertEqual(ordenado, fora)
+        self.assertEqual([x['local'] for x in fora.detalhes], ['a', 'a', 'b', 'b'])
+
+    def test_episodio_previsto_perto_mas_fora_do_real_e_alarme_falso(self):
+        """Encostar e ter dia real dentro, e nao so cair dentro da folga."""
+        quadro = pd.DataFrame(
+            {
+                'alvo_data': [date(2024, 3, d) for d in range(1, 11)],
+                'alvo': [4, 4, 0, 0, 0, 0, 0, 0, 0, 0],
+            }
+        )
+        previsto = pd.Series([0, 0, 0, 0, 4, 0, 0, 0, 0, 0])
+
+        d = avaliar_episodios(quadro, previsto)
+
+        self.assertEqual(d.episodios_detectados, 0)
+        self.assertEqual(d.episodios_falsos, 1)
+
 
 class DivisaoTemporalTests(TestCase):
     def setUp(self):
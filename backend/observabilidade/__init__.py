@@ -5,9 +5,16 @@ O que cada modulo resolve:
 | Modulo | Papel |
 |---|---|
 | `correlacao` | o id que liga as linhas de um mesmo fluxo, e o mascaramento de credencial |
+| `rastro` | trechos cronometrados e aninhados: a divisao do tempo de cada execucao, e o rastro para o Perfetto |
 | `formatadores` | a mesma linha em texto (console) e em JSON Lines (arquivo) |
 | `config` | monta o `LOGGING` do Django a partir do ambiente |
-| `middleware` | abre um fluxo por requisicao HTTP e devolve o id no cabecalho |
+| `indice` | indice SQLite incremental dos JSONL, com FTS: o `manage.py logs` |
+| `amostragem` | uma em N das linhas de alto volume (`Requisicao concluida`), com resumo periodico do que ficou de fora |
+| `fila` | os arquivos JSONL escritos por uma thread propria, em lote, com fila limitada |
+| `middleware` | abre um fluxo por requisicao HTTP, devolve o id no cabecalho e confere o orcamento da rota |
+| `consultas` | quanto SQL um trecho fez: contagem, tempo, a mais lenta e as repetidas (N+1) |
+| `metricas` | contadores e histogramas do processo, expostos em `/metricas/` no formato do Prometheus |
+| `importacao` | le `python -X importtime`: quanto a partida custa e quem puxou cada pacote |
 
 Uso normal, em qualquer modulo do backend:
 
@@ -31,6 +38,7 @@ from .correlacao import (
     mascarar,
     novo_id,
 )
+from .rastro import trecho
 
 __all__ = [
     'contexto',
@@ -38,4 +46,5 @@ __all__ = [
     'correlacao_atual',
     'mascarar',
     'novo_id',
+    'trecho',
 ]
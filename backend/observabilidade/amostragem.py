@@ -0,0 +1,200 @@
+"""Amostragem das linhas de alto volume, com resumo periodico do que ficou de fora.
+
+Com o painel consultando a API a cada poucos segundos, e os robos por cima,
+`Requisicao concluida` vira a maior parte do `coral.jsonl`: os 200 MB da
+rotacao passam a cobrir minutos, e a linha de ingestao da madrugada sai do
+ultimo backup antes de alguem procurar por ela. O volume nao diz nada que
+`/metricas/` ja nao diga; o que importa e a excecao.
+
+`FiltroAmostragem` e um filtro de handler, como o de correlacao, regido por
+regras por logger (`LOG_AMOSTRAGEM` no settings):
+
+    'observabilidade.middleware': {'um_em': 10, 'lento_ms': 300,
+                                   'rotas': {'/api/pronto/': 100}}
+
+Passam **sempre**:
+
+- WARNING e acima;
+- a linha com `duracao_ms` acima de `lento_ms`;
+- a linha com `status` fora de 2xx (o 404 dos robos, o 302 do login).
+
+Do resto passa uma em `um_em` (ou o `um_em` do prefixo de rota mais longo em
+`rotas`), com `amostragem=N` na linha: quem soma depois multiplica.
+
+A cada `resumo_s`, uma linha `Resumo da amostragem` por mensagem e rota diz
+quantas linhas houve, quantas foram gravadas e os percentis de `duracao_ms` de
+**todas** elas - as que passam sempre inclusive -, com o maximo exato: a
+latencia continua medida, mesmo sem a linha de cada uma.
+Descartes tambem contam em `log_amostradas_total` (`/metricas/`).
+
+⚠️ O resumo sai junto com a primeira linha depois do intervalo, e no fim do
+processo (`atexit`): sem trafego, nao ha o que resumir.
+
+⚠️ O filtro esta nos dois handlers (console e arquivo), e os dois tem de ver a
+mesma decisao: ela e guardada no proprio registro, e a contagem acontece uma
+vez so.
+"""
+
+import atexit
+import contextvars
+import itertools
+import logging
+import math
+import random
+import threading
+import time
+
+from . import metricas
+
+# Duracoes guardadas por chave e intervalo para os percentis do resumo. Acima
+# disto, amostra de reservatorio: o percentil continua honesto, a memoria nao
+# cresce com o trafego.
+RESERVATORIO = 1_000
+RESUMO_S_PADRAO = 60
+
+_DECISAO = '_amostragem_decisao'
+
+AMOSTRADAS = metricas.contador(
+    'log_amostradas_total',
+    'Linhas de log deixadas de fora pela amostragem, por logger.',
+    ('logger',),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _percentil(ordenados, fracao):
+    """Posto mais proximo, como o `manage.py logs`."""
+    return ordenados[max(math.ceil(len(ordenados) * fracao) - 1, 0)]
+
+
+class _Acumulado:
+    __slots__ = ('linhas', 'gravadas', 'medidas', 'maximo', 'duracoes')
+
+    def __init__(self):
+        self.linhas = 0
+        self.gravadas = 0
+        # Quantas linhas trouxeram `duracao_ms`, e a maior delas: contadas
+        # fora do reservatorio, que so guarda `RESERVATORIO` e perderia a
+        # linha mais lenta justamente quando o trafego e grande.
+        self.medidas = 0
+        self.maximo = None
+        self.duracoes = []
+
+    def observar(self, duracao):
+        if duracao is None:
+            return
+        self.medidas += 1
+        if self.maximo is None or duracao > self.maximo:
+            self.maximo = duracao
+        if len(self.duracoes) < RESERVATORIO:
+            self.duracoes.append(duracao)
+            return
+        posicao = random.randrange(self.medidas)
+        if posicao < RESERVATORIO:
+            self.duracoes[posicao] = duracao
+
+
+class FiltroAmostragem:
+    """Deixa passar o que importa e uma em N do resto. Ver o modulo."""
+
+    def __init__(self, regras=None, resumo_s=RESUMO_S_PADRAO):
+        # Do prefixo mais longo para o mais curto: `ingestao.registro` antes
+        # de `ingestao`, como no proprio `logging`.
+        self.regras = sorted((regras or {}).items(), key=lambda par: -len(par[0]))
+        self.resumo_s = resumo_s
+        self._contadores = {}
+        self._acumulados = {}
+        self._trava = threading.Lock()
+        self._ultimo_resumo = time.monotonic()
+        atexit.register(self.resumir)
+
+    def _regra(self, nome):
+        for prefixo, regra in self.regras:
+            if nome == prefixo or nome.startswith(f'{prefixo}.'):
+                return regra
+        return None
+
+    def filter(self, record):  # noqa: A003 - nome exigido pela API do logging
+        decisao = getattr(record, _DECISAO, None)
+        if decisao is None:
+            decisao = self._decidir(record)
+            setattr(record, _DECISAO, decisao)
+            if self.resumo_s and time.monotonic() - self._ultimo_resumo >= self.resumo_s:
+                self.resumir()
+        return decisao
+
+    def _decidir(self, record):
+        if record.name == __name__:
+            return True
+        regra = self._regra(record.name)
+        if regra is None:
+            return True
+
+        duracao = getattr(record, 'duracao_ms', None)
+        status = getattr(record, 'status', None)
+        rota = (getattr(record, 'contexto', None) or {}).get('rota', '')
+        um_em = regra.get('um_em', 1)
+        for prefixo, proprio in sorted(regra.get('rotas', {}).items(), key=lambda p: -len(p[0])):
+            if rota.startswith(prefixo):
+                um_em = proprio
+                break
+        sempre = (
+            um_em <= 1
+            or record.levelno >= logging.WARNING
+            or (duracao is not None and duracao >= regra.get('lento_ms', float('inf')))
+            or (status is not None and not 200 <= int(status) < 300)
+        )
+
+        # Rota pelo padrao da URL quando a linha traz (`padrao`); senao o
+        # caminho viraria uma chave por recife.
+        chave = (record.name, str(record.msg), getattr(record, 'padrao', None) or rota)
+        with self._trava:
+            passa = sempre
+            if not sempre:
+                contador = self._contadores.setdefault(chave, itertools.count())
+                passa = next(contador) % um_em == 0
+            # 🚨 Toda linha do logger entra no resumo, e nao so as amostraveis:
+            # as lentas e as de erro passam sempre, e sao exatamente a cauda
+            # que p95/p99/max existem para mostrar. Ate 19/10/2026 o resumo
+            # so via as rapidas com 2xx.
+            acumulado = self._acumulados.setdefault(chave, _Acumulado())
+            acumulado.linhas += 1
+            acumulado.gravadas += passa
+            acumulado.observar(duracao)
+
+        if sempre:
+            return True
+        if passa:
+            record.amostragem = um_em
+        else:
+            AMOSTRADAS.inc(logger=record.name)
+        return passa
+
+    def resumir(self):
+        """Uma linha por mensagem e rota com o que houve desde o ultimo resumo."""
+        with self._trava:
+            acumulados, self._acumulados = self._acumulados, {}
+            self._ultimo_resumo = time.monotonic()
+
+        for (origem, mensagem, rota), acumulado in acumulados.items():
+            extra = {
+                'origem': origem,
+                'mensagem_amostrada': mensagem,
+                'padrao': rota,
+                'linhas': acumulado.linhas,
+                'gravadas': acumulado.gravadas,
+            }
+            if acumulado.duracoes:
+                ordenados = sorted(acumulado.duracoes)
+                extra.update({
+                    'duracao_ms_p50': round(_percentil(ordenados, 0.50), 1),
+                    'duracao_ms_p95': round(_percentil(ordenados, 0.95), 1),
+                    'duracao_ms_p99': round(_percentil(ordenados, 0.99), 1),
+                    'duracao_ms_max': round(acumulado.maximo, 1),
+                })
+            # Num contexto vazio: o resumo e do processo, e nao da requisicao
+            # que por acaso o disparou - sem isto sairia com a correlacao dela.
+            contextvars.Context().run(
+                logger.info, 'Resumo da amostragem', extra=extra,
+            )
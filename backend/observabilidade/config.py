@@ -27,6 +27,10 @@ deixa a ingestao falante sem inundar o log com o resto.
 `backend/logs/` a cada execucao, e um clone novo passaria a diferir de um clone
 que ja rodou os testes — o mesmo defeito que derrubou o CI em 30/07 por outro
 caminho. Ver `LOG_EM_ARQUIVO`.
+
+Com `em_fila` (padrao do settings fora da suite), os dois arquivos ficam atras
+de um handler so, `fila.ArquivosEmFila`: quem loga so enfileira, e uma thread
+escreve em lote. O conteudo dos arquivos e o mesmo; muda quem paga a escrita.
 """
 
 import sys
@@ -63,12 +67,16 @@ def rodando_teste(argv=None):
 
 def montar(*, base_dir, nivel='INFO', nivel_console=None, pasta=None,
            em_arquivo=True, rotacao_mb=ROTACAO_MB_PADRAO,
-           backups=BACKUPS_PADRAO, niveis_por_dominio=None):
+           backups=BACKUPS_PADRAO, niveis_por_dominio=None,
+           em_fila=False, fila_tamanho=None, amostragem=None, resumo_s=None):
     """Devolve o dicionario de `LOGGING`.
 
     `nivel` vale para os dominios do projeto; `nivel_console` filtra so o que
     aparece na tela, para que o arquivo possa guardar DEBUG enquanto o console
     mostra INFO — o caso normal de um backfill longo.
+
+    `amostragem` sao as regras por logger de `amostragem.FiltroAmostragem`;
+    sem regras, o filtro nem entra.
     """
     nivel_console = nivel_console or nivel
     niveis_por_dominio = niveis_por_dominio or {}
@@ -124,6 +132,43 @@ def montar(*, base_dir, nivel='INFO', nivel_console=None, pasta=None,
             'delay': True,
         }
 
+    if em_arquivo and em_fila:
+        from .fila import TAMANHO_PADRAO
+
+        # Os mesmos dois arquivos, agora construidos pelo handler da fila.
+        # `class` e `formatter` saem porque quem monta e ele, sempre em JSON.
+        arquivos = [
+            {
+                chave: valor for chave, valor in handlers.pop(nome).items()
+                if chave not in ('class', 'formatter', 'filters')
+            }
+            for nome in ('arquivo', 'erros')
+        ]
+        handlers['arquivos'] = {
+            '()': 'observabilidade.fila.ArquivosEmFila',
+            'level': 'DEBUG',
+            'filters': ['correlacao'],
+            'arquivos': arquivos,
+            'tamanho': fila_tamanho or TAMANHO_PADRAO,
+        }
+
+    filtros = {
+        'correlacao': {
+            '()': 'observabilidade.correlacao.FiltroCorrelacao',
+        },
+    }
+    if amostragem:
+        from .amostragem import RESUMO_S_PADRAO
+
+        # Depois da correlacao: a regra por rota le o `contexto` que ela poe.
+        filtros['amostragem'] = {
+            '()': 'observabilidade.amostragem.FiltroAmostragem',
+            'regras': amostragem,
+            'resumo_s': RESUMO_S_PADRAO if resumo_s is None else resumo_s,
+        }
+        for handler in handlers.values():
+            handler['filters'] = [*handler['filters'], 'amostragem']
+
     destinos = list(handlers)
 
     loggers = {}
@@ -157,11 +202,7 @@ def montar(*, base_dir, nivel='INFO', nivel_console=None, pasta=None,
         # `copernicusmarine`, cujo aviso de credencial expirada e a unica
         # pista quando a coleta volta vazia.
         'disable_existing_loggers': False,
-        'filters': {
-            'correlacao': {
-                '()': 'observabilidade.correlacao.FiltroCorrelacao',
-            },
-        },
+        'filters': filtros,
         'formatters': {
             'legivel': {'()': 'observabilidade.formatadores.TextoLegivel'},
             'json': {'()': 'observabilidade.formatadores.JsonLinhas'},
@@ -0,0 +1,108 @@
+"""Quanto SQL um trecho de codigo fez: contagem, tempo, a mais lenta e as repetidas.
+
+O `CorrelacaoMiddleware` media so o tempo total da requisicao. Uma view que
+passa de 40 ms para 400 ms aparece ali - mas sem dizer se o tempo foi para o
+banco, para o modelo ou para serializar. E o defeito mais comum de uma API
+Django nao aparece no tempo enquanto a base e pequena: **N+1**, uma consulta
+por item da lista. Com tres recifes, sao tres consultas a mais e ninguem nota;
+com quinhentos, a pagina cai.
+
+`medir_sql` instala um `execute_wrapper` em cada conexao pelo tempo do bloco.
+Nao depende de `DEBUG` (o `connection.queries` so existe com ele ligado) e
+nao guarda as consultas: so os totais e uma contagem por texto de SQL.
+
+⚠️ **Repetida e "mesmo SQL", com parametros diferentes ou nao.** E a assinatura
+do N+1: `SELECT ... WHERE local_recife_id = %s` cem vezes, uma por recife. As
+identicas tambem com os mesmos parametros - trabalho jogado fora, que um cache
+ou um `select_related` evitaria - sao contadas a parte, em `duplicadas`.
+
+🚨 **Os parametros nunca saem daqui.** O texto da consulta vai para o log com
+os `%s` no lugar dos valores: e o bastante para achar a linha no codigo, e
+nao leva e-mail, senha ou token que estivesse num filtro.
+"""
+
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+
+# Quanto do texto de uma consulta vai para o log, depois de `resumir`.
+TAMANHO_SQL = 300
+
+_COLUNAS_DO_SELECT = re.compile(r'^SELECT\s.*?\sFROM\s', re.DOTALL)
+
+
+def resumir(sql):
+    """O SQL sem a lista de colunas do SELECT, encurtado para o log.
+
+    O ORM lista todas as colunas do modelo, e 300 caracteres acabavam antes do
+    FROM. O que identifica a consulta e a tabela e o WHERE.
+    """
+    return _COLUNAS_DO_SELECT.sub('SELECT ... FROM ', sql, count=1)[:TAMANHO_SQL]
+
+
+@dataclass
+class MedidaSql:
+    consultas: int = 0
+    tempo_ms: float = 0.0
+    mais_lenta_ms: float = 0.0
+    mais_lenta: str = ''
+    duplicadas: int = 0
+    formas: Counter = field(default_factory=Counter)
+    _vistas: set = field(default_factory=set, repr=False)
+
+    def __call__(self, execute, sql, params, many, context):
+        """O `execute_wrapper`: cronometra e conta, sem mudar o que executa."""
+        comeco = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            decorrido = (time.perf_counter() - comeco) * 1000
+            self.consultas += 1
+            self.tempo_ms += decorrido
+            self.formas[sql] += 1
+            if decorrido > self.mais_lenta_ms:
+                self.mais_lenta_ms, self.mais_lenta = decorrido, sql
+            # `repr` porque os parametros podem vir em lista, que nao e hashable.
+            assinatura = (sql, repr(params))
+            if assinatura in self._vistas:
+                self.duplicadas += 1
+            else:
+                self._vistas.add(assinatura)
+
+    @property
+    def repetida(self):
+        """`(sql, vezes)` do texto que mais se repetiu - o rastro do N+1."""
+        if not self.formas:
+            return '', 0
+        return self.formas.most_common(1)[0]
+
+    def como_extra(self):
+        """Os campos que vao para o `extra=` do log, com o SQL resumido."""
+        sql, vezes = self.repetida
+        campos = {
+            'consultas': self.consultas,
+            'sql_ms': round(self.tempo_ms, 1),
+        }
+        if self.consultas:
+            campos['sql_mais_lenta_ms'] = round(self.mais_lenta_ms, 1)
+            campos['sql_mais_lenta'] = resumir(self.mais_lenta)
+        if vezes > 1:
+            campos['repeticoes'] = vezes
+            campos['sql_repetida'] = resumir(sql)
+        if self.duplicadas:
+            campos['duplicadas'] = self.duplicadas
+        return campos
+
+
+@contextmanager
+def medir_sql():
+    """Mede o SQL de todas as conexoes dentro do bloco. Devolve a `MedidaSql`."""
+    from django.db import connections
+
+    medida = MedidaSql()
+    with ExitStack() as pilha:
+        for conexao in connections.all():
+            pilha.enter_context(conexao.execute_wrapper(medida))
+        yield medida
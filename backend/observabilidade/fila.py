@@ -0,0 +1,245 @@
+"""Os arquivos JSONL escritos por uma thread propria, em lote.
+
+Com os `RotatingFileHandler` ligados direto aos loggers, cada `logger.info`
+de um bloco de ingestao ou de uma requisicao paga, na thread de quem chamou:
+o filtro de correlacao uma vez por handler, o `json.dumps`, a checagem de
+rotacao, o `write` e o `flush` - duas vezes, uma por arquivo. E custo de
+relatar, cobrado de quem estava trabalhando.
+
+`ArquivosEmFila` e o unico handler dos dois arquivos. Na thread de quem loga
+so acontece o que depende dela: o filtro de correlacao (o contexto e um
+`ContextVar`, so existe ali), a mensagem montada com os argumentos e o
+traceback virado texto. O resto vai para uma fila, e uma thread de fundo tira
+ate `lote` registros de cada vez, serializa, e escreve cada arquivo com um
+`write` e um `flush` so.
+
+🚨 **A fila tem limite, e a politica de cheia depende do nivel.** Sem limite,
+um laco logando em DEBUG com o disco lento cresce a memoria ate o processo
+cair. Cheia, a fila:
+
+- **descarta** DEBUG e INFO na hora, sem esperar - quem logava continua no
+  mesmo ritmo;
+- **espera** ate `ESPERA_ALERTA_S` por WARNING e acima, que sao as linhas que
+  alguem vai procurar depois de um incidente. Passado o prazo, descarta tambem:
+  travar a requisicao para sempre por causa do log seria pior.
+
+Todo descarte e contado (`log_descartadas_total` em `/metricas/`) e a propria
+thread escreve uma linha avisando quantas se perderam, para o buraco no
+arquivo nao parecer silencio do sistema.
+
+⚠️ **O que esta na fila so chega ao disco se o processo sair pelo caminho
+normal.** `logging.shutdown` (registrado no `atexit` pelo proprio `logging`)
+chama `close`, que espera a fila esvaziar. `kill -9` ou `os._exit` perdem o
+que ainda nao foi escrito - no maximo uma fila, e normalmente um lote.
+
+⚠️ **Fork.** Com `gunicorn --preload` o `LOGGING` e montado no mestre, e a
+thread nao atravessa o `fork`. A thread nasce no primeiro registro de cada
+processo, e nao na construcao, por isso.
+"""
+
+import contextlib
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+from . import metricas
+from .formatadores import JsonLinhas
+
+# 10 mil registros sao alguns MB de memoria e cobrem um backfill em DEBUG com o
+# disco parado por varios segundos.
+TAMANHO_PADRAO = 10_000
+# Quantos registros a thread escreve por `write`.
+LOTE_PADRAO = 500
+# Quanto um WARNING+ espera por espaco na fila antes de ser descartado.
+ESPERA_ALERTA_S = 1.0
+# Quanto `close` espera a fila esvaziar na saida do processo.
+ESPERA_FECHAR_S = 10.0
+
+_FIM = object()
+
+DESCARTADAS = metricas.contador(
+    'log_descartadas_total',
+    'Linhas de log descartadas com a fila dos arquivos cheia, por nivel.',
+    ('nivel',),
+)
+
+
+def _arquivo(especificacao):
+    """Um `RotatingFileHandler` em JSON a partir de `{filename, level, ...}`."""
+    especificacao = dict(especificacao)
+    nivel = especificacao.pop('level', 'DEBUG')
+    destino = logging.handlers.RotatingFileHandler(
+        especificacao.pop('filename'),
+        encoding=especificacao.pop('encoding', 'utf-8'),
+        delay=especificacao.pop('delay', True),
+        **especificacao,
+    )
+    destino.setLevel(nivel)
+    destino.setFormatter(JsonLinhas())
+    return destino
+
+
+class ArquivosEmFila(logging.Handler):
+    """Enfileira na thread de quem loga; escreve os arquivos numa thread propria.
+
+    `arquivos` e a lista dos arquivos de destino, cada um como os argumentos do
+    `RotatingFileHandler` mais `level`. Montado pelo `config.montar`.
+    """
+
+    def __init__(self, arquivos, tamanho=TAMANHO_PADRAO, lote=LOTE_PADRAO):
+        super().__init__()
+        self.destinos = [_arquivo(especificacao) for especificacao in arquivos]
+        self.tamanho = tamanho
+        self.lote = lote
+        self._preparar_processo()
+
+    def _preparar_processo(self):
+        self._pid = os.getpid()
+        self._fila = queue.Queue(maxsize=self.tamanho)
+        self._escritor = None
+        self._partida = threading.Lock()
+        self._descartadas = 0
+        self._avisadas = 0
+
+    def _garantir_escritor(self):
+        if self._pid != os.getpid():
+            # Filho de fork: a fila herdada pode ter registros do mestre, e a
+            # thread dele nao existe aqui.
+            self._preparar_processo()
+        if self._escritor is None:
+            with self._partida:
+                if self._escritor is None:
+                    self._escritor = threading.Thread(
+                        target=self._escrever, args=(self._fila,),
+                        name='log-arquivos', daemon=True,
+                    )
+                    self._escritor.start()
+
+    def preparar(self, record):
+        """Fixa na thread de quem logou o que nao pode esperar a fila.
+
+        A mensagem e montada agora porque os argumentos podem mudar depois; o
+        traceback vira texto agora porque o objeto prende os frames vivos.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.destinos[0].formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def handle(self, record):
+        # Sem a trava do `Handler.handle`: a `Queue` ja e segura entre threads,
+        # e com a trava um WARNING esperando espaco seguraria todas as outras.
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        try:
+            self._garantir_escritor()
+            self.preparar(record)
+            if record.levelno >= logging.WARNING:
+                self._fila.put(record, timeout=ESPERA_ALERTA_S)
+            else:
+                self._fila.put_nowait(record)
+        except queue.Full:
+            self._descartadas += 1
+            DESCARTADAS.inc(nivel=record.levelname)
+        except Exception:
+            self.handleError(record)
+
+    # -- thread de escrita --------------------------------------------------
+
+    def _escrever(self, fila):
+        # A fila vem por argumento, e nao de `self`: depois de um fork a
+        # instancia troca de fila, e esta thread segue presa a dela.
+        while True:
+            lote = [fila.get()]
+            while len(lote) < self.lote:
+                try:
+                    lote.append(fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            registros = [r for r in lote if r is not _FIM]
+            aviso = self._aviso_de_descarte()
+            if aviso is not None:
+                registros.append(aviso)
+            if registros:
+                self._gravar(registros)
+
+            for _ in lote:
+                fila.task_done()
+            if any(r is _FIM for r in lote):
+                return
+
+    def _aviso_de_descarte(self):
+        perdidas = self._descartadas - self._avisadas
+        if not perdidas:
+            return None
+        self._avisadas += perdidas
+        return logging.makeLogRecord({
+            'name': __name__,
+            'levelno': logging.WARNING,
+            'levelname': 'WARNING',
+            'msg': f'Fila de log cheia: {perdidas} linhas descartadas',
+            'correlacao': '-',
+            'descartadas': perdidas,
+        })
+
+    def _gravar(self, registros):
+        """Um `write` por arquivo para o lote inteiro, com a rotacao conferida uma vez.
+
+        Cada registro e serializado uma vez so, mesmo indo para os dois arquivos.
+        """
+        formatador = self.destinos[0].formatter
+        serializados = []
+        for registro in registros:
+            try:
+                serializados.append((registro.levelno, formatador.format(registro)))
+            except Exception:
+                # Um registro que nao serializa nao pode matar a thread: o
+                # resto do processo continuaria enfileirando para ninguem.
+                self.handleError(registro)
+        for destino in self.destinos:
+            linhas = [texto for nivel, texto in serializados if nivel >= destino.level]
+            if not linhas:
+                continue
+            texto = '\n'.join(linhas) + '\n'
+            try:
+                if destino.stream is None:
+                    destino.stream = destino._open()
+                if destino.maxBytes and destino.stream.tell() + len(texto) >= destino.maxBytes:
+                    destino.doRollover()
+                    # Com `delay`, o `doRollover` fecha e nao reabre.
+                    destino.stream = destino.stream or destino._open()
+                destino.stream.write(texto)
+                destino.stream.flush()
+            except Exception:
+                destino.handleError(registros[0])
+
+    # -- fim do processo ----------------------------------------------------
+
+    def flush(self):
+        """Espera a fila esvaziar. Sem thread viva, nao ha o que esperar."""
+        if self._escritor is not None and self._escritor.is_alive():
+            self._fila.join()
+
+    def close(self):
+        """Escreve o que esta na fila e fecha os arquivos.
+
+        Chamado pelo `logging.shutdown` na saida do processo.
+        """
+        escritor = self._escritor
+        if escritor is not None and escritor.is_alive() and self._pid == os.getpid():
+            with contextlib.suppress(queue.Full):
+                self._fila.put(_FIM, timeout=ESPERA_FECHAR_S)
+            escritor.join(ESPERA_FECHAR_S)
+        self._escritor = None
+        for destino in self.destinos:
+            destino.close()
+        super().close()
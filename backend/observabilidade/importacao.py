@@ -0,0 +1,105 @@
+"""Quanto custa importar o projeto, e quem puxou o que.
+
+Todo `manage.py` - `check`, `migrate`, o `atualizar` do cron - paga o import
+de tudo que o comando alcanca antes de fazer qualquer coisa. Esse custo cresce
+em silencio: um `import pandas` no topo de um modulo que as views importam
+soma meio segundo a todo comando, e nada na saida diz que ficou mais lento.
+
+Este modulo le a saida de `python -X importtime` e responde tres perguntas:
+
+1. **Quanto tudo custou.** A soma dos imports de nivel zero.
+2. **Quais pacotes pesam.** Tempo *proprio* somado por pacote de topo
+   (`neo4j`, `pandas`, `django`...), que e onde o tempo de fato foi gasto.
+3. **Quem trouxe o pacote.** A cadeia do primeiro import dele - por exemplo
+   `aquaculture.views > aquaculture.neo4j_service > neo4j`. E essa cadeia que
+   diz onde mover o import para dentro da funcao.
+
+⚠️ O `-X importtime` imprime cada modulo **depois** dos que ele importou, com
+dois espacos de recuo por nivel. O pai de uma linha e, portanto, a proxima
+linha com um nivel a menos - nao a anterior.
+"""
+
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
+_LINHA = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+@dataclass(frozen=True)
+class Importacao:
+    nome: str
+    proprio_us: int
+    acumulado_us: int
+    nivel: int
+
+    @property
+    def pacote(self):
+        return self.nome.split('.', 1)[0]
+
+
+@dataclass
+class Perfil:
+    """Um `-X importtime` lido."""
+
+    importacoes: list
+
+    @property
+    def total_ms(self):
+        return sum(i.acumulado_us for i in self.importacoes if i.nivel == 0) / 1000
+
+    def por_pacote(self):
+        """`[(pacote, ms proprios)]`, do mais caro para o mais barato."""
+        somas = {}
+        for importacao in self.importacoes:
+            somas[importacao.pacote] = somas.get(importacao.pacote, 0) + importacao.proprio_us
+        return sorted(
+            ((pacote, us / 1000) for pacote, us in somas.items()),
+            key=lambda par: -par[1],
+        )
+
+    def quem_trouxe(self, pacote):
+        """Cadeia do primeiro import de `pacote`, da raiz ate ele."""
+        for posicao, importacao in enumerate(self.importacoes):
+            if importacao.pacote != pacote:
+                continue
+            cadeia, nivel = [importacao.nome], importacao.nivel
+            for seguinte in self.importacoes[posicao + 1:]:
+                if seguinte.nivel < nivel:
+                    cadeia.append(seguinte.nome)
+                    nivel = seguinte.nivel
+                    if nivel == 0:
+                        break
+            # Do topo para baixo, e so ate o primeiro modulo do pacote.
+            cadeia.reverse()
+            while len(cadeia) > 1 and cadeia[-2].split('.', 1)[0] == pacote:
+                cadeia.pop()
+            return cadeia
+        return []
+
+
+def ler(texto):
+    """Interpreta a saida de `-X importtime`. Linhas que nao sao dela sao ignoradas."""
+    importacoes = []
+    for linha in texto.splitlines():
+        achado = _LINHA.match(linha)
+        if achado:
+            proprio, acumulado, recuo, nome = achado.groups()
+            importacoes.append(
+                Importacao(nome, int(proprio), int(acumulado), len(recuo) // 2)
+            )
+    return Perfil(importacoes)
+
+
+def medir(manage, argumentos=('check',)):
+    """Roda `manage.py <argumentos>` com `-X importtime`. Devolve (Perfil, codigo).
+
+    Em subprocesso, e nao neste interpretador: aqui o Django e meio projeto ja
+    estao importados, e o que se quer medir e justamente a partida a frio.
+    """
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', str(manage), *argumentos],
+        capture_output=True, text=True, check=False,
+    )
+    return ler(processo.stderr), processo.returncode
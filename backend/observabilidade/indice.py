@@ -0,0 +1,401 @@
+"""Indice SQLite dos arquivos JSONL, para consultar o log sem ler tudo de novo.
+
+Achar as linhas de uma `correlacao` no `coral.jsonl` e nos dez backups de
+20 MB e um `grep` em 220 MB; somar `rejeitadas` por fonte e um script que le
+e faz `json.loads` de cada linha. Os dois escalam com o tamanho do log, e o
+log so cresce ate a rotacao.
+
+`Indice` guarda cada linha num SQLite ao lado dos logs (`indice.sqlite3`):
+
+- `linhas`: horario, nivel, logger, correlacao, mensagem e erro em colunas, e
+  a linha original inteira, devolvida como estava no arquivo;
+- `campos`: cada campo do `contexto` e cada numero ou texto curto dos `dados`
+  (o `padrao` e o `status` da requisicao), um por linha da tabela, com indice
+  por nome e valor. E o que faz "soma de `rejeitadas` por `fonte`" e "p95 de
+  `duracao_ms` por `padrao`" serem juncoes por indice, e nao varreduras;
+- `busca`: FTS5 sobre mensagem e erro (`--texto "falhou AND 503"`).
+
+🚨 **Incremental pelo deslocamento, e o arquivo e reconhecido pela primeira
+linha, nao pelo nome.** O `RotatingFileHandler` renomeia `coral.jsonl` para
+`coral.jsonl.1`, o `.1` para `.2`, e assim por diante: pelo nome, cada rotacao
+pareceria um arquivo novo e o indice inteiro seria refeito. A primeira linha
+(com horario em microssegundos e a correlacao) nao muda com o nome, entao cada
+arquivo e lembrado por ela, com o deslocamento ate onde ja foi lido. A cada
+`atualizar`, so o que passou desse ponto e lido.
+
+⚠️ Linha sem `\\n` no fim ainda esta sendo escrita: fica para a proxima vez.
+Linha que nao e JSON (processo morto no meio do `write`) e contada e pulada.
+
+⚠️ **O indice espelha o disco.** O backup que a rotacao apagou sai do indice
+na atualizacao seguinte - o indice nao vira arquivo morto paralelo, nem cresce
+sem limite. `erros.jsonl` nao entra: tudo o que esta nele tambem esta no
+`coral.jsonl`.
+"""
+
+import hashlib
+import json
+import math
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from .config import ARQUIVO_UNIFICADO
+
+NOME_INDICE = 'indice.sqlite3'
+# Linhas por transacao. Um commit por linha seria o disco, e nao o parse, o
+# gargalo; um commit so para 200 MB seguraria tudo na memoria.
+LOTE = 5_000
+# Do mais baixo ao mais alto: `--nivel WARNING` pega daqui em diante.
+NIVEIS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Texto dos `dados` ate este tamanho entra em `campos`; maior e mensagem, e o
+# FTS cobre a mensagem.
+TEXTO_CURTO = 200
+# Sobe quando o que vai para as tabelas muda: indice de versao anterior e
+# refeito do zero na abertura, senao as linhas antigas ficariam sem os campos
+# novos e os agregados sairiam pela metade.
+VERSAO_ESQUEMA = 2
+
+FUNCOES = ('contagem', 'soma', 'media', 'min', 'max', 'p50', 'p95', 'p99')
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS arquivos (
+    id INTEGER PRIMARY KEY,
+    assinatura TEXT UNIQUE NOT NULL,
+    nome TEXT NOT NULL,
+    lido INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS linhas (
+    id INTEGER PRIMARY KEY,
+    arquivo INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    nivel TEXT NOT NULL,
+    logger TEXT NOT NULL,
+    correlacao TEXT NOT NULL,
+    mensagem TEXT NOT NULL,
+    erro TEXT,
+    bruta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS linhas_correlacao ON linhas (correlacao, ts);
+CREATE INDEX IF NOT EXISTS linhas_ts ON linhas (ts);
+CREATE INDEX IF NOT EXISTS linhas_arquivo ON linhas (arquivo);
+CREATE TABLE IF NOT EXISTS campos (
+    linha INTEGER NOT NULL,
+    chave TEXT NOT NULL,
+    texto TEXT,
+    numero REAL,
+    PRIMARY KEY (linha, chave)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS campos_chave_texto ON campos (chave, texto);
+CREATE VIRTUAL TABLE IF NOT EXISTS busca USING fts5 (
+    mensagem, erro, content='linhas', content_rowid='id'
+);
+"""
+
+
+@dataclass
+class Atualizacao:
+    """O que uma chamada de `atualizar` fez."""
+
+    arquivos: int = 0
+    linhas: int = 0
+    ignoradas: int = 0
+    removidos: int = 0
+    segundos: float = 0.0
+
+
+def arquivos_de_log(pasta):
+    """`coral.jsonl` e os backups, do mais antigo para o mais novo."""
+    pasta = Path(pasta)
+    achados = [c for c in pasta.glob(f'{ARQUIVO_UNIFICADO}*') if c.is_file()]
+
+    def idade(caminho):
+        sufixo = caminho.name[len(ARQUIVO_UNIFICADO):].lstrip('.')
+        return int(sufixo) if sufixo.isdigit() else 0 if not sufixo else -1
+
+    return sorted((c for c in achados if idade(c) >= 0), key=idade, reverse=True)
+
+
+def assinatura(caminho):
+    """O hash da primeira linha completa, ou `None` se ainda nao ha uma.
+
+    🚨 A linha inteira, seja qual for o tamanho. Ate 19/10/2026 eram os
+    primeiros 4 KB: um arquivo que comecava com um traceback longo nunca tinha
+    `\\n` nessa janela, e nunca era indexado - sem aviso nenhum.
+    """
+    with open(caminho, 'rb') as arquivo:
+        primeira = arquivo.readline()
+    if not primeira.endswith(b'\n'):
+        return None
+    return hashlib.sha1(primeira[:-1]).hexdigest()
+
+
+def _campos(linha_id, contexto, dados):
+    # Do `contexto`, tudo (sao poucos campos curtos, e sao os do GROUP BY).
+    # Dos `dados`, numero e texto curto: o `padrao` da rota e o `status` sao
+    # os grupos do p95 por rota. Texto longo la dentro e mensagem.
+    for chave, valor in (contexto or {}).items():
+        if isinstance(valor, (dict, list)) or valor is None:
+            continue
+        numero = valor if isinstance(valor, (int, float)) and not isinstance(valor, bool) else None
+        yield (linha_id, chave, str(valor), numero)
+    for chave, valor in (dados or {}).items():
+        if isinstance(valor, str):
+            if len(valor) <= TEXTO_CURTO:
+                yield (linha_id, chave, valor, None)
+            continue
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            continue
+        if isinstance(valor, float) and not math.isfinite(valor):
+            continue
+        yield (linha_id, chave, str(valor), valor)
+
+
+def _percentil(valores, fracao):
+    """Posto mais proximo sobre a lista ja ordenada."""
+    posicao = max(math.ceil(fracao * len(valores)) - 1, 0)
+    return valores[posicao]
+
+
+def _resumir(valores, funcao):
+    if funcao == 'contagem':
+        return len(valores)
+    if funcao == 'soma':
+        return sum(valores)
+    if funcao == 'media':
+        return sum(valores) / len(valores)
+    if funcao == 'min':
+        return min(valores)
+    if funcao == 'max':
+        return max(valores)
+    return _percentil(sorted(valores), int(funcao[1:]) / 100)
+
+
+class Indice:
+    """O indice de uma pasta de logs. Abre (e cria) o SQLite em `caminho`."""
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.conexao = sqlite3.connect(self.caminho)
+        self.conexao.row_factory = sqlite3.Row
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        if self.conexao.execute('PRAGMA user_version').fetchone()[0] < VERSAO_ESQUEMA:
+            self.conexao.executescript(
+                'DROP TABLE IF EXISTS busca; DROP TABLE IF EXISTS campos; '
+                'DROP TABLE IF EXISTS linhas; DROP TABLE IF EXISTS arquivos;'
+            )
+        self.conexao.executescript(_ESQUEMA)
+        self.conexao.execute(f'PRAGMA user_version = {VERSAO_ESQUEMA}')
+
+    def fechar(self):
+        self.conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    # -- atualizacao --------------------------------------------------------
+
+    def atualizar(self, pasta):
+        """Le de cada arquivo so o que passou do ultimo deslocamento."""
+        comeco = time.perf_counter()
+        feito = Atualizacao()
+        vistos = set()
+
+        for caminho in arquivos_de_log(pasta):
+            marca = assinatura(caminho)
+            if marca is None:
+                continue
+            vistos.add(marca)
+            arquivo_id, lido = self._arquivo(marca, caminho.name)
+            if caminho.stat().st_size <= lido:
+                continue
+            feito.arquivos += 1
+            lidas, ignoradas = self._ler(caminho, arquivo_id, lido)
+            feito.linhas += lidas
+            feito.ignoradas += ignoradas
+
+        feito.removidos = self._esquecer(vistos)
+        feito.segundos = time.perf_counter() - comeco
+        return feito
+
+    def _arquivo(self, marca, nome):
+        with self.conexao:
+            self.conexao.execute(
+                'INSERT INTO arquivos (assinatura, nome) VALUES (?, ?) '
+                'ON CONFLICT (assinatura) DO UPDATE SET nome = excluded.nome',
+                (marca, nome),
+            )
+        linha = self.conexao.execute(
+            'SELECT id, lido FROM arquivos WHERE assinatura = ?', (marca,)
+        ).fetchone()
+        return linha['id'], linha['lido']
+
+    def _ler(self, caminho, arquivo_id, lido):
+        proximo = (self.conexao.execute('SELECT max(id) FROM linhas').fetchone()[0] or 0) + 1
+        lidas = ignoradas = 0
+        linhas, campos = [], []
+
+        with open(caminho, 'rb') as arquivo:
+            arquivo.seek(lido)
+            for bruta in arquivo:
+                if not bruta.endswith(b'\n'):
+                    break
+                lido += len(bruta)
+                try:
+                    texto = bruta.decode('utf-8')
+                    registro = json.loads(texto)
+                    ts = datetime.fromisoformat(registro['quando']).timestamp()
+                except (ValueError, KeyError, TypeError):
+                    ignoradas += 1
+                    continue
+
+                linhas.append((
+                    proximo, arquivo_id, ts,
+                    registro.get('nivel', ''), registro.get('logger', ''),
+                    registro.get('correlacao', '-'), registro.get('mensagem', ''),
+                    registro.get('erro'), texto.rstrip('\n'),
+                ))
+                campos.extend(_campos(proximo, registro.get('contexto'), registro.get('dados')))
+                proximo += 1
+                lidas += 1
+
+                if len(linhas) >= LOTE:
+                    self._gravar(linhas, campos, arquivo_id, lido)
+                    linhas, campos = [], []
+
+        self._gravar(linhas, campos, arquivo_id, lido)
+        return lidas, ignoradas
+
+    def _gravar(self, linhas, campos, arquivo_id, lido):
+        # O deslocamento sobe na mesma transacao das linhas: interrompido no
+        # meio, o indice recomeca do ultimo lote gravado, sem duplicar.
+        with self.conexao:
+            self.conexao.executemany(
+                'INSERT INTO linhas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', linhas
+            )
+            # Mesma chave no contexto e nos dados: fica a do contexto.
+            self.conexao.executemany('INSERT OR IGNORE INTO campos VALUES (?, ?, ?, ?)', campos)
+            self.conexao.executemany(
+                'INSERT INTO busca (rowid, mensagem, erro) VALUES (?, ?, ?)',
+                ((linha[0], linha[6], linha[7]) for linha in linhas),
+            )
+            self.conexao.execute('UPDATE arquivos SET lido = ? WHERE id = ?', (lido, arquivo_id))
+
+    def _esquecer(self, vistos):
+        """Tira do indice os arquivos que a rotacao apagou."""
+        sumidos = [
+            linha['id'] for linha in self.conexao.execute('SELECT id, assinatura FROM arquivos')
+            if linha['assinatura'] not in vistos
+        ]
+        with self.conexao:
+            for arquivo_id in sumidos:
+                # Tabela FTS com conteudo externo: a remocao leva os valores
+                # antigos, senao os termos ficam orfaos no indice de texto.
+                self.conexao.execute(
+                    "INSERT INTO busca (busca, rowid, mensagem, erro) "
+                    "SELECT 'delete', id, mensagem, erro FROM linhas WHERE arquivo = ?",
+                    (arquivo_id,),
+                )
+                self.conexao.execute(
+                    'DELETE FROM campos WHERE linha IN (SELECT id FROM linhas WHERE arquivo = ?)',
+                    (arquivo_id,),
+                )
+                self.conexao.execute('DELETE FROM linhas WHERE arquivo = ?', (arquivo_id,))
+                self.conexao.execute('DELETE FROM arquivos WHERE id = ?', (arquivo_id,))
+        return len(sumidos)
+
+    # -- consulta -----------------------------------------------------------
+
+    def _filtros(self, correlacao=None, texto=None, nivel=None, logger=None,
+                 desde=None, ate=None, campos=None):
+        """O `WHERE` sobre `linhas l` para os filtros dados."""
+        condicoes, parametros = [], []
+        if correlacao:
+            condicoes.append('l.correlacao = ?')
+            parametros.append(correlacao)
+        if texto:
+            condicoes.append('l.id IN (SELECT rowid FROM busca WHERE busca MATCH ?)')
+            parametros.append(texto)
+        if nivel:
+            acima = NIVEIS[NIVEIS.index(nivel.upper()):]
+            condicoes.append(f'l.nivel IN ({", ".join("?" * len(acima))})')
+            parametros.extend(acima)
+        if logger:
+            condicoes.append('(l.logger = ? OR l.logger LIKE ?)')
+            parametros.extend([logger, f'{logger}.%'])
+        if desde is not None:
+            condicoes.append('l.ts >= ?')
+            parametros.append(desde.timestamp())
+        if ate is not None:
+            condicoes.append('l.ts < ?')
+            parametros.append(ate.timestamp())
+        for chave, valor in (campos or {}).items():
+            condicoes.append(
+                'l.id IN (SELECT linha FROM campos WHERE chave = ? AND texto = ?)'
+            )
+            parametros.extend([chave, str(valor)])
+        onde = f'WHERE {" AND ".join(condicoes)}' if condicoes else ''
+        return onde, parametros
+
+    def linhas(self, limite=None, **filtros):
+        """As linhas que passam nos filtros, em ordem de tempo, como no JSONL."""
+        onde, parametros = self._filtros(**filtros)
+        sql = f'SELECT l.bruta FROM linhas l {onde} ORDER BY l.ts, l.id'
+        if limite:
+            # As ultimas `limite`, ainda em ordem de tempo.
+            sql = (
+                f'SELECT bruta FROM (SELECT l.bruta, l.ts, l.id FROM linhas l {onde} '
+                f'ORDER BY l.ts DESC, l.id DESC LIMIT ?) ORDER BY ts, id'
+            )
+            parametros = [*parametros, limite]
+        for linha in self.conexao.execute(sql, parametros):
+            yield json.loads(linha['bruta'])
+
+    def agregar(self, medida, por=None, funcao='soma', **filtros):
+        """`[(grupo, valor, n)]` de um campo numerico, agrupado por outro campo.
+
+        `agregar('rejeitadas', por='fonte')` soma `dados.rejeitadas` por
+        `contexto.fonte`; `agregar('duracao_ms', por='padrao', funcao='p95')`
+        e o p95 por padrao de rota, e nao por caminho (um grupo por slug).
+        Sem `por`, um grupo so (`None`).
+        """
+        if funcao not in FUNCOES:
+            raise ValueError(f'Funcao "{funcao}" desconhecida; use uma de {", ".join(FUNCOES)}.')
+        onde, parametros = self._filtros(**filtros)
+        if por:
+            sql = (
+                'SELECT g.texto AS grupo, m.numero AS valor FROM campos m '
+                'JOIN campos g ON g.linha = m.linha AND g.chave = ? '
+                f'JOIN linhas l ON l.id = m.linha {onde} '
+                f'{"AND" if onde else "WHERE"} m.chave = ? AND m.numero IS NOT NULL'
+            )
+            parametros = [por, *parametros, medida]
+        else:
+            sql = (
+                'SELECT NULL AS grupo, m.numero AS valor FROM campos m '
+                f'JOIN linhas l ON l.id = m.linha {onde} '
+                f'{"AND" if onde else "WHERE"} m.chave = ? AND m.numero IS NOT NULL'
+            )
+            parametros = [*parametros, medida]
+
+        grupos = {}
+        for linha in self.conexao.execute(sql, parametros):
+            grupos.setdefault(linha['grupo'], []).append(linha['valor'])
+        resultado = [
+            (grupo, _resumir(valores, funcao), len(valores))
+            for grupo, valores in grupos.items()
+        ]
+        return sorted(resultado, key=lambda item: -item[1])
+
+    def consultar(self, sql, parametros=()):
+        """SQL livre sobre as tabelas do indice. Devolve `(colunas, linhas)`."""
+        cursor = self.conexao.execute(sql, parametros)
+        colunas = [descricao[0] for descricao in cursor.description or ()]
+        return colunas, [tuple(linha) for linha in cursor]
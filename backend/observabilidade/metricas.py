@@ -0,0 +1,265 @@
+"""Metricas em processo, expostas no formato texto do Prometheus.
+
+O log diz o que aconteceu em cada requisicao e em cada bloco de ingestao; o
+que ele nao diz sem reprocessamento e a **forma ao longo do tempo**: quantas
+medicoes por minuto a ingestao grava, qual o p99 do painel hoje contra a
+semana passada. Para isso servem contadores e histogramas, lidos por um
+`curl /metricas/` ou por um Prometheus local apontado para o mesmo caminho.
+
+Sem dependencia nova e sem servico externo: o registro e um dicionario em
+memoria com trava, e a exposicao e texto no formato 0.0.4 do Prometheus.
+
+    from observabilidade import metricas
+
+    GRAVADOS = metricas.contador(
+        'ingestao_registros_gravados_total', 'Medicoes gravadas.', ('fonte', 'local')
+    )
+    GRAVADOS.inc(406, fonte='noaa_crw', local='abrolhos-ba')
+
+⚠️ **Os numeros sao do processo.** Com varios workers do gunicorn, cada um
+tem o seu registro, e um scrape cai num deles so. Serve para ver tendencia e
+cauda num worker representativo; somar o site inteiro exigiria um coletor
+externo, que e justamente o que este modulo evita.
+
+🚨 **Rotulo tem de ter poucos valores.** `rota` e o padrao da URL
+(`api/locais/<slug:slug>/`), nunca o caminho com o slug; `local` e o slug do
+recife, que sao centenas e nao milhoes. Rotulo com id de requisicao ou data
+faria o registro crescer sem limite.
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Segundos. De 5 ms (uma lista pequena) a 10 s (o painel sem cache em disco lento).
+FAIXAS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Segundos. Um bloco de 180 dias do ERDDAP leva de segundos a minutos.
+FAIXAS_BLOCO = (1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+class _Metrica:
+    tipo = ''
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._trava = threading.Lock()
+        self._valores = {}
+
+    def _chave(self, rotulos):
+        if set(rotulos) != set(self.rotulos):
+            raise ValueError(
+                f'{self.nome} espera os rotulos {self.rotulos}, recebeu {tuple(rotulos)}.'
+            )
+        return tuple(str(rotulos[nome]) for nome in self.rotulos)
+
+    def limpar(self):
+        with self._trava:
+            self._valores.clear()
+
+    def _rotulado(self, chave, extra=()):
+        pares = [*zip(self.rotulos, chave, strict=True), *extra]
+        if not pares:
+            return ''
+        return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + '}'
+
+    def linhas(self):
+        yield f'# HELP {self.nome} {self.ajuda}'
+        yield f'# TYPE {self.nome} {self.tipo}'
+        with self._trava:
+            valores = dict(self._valores)
+        yield from self._amostras(valores)
+
+
+class Contador(_Metrica):
+    """So sobe. A taxa por segundo e conta de quem le (`rate()` no Prometheus)."""
+
+    tipo = 'counter'
+
+    def inc(self, valor=1, **rotulos):
+        if valor < 0:
+            raise ValueError(f'{self.nome}: contador nao desce (recebeu {valor}).')
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos):
+        return self._valores.get(self._chave(rotulos), 0)
+
+    def _amostras(self, valores):
+        for chave, valor in sorted(valores.items()):
+            yield f'{self.nome}{self._rotulado(chave)} {_numero(valor)}'
+
+
+class Medidor(_Metrica):
+    """Valor do momento. Com `funcao`, lido na hora da exposicao."""
+
+    tipo = 'gauge'
+
+    def __init__(self, nome, ajuda, rotulos=(), funcao=None):
+        super().__init__(nome, ajuda, rotulos)
+        if funcao is not None and self.rotulos:
+            raise ValueError(f'{self.nome}: medidor com funcao nao tem rotulos.')
+        self._funcao = funcao
+
+    def definir(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = valor
+
+    def _amostras(self, valores):
+        if self._funcao is not None:
+            valores = {(): self._funcao()}
+        for chave, valor in sorted(valores.items()):
+            yield f'{self.nome}{self._rotulado(chave)} {_numero(valor)}'
+
+
+class Histograma(_Metrica):
+    """Distribuicao em faixas cumulativas, mais soma e contagem.
+
+    E o que permite ler p50 e p99 depois (`histogram_quantile`), sem guardar
+    cada observacao.
+    """
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), faixas=FAIXAS_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.faixas = tuple(sorted(faixas))
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        posicao = bisect_left(self.faixas, valor)
+        with self._trava:
+            contagens, soma = self._valores.get(chave, ([0] * (len(self.faixas) + 1), 0.0))
+            contagens[posicao] += 1
+            self._valores[chave] = (contagens, soma + valor)
+
+    def cronometrar(self, **rotulos):
+        """Context manager que observa a duracao do bloco, em segundos."""
+        return _Cronometro(self, rotulos)
+
+    def contagem(self, **rotulos):
+        contagens, _ = self._valores.get(self._chave(rotulos), ((), 0.0))
+        return sum(contagens)
+
+    def _amostras(self, valores):
+        for chave, (contagens, soma) in sorted(valores.items()):
+            acumulado = 0
+            for limite, contagem in zip((*self.faixas, math.inf), contagens, strict=True):
+                acumulado += contagem
+                rotulado = self._rotulado(chave, [('le', _numero(limite))])
+                yield f'{self.nome}_bucket{rotulado} {acumulado}'
+            yield f'{self.nome}_sum{self._rotulado(chave)} {_numero(soma)}'
+            yield f'{self.nome}_count{self._rotulado(chave)} {acumulado}'
+
+
+class _Cronometro:
+    def __init__(self, histograma, rotulos):
+        self._histograma = histograma
+        self._rotulos = rotulos
+
+    def __enter__(self):
+        self._comeco = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        self._histograma.observar(time.perf_counter() - self._comeco, **self._rotulos)
+        return False
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _numero(valor):
+    if valor == math.inf:
+        return '+Inf'
+    if isinstance(valor, int) or float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class Registro:
+    """As metricas do processo, por nome."""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._metricas = {}
+
+    def _obter(self, classe, nome, *argumentos, **opcoes):
+        """Devolve a metrica ja registrada com o nome, ou registra.
+
+        Idempotente de proposito: o modulo que declara a metrica pode ser
+        recarregado (autoreload, teste), e a segunda declaracao tem de devolver
+        a mesma serie, e nao zerar nem duplicar.
+        """
+        with self._trava:
+            existente = self._metricas.get(nome)
+            if existente is None:
+                existente = self._metricas[nome] = classe(nome, *argumentos, **opcoes)
+            elif not isinstance(existente, classe):
+                raise ValueError(f'{nome} ja registrada como {existente.tipo}.')
+            return existente
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._obter(Contador, nome, ajuda, rotulos)
+
+    def medidor(self, nome, ajuda, rotulos=(), funcao=None):
+        return self._obter(Medidor, nome, ajuda, rotulos, funcao=funcao)
+
+    def histograma(self, nome, ajuda, rotulos=(), faixas=FAIXAS_LATENCIA):
+        return self._obter(Histograma, nome, ajuda, rotulos, faixas=faixas)
+
+    def exposicao(self):
+        """Todas as metricas no formato texto do Prometheus."""
+        with self._trava:
+            metricas = sorted(self._metricas.values(), key=lambda m: m.nome)
+        return ''.join(f'{linha}\n' for metrica in metricas for linha in metrica.linhas())
+
+    def limpar(self):
+        """Zera os valores, mantendo as metricas. Para teste."""
+        with self._trava:
+            metricas = list(self._metricas.values())
+        for metrica in metricas:
+            metrica.limpar()
+
+
+REGISTRO = Registro()
+contador = REGISTRO.contador
+medidor = REGISTRO.medidor
+histograma = REGISTRO.histograma
+
+
+def autorizado(requisicao):
+    """Quem pode ler `/metricas/`.
+
+    Com `METRICAS_TOKEN`, so quem manda `Authorization: Bearer <token>`. Sem
+    ele, so a propria maquina: o scraper local e o `curl` de quem opera.
+    Atras de proxy o endereco e sempre o do proxy - ai o token e obrigatorio.
+    """
+    import hmac
+
+    from django.conf import settings
+
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    if token:
+        enviado = requisicao.META.get('HTTP_AUTHORIZATION', '')
+        # Em bytes: com `str`, `compare_digest` levanta TypeError se qualquer
+        # lado tiver caractere fora do ASCII, e um cabecalho assim virava 500
+        # em vez de 403.
+        return hmac.compare_digest(enviado.encode(), f'Bearer {token}'.encode())
+    return requisicao.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1')
+
+
+def exposicao_view(requisicao):
+    """`GET /metricas/`: o registro inteiro, em texto."""
+    from django.http import HttpResponse, HttpResponseForbidden
+
+    if not autorizado(requisicao):
+        return HttpResponseForbidden('Metricas so para a propria maquina ou com METRICAS_TOKEN.')
+    return HttpResponse(REGISTRO.exposicao(), content_type=TIPO_CONTEUDO)
@@ -9,12 +9,39 @@ sairiam sem correlacao nenhuma — o unico fluxo do sistema fora do rastro.
 util para quem esta do lado de fora: um erro relatado por quem usa o site vem
 com o id, e o id encontra a linha. Sem devolver, a unica ancora seria o
 horario aproximado informado por quem viu a tela.
+
+**Cada requisicao tambem mede o proprio SQL** (`consultas.medir_sql`): quantas
+consultas, quanto tempo no banco, a mais lenta e a mais repetida. Os numeros
+vao para o `dados` da linha no JSONL e para o cabecalho `Server-Timing`, que o
+DevTools do navegador desenha na aba de rede sem nenhuma ferramenta a mais.
+
+🚨 **Orcamento por rota, e nao um limite unico.** 1 s e lento para
+`/api/locais/` e normal para o painel, que calcula o risco recife a recife.
+`ORCAMENTOS_REQUISICAO` no settings fixa tempo, consultas e repeticoes por
+prefixo de rota; a requisicao que estoura qualquer um sai em WARNING com
+`orcamento_estourado` dizendo qual. E assim que um N+1 novo aparece no log de
+producao no primeiro dia, e nao quando alguem por acaso abre o profiler.
+
+Cada requisicao tambem entra no histograma `http_requisicao_segundos` de
+`metricas`, rotulado pelo **padrao** da rota (`api/locais/<slug:slug>/`) e nao
+pelo caminho: com o slug, seriam quinhentas series para a mesma view.
+
+A requisicao tambem e a raiz dos trechos de `rastro` abertos pela view: a que
+abriu algum sai com a divisao do tempo por etapa, e a lenta vira arquivo para
+o Perfetto.
+
+⚠️ Resposta em streaming (o CSV de `/api/medicoes/`) consulta o banco
+enquanto o corpo e enviado, depois que este middleware ja devolveu: a medida
+cobre so a montagem da resposta.
 """
 
 import logging
 import time
 
+from . import metricas
+from .consultas import medir_sql
 from .correlacao import contexto
+from .rastro import trecho
 
 logger = logging.getLogger(__name__)
 
@@ -25,14 +52,69 @@ CABECALHO = 'X-Correlacao'
 CABECALHO_ENTRADA = 'HTTP_X_CORRELACAO'
 
 # Rotas que nao geram linha de log. `/admin/jsi18n/` e os estaticos sao ruido
-# de alto volume e valor nulo para auditoria de dado.
-IGNORADAS = ('/static/', '/media/', '/admin/jsi18n/')
+# de alto volume e valor nulo para auditoria de dado; `/metricas/` e o scrape,
+# a cada poucos segundos.
+IGNORADAS = ('/static/', '/media/', '/admin/jsi18n/', '/metricas/')
 
 # A partir de quantos milissegundos a requisicao vira WARNING em vez de INFO.
 # 🚨 Nao e um alarme de performance: e o gancho de "gargalo" pedido junto com o
 # cache. Sem medir onde demora, cachear e adivinhar.
 LIMITE_LENTA_MS = 1000
 
+CABECALHO_TEMPOS = 'Server-Timing'
+
+# O orcamento de toda rota sem entrada propria em `ORCAMENTOS_REQUISICAO`.
+# `repeticoes` e o mesmo SQL executado N vezes - o N+1. As listas da API fazem
+# 2 ou 3 consultas; 10 iguais numa requisicao ja e um laco consultando o banco.
+# `None` desliga o limite.
+ORCAMENTO_PADRAO = {'ms': LIMITE_LENTA_MS, 'consultas': 50, 'repeticoes': 10}
+
+LATENCIA = metricas.histograma(
+    'http_requisicao_segundos',
+    'Duracao das requisicoes HTTP, por metodo, padrao de rota e status.',
+    ('metodo', 'rota', 'status'),
+)
+
+
+def padrao_da_rota(requisicao):
+    """O padrao de URL que resolveu a requisicao, ou `nao_resolvida` (404)."""
+    casamento = getattr(requisicao, 'resolver_match', None)
+    if casamento is None or not casamento.route:
+        return 'nao_resolvida'
+    return casamento.route
+
+
+def orcamento(rota, orcamentos=None):
+    """O orcamento da rota: o padrao, sobreposto pelo prefixo mais longo que casa."""
+    if orcamentos is None:
+        from django.conf import settings
+
+        orcamentos = getattr(settings, 'ORCAMENTOS_REQUISICAO', {})
+    prefixos = [prefixo for prefixo in orcamentos if rota.startswith(prefixo)]
+    proprio = orcamentos[max(prefixos, key=len)] if prefixos else {}
+    return {**ORCAMENTO_PADRAO, **proprio}
+
+
+def estourados(limites, decorrido_ms, medida):
+    """Os nomes dos limites que a requisicao passou, na ordem do orcamento."""
+    medido = {
+        'ms': decorrido_ms,
+        'consultas': medida.consultas,
+        'repeticoes': medida.repetida[1],
+    }
+    return [
+        nome for nome, limite in limites.items()
+        if limite is not None and medido.get(nome, 0) > limite
+    ]
+
+
+def server_timing(decorrido_ms, medida):
+    """O valor do cabecalho `Server-Timing`: total e banco, com a contagem."""
+    return (
+        f'total;dur={decorrido_ms:.1f}, '
+        f'sql;dur={medida.tempo_ms:.1f};desc="{medida.consultas} consultas"'
+    )
+
 
 class CorrelacaoMiddleware:
     """Envolve a requisicao num contexto de log e mede quanto ela levou."""
@@ -53,33 +135,55 @@ class CorrelacaoMiddleware:
             correlacao=recebido,
         ) as identificador:
             comeco = time.perf_counter()
-            try:
-                resposta = self.get_response(requisicao)
-            except Exception:
-                # ⚠️ Registra e **relanca**. Engolir aqui transformaria um 500
-                # com traceback num 200 vazio; o papel deste bloco e garantir
-                # que a falha entre no arquivo com a mesma correlacao da
-                # requisicao, nao tratar a falha.
-                decorrido = (time.perf_counter() - comeco) * 1000
-                logger.exception(
-                    'Requisicao levantou excecao',
-                    extra={'duracao_ms': round(decorrido, 1)},
-                )
-                raise
+            # O trecho fecha antes da linha final: a requisicao que abriu
+            # trechos (o painel, por recife) sai com `Rastro concluido` logo
+            # antes de `Requisicao concluida`, na mesma correlacao.
+            with medir_sql() as medida, trecho('http'):
+                try:
+                    resposta = self.get_response(requisicao)
+                except Exception:
+                    # ⚠️ Registra e **relanca**. Engolir aqui transformaria um
+                    # 500 com traceback num 200 vazio; o papel deste bloco e
+                    # garantir que a falha entre no arquivo com a mesma
+                    # correlacao da requisicao, nao tratar a falha.
+                    decorrido = (time.perf_counter() - comeco) * 1000
+                    logger.exception(
+                        'Requisicao levantou excecao',
+                        extra={'duracao_ms': round(decorrido, 1), **medida.como_extra()},
+                    )
+                    LATENCIA.observar(
+                        decorrido / 1000,
+                        metodo=requisicao.method,
+                        rota=padrao_da_rota(requisicao),
+                        status=500,
+                    )
+                    raise
 
             decorrido = (time.perf_counter() - comeco) * 1000
             resposta[CABECALHO] = identificador
+            resposta[CABECALHO_TEMPOS] = server_timing(decorrido, medida)
+            LATENCIA.observar(
+                decorrido / 1000,
+                metodo=requisicao.method,
+                rota=padrao_da_rota(requisicao),
+                status=resposta.status_code,
+            )
 
+            acima = estourados(orcamento(requisicao.path), decorrido, medida)
             nivel = logging.INFO
-            if resposta.status_code >= 500 or decorrido >= LIMITE_LENTA_MS:
+            if resposta.status_code >= 500 or acima:
                 nivel = logging.WARNING
 
-            logger.log(
-                nivel,
-                'Requisicao concluida',
-                extra={
-                    'status': resposta.status_code,
-                    'duracao_ms': round(decorrido, 1),
-                },
-            )
+            extra = {
+                'status': resposta.status_code,
+                # O padrao da rota, como no histograma: e por ele que a
+                # amostragem agrupa, e que o `manage.py logs --por padrao`
+                # agrega (`testes_indice`, p95 por padrao junta os slugs).
+                'padrao': padrao_da_rota(requisicao),
+                'duracao_ms': round(decorrido, 1),
+                **medida.como_extra(),
+            }
+            if acima:
+                extra['orcamento_estourado'] = acima
+            logger.log(nivel, 'Requisicao concluida', extra=extra)
             return resposta
@@ -0,0 +1,211 @@
+"""Trechos cronometrados e aninhados sobre o mesmo `contexto` do log.
+
+O `contexto` ja aninha campos (fluxo -> fonte/local -> bloco), mas nao tem
+tempo: um backfill de quatro minutos sai no log como uma sequencia de linhas,
+e ninguem consegue dizer quanto foi download, quanto foi parse, quanto foi
+normalizar e quanto foi gravar. O `trecho` e um `contexto` que tambem anota
+inicio, fim e pai:
+
+    with trecho('noaa.download', bloco=rotulo):
+        df = self._buscar(...)
+
+Dentro dele, toda linha de log sai com `contexto.trecho`, o id do trecho
+aberto - a linha de log acha o trecho que a produziu, e vice-versa.
+
+O trecho sem pai e a **raiz** (a requisicao HTTP, uma execucao de ingestao, a
+projecao). Quando ela fecha:
+
+- a linha `Rastro concluido` (INFO) leva `por_etapa`: os milissegundos somados
+  por nome de trecho, e `proprio`, o tempo da raiz fora de qualquer filho. E a
+  divisao do relogio que aparece em **toda** execucao, sem ferramenta nenhuma;
+- cada trecho sai numa linha `Trecho concluido` em DEBUG
+  (`LOG_NIVEL_OBSERVABILIDADE=DEBUG` para ver);
+- com `RASTRO_CHROME` ligado e a raiz acima de `RASTRO_MINIMO_MS`, o rastro
+  inteiro vai para `logs/rastros/` no formato de eventos do Chrome. Abra em
+  https://ui.perfetto.dev (ou `chrome://tracing`): cada trecho e uma barra,
+  aninhada sob o pai.
+
+⚠️ **Raiz sem filho nao gera nada.** Toda requisicao e raiz, e a maioria nao
+abre trecho nenhum; uma linha de rastro por requisicao duplicaria o log sem
+dizer nada que `Requisicao concluida` ja nao diga.
+
+⚠️ Thread nova nao herda o trecho (nem o `contexto`): o `ContextVar` e da
+thread. O que roda num pool sai como raiz propria.
+"""
+
+import contextlib
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from .correlacao import contexto
+
+logger = logging.getLogger(__name__)
+
+# Teto de trechos guardados por raiz. Um backfill de trinta anos em blocos de
+# 180 dias, com cinco trechos por bloco, fica perto de 300; o painel com 500
+# recifes, perto de 1.500. Acima disto os trechos sao contados, nao guardados.
+LIMITE_TRECHOS = 50_000
+
+_ABERTO = contextvars.ContextVar('coral_trecho', default=None)
+# Id curto e unico no processo; junto com a correlacao, unico no log inteiro.
+_IDS = itertools.count(1)
+
+
+@dataclass
+class Trecho:
+    nome: str
+    id: str
+    pai: str | None
+    correlacao: str
+    inicio: float
+    campos: dict = field(default_factory=dict)
+    duracao_ms: float | None = None
+    thread: int = 0
+    _comeco: float = 0.0
+    _raiz: 'Trecho | None' = None
+    _trechos: list = field(default_factory=list)
+    _descartados: int = 0
+
+    @property
+    def raiz(self):
+        return self._raiz or self
+
+    def como_dict(self):
+        return {
+            'trecho': self.id,
+            'pai': self.pai,
+            'nome': self.nome,
+            'inicio': round(self.inicio, 6),
+            'duracao_ms': self.duracao_ms,
+            **self.campos,
+        }
+
+
+def trecho_atual():
+    """O trecho aberto, ou `None` fora de qualquer trecho."""
+    return _ABERTO.get()
+
+
+@contextlib.contextmanager
+def trecho(nome, **campos):
+    """Abre um trecho cronometrado. Devolve o `Trecho`; `campos` pode crescer dentro.
+
+    Os campos tambem entram no `contexto` do log, como os de `contexto()`.
+    """
+    pai = _ABERTO.get()
+    identificador = f'{next(_IDS):x}'
+    with contexto(trecho=identificador, **campos) as correlacao:
+        aberto = Trecho(
+            nome=nome,
+            id=identificador,
+            pai=pai.id if pai else None,
+            correlacao=correlacao,
+            inicio=time.time(),
+            campos={chave: valor for chave, valor in campos.items() if valor is not None},
+            thread=threading.get_ident(),
+            _comeco=time.perf_counter(),
+            _raiz=pai.raiz if pai else None,
+        )
+        token = _ABERTO.set(aberto)
+        try:
+            yield aberto
+        finally:
+            _ABERTO.reset(token)
+            aberto.duracao_ms = round((time.perf_counter() - aberto._comeco) * 1000, 3)
+            raiz = aberto.raiz
+            if aberto is raiz:
+                _concluir(raiz)
+            elif len(raiz._trechos) < LIMITE_TRECHOS:
+                raiz._trechos.append(aberto)
+            else:
+                raiz._descartados += 1
+
+
+def por_etapa(raiz):
+    """Milissegundos somados por nome de trecho, e o `proprio` da raiz."""
+    somas = {}
+    filhos_diretos = 0.0
+    for filho in raiz._trechos:
+        somas[filho.nome] = somas.get(filho.nome, 0.0) + filho.duracao_ms
+        if filho.pai == raiz.id:
+            filhos_diretos += filho.duracao_ms
+    somas = {nome: round(ms, 1) for nome, ms in sorted(somas.items(), key=lambda p: -p[1])}
+    somas['proprio'] = round(max(raiz.duracao_ms - filhos_diretos, 0.0), 1)
+    return somas
+
+
+def eventos_chrome(raiz):
+    """O rastro no formato de eventos do Chrome, que o Perfetto abre.
+
+    Um evento completo (`ph: X`) por trecho, com inicio e duracao em
+    microssegundos. O aninhamento na tela sai do tempo e da thread.
+    """
+    processo = os.getpid()
+    eventos = []
+    for aberto in [raiz, *raiz._trechos]:
+        eventos.append({
+            'name': aberto.nome,
+            'cat': aberto.nome.split('.', 1)[0],
+            'ph': 'X',
+            'ts': round(aberto.inicio * 1_000_000),
+            'dur': round(aberto.duracao_ms * 1000),
+            'pid': processo,
+            'tid': aberto.thread,
+            'args': {'trecho': aberto.id, 'pai': aberto.pai, **aberto.campos},
+        })
+    return {
+        'traceEvents': eventos,
+        'displayTimeUnit': 'ms',
+        'otherData': {'correlacao': raiz.correlacao, 'raiz': raiz.nome},
+    }
+
+
+def gravar_chrome(raiz, pasta):
+    """Grava o rastro em `pasta/<inicio>-<raiz>-<correlacao>.json`. Devolve o caminho."""
+    from pathlib import Path
+
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    carimbo = time.strftime('%Y%m%d-%H%M%S', time.localtime(raiz.inicio))
+    nome = raiz.nome.replace('/', '_').replace(' ', '_')
+    caminho = pasta / f'{carimbo}-{nome}-{raiz.correlacao}.json'
+    caminho.write_text(json.dumps(eventos_chrome(raiz), default=str), encoding='utf-8')
+    return caminho
+
+
+def _concluir(raiz):
+    if not raiz._trechos:
+        return
+
+    # 🚨 Nada aqui pode levantar: o rastro e relato, e a execucao que ele
+    # descreve ja terminou - falhar agora a transformaria em erro.
+    try:
+        for aberto in raiz._trechos:
+            logger.debug('Trecho concluido', extra=aberto.como_dict())
+
+        extra = {
+            'nome': raiz.nome,
+            'duracao_ms': raiz.duracao_ms,
+            'trechos': len(raiz._trechos),
+            'por_etapa': por_etapa(raiz),
+        }
+        if raiz._descartados:
+            extra['trechos_descartados'] = raiz._descartados
+
+        from django.conf import settings
+
+        if (
+            getattr(settings, 'RASTRO_CHROME', False)
+            and raiz.duracao_ms >= getattr(settings, 'RASTRO_MINIMO_MS', 0)
+        ):
+            extra['chrome'] = str(gravar_chrome(raiz, settings.RASTRO_PASTA))
+
+        logger.info('Rastro concluido', extra=extra)
+    except Exception:
+        logger.warning('Falha ao concluir o rastro', exc_info=True)
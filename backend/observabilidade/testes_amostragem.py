@@ -0,0 +1,157 @@
+"""Testes da amostragem das linhas de alto volume.
+
+O que protegem:
+
+1. 🚨 **O que importa nunca e amostrado.** WARNING+, requisicao lenta e status
+   fora de 2xx passam sempre, com qualquer `um_em`.
+2. **Uma decisao por linha.** O filtro esta no console e no arquivo; a linha
+   sai nos dois ou em nenhum, e conta uma vez.
+3. **O resumo.** Contagem e percentis de todas as linhas, inclusive das que
+   ficaram de fora e das lentas e de erro, que passam sempre; o maximo e o
+   real, e nao o do reservatorio. Sem a correlacao da requisicao que o
+   disparou.
+"""
+
+import logging
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from .amostragem import FiltroAmostragem
+from .config import montar
+from .correlacao import FiltroCorrelacao, contexto
+
+REGRAS = {
+    'observabilidade.middleware': {
+        'um_em': 10, 'lento_ms': 300, 'rotas': {'/api/pronto/': 100},
+    },
+}
+
+
+def requisicao(duracao_ms=12.0, status=200, rota='/api/locais/', nivel=logging.INFO,
+               padrao='api/locais/'):
+    return logging.makeLogRecord({
+        'name': 'observabilidade.middleware',
+        'levelno': nivel,
+        'levelname': logging.getLevelName(nivel),
+        'msg': 'Requisicao concluida',
+        'duracao_ms': duracao_ms,
+        'status': status,
+        'padrao': padrao,
+        'contexto': {'fluxo': 'http', 'rota': rota},
+    })
+
+
+class FiltroAmostragemTests(SimpleTestCase):
+    def setUp(self):
+        self.filtro = FiltroAmostragem(REGRAS, resumo_s=0)
+
+    def passam(self, quantas, **campos):
+        return sum(self.filtro.filter(requisicao(**campos)) for _ in range(quantas))
+
+    def test_uma_em_n_das_rapidas_com_2xx(self):
+        self.assertEqual(self.passam(100), 10)
+
+        gravada = requisicao()
+        self.filtro.filter(requisicao())
+        while not self.filtro.filter(gravada):
+            gravada = requisicao()
+        self.assertEqual(gravada.amostragem, 10)
+
+    def test_warning_lenta_e_outro_status_passam_sempre(self):
+        self.assertEqual(self.passam(50, nivel=logging.WARNING), 50)
+        self.assertEqual(self.passam(50, duracao_ms=450.0), 50)
+        self.assertEqual(self.passam(50, status=404), 50)
+
+    def test_rota_com_regra_propria_e_logger_sem_regra(self):
+        self.assertEqual(self.passam(300, rota='/api/pronto/', padrao='api/pronto/'), 3)
+
+        outro = logging.makeLogRecord({
+            'name': 'ingestao.registro', 'levelno': logging.INFO, 'msg': 'Bloco gravado',
+        })
+        self.assertTrue(self.filtro.filter(outro))
+
+    def test_a_mesma_linha_tem_a_mesma_decisao_nos_dois_handlers(self):
+        linhas = [requisicao() for _ in range(20)]
+
+        primeiro = [self.filtro.filter(linha) for linha in linhas]
+        segundo = [self.filtro.filter(linha) for linha in linhas]
+
+        self.assertEqual(primeiro, segundo)
+        self.assertEqual(sum(primeiro), 2)
+        self.assertEqual(self.filtro._acumulados[
+            ('observabilidade.middleware', 'Requisicao concluida', 'api/locais/')
+        ].linhas, 20)
+
+    def test_resumo_conta_tudo_e_sai_sem_a_correlacao_da_requisicao(self):
+        for ms in range(1, 101):
+            self.filtro.filter(requisicao(duracao_ms=float(ms)))
+
+        # O filtro de correlacao no handler, como no settings: e nele que a
+        # correlacao da requisicao entraria.
+        with contexto(fluxo='http') as correlacao, self.assertLogs(
+            'observabilidade.amostragem', 'INFO',
+        ) as capturado:
+            logging.getLogger('observabilidade.amostragem').handlers[0].addFilter(
+                FiltroCorrelacao()
+            )
+            self.filtro.resumir()
+
+        resumo = capturado.records[0]
+        self.assertEqual(resumo.getMessage(), 'Resumo da amostragem')
+        self.assertEqual((resumo.linhas, resumo.gravadas), (100, 10))
+        self.assertEqual(resumo.padrao, 'api/locais/')
+        self.assertEqual(resumo.duracao_ms_p95, 95.0)
+        self.assertEqual(resumo.duracao_ms_max, 100.0)
+        self.assertNotEqual(resumo.correlacao, correlacao)
+        self.assertEqual(resumo.correlacao, '-')
+        self.assertEqual(self.filtro._acumulados, {})
+
+    def test_resumo_inclui_as_lentas_e_as_de_erro(self):
+        """🚨 As que passam sempre sao a cauda: o resumo ja as deixou de fora."""
+        for _ in range(90):
+            self.filtro.filter(requisicao(duracao_ms=10.0))
+        for _ in range(5):
+            self.filtro.filter(requisicao(duracao_ms=2000.0))
+        for _ in range(5):
+            self.filtro.filter(requisicao(duracao_ms=2000.0, status=503, nivel=logging.WARNING))
+
+        with self.assertLogs('observabilidade.amostragem', 'INFO') as capturado:
+            self.filtro.resumir()
+
+        resumo = capturado.records[0]
+        self.assertEqual((resumo.linhas, resumo.gravadas), (100, 19))
+        self.assertEqual(resumo.duracao_ms_p50, 10.0)
+        self.assertEqual(resumo.duracao_ms_p95, 2000.0)
+        self.assertEqual(resumo.duracao_ms_p99, 2000.0)
+        self.assertEqual(resumo.duracao_ms_max, 2000.0)
+
+    def test_maximo_e_contagem_nao_dependem_do_reservatorio(self):
+        with patch('observabilidade.amostragem.RESERVATORIO', 10):
+            for ms in range(1, 1001):
+                self.filtro.filter(requisicao(duracao_ms=float(ms % 250)))
+            self.filtro.filter(requisicao(duracao_ms=299.0))
+
+        acumulado = self.filtro._acumulados[
+            ('observabilidade.middleware', 'Requisicao concluida', 'api/locais/')
+        ]
+        self.assertEqual(len(acumulado.duracoes), 10)
+        self.assertEqual((acumulado.linhas, acumulado.medidas), (1001, 1001))
+        self.assertEqual(acumulado.maximo, 299.0)
+
+
+class ConfiguracaoTests(SimpleTestCase):
+    def test_filtro_entra_em_todo_handler_depois_da_correlacao(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            config = montar(base_dir=Path(pasta), pasta=Path(pasta), amostragem=REGRAS)
+
+        self.assertEqual(config['filters']['amostragem']['regras'], REGRAS)
+        for handler in config['handlers'].values():
+            self.assertEqual(handler['filters'], ['correlacao', 'amostragem'])
+
+    def test_sem_regras_o_filtro_nem_entra(self):
+        config = montar(base_dir=Path('.'), em_arquivo=False)
+
+        self.assertNotIn('amostragem', config['filters'])
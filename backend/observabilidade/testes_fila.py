@@ -0,0 +1,141 @@
+"""Testes dos arquivos de log escritos pela fila.
+
+O que protegem:
+
+1. **O arquivo e o mesmo.** Sair da thread de quem loga nao pode custar a
+   correlacao (que e um `ContextVar` daquela thread) nem o traceback.
+2. **Fila cheia descarta, conta e avisa.** O buraco no arquivo tem de vir
+   com a linha que diz quantas se perderam.
+3. 🚨 **Nada fica na fila na saida.** `close` e o que o `logging.shutdown`
+   chama no `atexit`; o que foi logado antes dele tem de estar no disco.
+"""
+
+import json
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from . import fila
+from .config import montar
+from .correlacao import FiltroCorrelacao, contexto
+
+
+class _Travado(fila.ArquivosEmFila):
+    """A thread de escrita so grava depois de `soltar`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.soltar = threading.Event()
+
+    def _gravar(self, registros):
+        self.soltar.wait(5)
+        super()._gravar(registros)
+
+
+class ArquivosEmFilaTests(SimpleTestCase):
+    def setUp(self):
+        temporaria = tempfile.TemporaryDirectory(prefix='coral-fila-')
+        self.addCleanup(temporaria.cleanup)
+        self.pasta = Path(temporaria.name)
+
+    def handler(self, classe=fila.ArquivosEmFila, **opcoes):
+        handler = classe(
+            [
+                {'filename': str(self.pasta / 'coral.jsonl'), 'level': 'DEBUG'},
+                {'filename': str(self.pasta / 'erros.jsonl'), 'level': 'ERROR'},
+            ],
+            **opcoes,
+        )
+        handler.addFilter(FiltroCorrelacao())
+        logger = logging.getLogger(f'observabilidade.testes_fila.{id(handler)}')
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(handler.close)
+        return handler, logger
+
+    def linhas(self, nome='coral.jsonl'):
+        caminho = self.pasta / nome
+        if not caminho.exists():
+            return []
+        return [json.loads(linha) for linha in caminho.read_text(encoding='utf-8').splitlines()]
+
+    def test_grava_os_dois_arquivos_com_correlacao_e_traceback(self):
+        handler, logger = self.handler()
+
+        with contexto(fluxo='ingestao', fonte='noaa_crw') as correlacao:
+            logger.info('Bloco gravado %s', 'a', extra={'gravadas': 406})
+            try:
+                raise ValueError('quebrou')
+            except ValueError:
+                logger.exception('Bloco falhou')
+        handler.flush()
+
+        tudo, erros = self.linhas(), self.linhas('erros.jsonl')
+        self.assertEqual([linha['mensagem'] for linha in tudo], ['Bloco gravado a', 'Bloco falhou'])
+        self.assertEqual(tudo[0]['correlacao'], correlacao)
+        self.assertEqual(tudo[0]['contexto']['fonte'], 'noaa_crw')
+        self.assertEqual(tudo[0]['dados'], {'gravadas': 406})
+        self.assertEqual([linha['mensagem'] for linha in erros], ['Bloco falhou'])
+        self.assertIn('ValueError: quebrou', erros[0]['erro'])
+
+    def test_close_escreve_o_que_estava_na_fila(self):
+        handler, logger = self.handler()
+
+        for numero in range(2000):
+            logger.debug('linha %d', numero)
+        handler.close()
+
+        self.assertEqual(len(self.linhas()), 2000)
+
+    @mock.patch.object(fila, 'ESPERA_ALERTA_S', 0.01)
+    def test_fila_cheia_descarta_conta_e_avisa(self):
+        handler, logger = self.handler(classe=_Travado, tamanho=2)
+        antes = fila.DESCARTADAS.valor(nivel='INFO') + fila.DESCARTADAS.valor(nivel='WARNING')
+
+        logger.info('primeira')
+        # A thread tira a primeira e para em `_gravar`; a fila fica vazia.
+        while handler._fila.qsize():
+            pass
+        logger.info('segunda')
+        logger.info('terceira')
+        logger.info('perdida')
+        logger.warning('perdida depois de esperar')
+        handler.soltar.set()
+        handler.close()
+
+        mensagens = [linha['mensagem'] for linha in self.linhas()]
+        depois = fila.DESCARTADAS.valor(nivel='INFO') + fila.DESCARTADAS.valor(nivel='WARNING')
+        self.assertEqual(mensagens[:3], ['primeira', 'segunda', 'terceira'])
+        self.assertEqual(mensagens[3:], ['Fila de log cheia: 2 linhas descartadas'])
+        self.assertEqual(depois - antes, 2)
+
+    def test_filho_de_fork_recomeca_a_fila(self):
+        handler, logger = self.handler()
+        logger.info('no mestre')
+        herdada = handler._fila
+
+        with mock.patch.object(fila.os, 'getpid', return_value=handler._pid + 1):
+            logger.info('no filho')
+            handler.flush()
+
+        self.assertIsNot(handler._fila, herdada)
+        self.assertIn('no filho', [linha['mensagem'] for linha in self.linhas()])
+
+
+class ConfiguracaoEmFilaTests(SimpleTestCase):
+    def test_os_dois_arquivos_passam_para_o_handler_da_fila(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            config = montar(base_dir=Path(pasta), pasta=Path(pasta), em_fila=True)
+
+        handlers = config['handlers']
+        self.assertEqual(sorted(handlers), ['arquivos', 'console'])
+        arquivos = handlers['arquivos']['arquivos']
+        self.assertEqual([a['level'] for a in arquivos], ['DEBUG', 'ERROR'])
+        self.assertTrue(arquivos[1]['filename'].endswith('erros.jsonl'))
+        self.assertEqual(config['loggers']['ingestao']['handlers'], ['console', 'arquivos'])
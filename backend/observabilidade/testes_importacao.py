@@ -0,0 +1,82 @@
+"""Testes do perfil de importacao e da partida enxuta.
+
+O que protegem: que a saida de `-X importtime` seja lida com o pai certo
+(ela vem **de baixo para cima**), e que os dois imports que pesavam em todo
+`manage.py` - o driver do Neo4j e os conectores - continuem fora da partida.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from .importacao import ler
+
+# O formato real: filho antes do pai, dois espacos de recuo por nivel.
+SAIDA = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     numpy.core
+import time:       300 |        400 |   numpy
+import time:       500 |        900 | pandas
+import time:        50 |         50 |     neo4j.exceptions
+import time:       200 |        250 |   neo4j
+import time:        20 |        270 | aquaculture.neo4j_service
+System check identified no issues (0 silenced).
+"""
+
+
+class LeituraTests(SimpleTestCase):
+    def test_le_nivel_e_tempos_e_ignora_o_resto(self):
+        perfil = ler(SAIDA)
+
+        self.assertEqual(len(perfil.importacoes), 6)
+        self.assertEqual(perfil.importacoes[0].nome, 'numpy.core')
+        self.assertEqual(perfil.importacoes[0].nivel, 2)
+        self.assertEqual(perfil.importacoes[2].acumulado_us, 900)
+
+    def test_total_soma_so_o_nivel_zero(self):
+        self.assertEqual(ler(SAIDA).total_ms, (900 + 270) / 1000)
+
+    def test_por_pacote_soma_o_tempo_proprio(self):
+        pacotes = dict(ler(SAIDA).por_pacote())
+
+        self.assertEqual(pacotes['numpy'], 0.4)
+        self.assertEqual(pacotes['neo4j'], 0.25)
+        self.assertEqual(ler(SAIDA).por_pacote()[0][0], 'pandas')
+
+    def test_quem_trouxe_sobe_pelo_pai_seguinte(self):
+        perfil = ler(SAIDA)
+
+        self.assertEqual(
+            perfil.quem_trouxe('neo4j'), ['aquaculture.neo4j_service', 'neo4j']
+        )
+        self.assertEqual(perfil.quem_trouxe('numpy'), ['pandas', 'numpy'])
+        self.assertEqual(perfil.quem_trouxe('pandas'), ['pandas'])
+        self.assertEqual(perfil.quem_trouxe('scipy'), [])
+
+
+class PartidaTests(SimpleTestCase):
+    """🚨 O que o `manage.py check` importa nao pode voltar a incluir estes."""
+
+    def test_views_e_registro_nao_importam_driver_nem_conectores(self):
+        codigo = (
+            'import sys, django; django.setup(); '
+            'import aquaculture.views, ingestao.registro; '
+            'print(sorted(m for m in sys.modules '
+            "if m == 'neo4j' or m.startswith('ingestao.conectores.')))"
+        )
+        ambiente = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'coral_site.settings',
+            'DJANGO_DEBUG': 'True',
+            'DJANGO_SECRET_KEY': 'teste',
+        }
+        processo = subprocess.run(
+            [sys.executable, '-c', codigo], cwd=Path(settings.BASE_DIR),
+            env=ambiente, capture_output=True, text=True, check=True,
+        )
+
+        self.assertEqual(processo.stdout.strip().splitlines()[-1], '[]')
@@ -0,0 +1,225 @@
+"""Testes do indice SQLite dos logs e do `manage.py logs`.
+
+O que protegem:
+
+1. 🚨 **So o novo e lido.** Rodar de novo sem linha nova nao le nada, e a
+   rotacao (`coral.jsonl` -> `coral.jsonl.1`) nao faz o arquivo parecer novo.
+2. **Linha pela metade espera.** O processo pode estar no meio do `write`.
+   Mas uma primeira linha longa e completa (um traceback) e lida.
+3. **O indice espelha o disco.** Backup apagado pela rotacao sai do indice.
+4. **As consultas do pedido:** um fluxo pela correlacao, soma por fonte e p95
+   por rota - pelo `padrao`, que junta os slugs num grupo so.
+"""
+
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from . import indice
+
+
+def linha(mensagem, correlacao='c1', quando='2026-10-01T12:00:00+00:00',
+          nivel='INFO', contexto=None, **dados):
+    registro = {
+        'quando': quando,
+        'nivel': nivel,
+        'logger': 'ingestao.registro',
+        'mensagem': mensagem,
+        'correlacao': correlacao,
+    }
+    if contexto:
+        registro['contexto'] = contexto
+    if dados:
+        registro['dados'] = dados
+    return json.dumps(registro) + '\n'
+
+
+class IndiceTests(SimpleTestCase):
+    def setUp(self):
+        temporaria = tempfile.TemporaryDirectory(prefix='coral-indice-')
+        self.addCleanup(temporaria.cleanup)
+        self.pasta = Path(temporaria.name)
+        self.indice = indice.Indice(self.pasta / indice.NOME_INDICE)
+        self.addCleanup(self.indice.fechar)
+
+    def escrever(self, *linhas, nome='coral.jsonl'):
+        with open(self.pasta / nome, 'a', encoding='utf-8') as arquivo:
+            arquivo.writelines(linhas)
+
+    def mensagens(self, **filtros):
+        return [r['mensagem'] for r in self.indice.linhas(**filtros)]
+
+    def test_segunda_atualizacao_le_so_as_linhas_novas(self):
+        self.escrever(linha('a'), linha('b'))
+        self.assertEqual(self.indice.atualizar(self.pasta).linhas, 2)
+        self.assertEqual(self.indice.atualizar(self.pasta).linhas, 0)
+
+        self.escrever(linha('c'))
+
+        self.assertEqual(self.indice.atualizar(self.pasta).linhas, 1)
+        self.assertEqual(self.mensagens(correlacao='c1'), ['a', 'b', 'c'])
+
+    def test_rotacao_continua_de_onde_parou(self):
+        self.escrever(linha('a', quando='2026-10-01T12:00:00.000001+00:00'))
+        self.indice.atualizar(self.pasta)
+        # Escrita depois da ultima leitura, e logo em seguida a rotacao.
+        self.escrever(linha('b', quando='2026-10-01T12:00:01+00:00'))
+        (self.pasta / 'coral.jsonl').rename(self.pasta / 'coral.jsonl.1')
+        self.escrever(linha('c', quando='2026-10-01T12:00:02+00:00'))
+
+        feito = self.indice.atualizar(self.pasta)
+
+        self.assertEqual(feito.linhas, 2)
+        self.assertEqual(self.mensagens(correlacao='c1'), ['a', 'b', 'c'])
+
+    def test_linha_incompleta_fica_para_a_proxima(self):
+        inteira = linha('inteira')
+        self.escrever(linha('a'), inteira[:20])
+        self.assertEqual(self.indice.atualizar(self.pasta).linhas, 1)
+
+        self.escrever(inteira[20:], 'isto nao e json\n')
+        feito = self.indice.atualizar(self.pasta)
+
+        self.assertEqual((feito.linhas, feito.ignoradas), (1, 1))
+        self.assertEqual(self.mensagens(correlacao='c1'), ['a', 'inteira'])
+
+    def test_primeira_linha_longa_tambem_e_indexada(self):
+        """🚨 Com a assinatura nos primeiros 4 KB, este arquivo nunca entrava."""
+        self.escrever(linha('Falhou', traceback='x' * 10_000), linha('depois'))
+
+        feito = self.indice.atualizar(self.pasta)
+
+        self.assertEqual((feito.arquivos, feito.linhas), (1, 2))
+        self.assertEqual(self.mensagens(correlacao='c1'), ['Falhou', 'depois'])
+
+    def test_primeira_linha_sem_fim_espera(self):
+        self.escrever(linha('pela metade', traceback='x' * 10_000)[:8_000])
+
+        self.assertIsNone(indice.assinatura(self.pasta / 'coral.jsonl'))
+        self.assertEqual(self.indice.atualizar(self.pasta).linhas, 0)
+
+    def test_backup_apagado_sai_do_indice(self):
+        self.escrever(linha('velha', correlacao='v'), nome='coral.jsonl.1')
+        self.escrever(linha('nova', correlacao='n'))
+        self.indice.atualizar(self.pasta)
+
+        (self.pasta / 'coral.jsonl.1').unlink()
+        feito = self.indice.atualizar(self.pasta)
+
+        self.assertEqual(feito.removidos, 1)
+        self.assertEqual(self.mensagens(texto='velha'), [])
+        self.assertEqual(self.mensagens(texto='nova'), ['nova'])
+
+    def test_filtros_de_texto_nivel_e_campo(self):
+        self.escrever(
+            linha('Bloco gravado', contexto={'fonte': 'noaa_crw'}),
+            linha('Bloco falhou', nivel='WARNING', contexto={'fonte': 'noaa_crw'}),
+            linha('Bloco falhou', nivel='ERROR', contexto={'fonte': 'copernicus'}),
+        )
+        self.indice.atualizar(self.pasta)
+
+        self.assertEqual(len(self.mensagens(texto='falhou')), 2)
+        self.assertEqual(len(self.mensagens(nivel='WARNING')), 2)
+        self.assertEqual(
+            self.mensagens(nivel='WARNING', campos={'fonte': 'noaa_crw'}), ['Bloco falhou']
+        )
+
+    def test_soma_por_fonte_e_p95_por_rota(self):
+        self.escrever(
+            linha('Bloco gravado', contexto={'fonte': 'noaa_crw'}, rejeitadas=2),
+            linha('Bloco gravado', contexto={'fonte': 'noaa_crw'}, rejeitadas=3),
+            linha('Bloco gravado', contexto={'fonte': 'copernicus'}, rejeitadas=1),
+            *(
+                linha('Requisicao concluida', contexto={'rota': '/api/painel-risco/'},
+                      duracao_ms=float(ms))
+                for ms in range(1, 101)
+            ),
+        )
+        self.indice.atualizar(self.pasta)
+
+        self.assertEqual(
+            self.indice.agregar('rejeitadas', por='fonte'),
+            [('noaa_crw', 5, 2), ('copernicus', 1, 1)],
+        )
+        self.assertEqual(
+            self.indice.agregar('duracao_ms', por='rota', funcao='p95'),
+            [('/api/painel-risco/', 95.0, 100)],
+        )
+
+    def test_p95_por_padrao_junta_os_slugs(self):
+        """🚨 O `padrao` vem nos `dados`; antes so numero dali era indexado."""
+        self.escrever(*(
+            linha('Requisicao concluida', contexto={'rota': f'/api/locais/{slug}/'},
+                  padrao='api/locais/<slug:slug>/', status=200, duracao_ms=float(ms))
+            for slug, ms in (('abrolhos-ba', 10), ('tamandare-pe', 30))
+        ))
+        self.indice.atualizar(self.pasta)
+
+        self.assertEqual(
+            self.indice.agregar('duracao_ms', por='padrao', funcao='p95'),
+            [('api/locais/<slug:slug>/', 30.0, 2)],
+        )
+        self.assertEqual(len(self.indice.agregar('duracao_ms', por='rota')), 2)
+        self.assertEqual(len(self.mensagens(campos={'status': 200})), 2)
+
+    def test_indice_de_versao_anterior_e_refeito(self):
+        self.escrever(linha('a'))
+        self.indice.atualizar(self.pasta)
+        self.indice.conexao.execute('PRAGMA user_version = 1')
+        self.indice.fechar()
+
+        self.indice = indice.Indice(self.pasta / indice.NOME_INDICE)
+        self.addCleanup(self.indice.fechar)
+
+        self.assertEqual(self.mensagens(correlacao='c1'), [])
+        self.assertEqual(self.indice.atualizar(self.pasta).linhas, 1)
+
+
+class ComandoLogsTests(SimpleTestCase):
+    def test_fluxo_por_correlacao(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            (Path(pasta) / 'coral.jsonl').write_text(
+                linha('Coleta iniciada', correlacao='abc')
+                + linha('Outro fluxo', correlacao='xyz')
+                + linha('Bloco gravado', correlacao='abc', contexto={'fonte': 'noaa_crw'}, gravadas=406),
+                encoding='utf-8',
+            )
+            saida = StringIO()
+
+            call_command('logs', pasta=pasta, correlacao='abc', stdout=saida, stderr=StringIO())
+
+        linhas = saida.getvalue().splitlines()
+        self.assertEqual(len(linhas), 2)
+        self.assertIn('[abc] ingestao.registro: Coleta iniciada', linhas[0])
+        self.assertIn('fonte=noaa_crw gravadas=406', linhas[1])
+
+    def test_nivel_desconhecido_e_recusado_pelo_argumento(self):
+        with tempfile.TemporaryDirectory() as pasta, self.assertRaises(CommandError):
+            call_command('logs', '--pasta', pasta, '--nivel', 'AVISO', stdout=StringIO())
+
+    def test_nivel_em_minusculas_vale(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            (Path(pasta) / 'coral.jsonl').write_text(
+                linha('so info') + linha('deu erro', nivel='ERROR'), encoding='utf-8',
+            )
+            saida = StringIO()
+
+            call_command('logs', '--pasta', pasta, '--nivel', 'warning', stdout=saida, stderr=StringIO())
+
+        self.assertIn('deu erro', saida.getvalue())
+        self.assertNotIn('so info', saida.getvalue())
+
+    def test_expressao_fts_invalida_vira_erro_do_comando(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            (Path(pasta) / 'coral.jsonl').write_text(linha('Falhou com 503'), encoding='utf-8')
+
+            for opcoes in ({}, {'agregar': 'duracao_ms'}):
+                with self.subTest(**opcoes), self.assertRaisesMessage(CommandError, 'recusada'):
+                    call_command(
+                        'logs', pasta=pasta, texto='503)', stdout=StringIO(), stderr=StringIO(),
+                        **opcoes,
+                    )
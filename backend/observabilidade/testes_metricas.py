@@ -0,0 +1,125 @@
+"""Testes do registro de metricas e de `/metricas/`.
+
+O que protegem:
+
+1. **O formato.** Um Prometheus que nao entende a linha descarta o scrape
+   inteiro, em silencio; faixa cumulativa errada da p99 errado sem erro.
+2. **A rota e o padrao, nao o caminho.** Com o slug no rotulo, cada recife
+   vira uma serie e o registro cresce com a base.
+3. 🚨 **O endpoint nao e publico.** Sem token, so a propria maquina le.
+"""
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import path
+
+from . import metricas
+from .middleware import LATENCIA, CorrelacaoMiddleware
+
+
+class ExposicaoTests(SimpleTestCase):
+    def setUp(self):
+        self.registro = metricas.Registro()
+
+    def test_contador_com_rotulos_escapados(self):
+        contador = self.registro.contador('teste_total', 'Um teste.', ('fonte',))
+        contador.inc(2, fonte='noaa')
+        contador.inc(fonte='a"b')
+
+        texto = self.registro.exposicao()
+
+        self.assertIn('# HELP teste_total Um teste.\n', texto)
+        self.assertIn('# TYPE teste_total counter\n', texto)
+        self.assertIn('teste_total{fonte="noaa"} 2\n', texto)
+        self.assertIn('teste_total{fonte="a\\"b"} 1\n', texto)
+
+    def test_histograma_acumula_as_faixas_e_fecha_em_inf(self):
+        histograma = self.registro.histograma('teste_segundos', 'Duracao.', faixas=(0.1, 1))
+        for valor in (0.05, 0.1, 0.5, 3):
+            histograma.observar(valor)
+
+        linhas = self.registro.exposicao().splitlines()
+
+        self.assertIn('teste_segundos_bucket{le="0.1"} 2', linhas)
+        self.assertIn('teste_segundos_bucket{le="1"} 3', linhas)
+        self.assertIn('teste_segundos_bucket{le="+Inf"} 4', linhas)
+        self.assertIn('teste_segundos_sum 3.65', linhas)
+        self.assertIn('teste_segundos_count 4', linhas)
+
+    def test_declarar_de_novo_devolve_a_mesma_metrica(self):
+        primeiro = self.registro.contador('teste_total', 'Um teste.')
+        primeiro.inc()
+
+        self.assertIs(self.registro.contador('teste_total', 'Um teste.'), primeiro)
+        with self.assertRaises(ValueError):
+            self.registro.histograma('teste_total', 'Outro tipo.')
+
+    def test_rotulo_faltando_e_recusado(self):
+        contador = self.registro.contador('teste_total', 'Um teste.', ('fonte', 'local'))
+
+        with self.assertRaises(ValueError):
+            contador.inc(fonte='noaa')
+
+    def test_medidor_com_funcao_le_na_hora(self):
+        itens = []
+        self.registro.medidor('teste_itens', 'Itens.', funcao=lambda: len(itens))
+        itens.extend([1, 2, 3])
+
+        self.assertIn('teste_itens 3\n', self.registro.exposicao())
+
+
+def _local(requisicao, slug):
+    return HttpResponse('ok')
+
+
+urlpatterns = [path('api/locais/<slug:slug>/', _local)]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class LatenciaPorRotaTests(SimpleTestCase):
+    def test_rotulo_e_o_padrao_da_url(self):
+        from django.urls import resolve
+
+        def view(requisicao):
+            requisicao.resolver_match = resolve(requisicao.path)
+            return HttpResponse('ok')
+
+        rotulos = {'metodo': 'GET', 'rota': 'api/locais/<slug:slug>/', 'status': '200'}
+        antes = LATENCIA.contagem(**rotulos)
+        with self.assertLogs('observabilidade.middleware', 'INFO'):
+            for slug in ('abrolhos-ba', 'porto-de-galinhas-pe'):
+                CorrelacaoMiddleware(view)(RequestFactory().get(f'/api/locais/{slug}/'))
+
+        self.assertEqual(LATENCIA.contagem(**rotulos) - antes, 2)
+        self.assertNotIn('abrolhos-ba', metricas.REGISTRO.exposicao())
+
+
+class EndpointTests(SimpleTestCase):
+    def pedir(self, **meta):
+        return metricas.exposicao_view(RequestFactory().get('/metricas/', **meta))
+
+    def test_propria_maquina_le_sem_token(self):
+        resposta = self.pedir(REMOTE_ADDR='127.0.0.1')
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], metricas.TIPO_CONTEUDO)
+        self.assertIn(b'# TYPE http_requisicao_segundos histogram', resposta.content)
+
+    def test_outra_maquina_sem_token_e_recusada(self):
+        self.assertEqual(self.pedir(REMOTE_ADDR='203.0.113.9').status_code, 403)
+
+    @override_settings(METRICAS_TOKEN='s3cr3to')
+    def test_com_token_configurado_so_o_token_vale(self):
+        local = self.pedir(REMOTE_ADDR='127.0.0.1')
+        errado = self.pedir(REMOTE_ADDR='127.0.0.1', HTTP_AUTHORIZATION='Bearer outro')
+        certo = self.pedir(REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer s3cr3to')
+
+        self.assertEqual(local.status_code, 403)
+        self.assertEqual(errado.status_code, 403)
+        self.assertEqual(certo.status_code, 200)
+
+    @override_settings(METRICAS_TOKEN='s3cr3to')
+    def test_cabecalho_fora_do_ascii_e_recusado_e_nao_derruba(self):
+        resposta = self.pedir(REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer s3cr3tô')
+
+        self.assertEqual(resposta.status_code, 403)
@@ -0,0 +1,107 @@
+"""Testes da medida de SQL por requisicao e do orcamento por rota.
+
+O que protegem:
+
+1. **O N+1 aparece.** Um laco que consulta o banco por item sai em WARNING
+   com `orcamento_estourado`, e a linha traz o SQL repetido - e o que deixa
+   achar a regressao pelo log de producao, e nao por acaso.
+2. **O orcamento e da rota.** O painel consulta por recife de proposito; o
+   mesmo padrao em `/api/locais/` e defeito.
+3. 🚨 **Parametro de consulta nao vai para o log.** O SQL sai com `%s`.
+"""
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from aquaculture.models import LocalRecife
+
+from .consultas import medir_sql
+from .middleware import CABECALHO_TEMPOS, CorrelacaoMiddleware, orcamento
+
+
+def _view_que_consulta(vezes, filtro='segredo@example.com'):
+    def view(requisicao):
+        for _ in range(vezes):
+            list(LocalRecife.objects.filter(nome=filtro))
+        return HttpResponse('ok')
+    return view
+
+
+class MedidaSqlTests(TestCase):
+    def test_conta_tempo_repetidas_e_duplicadas(self):
+        with medir_sql() as medida:
+            for slug in ('a', 'b', 'c'):
+                LocalRecife.objects.filter(slug=slug).exists()
+            LocalRecife.objects.filter(slug='a').exists()
+            LocalRecife.objects.count()
+
+        self.assertEqual(medida.consultas, 5)
+        self.assertEqual(medida.repetida[1], 4)
+        self.assertEqual(medida.duplicadas, 1, 'so a segunda de slug=a')
+        self.assertGreater(medida.tempo_ms, 0)
+        self.assertIn('aquaculture_localrecife', medida.mais_lenta)
+
+    def test_fora_do_bloco_nao_mede(self):
+        with medir_sql() as medida:
+            pass
+        LocalRecife.objects.count()
+
+        self.assertEqual(medida.consultas, 0)
+        self.assertEqual(medida.como_extra(), {'consultas': 0, 'sql_ms': 0.0})
+
+
+class OrcamentoTests(SimpleTestCase):
+    ORCAMENTOS = {
+        '/api/': {'consultas': 20},
+        '/api/painel-risco/': {'repeticoes': None},
+    }
+
+    def test_prefixo_mais_longo_vence_e_herda_o_padrao(self):
+        painel = orcamento('/api/painel-risco/abrolhos-ba/', self.ORCAMENTOS)
+        locais = orcamento('/api/locais/', self.ORCAMENTOS)
+        fora = orcamento('/', self.ORCAMENTOS)
+
+        self.assertIsNone(painel['repeticoes'])
+        self.assertEqual(painel['ms'], 1000)
+        self.assertEqual(locais['consultas'], 20)
+        self.assertEqual(locais['repeticoes'], 10)
+        self.assertEqual(fora['consultas'], 50)
+
+
+@override_settings(ORCAMENTOS_REQUISICAO={'/api/painel-risco/': {'repeticoes': None}})
+class MiddlewareTests(TestCase):
+    def pedir(self, caminho, view):
+        requisicao = RequestFactory().get(caminho)
+        with self.assertLogs('observabilidade.middleware', 'INFO') as capturado:
+            resposta = CorrelacaoMiddleware(view)(requisicao)
+        return resposta, capturado.records[-1]
+
+    def test_requisicao_dentro_do_orcamento_e_info_com_os_numeros(self):
+        resposta, registro = self.pedir('/api/locais/', _view_que_consulta(2))
+
+        self.assertEqual(registro.levelname, 'INFO')
+        self.assertEqual(registro.consultas, 2)
+        self.assertFalse(hasattr(registro, 'orcamento_estourado'))
+        self.assertIn('sql;dur=', resposta[CABECALHO_TEMPOS])
+        self.assertIn('2 consultas', resposta[CABECALHO_TEMPOS])
+
+    def test_n_mais_1_estoura_e_vira_warning(self):
+        _, registro = self.pedir('/api/locais/', _view_que_consulta(12))
+
+        self.assertEqual(registro.levelname, 'WARNING')
+        self.assertEqual(registro.orcamento_estourado, ['repeticoes'])
+        self.assertEqual(registro.repeticoes, 12)
+        self.assertIn('aquaculture_localrecife', registro.sql_repetida)
+
+    def test_rota_com_orcamento_proprio_nao_acusa(self):
+        _, registro = self.pedir('/api/painel-risco/', _view_que_consulta(12))
+
+        self.assertEqual(registro.levelname, 'INFO')
+
+    def test_parametro_da_consulta_nao_vai_para_o_log(self):
+        _, registro = self.pedir('/api/locais/', _view_que_consulta(12))
+
+        self.assertNotIn('segredo', registro.sql_repetida)
+        self.assertNotIn('segredo', registro.sql_mais_lenta)
+        self.assertIn('%s', registro.sql_repetida)
+        self.assertTrue(registro.sql_repetida.startswith('SELECT ... FROM'))
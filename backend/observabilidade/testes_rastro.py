@@ -0,0 +1,160 @@
+"""Testes dos trechos e do rastro.
+
+O que protegem:
+
+1. **O aninhamento.** O pai de cada trecho e o trecho aberto quando ele abriu,
+   e a linha de log dentro dele carrega o id - e o que liga log e rastro.
+2. **A divisao do tempo.** `por_etapa` soma por nome, e `proprio` e o que
+   sobra da raiz fora dos filhos diretos (neto nao desconta duas vezes).
+3. **O formato do Chrome.** Microssegundos, `ph: X`; fora disso o Perfetto
+   abre a pagina em branco, sem erro.
+4. ⚠️ **Raiz sem filho nao loga.** Toda requisicao e raiz.
+"""
+
+import json
+import logging
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+
+from . import rastro
+from .correlacao import FiltroCorrelacao, contexto_atual
+from .rastro import por_etapa, trecho
+
+
+class _Capturados(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.registros = []
+
+    def emit(self, record):
+        self.registros.append(record)
+
+
+class TrechoTests(SimpleTestCase):
+    def test_filho_aponta_para_o_pai_e_entra_no_contexto(self):
+        with trecho('raiz', fonte='noaa_crw') as raiz, trecho('raiz.filho', bloco='2026-01') as filho:
+            campos = contexto_atual()
+            with trecho('raiz.filho.neto') as neto:
+                pass
+
+        self.assertIsNone(raiz.pai)
+        self.assertEqual(filho.pai, raiz.id)
+        self.assertEqual(neto.pai, filho.id)
+        self.assertIs(neto.raiz, raiz)
+        self.assertEqual(campos['trecho'], filho.id)
+        self.assertEqual(campos['fonte'], 'noaa_crw')
+        self.assertEqual(campos['bloco'], '2026-01')
+        self.assertEqual({filho.correlacao, neto.correlacao}, {raiz.correlacao})
+        self.assertEqual([t.nome for t in raiz._trechos], ['raiz.filho.neto', 'raiz.filho'])
+        self.assertIsNone(rastro.trecho_atual())
+
+    def test_trecho_fecha_mesmo_com_excecao(self):
+        with self.assertRaises(ValueError), trecho('raiz') as raiz, trecho('raiz.filho'):
+            raise ValueError('quebrou')
+
+        self.assertIsNotNone(raiz.duracao_ms)
+        self.assertEqual(raiz._trechos[0].nome, 'raiz.filho')
+        self.assertIsNone(rastro.trecho_atual())
+
+    def test_por_etapa_soma_por_nome_e_desconta_so_filhos_diretos(self):
+        raiz = rastro.Trecho(nome='ingestao', id='1', pai=None, correlacao='c', inicio=0)
+        raiz.duracao_ms = 100.0
+
+        def filho(nome, id, pai, ms):
+            aberto = rastro.Trecho(nome=nome, id=id, pai=pai, correlacao='c', inicio=0)
+            aberto.duracao_ms = ms
+            return aberto
+
+        raiz._trechos = [
+            filho('ingestao.gravar', '3', '2', 20.0),
+            filho('ingestao.bloco', '2', '1', 40.0),
+            filho('ingestao.gravar', '5', '4', 25.0),
+            filho('ingestao.bloco', '4', '1', 30.0),
+        ]
+
+        self.assertEqual(
+            por_etapa(raiz),
+            {'ingestao.bloco': 70.0, 'ingestao.gravar': 45.0, 'proprio': 30.0},
+        )
+
+    def test_eventos_chrome_em_microssegundos(self):
+        with trecho('projecao') as raiz, trecho('projecao.medicoes', lote=500):
+            pass
+
+        eventos = rastro.eventos_chrome(raiz)['traceEvents']
+
+        self.assertEqual([e['name'] for e in eventos], ['projecao', 'projecao.medicoes'])
+        self.assertEqual({e['ph'] for e in eventos}, {'X'})
+        self.assertEqual(eventos[1]['cat'], 'projecao')
+        self.assertEqual(eventos[1]['args']['pai'], raiz.id)
+        self.assertEqual(eventos[1]['args']['lote'], 500)
+        self.assertEqual(eventos[0]['ts'], round(raiz.inicio * 1_000_000))
+        self.assertEqual(eventos[0]['dur'], round(raiz.duracao_ms * 1000))
+        self.assertGreaterEqual(eventos[1]['ts'], eventos[0]['ts'])
+
+
+class ConclusaoTests(SimpleTestCase):
+    def setUp(self):
+        self.capturados = _Capturados()
+        self.capturados.addFilter(FiltroCorrelacao())
+        logger = logging.getLogger(rastro.__name__)
+        nivel, propaga = logger.level, logger.propagate
+        logger.addHandler(self.capturados)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        self.addCleanup(logger.removeHandler, self.capturados)
+        self.addCleanup(logger.setLevel, nivel)
+        self.addCleanup(setattr, logger, 'propagate', propaga)
+
+    def mensagens(self):
+        return [r.getMessage() for r in self.capturados.registros]
+
+    def test_raiz_sem_filho_nao_gera_nada(self):
+        with trecho('http'):
+            pass
+
+        self.assertEqual(self.mensagens(), [])
+
+    @override_settings(RASTRO_CHROME=False)
+    def test_raiz_conclui_com_a_divisao_por_etapa(self):
+        with trecho('ingestao') as raiz:
+            with trecho('ingestao.bloco'):
+                pass
+            with trecho('ingestao.bloco'):
+                pass
+
+        self.assertEqual(
+            self.mensagens(),
+            ['Trecho concluido', 'Trecho concluido', 'Rastro concluido'],
+        )
+        final = self.capturados.registros[-1]
+        self.assertEqual(final.nome, 'ingestao')
+        self.assertEqual(final.trechos, 2)
+        self.assertEqual(set(final.por_etapa), {'ingestao.bloco', 'proprio'})
+        self.assertEqual(final.correlacao, raiz.correlacao)
+        self.assertFalse(hasattr(final, 'chrome'))
+
+    def test_raiz_lenta_vira_arquivo_do_chrome(self):
+        with tempfile.TemporaryDirectory() as pasta, override_settings(
+            RASTRO_CHROME=True, RASTRO_MINIMO_MS=0, RASTRO_PASTA=Path(pasta),
+        ):
+            with trecho('projecao'), trecho('projecao.medicoes'):
+                pass
+
+            caminho = Path(self.capturados.registros[-1].chrome)
+            conteudo = json.loads(caminho.read_text(encoding='utf-8'))
+
+        self.assertEqual(caminho.parent, Path(pasta))
+        self.assertEqual(len(conteudo['traceEvents']), 2)
+
+    def test_falha_ao_concluir_nao_vira_erro_da_execucao(self):
+        with (
+            override_settings(RASTRO_CHROME=True, RASTRO_MINIMO_MS=0, RASTRO_PASTA='/dev/null/x'),
+            trecho('projecao'),
+            trecho('projecao.medicoes'),
+        ):
+            pass
+
+        self.assertEqual(self.mensagens()[-1], 'Falha ao concluir o rastro')